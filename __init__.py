@@ -5,4 +5,9 @@ import os
 os.makedirs('logs', mode=0o755, exist_ok=True)
 os.makedirs('logs-debug', mode=0o755, exist_ok=True)
 
-logging.config.fileConfig(os.path.join('user-config', 'logging.ini'))
+# 尚未建立 user-config/logging.ini 時 (e.g., 測試、CI) 使用範例設定
+_logging_config = os.path.join('user-config', 'logging.ini')
+if not os.path.exists(_logging_config):
+    _logging_config = os.path.join('user-config-sample', 'logging.example.ini')
+
+logging.config.fileConfig(_logging_config)
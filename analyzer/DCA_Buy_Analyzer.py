@@ -1,5 +1,4 @@
 import logging.config
-import time
 from .analyzer import *
 
 _log = logging.getLogger(__name__)
@@ -33,7 +32,7 @@ class DCA_Buy_Analyzer(Analyzer):
         # Extract asset symbol from the position object
         asset_symbol = position.asset_symbol
         
-        current_time = time.time()
+        current_time = self.clock.time()
         last_buy_time = self._last_buy_times.get(asset_symbol, 0)
         time_since_last_buy = current_time - last_buy_time
         
@@ -47,12 +46,20 @@ class DCA_Buy_Analyzer(Analyzer):
             _log.debug(f"[DCA] {asset_symbol}: Still {remaining_time:.0f}s until next DCA buy")
             return Trade.PASS
     
+    def analyze_intra_candle(self, latest_price, position):
+        """
+        DCA is time based rather than candle based, so it runs on every intra-candle check too
+        :param latest_price: Latest price (not used for DCA)
+        :param position: Position information containing asset symbol
+        """
+        return self.analyze(None, position)
+    
     def record_successful_buy(self, asset_symbol):
         """
         Record a successful buy to update the timer
         This should be called by the trading system after a successful purchase
         """
-        current_time = time.time()
+        current_time = self.clock.time()
         self._last_buy_times[asset_symbol] = current_time
         _log.info(f"[DCA] {asset_symbol}: Recorded successful buy at {current_time}")
     
@@ -62,7 +69,7 @@ class DCA_Buy_Analyzer(Analyzer):
     
     def get_time_until_next_buy(self, asset_symbol):
         """Get seconds remaining until next buy is allowed"""
-        current_time = time.time()
+        current_time = self.clock.time()
         last_buy_time = self._last_buy_times.get(asset_symbol, 0)
         time_since_last_buy = current_time - last_buy_time
         remaining = max(0, self.min_interval_between_buy - time_since_last_buy)
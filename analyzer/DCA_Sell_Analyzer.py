@@ -1,5 +1,4 @@
 import logging.config
-import time
 from .analyzer import *
 
 _log = logging.getLogger(__name__)
@@ -39,7 +38,7 @@ class DCA_Sell_Analyzer(Analyzer):
             _log.debug(f"[DCA_SELL] {asset_symbol}: No positions to sell")
             return Trade.PASS
         
-        current_time = time.time()
+        current_time = self.clock.time()
         last_sell_time = self._last_sell_times.get(asset_symbol, 0)
         time_since_last_sell = current_time - last_sell_time
         
@@ -53,12 +52,20 @@ class DCA_Sell_Analyzer(Analyzer):
             _log.debug(f"[DCA_SELL] {asset_symbol}: Still {remaining_time:.0f}s until next DCA sell")
             return Trade.PASS
     
+    def analyze_intra_candle(self, latest_price, position):
+        """
+        DCA is time based rather than candle based, so it runs on every intra-candle check too
+        :param latest_price: Latest price (not used for DCA)
+        :param position: Position information containing asset symbol
+        """
+        return self.analyze(None, position)
+    
     def record_successful_sell(self, asset_symbol):
         """
         Record a successful sell to update the timer
         This should be called by the trading system after a successful sale
         """
-        current_time = time.time()
+        current_time = self.clock.time()
         self._last_sell_times[asset_symbol] = current_time
         _log.info(f"[DCA_SELL] {asset_symbol}: Recorded successful sell at {current_time}")
     
@@ -68,7 +75,7 @@ class DCA_Sell_Analyzer(Analyzer):
     
     def get_time_until_next_sell(self, asset_symbol):
         """Get seconds remaining until next sell is allowed"""
-        current_time = time.time()
+        current_time = self.clock.time()
         last_sell_time = self._last_sell_times.get(asset_symbol, 0)
         time_since_last_sell = current_time - last_sell_time
         remaining = max(0, self.min_interval_between_sell - time_since_last_sell)
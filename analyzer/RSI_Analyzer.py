@@ -1,7 +1,6 @@
 import logging.config
 
 import backtrader as bt
-import numpy
 import talib
 from bot_env_config.config import Config
 
@@ -37,12 +36,10 @@ class RSI_Analyzer(Analyzer):
     def analyze(self, klines, position):
         """
         RSI Analyzer
-        :param klines: K線資料
+        :param klines: K線資料 (KlineBatch)
         :return: 建議交易行為 Trade.SELL || Trade.BUY || Trade.PASS
         """
-        closes = [float(candle.close) for candle in klines]
-        np_closes = numpy.array(closes)
-        rsi = talib.RSI(np_closes, self.period)
+        rsi = talib.RSI(klines.close, self.period)
         last_rsi = rsi[-1]
         if last_rsi >= self.oversell:
             return Trade.SELL
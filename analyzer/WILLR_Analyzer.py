@@ -1,7 +1,6 @@
 import logging.config
 
 import backtrader as bt
-import numpy
 import talib
 from bot_env_config.config import Config
 
@@ -28,13 +27,10 @@ class WILLR_Analyzer(Analyzer):
     def analyze(self, klines, position):
         """
         WILLR - Williams' %R Analyzer
-        :param klines: K線資料
+        :param klines: K線資料 (KlineBatch)
         :return: 建議交易行為 Trade.SELL || Trade.BUY || Trade.PASS
         """
-        highs, lows, closes = zip(
-            *[(float(candle.high), float(candle.low), float(candle.close)) for candle in klines])
-        willrs = talib.WILLR(numpy.array(highs), numpy.array(
-            lows), numpy.array(closes), self.period)
+        willrs = talib.WILLR(klines.high, klines.low, klines.close, self.period)
         # upper, middle, lower = talib.BBANDS(numpy.array(closes), timeperiod=200, nbdevup=2, nbdevdn=2, matype=0)
         last_willr = willrs[-1]
         if last_willr >= self.oversell and position.open_quantity > 0:
@@ -2,6 +2,8 @@ import abc
 from enum import Enum
 import backtrader as bt
 import logging.config
+import time
+from binance.client import Client
 
 
 _log = logging.getLogger(__name__)
@@ -14,6 +16,13 @@ class Trade(Enum):
 
 
 class Analyzer(metaclass=abc.ABCMeta):
+    # 分析使用的 K 線週期與數量，可在 analyzer.json 以 kline_interval、klines_limit 覆寫
+    kline_interval = Client.KLINE_INTERVAL_1DAY
+    klines_limit = 20
+
+    # 取得目前時間 (epoch 秒) 的時間來源，重播紀錄時由 TradeLoopRunner 換成模擬時間
+    clock = time
+
     # 建構式
     def __init__(self):
         pass
@@ -21,3 +30,15 @@ class Analyzer(metaclass=abc.ABCMeta):
     @abc.abstractmethod
     def analyze(self, klines, position):
         return NotImplemented
+
+    def analyze_intra_candle(self, latest_price, position):
+        """
+        K 線尚未收盤時，只用最新價進行的輕量分析 (e.g., 停損、停利)
+        :param latest_price: 最新價 (Decimal)
+        :return: 建議交易行為，預設不動作 Trade.PASS
+        """
+        return Trade.PASS
+
+    def has_intra_candle_logic(self):
+        """子類別是否有實作 analyze_intra_candle()"""
+        return type(self).analyze_intra_candle is not Analyzer.analyze_intra_candle
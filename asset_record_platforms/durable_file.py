@@ -0,0 +1,23 @@
+import json
+import os
+
+
+def write_json_synced(path: str, content: dict) -> None:
+    """寫出 JSON 檔並 fsync，回傳時內容已寫入磁碟"""
+    with open(path, 'w') as outfile:
+        json.dump(content, outfile)
+        outfile.flush()
+        os.fsync(outfile.fileno())
+
+
+def fsync_dir(dir_path: str) -> None:
+    """fsync 目錄，讓目錄內的 rename、新增、刪除在斷電後仍然存在"""
+    # Windows 無法開啟目錄做 fsync，NTFS 的 rename 由檔案系統的 journal 保護
+    if os.name == 'nt':
+        return
+
+    fd = os.open(dir_path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
@@ -1,11 +1,30 @@
+import decimal
 import json
 import logging
 import os
+import threading
 
+from .durable_file import fsync_dir, write_json_synced
+from .journal_position_store import JournalPositionStore
 from .position import *
+from .sqlite_position_store import SqlitePositionStore
+from metrics import REGISTRY
 
 _log = logging.getLogger(__name__)
 
+_position_write_seconds = REGISTRY.histogram(
+    'asset_positions_write_seconds', 'Time spent writing a position record file')
+_position_commit_seconds = REGISTRY.histogram(
+    'asset_positions_commit_seconds', 'Time spent writing the positions updated in a round (group commit)')
+
+# asset_positions_storage 可用的值
+STORAGE_TYPES = ('json', 'journal', 'sqlite')
+
+# 總計以不捨入的精度加減，反覆扣掉舊值、加上新值後仍等於逐一加總
+_EXACT = decimal.Context(prec=decimal.MAX_PREC)
+# 沒有計入總計的資產：(是否持倉, 持倉成本, 總手續費, 交易筆數)
+_NO_CONTRIBUTION = (0, Decimal('0'), Decimal('0'), 0)
+
 
 class AssetPositions:
     """基於檔案儲存的、帳號下的資產倉位"""
@@ -13,47 +32,108 @@ class AssetPositions:
     BASE_DIR = os.path.normpath(os.path.join(
             os.path.dirname(__file__), '..', "asset-positions"))
 
-    def __init__(self, watching_symbols, cash_asset):
-        os.makedirs(AssetPositions.BASE_DIR, mode=0o755, exist_ok=True)
+    # json 模式 group commit 時，記錄正在取代哪些 <ASSET>.json，中斷後啟動時依它完成取代
+    # 有 writer_id 時為 .commit-intent.<writer_id>
+    COMMIT_INTENT_FILE = ".commit-intent"
+
+    def __init__(
+            self, watching_symbols, cash_asset, base_dir=None, storage='json', compact_every=100, group_commit=False,
+            read_only=False, writer_id=None):
+        """
+        base_dir: 倉位紀錄的目錄，None 表示使用 AssetPositions.BASE_DIR
+        storage: json 為每筆交易都重寫整個 <ASSET>.json；journal 為交易逐筆附加 (見 JournalPositionStore)；
+                 sqlite 為存在 positions.sqlite3 (見 SqlitePositionStore)
+        compact_every: journal 模式下，每幾筆交易更新一次彙總欄位
+        group_commit: 交易只先記在 memory，呼叫 commit() (每輪結束時) 才一次寫檔並 fsync
+        read_only: 只讀取，不修復或轉換倉位紀錄 (e.g., portfolio_summary.py 等在交易迴圈寫入時讀取)
+        writer_id: 同一個目錄有多個寫入端時 (e.g., sharded_trade_loop.py 的 shard) 各自的名稱，
+                   json 模式 group commit 的 intent 檔以它區分，各寫入端只完成自己中斷的 commit
+        """
+        if storage not in STORAGE_TYPES:
+            raise ValueError(f"Invalid asset_positions_storage: {storage}. Use 'json', 'journal' or 'sqlite'")
+
+        self.__base_dir = base_dir if base_dir is not None else AssetPositions.BASE_DIR
+        self.__intent_path = os.path.join(
+            self.__base_dir,
+            AssetPositions.COMMIT_INTENT_FILE + (f".{writer_id}" if writer_id is not None else ''))
+        if not read_only:
+            os.makedirs(self.__base_dir, mode=0o755, exist_ok=True)
         self.positions = dict()
 
+        self.__store = None
+        if storage == 'journal':
+            self.__store = JournalPositionStore(self.__base_dir, compact_every, read_only=read_only)
+        elif storage == 'sqlite':
+            self.__store = SqlitePositionStore(self.__base_dir, read_only=read_only, durable=group_commit)
+        elif not read_only:
+            self.__recover_json_commit()
+        # 上次 export_json() 之後有新交易的資產
+        self.__unexported = set()
+
+        self.__group_commit = group_commit
+        # 上次 commit() 之後有新交易的資產 -> 要寫入的交易與彙總欄位
+        self.__pending = dict()
+        # 成交可能由送單執行緒或 user data stream 執行緒記入
+        self.__pending_lock = threading.Lock()
+        self.__commit_lock = threading.Lock()
+
+        # 持倉數量、持倉成本、手續費、交易筆數的總計，每筆交易只更新該資產的部份，買進前檢查限制不需掃過全部倉位
+        self.__open_position_count = 0
+        self.__total_open_cost = Decimal('0')
+        self.__total_commission_as_usdt = Decimal('0')
+        self.__transaction_count = 0
+        # 資產 -> 目前計入總計的值
+        self.__contributions = dict()
+        self.__totals_lock = threading.Lock()
+
         self.__read_file(cash_asset)
         for symbol in watching_symbols:
             self.__read_file(symbol.base_asset)
+        for asset_symbol in self.positions:
+            self.__update_totals(asset_symbol)
+
+    def from_config(config, watching_symbols, cash_asset, read_only=False, writer_id=None):
+        """
+        依 config 的 asset_positions_dir、asset_positions_storage 建立
+        read_only、writer_id: 見 __init__
+        """
+        return AssetPositions(
+            watching_symbols, cash_asset,
+            base_dir=config.get_data_dir('asset_positions_dir'),
+            storage=config.position_manage.get('asset_positions_storage', 'json'),
+            compact_every=int(config.position_manage.get('asset_positions_compact_every', 100)),
+            group_commit=bool(config.position_manage.get('asset_positions_group_commit', False)),
+            read_only=read_only,
+            writer_id=writer_id)
+
+    def stored_assets(base_dir, storage='json'):
+        """base_dir 內有倉位紀錄的資產名稱"""
+        base_dir = base_dir if base_dir is not None else AssetPositions.BASE_DIR
+        if not os.path.isdir(base_dir):
+            return []
+
+        if storage == 'journal':
+            return JournalPositionStore(base_dir, read_only=True).stored_assets()
+        if storage == 'sqlite':
+            return SqlitePositionStore(base_dir, read_only=True).stored_assets()
+
+        return sorted(name[:-len('.json')] for name in os.listdir(base_dir) if name.endswith('.json'))
 
     def get_total_commision_as_usdt(self):
         """取得總手續費 (USDT)"""
-        sum = Decimal('0.0')
-        for pos in self.positions.values():
-            sum += pos.total_commission_as_usdt
-
-        return sum
+        return self.__total_commission_as_usdt
 
     def get_transactions_count(self):
         """取得交易完成總數"""
-        sum = int(0)
-        for pos in self.positions.values():
-            sum += pos.get_transactions_count()
-
-        return sum
+        return self.__transaction_count
 
     def cal_total_open_position_count(self):
-        total_open_count = int(0)
-
-        for _symbol, position in self.positions.items():
-            if position.open_quantity > 0:
-                total_open_count += 1
-
-        return total_open_count
+        """持倉 (open_quantity > 0) 的資產數量"""
+        return self.__open_position_count
 
     def cal_total_open_cost(self):
-        total_open_cost = Decimal(0)
-
-        for _symbol, position in self.positions.items():
-            if position.open_cost > 0:
-                total_open_cost += position.open_cost
-
-        return total_open_cost
+        """全部持倉的成本"""
+        return self.__total_open_cost
     
     def cal_portfolio_pnl(self, market_prices_dict, cash_currency="USDT"):
         """Calculate comprehensive portfolio P&L metrics
@@ -183,8 +263,97 @@ class AssetPositions:
         
         return "\n".join(lines)
 
+    def export_json(self, only_changed=True):
+        """
+        journal / sqlite 模式下，將倉位以 <ASSET>.json 格式寫出 (dashboard 讀取的格式)
+        only_changed: 只寫出上次匯出後有新交易的倉位
+        """
+        if self.__store is None:
+            return
+
+        asset_symbols = self.__unexported if only_changed else self.positions.keys()
+        for asset_symbol in sorted(asset_symbols):
+            self.__store.export_json(self.positions[asset_symbol])
+        self.__unexported.clear()
+
+    def commit(self):
+        """
+        group_commit 模式下，將上次 commit() 之後的交易一次寫入，回傳寫入的交易筆數
+        json 為寫暫存檔、fsync 後 rename；journal 為每個資產附加一次並 fsync；sqlite 為單一 transaction
+        """
+        with self.__commit_lock:
+            with self.__pending_lock:
+                pending, self.__pending = self.__pending, dict()
+            if not pending:
+                return 0
+
+            with _position_commit_seconds.time():
+                if self.__store is not None:
+                    self.__store.commit(pending)
+                else:
+                    self.__commit_json(sorted(pending))
+            self.__unexported.update(pending)
+
+        return sum(len(batch['transactions']) for batch in pending.values())
+
+    def __commit_json(self, asset_symbols):
+        # 1. 新內容寫到暫存檔並 fsync，中斷時原本的 <ASSET>.json 都還在
+        for asset_symbol in asset_symbols:
+            record_path = AssetPositions.__get_record_path(self.__base_dir, asset_symbol)
+            write_json_synced(record_path + '.tmp', self.positions[asset_symbol].to_dict())
+
+        # 2. 寫入 intent 檔之後，即使中斷也會在啟動時完成全部的取代
+        write_json_synced(self.__intent_path + '.tmp', {'assets': asset_symbols})
+        os.replace(self.__intent_path + '.tmp', self.__intent_path)
+        fsync_dir(self.__base_dir)
+
+        # 3. 取代 <ASSET>.json，完成後才移除 intent 檔
+        self.__finish_json_commit(asset_symbols)
+
+    def __recover_json_commit(self):
+        """
+        完成中斷的 group commit：有 intent 檔時取代其中的資產
+        沒有 intent 檔時殘留的暫存檔是未完成的 commit，不讀取它，下一次 commit 會覆寫
+        """
+        if not os.path.exists(self.__intent_path):
+            return
+
+        try:
+            with open(self.__intent_path, "r") as json_file:
+                asset_symbols = json.load(json_file)['assets']
+        except FileNotFoundError:
+            # 交易迴圈剛好完成了這次 commit (e.g., portfolio_summary.py 同時讀取)
+            return
+        _log.warning(f"Completing an interrupted position commit of {', '.join(asset_symbols)}")
+        self.__finish_json_commit(asset_symbols)
+
+    def __finish_json_commit(self, asset_symbols):
+        # 其他 process 啟動時可能同時在完成同一個 commit，已取代過的資產沒有暫存檔
+        for asset_symbol in asset_symbols:
+            record_path = AssetPositions.__get_record_path(self.__base_dir, asset_symbol)
+            try:
+                os.replace(record_path + '.tmp', record_path)
+            except FileNotFoundError:
+                pass
+        fsync_dir(self.__base_dir)
+
+        # 移除也要 fsync，否則斷電後殘留的 intent 檔會套用到下一次 commit 的暫存檔
+        try:
+            os.remove(self.__intent_path)
+        except FileNotFoundError:
+            pass
+        fsync_dir(self.__base_dir)
+
     def __read_file(self, asset_symbol):
-        record_path = AssetPositions.__get_record_path(asset_symbol)
+        if self.__store is not None:
+            # 交易紀錄第一次被讀取時才載入
+            store = self.__store
+            self.positions[asset_symbol] = Position(
+                asset_symbol, self.__on_position_update, store.load(asset_symbol),
+                lambda: store.load_transactions(asset_symbol))
+            return
+
+        record_path = AssetPositions.__get_record_path(self.__base_dir, asset_symbol)
 
         if not os.path.exists(record_path):
             self.positions[asset_symbol] = Position(
@@ -193,19 +362,56 @@ class AssetPositions:
                 f"{asset_symbol} position file does not exist, skip loading ({record_path})")
             return
 
-        with open(record_path, "r+") as json_file:
+        with open(record_path, "r") as json_file:
             _log.debug(
                 f"{asset_symbol} position file exists, loading ({record_path})")
             self.positions[asset_symbol] = Position(
                 asset_symbol, self.__on_position_update, json.load(json_file))
 
+    def __update_totals(self, asset_symbol):
+        """以資產目前的倉位取代它之前計入總計的值"""
+        position = self.positions[asset_symbol]
+        contribution = (
+            1 if position.open_quantity > 0 else 0,
+            position.open_cost if position.open_cost > 0 else Decimal('0'),
+            position.total_commission_as_usdt,
+            position.get_transactions_count(),
+        )
+
+        with self.__totals_lock:
+            open_count, open_cost, commission, count = self.__contributions.get(asset_symbol, _NO_CONTRIBUTION)
+            self.__open_position_count += contribution[0] - open_count
+            self.__total_open_cost = _EXACT.add(
+                _EXACT.subtract(self.__total_open_cost, open_cost), contribution[1])
+            self.__total_commission_as_usdt = _EXACT.add(
+                _EXACT.subtract(self.__total_commission_as_usdt, commission), contribution[2])
+            self.__transaction_count += contribution[3] - count
+            self.__contributions[asset_symbol] = contribution
+
     def __on_position_update(self, asset_symbol):
-        record_path = AssetPositions.__get_record_path(asset_symbol)
+        self.__update_totals(asset_symbol)
+
+        if self.__group_commit:
+            position = self.positions[asset_symbol]
+            with self.__pending_lock:
+                batch = self.__pending.setdefault(asset_symbol, {'transactions': []})
+                batch['transactions'].append(position.latest_transaction)
+                batch['aggregates'] = position.aggregates()
+                batch['transaction_count'] = position.get_transactions_count()
+            return
+
+        if self.__store is not None:
+            with _position_write_seconds.time():
+                self.__store.append(self.positions[asset_symbol])
+            self.__unexported.add(asset_symbol)
+            return
+
+        record_path = AssetPositions.__get_record_path(self.__base_dir, asset_symbol)
         _log.debug(f"__on_position_update, writing to {record_path}")
 
-        with open(record_path, 'w') as outfile:
+        with _position_write_seconds.time(), open(record_path, 'w') as outfile:
             position = self.positions[asset_symbol]
             json.dump(position.to_dict(), outfile)
 
-    def __get_record_path(asset_symbol):
-        return os.sep.join([AssetPositions.BASE_DIR, f"{asset_symbol}.json"])
+    def __get_record_path(base_dir, asset_symbol):
+        return os.sep.join([base_dir, f"{asset_symbol}.json"])
@@ -0,0 +1,218 @@
+import json
+import logging
+import os
+
+from .durable_file import fsync_dir
+from .position import *
+
+_log = logging.getLogger(__name__)
+
+# 倉位的彙總欄位，header 只保存這些欄位與已涵蓋的交易筆數
+AGGREGATE_FIELDS = ('open_quantity', 'open_cost', 'realized_gain', 'total_commission_as_usdt')
+
+
+class JournalPositionStore:
+    """
+    以 journal 保存倉位：交易逐筆附加到 journal/<ASSET>.jsonl (JSON Lines)，
+    彙總欄位與它涵蓋到 journal 的位置存在 journal/<ASSET>.header.json，每 compact_every 筆交易才重寫一次 header
+    讀取時以 header 加上之後的交易還原彙總欄位；<ASSET>.json (舊格式，dashboard 使用) 只在 export_json() 時寫出
+    """
+
+    SUB_DIR = "journal"
+
+    def __init__(self, base_dir: str, compact_every: int = 100, read_only: bool = False):
+        """
+        base_dir: 倉位紀錄的目錄 (與 AssetPositions 相同)，journal 存放在其下的 journal/
+        compact_every: 每附加幾筆交易就把它們併入 header
+        read_only: 只讀取，不截掉寫到一半的最後一行、不重寫 header、不轉換舊格式 (e.g., 交易迴圈寫入時的讀取端)
+                   修復只由寫入的交易迴圈進行
+        """
+        if compact_every < 1:
+            raise ValueError('compact_every must be at least 1')
+
+        self.__base_dir = base_dir
+        self.__journal_dir = os.path.join(base_dir, JournalPositionStore.SUB_DIR)
+        self.__compact_every = compact_every
+        self.__read_only = read_only
+        if not read_only:
+            os.makedirs(self.__journal_dir, mode=0o755, exist_ok=True)
+
+        # 資產 -> header 涵蓋的交易筆數
+        self.__compacted_counts = dict()
+
+    def stored_assets(self) -> list:
+        """有 journal 的資產名稱"""
+        if not os.path.isdir(self.__journal_dir):
+            return []
+
+        return sorted(name[:-len('.jsonl')] for name in os.listdir(self.__journal_dir) if name.endswith('.jsonl'))
+
+    def load(self, asset_symbol: str):
+        """
+        回傳倉位的彙總欄位與 transaction_count，交易紀錄由 load_transactions() 延遲載入；沒有紀錄時回傳 None
+        只讀取 header 之後附加的交易，啟動時間不隨交易筆數增加
+        header 與 journal 不符、或尚未轉換的舊格式 <ASSET>.json，回傳含 transactions 的 dict (與 Position.to_dict() 相同格式)
+        """
+        journal_path = self.__get_journal_path(asset_symbol)
+        if not os.path.exists(journal_path):
+            legacy_path = self.__get_legacy_path(asset_symbol)
+            if not os.path.exists(legacy_path):
+                return None
+
+            with open(legacy_path, "r") as json_file:
+                legacy = json.load(json_file)
+            if self.__read_only:
+                return legacy
+
+            _log.info(f"Converting {legacy_path} to a journal")
+            self.__rewrite(asset_symbol, legacy)
+            return legacy
+
+        header = self.__read_header(asset_symbol)
+        if header is None or header.get('journal_size', -1) < 0 or header['journal_size'] > os.path.getsize(journal_path):
+            # header 遺失或比 journal 新 (journal 的尾端沒寫入磁碟)，從頭計算彙總欄位
+            _log.warning(f"{asset_symbol} journal header does not match the journal, rebuilding it")
+            transactions, journal_size = self.__read_journal(journal_path, 0)
+            ret = JournalPositionStore.__replay(asset_symbol, {field: '0' for field in AGGREGATE_FIELDS}, transactions)
+            if not self.__read_only:
+                self.__write_header(asset_symbol, ret, len(transactions), journal_size)
+
+            ret['transactions'] = transactions
+            return ret
+
+        # 套用 header 之後的交易
+        tail, journal_size = self.__read_journal(journal_path, header['journal_size'])
+        ret = JournalPositionStore.__replay(asset_symbol, header, tail)
+        transaction_count = header['transaction_count'] + len(tail)
+        if tail and not self.__read_only:
+            self.__write_header(asset_symbol, ret, transaction_count, journal_size)
+        else:
+            self.__compacted_counts[asset_symbol] = transaction_count
+
+        ret['transaction_count'] = transaction_count
+        return ret
+
+    def load_transactions(self, asset_symbol: str) -> list:
+        """讀取 journal 內全部的交易 (Transaction.to_dict() 格式)"""
+        transactions, _journal_size = self.__read_journal(self.__get_journal_path(asset_symbol), 0)
+        return transactions
+
+    def append(self, position: Position) -> None:
+        """附加 position 最新的一筆交易，累積 compact_every 筆後更新 header"""
+        asset_symbol = position.asset_symbol
+        with open(self.__get_journal_path(asset_symbol), 'a') as journal_file:
+            journal_file.write(json.dumps(position.latest_transaction.to_dict()) + '\n')
+
+        transaction_count = position.get_transactions_count()
+        if transaction_count - self.__compacted_counts.get(asset_symbol, 0) >= self.__compact_every:
+            self.compact(position)
+
+    def commit(self, batches: dict) -> None:
+        """
+        group commit：一次附加多個資產累積的交易並 fsync，需要時更新 header
+        batches: 資產 -> {'transactions': [Transaction], 'aggregates': 彙總欄位, 'transaction_count': 交易筆數}
+        中斷時各資產的 journal 以寫完的最後一筆為準 (寫到一半的最後一行在讀取時截掉)
+        """
+        for asset_symbol, batch in sorted(batches.items()):
+            journal_path = self.__get_journal_path(asset_symbol)
+            with open(journal_path, 'a') as journal_file:
+                journal_file.write(''.join(json.dumps(t.to_dict()) + '\n' for t in batch['transactions']))
+                journal_file.flush()
+                os.fsync(journal_file.fileno())
+
+            transaction_count = batch['transaction_count']
+            if transaction_count - self.__compacted_counts.get(asset_symbol, 0) >= self.__compact_every:
+                self.__write_header(
+                    asset_symbol, batch['aggregates'], transaction_count, os.path.getsize(journal_path))
+
+        # 第一次寫入的資產會新增 journal 檔
+        fsync_dir(self.__journal_dir)
+
+    def compact(self, position: Position) -> None:
+        """將目前的彙總欄位寫入 header"""
+        self.__write_header(
+            position.asset_symbol, JournalPositionStore.__aggregates(position), position.get_transactions_count(),
+            os.path.getsize(self.__get_journal_path(position.asset_symbol)))
+
+    def export_json(self, position: Position) -> None:
+        """以舊格式寫出 <ASSET>.json，供 dashboard 等讀取"""
+        self.__replace_file(self.__get_legacy_path(position.asset_symbol), position.to_dict())
+
+    def __rewrite(self, asset_symbol: str, position_dict: dict) -> None:
+        journal_path = self.__get_journal_path(asset_symbol)
+        with open(journal_path + '.tmp', 'w') as journal_file:
+            for transact in position_dict['transactions']:
+                journal_file.write(json.dumps(transact) + '\n')
+        os.replace(journal_path + '.tmp', journal_path)
+
+        self.__write_header(
+            asset_symbol, position_dict, len(position_dict['transactions']), os.path.getsize(journal_path))
+
+    def __read_journal(self, journal_path: str, offset: int):
+        """讀取 offset 之後的交易，回傳 (交易, 最後一筆完整紀錄結束的位置)"""
+        transactions = []
+        valid_size = offset
+        with open(journal_path, "rb") as journal_file:
+            journal_file.seek(offset)
+            for line in journal_file:
+                try:
+                    if not line.endswith(b'\n'):
+                        raise ValueError('missing newline')
+                    transactions.append(json.loads(line))
+                except ValueError:
+                    _log.warning(f"Ignoring a truncated record at the end of {journal_path}")
+                    break
+                valid_size += len(line)
+
+        # 截掉寫到一半的最後一行，之後附加的交易才不會接在它後面
+        # 唯讀時不截掉，最後一行可能是交易迴圈正在附加的紀錄
+        if not self.__read_only and valid_size < os.path.getsize(journal_path):
+            os.truncate(journal_path, valid_size)
+
+        return transactions, valid_size
+
+    def __read_header(self, asset_symbol: str):
+        header_path = self.__get_header_path(asset_symbol)
+        if not os.path.exists(header_path):
+            return None
+
+        with open(header_path, "r") as json_file:
+            return json.load(json_file)
+
+    def __write_header(self, asset_symbol: str, aggregates: dict, transaction_count: int, journal_size: int) -> None:
+        header = {field: aggregates[field] for field in AGGREGATE_FIELDS}
+        header['transaction_count'] = transaction_count
+        # header 涵蓋到 journal 的哪個位置，之後的交易讀取時再套用
+        header['journal_size'] = journal_size
+        self.__replace_file(self.__get_header_path(asset_symbol), header)
+        self.__compacted_counts[asset_symbol] = transaction_count
+
+    def __replay(asset_symbol: str, aggregates: dict, transactions: list) -> dict:
+        """將 transactions 套用到彙總欄位，回傳新的彙總欄位"""
+        position = Position(asset_symbol, lambda _asset_symbol: None, {
+            **{field: aggregates[field] for field in AGGREGATE_FIELDS},
+            'transactions': [],
+        })
+        for transact in transactions:
+            position.add_transaction(Transaction.from_dict(transact))
+
+        return JournalPositionStore.__aggregates(position)
+
+    def __aggregates(position: Position) -> dict:
+        # 輸出全部轉 string，保留數字精度
+        return {field: str(getattr(position, field)) for field in AGGREGATE_FIELDS}
+
+    def __replace_file(self, path: str, content: dict) -> None:
+        # 先寫到暫存檔再取代，中斷時不會留下寫一半的檔案
+        with open(path + '.tmp', 'w') as outfile:
+            json.dump(content, outfile)
+        os.replace(path + '.tmp', path)
+
+    def __get_journal_path(self, asset_symbol: str) -> str:
+        return os.path.join(self.__journal_dir, f"{asset_symbol}.jsonl")
+
+    def __get_header_path(self, asset_symbol: str) -> str:
+        return os.path.join(self.__journal_dir, f"{asset_symbol}.header.json")
+
+    def __get_legacy_path(self, asset_symbol: str) -> str:
+        return os.path.join(self.__base_dir, f"{asset_symbol}.json")
@@ -10,15 +10,21 @@ _log = logging.getLogger(__name__)
 class Position:
     """單一種貨幣的倉位"""
 
-    def __init__(self, asset_symbol, on_update, dict):
+    def __init__(self, asset_symbol, on_update, dict, transactions_loader=None):
         """
         從資料來源 (dict) 還原倉位紀錄到 memory
         asset_symbol: 貨幣代號
         transaction: 交易紀錄
+        transactions_loader: dict 只有彙總欄位與 transaction_count (沒有 transactions) 時，
+                             第一次讀取 transactions 才呼叫它取得交易紀錄 (Transaction.to_dict() 格式的 list)
         """
         self.asset_symbol = asset_symbol
         self.__on_update_transaction = on_update
-        self.transactions = list()
+        self.__transactions = list()
+        self.__transactions_loader = None
+        self.__transaction_count = 0
+        # 最近一次 add_transaction() 的交易，儲存端以它附加紀錄，不需載入全部交易
+        self.latest_transaction = None
 
         if dict is None:
             self.open_quantity = Decimal("0.0")
@@ -34,35 +40,43 @@ class Position:
         self.total_commission_as_usdt = Decimal(
             dict['total_commission_as_usdt'])
 
+        if 'transactions' not in dict:
+            self.__transactions = None
+            self.__transactions_loader = transactions_loader
+            self.__transaction_count = int(dict['transaction_count'])
+            return
+
         for transact in dict['transactions']:
             # print(transact)
-            round_id = None
-            if 'round_id' in transact and transact['round_id'] != "None":
-                round_id = transact['round_id']
-
-            self.transactions.append(Transaction(
-                time=int(transact['time']),
-                activity=transact['activity'],
-                symbol=transact['symbol'],
-                trade_symbol=transact['trade_symbol'],
-                quantity=Decimal(transact['quantity']),
-                price=Decimal(transact['price']),
-                commission=Decimal(transact['commission']),
-                commission_asset=transact['commission_asset'],
-                commission_as_usdt=Decimal(transact['commission_as_usdt']),
-                round_id=round_id,
-                order_id=transact['order_id'],
-                trade_id=transact['trade_id'],
-                closed_trade_ids=transact['closed_trade_ids']))
+            self.__transactions.append(Transaction.from_dict(transact))
+        self.__transaction_count = len(self.__transactions)
+
+    @property
+    def transactions(self):
+        """全部的交易紀錄，延遲載入時第一次讀取才載入"""
+        if self.__transactions is None:
+            self.__transactions = [Transaction.from_dict(t) for t in self.__transactions_loader()]
+            self.__transactions_loader = None
+
+        return self.__transactions
+
+    def transactions_loaded(self) -> bool:
+        return self.__transactions is not None
 
     def to_dict(self):
         # 輸出全部轉 string，保留數字精度
+        return {
+            **self.aggregates(),
+            'transactions': [t.to_dict() for t in self.transactions],
+        }
+
+    def aggregates(self):
+        """彙總欄位 (不含交易紀錄)，全部轉 string"""
         return {
             'open_quantity': str(self.open_quantity),
             'open_cost': str(self.open_cost),
             'realized_gain': str(self.realized_gain),
             'total_commission_as_usdt': str(self.total_commission_as_usdt),
-            'transactions': [t.to_dict() for t in self.transactions],
         }
 
     def add_transaction(self, transaction):
@@ -92,12 +106,16 @@ class Position:
             raise Exception("Unknown transaction activity")
 
         self.total_commission_as_usdt += transaction.commission_as_usdt
-        self.transactions.append(transaction)
+        # 尚未載入時不需附加，儲存端寫入後，載入時就會包含這筆交易
+        if self.__transactions is not None:
+            self.__transactions.append(transaction)
+        self.__transaction_count += 1
+        self.latest_transaction = transaction
         self.__on_update_transaction(self.asset_symbol)
 
     def get_transactions_count(self):
         """取得交易完成總數"""
-        return len(self.transactions)
+        return self.__transaction_count
 
     def __str__(self):
         if self.open_quantity > 0:
@@ -144,6 +162,27 @@ class Transaction:
         else:
             self.closed_trade_ids = closed_trade_ids
 
+    def from_dict(transact):
+        """由 to_dict() 的輸出還原"""
+        round_id = None
+        if 'round_id' in transact and transact['round_id'] != "None":
+            round_id = transact['round_id']
+
+        return Transaction(
+            time=int(transact['time']),
+            activity=transact['activity'],
+            symbol=transact['symbol'],
+            trade_symbol=transact['trade_symbol'],
+            quantity=Decimal(transact['quantity']),
+            price=Decimal(transact['price']),
+            commission=Decimal(transact['commission']),
+            commission_asset=transact['commission_asset'],
+            commission_as_usdt=Decimal(transact['commission_as_usdt']),
+            round_id=round_id,
+            order_id=transact['order_id'],
+            trade_id=transact['trade_id'],
+            closed_trade_ids=transact['closed_trade_ids'])
+
     def to_dict(self):
         # 輸出全部轉 string，保留數字精度
         return {
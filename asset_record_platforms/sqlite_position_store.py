@@ -0,0 +1,220 @@
+import json
+import logging
+import os
+import sqlite3
+import threading
+
+from .position import *
+
+_log = logging.getLogger(__name__)
+
+# 倉位的彙總欄位，以 TEXT 保存 Decimal 的完整精度
+AGGREGATE_FIELDS = ('open_quantity', 'open_cost', 'realized_gain', 'total_commission_as_usdt')
+
+# 交易紀錄欄位 (與 Transaction.to_dict() 相同，symbol 即為倉位的 asset)
+TRANSACTION_FIELDS = (
+    'time', 'activity', 'trade_symbol', 'quantity', 'price', 'commission', 'commission_asset',
+    'commission_as_usdt', 'round_id', 'order_id', 'trade_id', 'closed_trade_ids')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS positions (
+    asset TEXT PRIMARY KEY,
+    open_quantity TEXT NOT NULL,
+    open_cost TEXT NOT NULL,
+    realized_gain TEXT NOT NULL,
+    total_commission_as_usdt TEXT NOT NULL,
+    transaction_count INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS transactions (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    asset TEXT NOT NULL,
+    time INTEGER NOT NULL,
+    activity TEXT NOT NULL,
+    trade_symbol TEXT NOT NULL,
+    quantity TEXT NOT NULL,
+    price TEXT NOT NULL,
+    commission TEXT NOT NULL,
+    commission_asset TEXT NOT NULL,
+    commission_as_usdt TEXT NOT NULL,
+    round_id TEXT,
+    order_id TEXT,
+    trade_id TEXT,
+    closed_trade_ids TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_transactions_asset_time ON transactions (asset, time);
+CREATE INDEX IF NOT EXISTS idx_transactions_time ON transactions (time);
+CREATE INDEX IF NOT EXISTS idx_transactions_round_id ON transactions (round_id);
+CREATE INDEX IF NOT EXISTS idx_transactions_trade_id ON transactions (trade_id);
+"""
+
+
+class SqlitePositionStore:
+    """
+    以 SQLite (WAL 模式) 保存倉位：positions 表存彙總欄位，transactions 表逐筆存交易
+    新增一筆交易只需 INSERT 一列並更新該資產的彙總欄位；其他 process (dashboard、portfolio_summary.py)
+    可在交易迴圈寫入時同時以索引查詢，不需重新讀取全部紀錄
+    """
+
+    DB_FILE = "positions.sqlite3"
+
+    def __init__(self, base_dir: str, read_only: bool = False, durable: bool = False):
+        """
+        base_dir: 倉位紀錄的目錄 (與 AssetPositions 相同)，資料庫為其下的 positions.sqlite3
+        read_only: 只查詢、不寫入，也不匯入舊格式 (e.g., 交易迴圈以外的讀取端)
+        durable: 每次 commit 都 fsync (synchronous=FULL)，group commit 時每輪只 commit 一次
+        """
+        self.__base_dir = base_dir
+        db_path = os.path.join(base_dir, SqlitePositionStore.DB_FILE)
+        # 成交可能由送單執行緒或 user data stream 執行緒寫入，以 lock 保護同一個連線
+        self.__lock = threading.Lock()
+        self.__read_only = read_only
+        if read_only and not os.path.exists(db_path):
+            # 交易迴圈尚未建立資料庫，以空的 in-memory 資料庫回應查詢
+            self.__conn = sqlite3.connect(":memory:", check_same_thread=False)
+            self.__conn.executescript(SCHEMA)
+            return
+        if read_only:
+            self.__conn = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True, check_same_thread=False)
+            return
+
+        self.__conn = sqlite3.connect(db_path, check_same_thread=False)
+        with self.__lock, self.__conn:
+            self.__conn.execute("PRAGMA journal_mode=WAL")
+            # WAL 模式下 NORMAL 不會損毀資料庫，只可能遺失斷電前最後幾筆交易
+            self.__conn.execute(f"PRAGMA synchronous={'FULL' if durable else 'NORMAL'}")
+            self.__conn.executescript(SCHEMA)
+
+    def close(self) -> None:
+        with self.__lock:
+            self.__conn.close()
+
+    def stored_assets(self) -> list:
+        """有紀錄的資產名稱"""
+        with self.__lock:
+            rows = self.__conn.execute("SELECT asset FROM positions ORDER BY asset").fetchall()
+        return [row[0] for row in rows]
+
+    def load(self, asset_symbol: str):
+        """
+        回傳倉位的彙總欄位與 transaction_count，交易紀錄由 load_transactions() 延遲載入；沒有紀錄時回傳 None
+        資料庫內沒有、但有舊格式 <ASSET>.json 時會先匯入，回傳含 transactions 的 dict (與 Position.to_dict() 相同格式)
+        """
+        with self.__lock:
+            row = self.__conn.execute(
+                f"SELECT {', '.join(AGGREGATE_FIELDS)}, transaction_count FROM positions WHERE asset = ?",
+                (asset_symbol,)).fetchone()
+
+        if row is None:
+            return self.__import_legacy(asset_symbol)
+
+        return dict(zip(AGGREGATE_FIELDS + ('transaction_count',), row))
+
+    def load_transactions(self, asset_symbol: str) -> list:
+        return self.transactions(asset=asset_symbol)
+
+    def append(self, position: Position) -> None:
+        """新增 position 最新的一筆交易，並在同一個 transaction 內更新彙總欄位"""
+        with self.__lock, self.__conn:
+            self.__insert_transactions(position.asset_symbol, [position.latest_transaction.to_dict()])
+            self.__upsert_position(
+                position.asset_symbol, SqlitePositionStore.__aggregates(position), position.get_transactions_count())
+
+    def commit(self, batches: dict) -> None:
+        """
+        group commit：在同一個 transaction 內寫入多個資產累積的交易與彙總欄位，中斷時全部不生效
+        batches: 資產 -> {'transactions': [Transaction], 'aggregates': 彙總欄位, 'transaction_count': 交易筆數}
+        """
+        with self.__lock, self.__conn:
+            for asset_symbol, batch in sorted(batches.items()):
+                self.__insert_transactions(asset_symbol, [t.to_dict() for t in batch['transactions']])
+                self.__upsert_position(asset_symbol, batch['aggregates'], batch['transaction_count'])
+
+    def export_json(self, position: Position) -> None:
+        """以舊格式寫出 <ASSET>.json，供尚未改用資料庫的讀取端使用"""
+        path = os.path.join(self.__base_dir, f"{position.asset_symbol}.json")
+        with open(path + '.tmp', 'w') as outfile:
+            json.dump(position.to_dict(), outfile)
+        os.replace(path + '.tmp', path)
+
+    def positions_summary(self) -> dict:
+        """各資產的彙總欄位 (不含交易紀錄)：資產 -> dict"""
+        with self.__lock:
+            rows = self.__conn.execute(
+                f"SELECT asset, {', '.join(AGGREGATE_FIELDS)}, transaction_count FROM positions").fetchall()
+        return {row[0]: dict(zip(AGGREGATE_FIELDS + ('transaction_count',), row[1:])) for row in rows}
+
+    def transactions(self, asset: str = None, start_ms: int = None, end_ms: int = None) -> list:
+        """
+        依資產、時間範圍 [start_ms, end_ms) 查詢交易，依寫入順序回傳 Transaction.to_dict() 格式
+        各條件為 None 表示不限制
+        """
+        conditions = []
+        params = []
+        if asset is not None:
+            conditions.append("asset = ?")
+            params.append(asset)
+        if start_ms is not None:
+            conditions.append("time >= ?")
+            params.append(start_ms)
+        if end_ms is not None:
+            conditions.append("time < ?")
+            params.append(end_ms)
+
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        return self.__query_transactions(where, params)
+
+    def transactions_by_round(self, round_id: str) -> list:
+        return self.__query_transactions("WHERE round_id = ?", [round_id])
+
+    def transactions_by_trade_id(self, trade_id) -> list:
+        return self.__query_transactions("WHERE trade_id = ?", [str(trade_id)])
+
+    def __query_transactions(self, where: str, params: list) -> list:
+        with self.__lock:
+            rows = self.__conn.execute(
+                f"SELECT asset, {', '.join(TRANSACTION_FIELDS)} FROM transactions {where} ORDER BY id",
+                params).fetchall()
+
+        ret = []
+        for row in rows:
+            transact = dict(zip(TRANSACTION_FIELDS, row[1:]))
+            transact['symbol'] = row[0]
+            transact['time'] = str(transact['time'])
+            transact['closed_trade_ids'] = json.loads(transact['closed_trade_ids'])
+            ret.append(transact)
+        return ret
+
+    def __import_legacy(self, asset_symbol: str):
+        legacy_path = os.path.join(self.__base_dir, f"{asset_symbol}.json")
+        if not os.path.exists(legacy_path):
+            return None
+
+        with open(legacy_path, "r") as json_file:
+            legacy = json.load(json_file)
+        if self.__read_only:
+            return legacy
+
+        _log.info(f"Importing {legacy_path} into {SqlitePositionStore.DB_FILE}")
+
+        with self.__lock, self.__conn:
+            self.__insert_transactions(asset_symbol, legacy['transactions'])
+            self.__upsert_position(asset_symbol, legacy, len(legacy['transactions']))
+        return legacy
+
+    def __insert_transactions(self, asset_symbol: str, transactions: list) -> None:
+        self.__conn.executemany(
+            f"INSERT INTO transactions (asset, {', '.join(TRANSACTION_FIELDS)})"
+            f" VALUES ({', '.join('?' * (len(TRANSACTION_FIELDS) + 1))})",
+            [(asset_symbol, int(t['time']), t['activity'], t['trade_symbol'], t['quantity'], t['price'],
+              t['commission'], t['commission_asset'], t['commission_as_usdt'], t['round_id'],
+              str(t['order_id']), str(t['trade_id']), json.dumps(t['closed_trade_ids']))
+             for t in transactions])
+
+    def __upsert_position(self, asset_symbol: str, aggregates: dict, transaction_count: int) -> None:
+        self.__conn.execute(
+            f"INSERT OR REPLACE INTO positions (asset, {', '.join(AGGREGATE_FIELDS)}, transaction_count)"
+            f" VALUES (?, ?, ?, ?, ?, ?)",
+            (asset_symbol, *(str(aggregates[field]) for field in AGGREGATE_FIELDS), transaction_count))
+
+    def __aggregates(position: Position) -> dict:
+        return {field: getattr(position, field) for field in AGGREGATE_FIELDS}
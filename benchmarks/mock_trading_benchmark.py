@@ -0,0 +1,62 @@
+import argparse
+import shutil
+import tempfile
+import time
+from types import SimpleNamespace
+
+from binance.enums import *
+
+from exchange_api_wrappers.mock_trading import PERSISTENCE_MODES, MockTradingWrapper
+
+SYMBOLS = ['BTCUSDT', 'ETHUSDT', 'BNBUSDT', 'XRPUSDT', 'ADAUSDT']
+
+
+class FixedQuote:
+    """固定報價，只量測模擬交易本身的成本"""
+
+    def get_latest_price_cache_first(self, symbol):
+        return {'price': '123.45678900'}
+
+
+def run_fills(persistence: str, fills: int, snapshot_every_fills: int, fills_per_round: int) -> float:
+    """
+    以指定的寫檔方式送出 fills 筆市價單，回傳每秒成交筆數 (含結束時的快照)
+    每 fills_per_round 筆呼叫一次 commit()，模擬交易迴圈每輪結束時的寫檔
+    """
+    base_dir = tempfile.mkdtemp()
+    try:
+        config = SimpleNamespace(position_manage={
+            'cash_currency': 'USDT',
+            'mock_trading_persistence': persistence,
+            'mock_trading_snapshot_every_fills': snapshot_every_fills,
+        })
+        wrapper = MockTradingWrapper(config, FixedQuote(), base_dir=base_dir)
+
+        tic = time.perf_counter()
+        for n in range(fills):
+            side = SIDE_BUY if n % 2 == 0 else SIDE_SELL
+            wrapper.order_qty(side, '0.01000000', SYMBOLS[(n // 2) % len(SYMBOLS)])
+            if (n + 1) % fills_per_round == 0:
+                wrapper.commit()
+        wrapper.snapshot()
+        elapsed = time.perf_counter() - tic
+
+        return fills / elapsed
+    finally:
+        shutil.rmtree(base_dir)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare fill throughput of the mock exchange persistence modes')
+    parser.add_argument('--fills', type=int, default=5000)
+    parser.add_argument('--snapshot-every-fills', type=int, default=MockTradingWrapper.DEFAULT_SNAPSHOT_EVERY_FILLS)
+    parser.add_argument('--fills-per-round', type=int, default=20, help='fills between commit() calls (group mode)')
+    args = parser.parse_args()
+
+    for persistence in PERSISTENCE_MODES:
+        rate = run_fills(persistence, args.fills, args.snapshot_every_fills, args.fills_per_round)
+        print(f"{persistence:>8}: {rate:10.0f} fills/s ({args.fills} fills)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,72 @@
+import argparse
+import shutil
+import tempfile
+import time
+from decimal import Decimal
+
+from binance.enums import *
+
+from asset_record_platforms.file_based_asset_positions import STORAGE_TYPES, AssetPositions
+from asset_record_platforms.position import Transaction
+from exchange_api_wrappers.wrapped_data import WatchingSymbol
+
+ASSETS = ['BTC', 'ETH', 'BNB', 'XRP', 'ADA']
+
+
+def make_transaction(asset: str, n: int) -> Transaction:
+    return Transaction(
+        time=1700000000000 + n,
+        activity=SIDE_BUY,
+        symbol=asset,
+        trade_symbol=f'{asset}USDT',
+        quantity=Decimal('0.01'),
+        price=Decimal('123.456789'),
+        commission=Decimal('0.001'),
+        commission_asset='USDT',
+        commission_as_usdt=Decimal('0.001'),
+        round_id=f'round-{n}',
+        order_id=str(n),
+        trade_id=str(n),
+        closed_trade_ids=[])
+
+
+def run_fills(storage: str, group_commit: bool, fills: int, fills_per_round: int) -> float:
+    """
+    記入 fills 筆成交，回傳每秒成交筆數
+    group_commit 時每 fills_per_round 筆呼叫一次 commit()，模擬交易迴圈每輪結束時的寫檔
+    """
+    base_dir = tempfile.mkdtemp()
+    try:
+        watching_symbols = [WatchingSymbol(f'{asset}USDT', asset, None) for asset in ASSETS]
+        record = AssetPositions(watching_symbols, 'USDT', base_dir=base_dir, storage=storage, group_commit=group_commit)
+
+        tic = time.perf_counter()
+        for n in range(fills):
+            asset = ASSETS[n % len(ASSETS)]
+            record.positions[asset].add_transaction(make_transaction(asset, n))
+            if (n + 1) % fills_per_round == 0:
+                record.commit()
+        record.commit()
+        elapsed = time.perf_counter() - tic
+
+        return fills / elapsed
+    finally:
+        shutil.rmtree(base_dir)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Compare fill throughput of the asset position storages with and without group commit')
+    parser.add_argument('--fills', type=int, default=2000)
+    parser.add_argument('--fills-per-round', type=int, default=20, help='fills between commit() calls')
+    args = parser.parse_args()
+
+    for storage in STORAGE_TYPES:
+        for group_commit in (False, True):
+            rate = run_fills(storage, group_commit, args.fills, args.fills_per_round)
+            mode = 'group commit' if group_commit else 'per fill'
+            print(f"{storage:>8} {mode:>12}: {rate:10.0f} fills/s ({args.fills} fills)")
+
+
+if __name__ == '__main__':
+    main()
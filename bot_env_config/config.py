@@ -9,11 +9,15 @@ _log = logging.getLogger(__name__)
 class Config:
     """使用者參數"""
 
-    def __init__(self):
-        """建構式"""
+    def __init__(self, config_dir=None):
+        """
+        建構式
+        config_dir: 設定檔目錄，None 表示使用專案內的 user-config/
+        """
 
-        self.config_dir = os.path.normpath(os.path.join(
-            os.path.dirname(__file__), '..', 'user-config'))
+        if config_dir is None:
+            config_dir = os.path.join(os.path.dirname(__file__), '..', 'user-config')
+        self.config_dir = os.path.normpath(config_dir)
 
         # API key/secret
         with open(os.path.join(self.config_dir, "auth.json"), "r+") as json_file:
@@ -31,6 +35,17 @@ class Config:
         with open(os.path.join(self.config_dir, "bot.json"), "r+") as json_file:
             self.bot = json.load(json_file)
 
+    def get_data_dir(self, key: str):
+        """
+        取得 position-manage.json 內 key 指定的資料目錄 (相對路徑以設定檔目錄為基準)
+        未設定時回傳 None，由使用端決定預設目錄
+        """
+        path = self.position_manage.get(key)
+        if not path:
+            return None
+
+        return os.path.normpath(os.path.join(self.config_dir, path))
+
     def spawn_nofification_platform(self):
         """根據設定參數產生通知平台"""
 
@@ -63,7 +78,35 @@ class Config:
             module = import_module(module_path)
             analyzer_class = getattr(module, class_name)
             analyzer = analyzer_class(self.analyzer)
-            return analyzer
         except (ImportError, AttributeError) as e:
             raise ImportError(
                 f"{module_path}.{class_name}")
+
+        if 'kline_interval' in self.analyzer:
+            analyzer.kline_interval = self.analyzer['kline_interval']
+        if 'klines_limit' in self.analyzer:
+            analyzer.klines_limit = int(self.analyzer['klines_limit'])
+
+        return analyzer
+
+    def spawn_round_scheduler(self, kline_interval: str):
+        """根據設定參數產生交易迴圈的排程 (round_scheduler: fixed、candle_close 或 priority)"""
+        from trade_schedulers import FixedIntervalScheduler, CandleCloseScheduler, PriorityScheduler
+
+        scheduler_type = self.position_manage.get('round_scheduler', 'fixed')
+        if scheduler_type == 'fixed':
+            return FixedIntervalScheduler(
+                round_seconds=float(self.position_manage.get('round_interval_seconds', 60)))
+        elif scheduler_type == 'candle_close':
+            return CandleCloseScheduler(
+                kline_interval,
+                settle_seconds=float(self.position_manage.get('candle_close_settle_seconds', 2)),
+                intra_candle_seconds=float(self.position_manage.get('intra_candle_check_seconds', 60)))
+        elif scheduler_type == 'priority':
+            return PriorityScheduler(
+                open_position_seconds=float(self.position_manage.get('open_position_interval_seconds', 60)),
+                watch_only_seconds=float(self.position_manage.get('watch_only_interval_seconds', 600)),
+                watch_only_max_per_round=int(self.position_manage.get('watch_only_max_per_round', 0)),
+                min_round_seconds=float(self.position_manage.get('min_round_interval_seconds', 5)))
+
+        raise ValueError(f"Invalid round_scheduler: {scheduler_type}. Use 'fixed', 'candle_close' or 'priority'")
@@ -1,8 +1,15 @@
+import collections
+import json
 import logging.config
+import os
+import threading
+import time
 from decimal import Decimal
 from typing import Dict, List
 from binance.client import Client
+from binance import AsyncClient
 from binance.enums import *
+from binance.helpers import interval_to_milliseconds
 from exchange_api_wrappers.wrapped_data import *
 
 _log = logging.getLogger(__name__)
@@ -11,45 +18,146 @@ _log = logging.getLogger(__name__)
 class BinanceKlineWrapper:
     """包裝幣安的 K 線歷史資料讀取 API，用來取得技術分析所需資料。"""
 
-    def __init__(self, client: Client) -> None:
+    CACHE_DIR = os.path.normpath(os.path.join(
+            os.path.dirname(__file__), '..', "exchange-data-cache"))
+
+    # exchangeInfo 本地快取的預設有效秒數，交易對的下單限制最多可能過期這麼久
+    DEFAULT_EXCHANGE_INFO_CACHE_TTL = 3600
+
+    def __init__(
+        self,
+        client: Client,
+        incremental: bool = False,
+        price_cache_ttl: float = 3,
+        exchange_info_cache_ttl: float = DEFAULT_EXCHANGE_INFO_CACHE_TTL,
+        cache_dir: str = None
+    ) -> None:
+        """
+        client: 幣安 API client
+        incremental: 是否只下載上次之後的新 K 線 (使用 startTime)，並與記憶體內的緩衝區合併
+        price_cache_ttl: get_latest_price_cache_first() 快取報價的有效秒數
+        exchange_info_cache_ttl: exchangeInfo 存在本地檔案的有效秒數，0 表示不使用本地快取；
+                                 快取期間不會重新驗證，下單限制 (filters) 最多可能過期這麼久
+        cache_dir: exchangeInfo 本地快取的目錄，None 表示使用 BinanceKlineWrapper.CACHE_DIR
+        """
         self.__client = client
+        self.__async_client = None
+        self.__exchange_info_cache_ttl = exchange_info_cache_ttl
+        self.__cache_dir = cache_dir if cache_dir is not None else BinanceKlineWrapper.CACHE_DIR
 
-    def get_tradable_symbols(self, quote_asset, include_assets, exclude_assets):
-        """找出以 quote_asset 報價，且目前可交易、可送市價單、非槓桿型的交易對"""
+        # (交易對, 週期) -> 原始格式 K 線 ring buffer，只在 incremental 模式使用
+        self.__incremental = incremental
+        self.__kline_buffers: Dict[tuple, collections.deque] = dict()
+        self.__kline_buffers_lock = threading.Lock()
+        self.__candles_fetched = 0
+        self.__candles_saved = 0
 
-        exchange_info = self.__get_exchange_info()
-        # print(type(exchange_info))
-        # with open('exchange_info.json', 'w') as outfile:
-        #     json.dump(exchange_info, outfile, indent=4)
+        # 交易對 -> (報價, 更新時間)，由一次查詢全部交易對的 API 或 !miniTicker@arr 串流填入
+        self.__price_cache_ttl = price_cache_ttl
+        self.__prices: Dict[str, tuple] = dict()
+        self.__prices_lock = threading.Lock()
+        self.__last_bulk_price_refresh = 0
 
-        trade_with_quote_asset = [item for item in exchange_info['symbols']
-                                  if item['quoteAsset'].upper() == quote_asset]
+    def set_async_client(self, async_client: AsyncClient) -> None:
+        """設定 asyncio 版本 API 使用的 client，傳入 None 表示移除"""
+        self.__async_client = async_client
+
+    def get_tradable_symbols(self, quote_asset, include_assets, exclude_assets, exchange_info=None):
+        """
+        找出以 quote_asset 報價，且目前可交易、可送市價單、非槓桿型的交易對
+        exchange_info: 已取得的 exchangeInfo (見 get_exchange_info)，None 表示由此呼叫取得
+        """
 
         if include_assets is not None and exclude_assets is not None:
             raise ValueError(
                 'include_assets and exclude_assets cannot both be non empty')
 
-        if include_assets is not None:
-            return [WatchingSymbol(symbol['symbol'], symbol['baseAsset'], symbol)
-                    for symbol in trade_with_quote_asset
-                    if symbol['status'].upper() == "TRADING"
-                    and symbol['baseAsset'] in include_assets
-                    and "MARKET" in symbol['orderTypes']
-                    and not "LEVERAGED" in symbol['permissions']]
-
-        if exclude_assets is not None:
-            return [WatchingSymbol(symbol['symbol'], symbol['baseAsset'], symbol)
-                    for symbol in trade_with_quote_asset
-                    if symbol['status'].upper() == "TRADING"
-                    and not symbol['baseAsset'] in exclude_assets
-                    and "MARKET" in symbol['orderTypes']
-                    and not "LEVERAGED" in symbol['permissions']]
+        if include_assets is None and exclude_assets is None:
+            return None
+
+        if exchange_info is None:
+            exchange_info = self.get_exchange_info()
+        # print(type(exchange_info))
+        # with open('exchange_info.json', 'w') as outfile:
+        #     json.dump(exchange_info, outfile, indent=4)
+
+        include_assets = set(include_assets) if include_assets is not None else None
+        exclude_assets = set(exclude_assets) if exclude_assets is not None else None
+
+        ret = []
+        for symbol in exchange_info['symbols']:
+            base_asset = symbol['baseAsset']
+            if symbol['quoteAsset'].upper() != quote_asset \
+                    or symbol['status'].upper() != "TRADING" \
+                    or "MARKET" not in symbol['orderTypes'] \
+                    or "LEVERAGED" in symbol['permissions']:
+                continue
+
+            if include_assets is not None and base_asset not in include_assets:
+                continue
+
+            if exclude_assets is not None and base_asset in exclude_assets:
+                continue
+
+            ret.append(WatchingSymbol(symbol['symbol'], base_asset, symbol))
+
+        return ret
 
     def get_latest_price(self, trade_symbol):
         """取得指定交易對的最新報價"""
         symbol_ticker = self.__client.get_symbol_ticker(symbol=trade_symbol)
         return symbol_ticker
 
+    def get_latest_price_cache_first(self, trade_symbol):
+        """
+        取得指定交易對的最新報價，優先使用快取 (price_cache_ttl 秒內的報價)
+        快取過期時以一次 API 呼叫更新全部交易對的報價
+        """
+        price = self.__get_cached_price(trade_symbol)
+        if price is None:
+            with self.__prices_lock:
+                price = self.__get_cached_price(trade_symbol)
+                if price is None and time.time() - self.__last_bulk_price_refresh > self.__price_cache_ttl:
+                    _log.debug(f"[{trade_symbol}] Price cache expired, refreshing all tickers")
+                    self.update_prices(self.__client.get_symbol_ticker())
+                    self.__last_bulk_price_refresh = time.time()
+                    price = self.__get_cached_price(trade_symbol)
+
+        if price is None:
+            # 全部交易對的報價內沒有此交易對，改為單獨查詢
+            return self.get_latest_price(trade_symbol)
+
+        return {'symbol': trade_symbol, 'price': price}
+
+    def update_prices(self, tickers, updated_at=None):
+        """
+        更新報價快取
+        tickers: [{'symbol': 'BTCUSDT', 'price': '50000.00'}, ...]
+        updated_at: 報價時間 (epoch 秒)，None 表示現在
+        """
+        if updated_at is None:
+            updated_at = time.time()
+
+        prices = self.__prices
+        for ticker in tickers:
+            prices[ticker['symbol']] = (ticker['price'], updated_at)
+
+    def update_prices_from_mini_tickers(self, mini_tickers):
+        """
+        以 !miniTicker@arr 串流的內容更新報價快取
+        mini_tickers: [{'e': '24hrMiniTicker', 'E': 事件時間 (ms), 's': 交易對, 'c': 最新價, ...}, ...]
+        """
+        prices = self.__prices
+        for t in mini_tickers:
+            prices[t['s']] = (t['c'], int(t['E']) / 1000)
+
+    def __get_cached_price(self, trade_symbol):
+        cached = self.__prices.get(trade_symbol)
+        if cached is None or time.time() - cached[1] > self.__price_cache_ttl:
+            return None
+
+        return cached[0]
+
     def get_historical_klines(self, symbol, KLINE_INTERVAL, fromdate, todate):
         return self.__client.get_historical_klines(symbol, KLINE_INTERVAL, fromdate, todate)
         # print(self.__client.response)
@@ -63,21 +171,166 @@ class BinanceKlineWrapper:
         :return: klines data
         """
 
-        klines = self.__client.get_klines(
-            symbol=symbol,
-            interval=interval,
-            limit=klines_limit)
+        klines = self.get_raw_klines(symbol, klines_limit, interval)
         if len(klines) < klines_limit:
             _log.debug(
                 f"[{symbol}] No enough data for {symbol} (only {len(klines)})")
             return None
 
-        return [Kline(data) for data in klines]
+        return KlineBatch(klines)
+
+    def get_raw_klines(self, symbol, klines_limit=100, interval=Client.KLINE_INTERVAL_15MINUTE):
+        """取得交易所原始格式 (list of list) 的 K 線，不做轉換"""
+        if not self.__incremental:
+            return self.__client.get_klines(
+                symbol=symbol,
+                interval=interval,
+                limit=klines_limit)
+
+        key = (symbol, interval)
+        start_time = self.__incremental_start_time(key, klines_limit, interval)
+        if start_time is None:
+            rows = self.__client.get_klines(
+                symbol=symbol,
+                interval=interval,
+                limit=klines_limit)
+        else:
+            rows = self.__client.get_klines(
+                symbol=symbol,
+                interval=interval,
+                startTime=start_time,
+                limit=klines_limit)
+
+        return self.__merge_incremental(key, klines_limit, start_time, rows)
+
+    def pop_kline_fetch_stats(self):
+        """
+        取得並歸零 incremental 模式的 K 線下載統計
+        回傳 {'fetched': 實際下載的 K 線數, 'saved': 因緩衝區而不需下載的 K 線數}
+        """
+        with self.__kline_buffers_lock:
+            stats = {
+                'fetched': self.__candles_fetched,
+                'saved': self.__candles_saved,
+            }
+            self.__candles_fetched = 0
+            self.__candles_saved = 0
+
+        return stats
+
+    def __incremental_start_time(self, key, klines_limit, interval):
+        """
+        計算 incremental 下載的 startTime：上次最後一根已收盤 K 線的下一根
+        沒有緩衝區，或缺少的 K 線比 klines_limit 還多時回傳 None (改為完整下載)
+        """
+        with self.__kline_buffers_lock:
+            buffer = self.__kline_buffers.get(key)
+            if buffer is None or buffer.maxlen != klines_limit or len(buffer) < klines_limit:
+                return None
+
+            now_ms = int(time.time() * 1000)
+            last_closed = None
+            for row in reversed(buffer):
+                if int(row[6]) < now_ms:
+                    last_closed = row
+                    break
+
+            if last_closed is None:
+                return None
+
+            interval_ms = interval_to_milliseconds(interval)
+            start_time = int(last_closed[0]) + interval_ms
+            missing_count = (now_ms - start_time) // interval_ms + 1
+            if missing_count >= klines_limit:
+                return None
+
+            return start_time
+
+    def __merge_incremental(self, key, klines_limit, start_time, rows):
+        """把新下載的 K 線併入緩衝區，回傳合併後的完整 K 線"""
+        with self.__kline_buffers_lock:
+            self.__candles_fetched += len(rows)
+
+            if start_time is None:
+                buffer = collections.deque(rows, maxlen=klines_limit)
+                self.__kline_buffers[key] = buffer
+                return list(buffer)
+
+            buffer = self.__kline_buffers[key]
+            while buffer and int(buffer[-1][0]) >= start_time:
+                buffer.pop()
+
+            buffer.extend(rows)
+            self.__candles_saved += max(klines_limit - len(rows), 0)
+            return list(buffer)
+
+    async def get_latest_price_async(self, trade_symbol):
+        """get_latest_price 的 asyncio 版本"""
+        return await self.__async_client.get_symbol_ticker(symbol=trade_symbol)
+
+    async def get_klines_async(self, symbol, klines_limit=100, interval=Client.KLINE_INTERVAL_15MINUTE):
+        """get_klines 的 asyncio 版本"""
+        start_time = None
+        if self.__incremental:
+            start_time = self.__incremental_start_time(
+                (symbol, interval), klines_limit, interval)
+
+        if start_time is None:
+            klines = await self.__async_client.get_klines(
+                symbol=symbol,
+                interval=interval,
+                limit=klines_limit)
+        else:
+            klines = await self.__async_client.get_klines(
+                symbol=symbol,
+                interval=interval,
+                startTime=start_time,
+                limit=klines_limit)
+
+        if self.__incremental:
+            klines = self.__merge_incremental(
+                (symbol, interval), klines_limit, start_time, klines)
+
+        if len(klines) < klines_limit:
+            _log.debug(
+                f"[{symbol}] No enough data for {symbol} (only {len(klines)})")
+            return None
+
+        return KlineBatch(klines)
 
     def get_closed_prices(self, symbol, klines_limit = 100, interval=Client.KLINE_INTERVAL_15MINUTE):
         klines = self.get_klines(symbol, klines_limit, interval)
-        return [kline.close for kline in klines]
+        return [klines.decimal_close(i) for i in range(len(klines))]
+
+    def get_exchange_info(self):
+        """取得 exchangeInfo，exchange_info_cache_ttl 秒內使用本地快取 (快取只保存 symbols 欄位)"""
+        if self.__exchange_info_cache_ttl <= 0:
+            return self.__client.get_exchange_info()
+
+        cache_path = self.__get_exchange_info_cache_path()
+        if os.path.exists(cache_path):
+            try:
+                with open(cache_path, 'r') as json_file:
+                    cached = json.load(json_file)
+
+                age = time.time() - cached['fetched_at']
+                if 0 <= age <= self.__exchange_info_cache_ttl:
+                    _log.debug(f"Using cached exchangeInfo ({age:.0f} seconds old, {cache_path})")
+                    return cached['exchange_info']
+            except Exception:
+                _log.exception(f"Failed to read cached exchangeInfo, downloading it again ({cache_path})")
 
-    def __get_exchange_info(self):
         exchange_info = self.__client.get_exchange_info()
-        return exchange_info
+
+        # 只保存用得到的部份 (交易對清單)，rateLimits 等其他欄位不存
+        compact = {'symbols': exchange_info['symbols']}
+        os.makedirs(self.__cache_dir, mode=0o755, exist_ok=True)
+        tmp_path = cache_path + '.tmp'
+        with open(tmp_path, 'w') as outfile:
+            json.dump({'fetched_at': time.time(), 'exchange_info': compact}, outfile)
+        os.replace(tmp_path, cache_path)
+
+        return compact
+
+    def __get_exchange_info_cache_path(self):
+        return os.path.join(self.__cache_dir, "exchange-info.json")
@@ -2,7 +2,9 @@ import logging.config
 from decimal import Decimal
 from typing import Dict, List
 from .wrapped_data import *
+from .user_data_stream import BalanceCache, UserDataStream
 from binance.client import Client
+from binance import AsyncClient
 from binance.enums import *
 
 _log = logging.getLogger(__name__)
@@ -11,13 +13,51 @@ _log = logging.getLogger(__name__)
 class BinanceTradingWrapper:
     """包裝幣安的資產 & 訂單相關 API"""
 
-    def __init__(self, client: Client) -> None:
+    def __init__(self, client: Client, balance_cache: BalanceCache = None) -> None:
+        """
+        balance_cache: 由 user data stream 維護的餘額快取，None 表示每次都以 get_account 查詢
+        """
         self.__client = client
+        self.__async_client = None
+        self.__balance_cache = balance_cache
+        self.__on_execution_report = None
+        self.__user_data_stream = None
+
+    def set_async_client(self, async_client: AsyncClient) -> None:
+        """設定 asyncio 版本 API 使用的 client，傳入 None 表示移除"""
+        self.__async_client = async_client
+
+    def set_execution_report_callback(self, callback) -> None:
+        """user data stream 的每則 executionReport 也交給 callback (e.g., OrderManager.on_execution_report)"""
+        self.__on_execution_report = callback
+
+    def start_user_data_stream(self) -> None:
+        """開始接收 user data stream，沒有使用餘額快取、也沒有 executionReport callback 時不做任何事"""
+        if self.__balance_cache is None and self.__on_execution_report is None:
+            return
+
+        if self.__user_data_stream is not None:
+            return
+
+        self.__user_data_stream = UserDataStream(
+            self.__client.API_KEY, self.__client.API_SECRET, self.__balance_cache, self.__on_execution_report)
+        self.__user_data_stream.start()
+
+    def stop_user_data_stream(self) -> None:
+        if self.__user_data_stream is None:
+            return
+
+        self.__user_data_stream.stop()
+        self.__user_data_stream = None
 
     def get_account(self):
         account = self.__client.get_account()
         return account
 
+    async def get_account_async(self):
+        """get_account 的 asyncio 版本"""
+        return await self.__async_client.get_account()
+
     def get_equities_balance(
         self,
         watching_symbols: List[WatchingSymbol],
@@ -25,43 +65,85 @@ class BinanceTradingWrapper:
     ) -> Dict[str, AssetBalance]:
         """取得所有資產的餘額，交易用的現金 (aka. cash_asset) 餘額也會包含在內"""
 
+        if self.__balance_cache is not None:
+            reason = self.__balance_cache.needs_reconcile()
+            if reason is not None:
+                self.__balance_cache.seed(self.get_account())
+                self.__balance_cache.record_reconcile(reason)
+
+            return BinanceTradingWrapper.__to_equities_balance(
+                self.__balance_cache.balances_by_asset(), watching_symbols, cash_asset)
+
         account = self.get_account()
-        balances = account['balances']
+        return BinanceTradingWrapper.__to_equities_balance(
+            BinanceTradingWrapper.__index_by_asset(account['balances']), watching_symbols, cash_asset)
+
+    async def get_equities_balance_async(
+        self,
+        watching_symbols: List[WatchingSymbol],
+        cash_asset: str
+    ) -> Dict[str, AssetBalance]:
+        """get_equities_balance 的 asyncio 版本"""
+        if self.__balance_cache is not None:
+            reason = self.__balance_cache.needs_reconcile()
+            if reason is not None:
+                self.__balance_cache.seed(await self.get_account_async())
+                self.__balance_cache.record_reconcile(reason)
+
+            return BinanceTradingWrapper.__to_equities_balance(
+                self.__balance_cache.balances_by_asset(), watching_symbols, cash_asset)
+
+        account = await self.get_account_async()
+        return BinanceTradingWrapper.__to_equities_balance(
+            BinanceTradingWrapper.__index_by_asset(account['balances']), watching_symbols, cash_asset)
+
+    def __index_by_asset(balances) -> Dict[str, dict]:
+        return {x['asset']: x for x in balances}
+
+    def __to_equities_balance(
+        balances_by_asset: Dict[str, dict],
+        watching_symbols: List[WatchingSymbol],
+        cash_asset: str
+    ) -> Dict[str, AssetBalance]:
         ret = dict()
 
-        asset_balance = [x for x in balances if x['asset'] == cash_asset]
-        if len(asset_balance) < 1:
+        asset_balance = balances_by_asset.get(cash_asset)
+        if asset_balance is None:
             raise Exception(f"Cannot get {cash_asset} balance in your account")
 
-        balance = AssetBalance(asset_balance[0])
-        ret[cash_asset] = balance
+        ret[cash_asset] = AssetBalance(asset_balance)
 
         for watching_symbol in watching_symbols:
             base_asset = watching_symbol.base_asset
-            asset_balance = [x for x in balances if x['asset'] == base_asset]
-            if len(asset_balance) < 1:
+            asset_balance = balances_by_asset.get(base_asset)
+            if asset_balance is None:
                 print(f"Cannot get {base_asset} balance in your account")
                 continue
 
-            balance = AssetBalance(asset_balance[0])
-            ret[base_asset] = balance
+            ret[base_asset] = AssetBalance(asset_balance)
 
         return ret
 
-    def order_qty(self, side: str, quantity: str, symbol: str, order_type=ORDER_TYPE_MARKET):
-        """送出指定交易數量的訂單"""
+    def order_qty(self, side: str, quantity: str, symbol: str, order_type=ORDER_TYPE_MARKET, client_order_id=None):
+        """
+        送出指定交易數量的訂單
+        client_order_id: newClientOrderId，None 表示由交易所產生
+        """
 
         if order_type != ORDER_TYPE_MARKET:
             # raise error
             pass
         try:
-            self._binance_quote.get_latest_price_cache_first(symbol)
             _log.debug(f"[order_qty] sending order")
+            params = dict()
+            if client_order_id is not None:
+                params['newClientOrderId'] = client_order_id
             order = self.__client.create_order(
                 symbol=symbol,
                 side=side,
                 type=order_type,
-                quantity=quantity)
+                quantity=quantity,
+                **params)
 
             _log.debug(f"[order_qty] raw response: {order}")
             return (True, order)
@@ -69,6 +151,30 @@ class BinanceTradingWrapper:
             _log.error(f"[order_qty] an exception occurred - {e}")
             return (False, None)
 
+    async def order_qty_async(
+            self, side: str, quantity: str, symbol: str, order_type=ORDER_TYPE_MARKET, client_order_id=None):
+        """
+        order_qty 的 asyncio 版本
+        client_order_id: newClientOrderId，None 表示由交易所產生
+        """
+        try:
+            _log.debug(f"[order_qty_async] sending order")
+            params = dict()
+            if client_order_id is not None:
+                params['newClientOrderId'] = client_order_id
+            order = await self.__async_client.create_order(
+                symbol=symbol,
+                side=side,
+                type=order_type,
+                quantity=quantity,
+                **params)
+
+            _log.debug(f"[order_qty_async] raw response: {order}")
+            return (True, order)
+        except Exception as e:
+            _log.error(f"[order_qty_async] an exception occurred - {e}")
+            return (False, None)
+
     def order_quote_qty(self, side, quoteOrderQty, symbol, order_type=ORDER_TYPE_MARKET):
         """送出指定成交額的訂單"""
         try:
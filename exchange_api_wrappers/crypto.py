@@ -1,48 +1,417 @@
+import asyncio
 import logging.config
+import threading
+import time
+from concurrent.futures import Future
 
 from bot_env_config.config import Config
 from binance.client import Client
+from binance import AsyncClient
 from binance.enums import *
-from . import binance_klines, binance_trading, mock_trading, wrapped_data
+from . import binance_klines, binance_trading, http_transport, kline_stream, mock_trading, rate_limiter, recorded_market, user_data_stream, wrapped_data
 from typing import List, Dict
 
 _log = logging.getLogger(__name__)
 
+# 幣安正式環境的 REST API 網址，與此不同表示改連到替身 server
+_DEFAULT_API_URL = Client.API_URL.format('', 'com')
+
+
+class MarketData:
+    """
+    行情資料層：REST client、K 線與報價 wrapper、共用的 HTTP 傳輸層，以及各週期的 K 線串流
+    可由多個帳號的 Crypto 共用：exchangeInfo 只下載一次，kline_share_ttl 秒內同一組 (交易對, 週期, 數量) 的 K 線
+    只下載一次，報價共用 price_cache_ttl 秒內的快取
+    """
+
+    # 多個帳號共用時，預設在此秒數內沿用其他帳號下載的 K 線
+    DEFAULT_KLINE_SHARE_TTL = 30
+
+    def __init__(self, client: Client, klines, transport: http_transport.HttpTransport = None, kline_share_ttl: float = 0):
+        """
+        client: 行情資料使用的 REST client
+        klines: 幣價 K 線圖的資料來源 API wrapper
+        transport: 全部幣安 REST 請求共用的 HttpTransport，None 表示不限制、不重送
+        kline_share_ttl: 以 REST 下載的 K 線在此秒數內提供給其他呼叫者，0 表示每次都下載
+        """
+        self.client = client
+        self.klines = klines
+        self.transport = transport
+        self.request_limiter = transport.request_limiter if transport is not None else None
+
+        # K 線週期 -> (KlineStreamCache, 訂閱的交易對, 緩衝區大小, 是否訂閱 !miniTicker@arr)
+        self.__kline_streams = dict()
+        self.__lock = threading.Lock()
+
+        # (交易對, 週期, 數量) -> (下載時間, K 線)；下載中的則為 Future，同時要求的呼叫者等待同一次下載
+        self.__kline_share_ttl = kline_share_ttl
+        self.__shared_klines = dict()
+        self.__kline_downloads: Dict[tuple, Future] = dict()
+        self.__kline_requests_shared = 0
+        self.__klines_lock = threading.Lock()
+
+        self.__exchange_info = None
+        self.__exchange_info_lock = threading.Lock()
+
+    def get_klines(self, symbol, klines_limit, interval):
+        """以 REST 取得 K 線，kline_share_ttl 秒內已下載過、或正在下載的直接沿用"""
+        if self.__kline_share_ttl <= 0:
+            return self.klines.get_klines(symbol, klines_limit, interval)
+
+        key = (symbol, interval, klines_limit)
+        shared, download, is_downloader = self.__begin_kline_download(key)
+        if download is None:
+            return shared
+        if not is_downloader:
+            return download.result()
+
+        try:
+            klines = self.klines.get_klines(symbol, klines_limit, interval)
+        except Exception as e:
+            self.__end_kline_download(key, download, error=e)
+            raise
+
+        self.__end_kline_download(key, download, klines)
+        return klines
+
+    async def get_klines_async(self, symbol, klines_limit, interval):
+        """get_klines 的 asyncio 版本，與 get_klines 共用 kline_share_ttl 秒內、或正在進行的下載"""
+        if self.__kline_share_ttl <= 0:
+            return await self.klines.get_klines_async(symbol, klines_limit, interval)
+
+        key = (symbol, interval, klines_limit)
+        shared, download, is_downloader = self.__begin_kline_download(key)
+        if download is None:
+            return shared
+        if not is_downloader:
+            return await asyncio.wrap_future(download)
+
+        try:
+            klines = await self.klines.get_klines_async(symbol, klines_limit, interval)
+        except BaseException as e:
+            # 下載被取消 (e.g., 停止 event loop) 時也要結束 Future，等待同一次下載的呼叫者才不會卡住
+            self.__end_kline_download(key, download, error=e)
+            raise
+
+        self.__end_kline_download(key, download, klines)
+        return klines
+
+    def __begin_kline_download(self, key):
+        """
+        回傳 (沿用的 K 線, 下載的 Future, 是否由呼叫者下載)
+        kline_share_ttl 秒內已下載過時 Future 為 None；已有其他呼叫者在下載時等待它的 Future
+        """
+        with self.__klines_lock:
+            shared = self.__shared_klines.get(key)
+            if shared is not None and time.time() - shared[0] <= self.__kline_share_ttl:
+                self.__kline_requests_shared += 1
+                return (shared[1], None, False)
+
+            download = self.__kline_downloads.get(key)
+            if download is not None:
+                self.__kline_requests_shared += 1
+                return (None, download, False)
+
+            download = Future()
+            self.__kline_downloads[key] = download
+            return (None, download, True)
+
+    def __end_kline_download(self, key, download: Future, klines=None, error: BaseException = None):
+        """下載結束，成功時保存結果供 kline_share_ttl 秒內沿用，並通知等待的呼叫者"""
+        with self.__klines_lock:
+            if error is None:
+                self.__shared_klines[key] = (time.time(), klines)
+            del self.__kline_downloads[key]
+
+        if error is None:
+            download.set_result(klines)
+        else:
+            download.set_exception(error)
+
+    def get_tradable_symbols(self, quote_asset, include_assets, exclude_assets):
+        """同 BinanceKlineWrapper.get_tradable_symbols，exchangeInfo 只在第一次呼叫時下載，之後的帳號沿用"""
+        with self.__exchange_info_lock:
+            if self.__exchange_info is None:
+                self.__exchange_info = self.klines.get_exchange_info()
+
+        return self.klines.get_tradable_symbols(
+            quote_asset, include_assets, exclude_assets, exchange_info=self.__exchange_info)
+
+    def pop_request_weight_stats(self):
+        """取得並歸零上次呼叫後全部使用者的 request weight 用量，沒有使用限制器時回傳 None"""
+        if self.request_limiter is None:
+            return None
+
+        return self.request_limiter.pop_round_stats()
+
+    def pop_kline_fetch_stats(self):
+        """
+        取得並歸零 K 線下載統計，資料來源不支援時回傳 None
+        回傳 {'fetched': 下載的 K 線數, 'saved': incremental 模式省下的 K 線數, 'shared': 沿用其他呼叫者下載結果的次數}
+        """
+        if not hasattr(self.klines, 'pop_kline_fetch_stats'):
+            return None
+
+        stats = self.klines.pop_kline_fetch_stats()
+        with self.__klines_lock:
+            stats['shared'] = self.__kline_requests_shared
+            self.__kline_requests_shared = 0
+
+        return stats
+
+    def start_kline_stream(self, symbols: List[str], interval, buffer_size: int, with_mini_tickers=False):
+        """
+        確保 interval 週期的串流涵蓋 symbols，已涵蓋時直接沿用
+        不足時以全部使用者需要的交易對聯集重新啟動
+        """
+        with self.__lock:
+            current = self.__kline_streams.get(interval)
+            has_mini_tickers = any(entry[3] for entry in self.__kline_streams.values())
+            need_mini_tickers = with_mini_tickers and not has_mini_tickers
+
+            if current is not None:
+                stream, subscribed, subscribed_size, subscribed_mini_tickers = current
+                if set(symbols) <= subscribed and buffer_size <= subscribed_size and not need_mini_tickers:
+                    return
+
+                stream.stop()
+                symbols = sorted(subscribed | set(symbols))
+                buffer_size = max(buffer_size, subscribed_size)
+                need_mini_tickers = need_mini_tickers or subscribed_mini_tickers
+
+            on_mini_tickers = None
+            if need_mini_tickers:
+                on_mini_tickers = self.klines.update_prices_from_mini_tickers
+
+            stream = kline_stream.KlineStreamCache(
+                self.klines, interval, buffer_size, on_mini_tickers)
+            stream.start(list(symbols))
+            self.__kline_streams[interval] = (stream, set(symbols), buffer_size, need_mini_tickers)
+
+    def get_kline_stream(self, interval):
+        entry = self.__kline_streams.get(interval)
+        return None if entry is None else entry[0]
+
+    def stop_kline_streams(self):
+        """停止全部 K 線串流"""
+        with self.__lock:
+            for stream, *_ in self.__kline_streams.values():
+                stream.stop()
+            self.__kline_streams.clear()
+
 
 class Crypto:
-    def __init__(self, klines, trade):
+    def __init__(self, market_data: MarketData, trade, owns_market_data=True):
         """
         建構式
-        klines: 幣價 K 線圖的資料來源 API wrapper
+        market_data: 行情資料層 (K 線、報價、request weight 限制器)
         trade: 交易所交易的交易 API wrapper
+        owns_market_data: market_data 是否只屬於此物件；與其他帳號共用時，不由此物件停止 K 線串流，
+                          request weight 與 K 線下載統計也由建立者統一取得
         """
 
-        self.__klines = klines
+        self.__market_data = market_data
+        self.__klines = market_data.klines
         self.__trade = trade
+        self.__transport = market_data.transport
+        self.__owns_market_data = owns_market_data
+        self.__async_client = None
 
     def get_binance_trade_and_klines(config: Config):
-        client = Client(
-            api_key=config.auth["API_KEY"],
-            api_secret=config.auth["API_SECRET"],
-            testnet=False
-        )
+        market_data = Crypto.create_market_data(config)
+        trade = binance_trading.BinanceTradingWrapper(
+            market_data.client, balance_cache=Crypto.__create_balance_cache(config))
 
-        klines = binance_klines.BinanceKlineWrapper(client)
-        trade = binance_trading.BinanceTradingWrapper(client)
-
-        return Crypto(klines, trade)
+        return Crypto(market_data, trade)
 
     def get_mock_trade_and_binance_klines(config: Config):
+        market_data = Crypto.create_market_data(config)
+        trade = mock_trading.MockTradingWrapper(
+            config, market_data.klines, base_dir=config.get_data_dir('mock_trading_dir'))
+
+        return Crypto(market_data, trade)
+
+    def get_mock_trade_and_replay_klines(config: Config, record_dir: str, clock):
+        """
+        重播 record_dir 錄下的行情 (見 recorded_market.record_market)，以模擬交易下單
+        clock: 模擬時間 (e.g., SimulatedClock)，K 線、報價與成交時間都以它為準
+        只支援 sync 引擎、kline_source rest
+        """
+        client = recorded_market.RecordedMarketClient(record_dir, clock)
+        # 報價快取與 incremental 模式以實際時間計算，重播時不使用
+        # exchangeInfo 來自錄下的檔案，不寫入實際行情的本地快取
+        klines = binance_klines.BinanceKlineWrapper(client, price_cache_ttl=0, exchange_info_cache_ttl=0)
+        trade = mock_trading.MockTradingWrapper(
+            config, klines, base_dir=config.get_data_dir('mock_trading_dir'), clock=clock)
+
+        return Crypto(MarketData(client, klines), trade)
+
+    def create_market_data(config: Config, shared=False) -> MarketData:
+        """
+        依 config 建立行情資料層，REST client 使用 config 內的 API key
+        shared: 是否由多個帳號共用，共用時 kline_share_ttl_seconds 秒內同一組 K 線只下載一次
+        """
+        if Crypto.__get_base_url(config) and config.position_manage.get('kline_source', 'rest') != 'rest':
+            # K 線串流仍會連到真正的幣安
+            raise ValueError('binance_base_url requires kline_source rest')
+
+        transport = Crypto.__create_transport(config)
+        client = Crypto.__create_client(config, transport)
+        klines = Crypto.__create_kline_wrapper(config, client)
+
+        kline_share_ttl = 0
+        if shared:
+            kline_share_ttl = float(config.position_manage.get(
+                'kline_share_ttl_seconds', MarketData.DEFAULT_KLINE_SHARE_TTL))
+
+        return MarketData(client, klines, transport, kline_share_ttl=kline_share_ttl)
+
+    def get_trade_with_shared_market_data(config: Config, market_data: MarketData):
+        """使用共用的行情資料層，並依 config 的 trading_mode 建立此帳號自己的交易 API"""
+        trading_mode = config.position_manage.get('trading_mode', 'mock_trading')
+        if trading_mode == 'mock_trading':
+            trade = mock_trading.MockTradingWrapper(
+                config, market_data.klines, base_dir=config.get_data_dir('mock_trading_dir'))
+        elif trading_mode == 'binance_trading':
+            # request weight 以 IP 計算，交易用的 client 也使用同一個傳輸層
+            client = Crypto.__create_client(config, market_data.transport)
+            trade = binance_trading.BinanceTradingWrapper(
+                client, balance_cache=Crypto.__create_balance_cache(config))
+        else:
+            raise ValueError(f"Invalid trading_mode: {trading_mode}. Use 'mock_trading' or 'binance_trading'")
+
+        return Crypto(market_data, trade, owns_market_data=False)
+
+    def __create_kline_wrapper(config: Config, client: Client):
+        # full: 每次都下載完整的 K 線; incremental: 只下載上次之後的新 K 線
+        fetch_mode = config.position_manage.get('kline_fetch_mode', 'full')
+        if fetch_mode not in ('full', 'incremental'):
+            raise ValueError(f"Invalid kline_fetch_mode: {fetch_mode}. Use 'full' or 'incremental'")
+
+        # binance_base_url 指向替身時，預設不讓它的 exchangeInfo 寫入實際幣安的本地快取
+        default_exchange_info_cache_ttl = binance_klines.BinanceKlineWrapper.DEFAULT_EXCHANGE_INFO_CACHE_TTL
+        if Crypto.__get_base_url(config):
+            default_exchange_info_cache_ttl = 0
+
+        return binance_klines.BinanceKlineWrapper(
+            client,
+            incremental=(fetch_mode == 'incremental'),
+            price_cache_ttl=float(config.position_manage.get('price_cache_ttl_seconds', 3)),
+            exchange_info_cache_ttl=float(config.position_manage.get(
+                'exchange_info_cache_ttl_seconds', default_exchange_info_cache_ttl)),
+            cache_dir=config.get_data_dir('exchange_data_cache_dir'))
+
+    def __create_balance_cache(config: Config):
+        # rest: 每輪以 get_account 查詢餘額; user_stream: 以 user data stream 維護的快取，定期以 REST 校正
+        balance_source = config.position_manage.get('balance_source', 'rest')
+        if balance_source not in ('rest', 'user_stream'):
+            raise ValueError(f"Invalid balance_source: {balance_source}. Use 'rest' or 'user_stream'")
+
+        if balance_source == 'rest':
+            return None
+
+        if Crypto.__get_base_url(config):
+            # user data stream 仍會連到真正的幣安
+            raise ValueError('binance_base_url requires balance_source rest')
+
+        return user_data_stream.BalanceCache(
+            reconcile_seconds=float(config.position_manage.get('balance_reconcile_seconds', 300)))
+
+    def __create_transport(config: Config) -> http_transport.HttpTransport:
+        # 幣安每分鐘的 request weight 上限，以及實際使用的比例
+        request_limiter = rate_limiter.RequestWeightLimiter(
+            limit_per_minute=int(config.position_manage.get('request_weight_limit_per_minute', 6000)),
+            safety_ratio=float(config.position_manage.get('request_weight_safety_ratio', 0.9)))
+
+        # 連線池至少要能容納全部分析 worker 同時送出的請求
+        analysis_workers = int(config.position_manage.get('analysis_workers', 1))
+        return http_transport.HttpTransport(
+            request_limiter,
+            pool_size=int(config.position_manage.get('http_pool_size', max(10, analysis_workers))),
+            timeout_seconds=float(config.position_manage.get('http_timeout_seconds', 10)),
+            max_retries=int(config.position_manage.get('http_max_retries', 2)))
+
+    def __create_client(config: Config, transport: http_transport.HttpTransport) -> Client:
+        requests_params = None
+        if transport is not None:
+            requests_params = transport.client_requests_params()
+
+        base_url = Crypto.__get_base_url(config)
         client = Client(
             api_key=config.auth["API_KEY"],
             api_secret=config.auth["API_SECRET"],
-            testnet=False
+            requests_params=requests_params,
+            testnet=False,
+            # 替身 server 不需要在建構時 ping 真正的幣安
+            ping=not base_url
         )
+        if base_url:
+            client.API_URL = Crypto.__to_api_url(base_url)
+        if transport is not None:
+            transport.mount(client.session)
 
-        klines = binance_klines.BinanceKlineWrapper(client)
-        trade = mock_trading.MockTradingWrapper(config, klines)
+        return client
 
-        return Crypto(klines, trade)
+    def __get_base_url(config: Config):
+        """position-manage.json 的 binance_base_url，用來改連本地的替身 server (e.g., fake_exchange)"""
+        return config.position_manage.get('binance_base_url') or None
+
+    def __to_api_url(base_url: str) -> str:
+        return base_url.rstrip('/') + '/api'
+
+    def pop_request_weight_stats(self):
+        """
+        取得並歸零上次呼叫後的 request weight 用量，沒有使用限制器時回傳 None
+        共用的行情資料層由建立者取得 (見 MarketData.pop_request_weight_stats)，此時也回傳 None
+        """
+        if not self.__owns_market_data:
+            return None
+
+        return self.__market_data.pop_request_weight_stats()
+
+    def get_request_latency_stats(self):
+        """各 endpoint 的請求次數與延遲分位數，沒有使用傳輸層時回傳 None"""
+        if self.__transport is None:
+            return None
+
+        return self.__transport.latency_stats()
+
+#region asyncio session
+
+    async def open_async_session(self, api_key, api_secret):
+        """建立 asyncio 版本 API 共用的 AsyncClient，必須在使用任何 *_async 方法前於 event loop 內呼叫"""
+        if self.__async_client is not None:
+            return
+
+        session_params = None
+        if self.__transport is not None:
+            session_params = self.__transport.aiohttp_session_params()
+
+        # 替身 server 的網址，asyncio client 也要改連到這裡
+        api_url = self.__market_data.client.API_URL
+        if api_url == _DEFAULT_API_URL:
+            self.__async_client = await AsyncClient.create(
+                api_key, api_secret, session_params=session_params)
+        else:
+            self.__async_client = AsyncClient(api_key, api_secret, session_params=session_params)
+            self.__async_client.API_URL = api_url
+        for wrapper in (self.__klines, self.__trade):
+            if hasattr(wrapper, 'set_async_client'):
+                wrapper.set_async_client(self.__async_client)
+
+    async def close_async_session(self):
+        """關閉 open_async_session() 建立的 AsyncClient"""
+        if self.__async_client is None:
+            return
+
+        for wrapper in (self.__klines, self.__trade):
+            if hasattr(wrapper, 'set_async_client'):
+                wrapper.set_async_client(None)
+
+        await self.__async_client.close_connection()
+        self.__async_client = None
+
+#endregion
 
 #region trading related APIs
 
@@ -57,9 +426,35 @@ class Crypto:
             cash_asset
         )
 
-    def order_qty(self, side: str, quantity: str, symbol: str, order_type=ORDER_TYPE_MARKET):
-        """送出指定交易數量的訂單 (e.g., 買/賣 10 顆 BTC)"""
-        return self.__trade.order_qty(side, quantity, symbol, order_type)
+    async def get_equities_balance_async(
+        self,
+        watching_symbols: List[wrapped_data.WatchingSymbol],
+        cash_asset: str
+    ) -> Dict[str, wrapped_data.AssetBalance]:
+        """get_equities_balance 的 asyncio 版本"""
+        return await self.__trade.get_equities_balance_async(
+            watching_symbols,
+            cash_asset
+        )
+
+    def order_qty(self, side: str, quantity: str, symbol: str, order_type=ORDER_TYPE_MARKET, client_order_id=None):
+        """
+        送出指定交易數量的訂單 (e.g., 買/賣 10 顆 BTC)
+        client_order_id: 自訂的訂單編號 (newClientOrderId)，None 表示由交易所產生
+        """
+        if client_order_id is None:
+            return self.__trade.order_qty(side, quantity, symbol, order_type)
+
+        return self.__trade.order_qty(side, quantity, symbol, order_type, client_order_id=client_order_id)
+
+    async def order_qty_async(
+            self, side: str, quantity: str, symbol: str, order_type=ORDER_TYPE_MARKET, client_order_id=None):
+        """order_qty 的 asyncio 版本"""
+        if client_order_id is None:
+            return await self.__trade.order_qty_async(side, quantity, symbol, order_type)
+
+        return await self.__trade.order_qty_async(
+            side, quantity, symbol, order_type, client_order_id=client_order_id)
 
     def order_quote_qty(self, side, quoteOrderQty, symbol, order_type=ORDER_TYPE_MARKET):
         """送出指定成交額的訂單 (e.g., 購買交易對 BTCUSDT，成交額要求 10000UDST)"""
@@ -69,14 +464,72 @@ class Crypto:
 
 #region Klines related APIs
 
+    def start_kline_stream(self, symbols: List[str], interval, buffer_size: int, with_mini_tickers=False):
+        """
+        以 WebSocket 串流維護 symbols 的 K 線緩衝區，之後 get_klines 會優先從緩衝區讀取
+        只有初始回補與缺口修復會使用 REST API
+        with_mini_tickers: 同時訂閱 !miniTicker@arr，持續更新 get_latest_price_cache_first() 的報價快取
+        """
+        self.__market_data.start_kline_stream(symbols, interval, buffer_size, with_mini_tickers)
+
+    def pop_kline_fetch_stats(self):
+        """
+        取得並歸零 K 線下載統計，資料來源不支援時回傳 None
+        共用的行情資料層由建立者取得 (見 MarketData.pop_kline_fetch_stats)，此時也回傳 None
+        """
+        if not self.__owns_market_data:
+            return None
+
+        return self.__market_data.pop_kline_fetch_stats()
+
+    def start_user_data_stream(self):
+        """交易 API 使用餘額快取時，開始以 user data stream 更新餘額"""
+        if hasattr(self.__trade, 'start_user_data_stream'):
+            self.__trade.start_user_data_stream()
+
+    def set_execution_report_callback(self, callback) -> bool:
+        """user data stream 的每則 executionReport 也交給 callback，交易 API 沒有 user data stream 時回傳 False"""
+        if not hasattr(self.__trade, 'set_execution_report_callback'):
+            return False
+
+        self.__trade.set_execution_report_callback(callback)
+        return True
+
+    def stop_user_data_stream(self):
+        if hasattr(self.__trade, 'stop_user_data_stream'):
+            self.__trade.stop_user_data_stream()
+
+    def commit_trade_records(self):
+        """交易 API 每輪才寫檔時 (模擬交易的 group 模式)，將這一輪的成交寫檔"""
+        if hasattr(self.__trade, 'commit'):
+            self.__trade.commit()
+
+    def snapshot_trade_records(self):
+        """交易 API 在 memory 內保存紀錄時 (模擬交易的 journal 模式)，將它完整寫檔"""
+        if hasattr(self.__trade, 'snapshot'):
+            self.__trade.snapshot()
+
+    def stop_kline_stream(self):
+        """停止 start_kline_stream() 啟動的串流，共用的行情資料層由建立者負責停止"""
+        if self.__owns_market_data:
+            self.__market_data.stop_kline_streams()
+
     def get_tradable_symbols(self, quote_asset, include_assets, exclude_assets):
         """找出以 quote_asset 報價，且目前可交易、可送市價單、非槓桿型的交易對"""
-        return self.__klines.get_tradable_symbols(quote_asset, include_assets, exclude_assets)
+        return self.__market_data.get_tradable_symbols(quote_asset, include_assets, exclude_assets)
 
     def get_latest_price(self, trade_symbol):
         """取得指定交易對的最新報價"""
         return self.__klines.get_latest_price(trade_symbol)
 
+    def get_latest_price_cache_first(self, trade_symbol):
+        """取得指定交易對的最新報價，優先使用數秒內的快取報價，快取過期時一次更新全部交易對"""
+        return self.__klines.get_latest_price_cache_first(trade_symbol)
+
+    async def get_latest_price_async(self, trade_symbol):
+        """get_latest_price 的 asyncio 版本"""
+        return await self.__klines.get_latest_price_async(trade_symbol)
+
     def get_historical_klines(self, symbol, KLINE_INTERVAL, fromdate, todate):
         return self.__klines.get_historical_klines(symbol, KLINE_INTERVAL, fromdate, todate)
 
@@ -88,6 +541,25 @@ class Crypto:
         :param interval: 幾分的K線資料
         :return: klines data
         """
-        return self.__klines.get_klines(symbol, klines_limit, interval)
+        klines = self.__get_klines_from_stream(symbol, klines_limit, interval)
+        if klines is not None:
+            return klines
+
+        return self.__market_data.get_klines(symbol, klines_limit, interval)
+
+    async def get_klines_async(self, symbol, klines_limit=100, interval=Client.KLINE_INTERVAL_15MINUTE):
+        """get_klines 的 asyncio 版本"""
+        klines = self.__get_klines_from_stream(symbol, klines_limit, interval)
+        if klines is not None:
+            return klines
+
+        return await self.__market_data.get_klines_async(symbol, klines_limit, interval)
+
+    def __get_klines_from_stream(self, symbol, klines_limit, interval):
+        stream = self.__market_data.get_kline_stream(interval)
+        if stream is None or not stream.covers(symbol, interval):
+            return None
+
+        return stream.get_klines(symbol, klines_limit)
 
 #endregion
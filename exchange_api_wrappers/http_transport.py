@@ -0,0 +1,140 @@
+import logging.config
+import random
+import time
+from typing import Dict
+
+import requests
+from requests.exceptions import ConnectionError, Timeout
+
+from metrics import REGISTRY
+from .rate_limiter import RateLimitedAdapter, RequestWeightLimiter
+
+_log = logging.getLogger(__name__)
+
+_retries = REGISTRY.counter(
+    'exchange_request_retries_total', 'Binance REST requests retried, by endpoint and reason')
+
+# 可以安全重送的 HTTP method (不會重複下單)
+RETRY_METHODS = frozenset(['GET'])
+
+# 交易所端暫時性錯誤的 HTTP status；429/418 由 RequestWeightLimiter 暫停請求，不在此重送
+RETRY_STATUSES = frozenset([500, 502, 503, 504])
+
+
+class HttpTransport:
+    """
+    全部幣安 REST 請求共用的傳輸層：
+    連線池與 keep-alive、GET 請求的重送 (jittered exponential backoff)、request weight 限制，
+    以及各 endpoint 的延遲統計 (exchange_request_seconds)
+    """
+
+    def __init__(
+        self,
+        request_limiter: RequestWeightLimiter,
+        pool_size: int = 10,
+        timeout_seconds: float = 10,
+        max_retries: int = 2,
+        backoff_seconds: float = 0.25,
+        max_backoff_seconds: float = 4.0,
+        sleep=time.sleep,
+        rand=random.random,
+    ):
+        """
+        request_limiter: 共用的 request weight 限制器
+        pool_size: 每個 host 保留的連線數量，應不小於同時送出請求的執行緒數量
+        timeout_seconds: 單次請求的連線與讀取 timeout
+        max_retries: GET 請求失敗後最多重送的次數
+        backoff_seconds, max_backoff_seconds: 第 n 次重送前等待 [0, min(max, base * 2^n)) 秒
+        sleep, rand: 測試時可替換的等待與亂數來源
+        """
+        if pool_size < 1 or max_retries < 0 or timeout_seconds <= 0:
+            raise ValueError('Invalid HTTP transport parameters')
+
+        self.request_limiter = request_limiter
+        self.pool_size = pool_size
+        self.timeout_seconds = timeout_seconds
+        self.max_retries = max_retries
+        self.__backoff_seconds = backoff_seconds
+        self.__max_backoff_seconds = max_backoff_seconds
+        self.__sleep = sleep
+        self.__rand = rand
+
+    def backoff(self, attempt: int) -> float:
+        """第 attempt 次 (從 0 開始) 重送前等待的秒數 (full jitter)"""
+        return self.__rand() * min(self.__max_backoff_seconds, self.__backoff_seconds * (2 ** attempt))
+
+    def wait_before_retry(self, attempt: int, method: str, path: str, reason: str) -> None:
+        wait = self.backoff(attempt)
+        _retries.inc(path=path, reason=reason)
+        _log.warning(
+            f"{method} {path} failed ({reason}), retry {attempt + 1}/{self.max_retries} in {wait:0.2f} seconds")
+        self.__sleep(wait)
+
+    def mount(self, session: requests.Session) -> None:
+        """讓 session (e.g., binance Client.session) 的全部請求經過此傳輸層"""
+        adapter = TransportAdapter(self)
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+
+    def client_requests_params(self) -> Dict:
+        """傳給 binance Client 的 requests_params，每個請求都套用 timeout"""
+        return {'timeout': self.timeout_seconds}
+
+    def aiohttp_session_params(self) -> Dict:
+        """傳給 AsyncClient 的 session_params：限制器與相同大小的連線池，必須在 event loop 內呼叫"""
+        import aiohttp
+
+        return {
+            'trace_configs': [self.request_limiter.aiohttp_trace_config()],
+            'connector': aiohttp.TCPConnector(limit_per_host=self.pool_size, keepalive_timeout=30),
+            'timeout': aiohttp.ClientTimeout(total=self.timeout_seconds),
+        }
+
+    def latency_stats(self, quantiles=(0.5, 0.9, 0.99)) -> Dict[str, Dict]:
+        """各 endpoint 的請求次數與延遲分位數 (秒)，以 'METHOD path' 為 key"""
+        histogram = REGISTRY.get('exchange_request_seconds')
+        stats = dict()
+        for labels, _sample in histogram.samples():
+            entry = {'count': histogram.count(**labels)}
+            for q in quantiles:
+                entry[f"p{int(q * 100)}"] = histogram.quantile(q, **labels)
+            stats[f"{labels.get('method')} {labels.get('path')}"] = entry
+
+        return stats
+
+
+class TransportAdapter(RateLimitedAdapter):
+    """連線池大小依 HttpTransport 設定；GET 請求遇到連線錯誤、timeout 或 5xx 時等待後重送"""
+
+    def __init__(self, transport: HttpTransport, **kwargs):
+        self.transport = transport
+        super().__init__(
+            transport.request_limiter,
+            pool_connections=transport.pool_size,
+            pool_maxsize=transport.pool_size,
+            **kwargs)
+
+    def send(self, request, **kwargs):
+        if kwargs.get('timeout') is None:
+            kwargs['timeout'] = self.transport.timeout_seconds
+
+        retryable = request.method.upper() in RETRY_METHODS
+        path = request.path_url.split('?', 1)[0]
+        attempt = 0
+        while True:
+            try:
+                response = super().send(request, **kwargs)
+            except (ConnectionError, Timeout) as e:
+                if not retryable or attempt >= self.transport.max_retries:
+                    raise
+                self.transport.wait_before_retry(attempt, request.method, path, e.__class__.__name__)
+                attempt += 1
+                continue
+
+            if not retryable or response.status_code not in RETRY_STATUSES \
+                    or attempt >= self.transport.max_retries:
+                return response
+
+            response.close()
+            self.transport.wait_before_retry(attempt, request.method, path, f"HTTP {response.status_code}")
+            attempt += 1
@@ -0,0 +1,265 @@
+import asyncio
+import collections
+import logging.config
+import threading
+import time
+from typing import Dict, List
+
+from binance import AsyncClient, BinanceSocketManager
+from binance.helpers import interval_to_milliseconds
+
+from .binance_klines import BinanceKlineWrapper
+from .wrapped_data import *
+
+_log = logging.getLogger(__name__)
+
+
+def stream_kline_to_raw(k: dict) -> list:
+    """
+    將 WebSocket K 線串流的 k 欄位轉成與 REST API 相同的 list 格式
+    k: {"t": 開盤時間, "T": 收盤時間, "o", "h", "l", "c", "v", "n", "x", "q", "V", "Q", "B", ...}
+    """
+    return [
+        int(k['t']),
+        k['o'],
+        k['h'],
+        k['l'],
+        k['c'],
+        k['v'],
+        int(k['T']),
+        k['q'],
+        int(k['n']),
+        k['V'],
+        k['Q'],
+        k['B'],
+    ]
+
+
+class KlineStreamCache:
+    """
+    由 @kline_<interval> WebSocket 串流維護的各交易對 K 線緩衝區。
+    REST API 只用於啟動時的初始回補，以及偵測到缺口 (例如斷線重連) 時的修復。
+    超過一個 K 線週期沒有收到訊息的交易對 (e.g., 連線中斷) 不從緩衝區提供 K 線，由呼叫端改用 REST。
+    """
+
+    # 每條 multiplex 連線訂閱的串流數量上限 (幣安限制每條連線 1024 個)
+    STREAMS_PER_SOCKET = 200
+
+    # 斷線後重新連線前等待的秒數
+    RECONNECT_DELAY = 5
+
+    # 全部交易對的精簡 ticker 串流
+    MINI_TICKER_STREAM = "!miniTicker@arr"
+
+    def __init__(
+        self,
+        rest_klines: BinanceKlineWrapper,
+        interval: str,
+        buffer_size: int,
+        on_mini_tickers=None,
+        clock=time.monotonic,
+    ) -> None:
+        """
+        rest_klines: 用來回補、修復缺口的 REST K 線 API wrapper
+        interval: 訂閱的 K 線週期 (e.g., Client.KLINE_INTERVAL_1DAY)
+        buffer_size: 每個交易對保留的 K 線數量
+        on_mini_tickers: 若有指定，同時訂閱 !miniTicker@arr 並把每則訊息 (list) 交給此 callback
+        clock: 回傳目前時間 (秒) 的函式，用來判斷交易對的串流是否已停止更新
+        """
+        self.__rest_klines = rest_klines
+        self.interval = interval
+        self.__interval_ms = interval_to_milliseconds(interval)
+        self.__buffer_size = buffer_size
+        self.__on_mini_tickers = on_mini_tickers
+        self.__clock = clock
+
+        # 交易對 -> 原始格式 K 線 deque，最後一根可能是尚未收盤的 K 線
+        self.__buffers: Dict[str, collections.deque] = dict()
+        # 交易對 -> 最後一次回補或收到訊息的時間 (clock)
+        self.__last_update_times: Dict[str, float] = dict()
+        # 有缺口、正在以 REST 修復的交易對，修復完成前不從緩衝區提供 K 線
+        self.__repairing = set()
+        self.__lock = threading.Lock()
+
+        self.__loop = None
+        self.__thread = None
+        self.__stopping = False
+
+    def start(self, symbols: List[str]) -> None:
+        """以 REST 回補全部交易對後，於背景執行緒開始接收串流"""
+        for symbol in symbols:
+            self.__backfill(symbol)
+
+        _log.info(
+            f"Backfilled {len(self.__buffers)}/{len(symbols)} symbols, subscribing @kline_{self.interval} streams")
+
+        self.__stopping = False
+        self.__thread = threading.Thread(
+            target=self.__run_event_loop,
+            args=(list(self.__buffers.keys()),),
+            name="kline-stream",
+            daemon=True)
+        self.__thread.start()
+
+    def stop(self) -> None:
+        """停止接收串流"""
+        self.__stopping = True
+        loop = self.__loop
+        if loop is not None:
+            # 工作清單只能在 event loop 的執行緒內讀取
+            try:
+                loop.call_soon_threadsafe(KlineStreamCache.__cancel_all_tasks)
+            except RuntimeError:
+                # event loop 已經結束
+                pass
+
+        if self.__thread is not None:
+            self.__thread.join(timeout=10)
+            self.__thread = None
+
+    def covers(self, symbol: str, interval: str) -> bool:
+        """此快取是否能提供指定交易對、週期的 K 線"""
+        return interval == self.interval and symbol in self.__buffers
+
+    def get_klines(self, symbol: str, klines_limit: int):
+        """
+        從緩衝區取得最近 klines_limit 根 K 線 (與 REST get_klines 相同，最後一根為尚未收盤的 K 線)
+        緩衝區資料不足、缺口尚未修復完成、或超過一個 K 線週期沒有收到訊息時回傳 None (由呼叫端改用 REST)
+        """
+        with self.__lock:
+            if symbol in self.__repairing:
+                return None
+
+            last_update_time = self.__last_update_times.get(symbol)
+            if last_update_time is not None and self.__clock() - last_update_time > self.__interval_ms / 1000:
+                _log.debug(f"[{symbol}] No K line message for over one interval, not serving the stream buffer")
+                return None
+
+            buffer = self.__buffers.get(symbol)
+            if buffer is None or len(buffer) < klines_limit:
+                return None
+
+            rows = list(buffer)[-klines_limit:]
+
+        return KlineBatch(rows)
+
+    def on_kline_message(self, symbol: str, k: dict) -> bool:
+        """
+        將一則 K 線串流訊息併入緩衝區
+        回傳 False 表示偵測到缺口，需要以 REST 修復；已在修復中的交易對不會再回傳 False
+        """
+        row = stream_kline_to_raw(k)
+
+        with self.__lock:
+            buffer = self.__buffers.get(symbol)
+            if buffer is None:
+                return True
+
+            self.__last_update_times[symbol] = self.__clock()
+            last_open_time = buffer[-1][0] if buffer else None
+            if last_open_time is None or row[0] == last_open_time:
+                # 同一根 K 線的更新
+                if buffer:
+                    buffer[-1] = row
+                else:
+                    buffer.append(row)
+            elif row[0] == last_open_time + self.__interval_ms:
+                # 下一根 K 線
+                buffer.append(row)
+            elif row[0] > last_open_time:
+                # 中間漏掉了 K 線 (例如斷線)，先記下最新的，交給 REST 修復
+                buffer.append(row)
+                if symbol not in self.__repairing:
+                    self.__repairing.add(symbol)
+                    return False
+
+        return True
+
+    def __backfill(self, symbol: str) -> bool:
+        """以 REST 下載 K 線取代緩衝區，失敗時回傳 False"""
+        try:
+            rows = self.__rest_klines.get_raw_klines(
+                symbol, self.__buffer_size, self.interval)
+        except Exception:
+            _log.exception(f"[{symbol}] Failed to backfill K lines from REST API")
+            return False
+
+        with self.__lock:
+            self.__buffers[symbol] = collections.deque(
+                rows, maxlen=self.__buffer_size)
+            self.__last_update_times[symbol] = self.__clock()
+        return True
+
+    def __run_event_loop(self, symbols: List[str]) -> None:
+        try:
+            asyncio.run(self.__stream_all(symbols))
+        except Exception:
+            _log.exception("K line stream event loop exited unexpectedly")
+
+    async def __stream_all(self, symbols: List[str]) -> None:
+        self.__loop = asyncio.get_running_loop()
+        client = await AsyncClient.create()
+        try:
+            bm = BinanceSocketManager(client)
+            streams = [f"{s.lower()}@kline_{self.interval}" for s in symbols]
+            if self.__on_mini_tickers is not None:
+                streams.insert(0, KlineStreamCache.MINI_TICKER_STREAM)
+
+            chunks = [streams[i:i + KlineStreamCache.STREAMS_PER_SOCKET]
+                      for i in range(0, len(streams), KlineStreamCache.STREAMS_PER_SOCKET)]
+            await asyncio.gather(*[self.__stream_chunk(bm, chunk) for chunk in chunks])
+        except asyncio.CancelledError:
+            pass
+        finally:
+            await client.close_connection()
+            self.__loop = None
+
+    async def __stream_chunk(self, bm: BinanceSocketManager, streams: List[str]) -> None:
+        while not self.__stopping:
+            try:
+                async with bm.multiplex_socket(streams) as socket:
+                    while not self.__stopping:
+                        res = await socket.recv()
+                        if not isinstance(res, dict):
+                            _log.warning(f"Unexpected message from K line stream: {res}")
+                            continue
+
+                        data = res.get('data')
+                        if res.get('stream') == KlineStreamCache.MINI_TICKER_STREAM:
+                            self.__on_mini_tickers(data)
+                            continue
+
+                        if data is None or 'k' not in data:
+                            _log.warning(f"Unexpected message from K line stream: {res}")
+                            continue
+
+                        symbol = data['s']
+                        if not self.on_kline_message(symbol, data['k']):
+                            self.__schedule_repair(symbol)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                _log.exception(
+                    f"K line stream disconnected, reconnecting in {KlineStreamCache.RECONNECT_DELAY} seconds")
+                await asyncio.sleep(KlineStreamCache.RECONNECT_DELAY)
+
+    def __schedule_repair(self, symbol: str) -> None:
+        _log.info(f"[{symbol}] Gap detected in K line stream, repairing from REST API")
+        self.__loop.run_in_executor(None, self.__repair, symbol)
+
+    def __repair(self, symbol: str) -> None:
+        if self.__backfill(symbol):
+            with self.__lock:
+                self.__repairing.discard(symbol)
+            return
+
+        # 修復失敗時不能再提供有缺口的緩衝區，移除後 covers() 為 False，此交易對改用 REST
+        _log.warning(f"[{symbol}] Failed to repair the K line buffer, downloading its K lines from REST API from now on")
+        with self.__lock:
+            self.__buffers.pop(symbol, None)
+            self.__last_update_times.pop(symbol, None)
+            self.__repairing.discard(symbol)
+
+    def __cancel_all_tasks():
+        for task in asyncio.all_tasks():
+            task.cancel()
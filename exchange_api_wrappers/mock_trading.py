@@ -1,3 +1,4 @@
+import asyncio
 import logging.config
 from decimal import Decimal
 from typing import Dict, List
@@ -10,10 +11,14 @@ import time
 import uuid
 import random
 import string
+import threading
 import traceback
 import bot_env_config.config
 _log = logging.getLogger(__name__)
 
+# mock_trading_persistence 可用的值
+PERSISTENCE_MODES = ('rewrite', 'journal', 'group')
+
 class MockTradingWrapper:
     """
     包裝一個假的、模擬用的資產 & 訂單相關 API。
@@ -23,13 +28,45 @@ class MockTradingWrapper:
     BASE_DIR = os.path.normpath(os.path.join(
             os.path.dirname(__file__), '..', "mock-exchange-data-storage"))
 
-    def __init__(self, config: bot_env_config.config.Config, binance_quote_wrapper: BinanceKlineWrapper) -> None:
+    # journal 模式下，每成交幾筆寫一次快照
+    DEFAULT_SNAPSHOT_EVERY_FILLS = 1000
+
+    def __init__(self, config: bot_env_config.config.Config, binance_quote_wrapper: BinanceKlineWrapper, base_dir=None, clock=None) -> None:
+        """
+        base_dir: 模擬帳戶紀錄的目錄，None 表示使用 MockTradingWrapper.BASE_DIR
+        clock: 提供 time() 的時間來源，用於成交時間，None 表示使用實際時間 (重播紀錄時為模擬時間)
+
+        餘額以 Decimal 保存在 memory，依 config 的 mock_trading_persistence 寫檔：
+        - rewrite: 每筆成交都重寫整個 mock-record.json
+        - journal: 成交逐筆附加到 mock-journal.jsonl，每 mock_trading_snapshot_every_fills 筆
+          或 snapshot() 時才寫 mock-record.json；啟動時以快照加上 journal 還原
+        - group: 成交只記在 memory，commit() (每輪結束時) 才寫暫存檔、fsync 後 rename 成 mock-record.json；
+          中斷時回到上一次 commit 的餘額
+        """
         # 還是需要幣安的報價 API。
         # 當收到市價單時，會使用幣安的即時報價來當作成交價。
         self.__binance_quote = binance_quote_wrapper
         self.__cash_currency = config.position_manage['cash_currency']
-
-        os.makedirs(MockTradingWrapper.BASE_DIR, mode=0o755, exist_ok=True)
+        self.__base_dir = base_dir if base_dir is not None else MockTradingWrapper.BASE_DIR
+        self.__clock = clock if clock is not None else time
+
+        self.__persistence = config.position_manage.get('mock_trading_persistence', 'rewrite')
+        if self.__persistence not in PERSISTENCE_MODES:
+            raise ValueError(
+                f"Invalid mock_trading_persistence: {self.__persistence}. Use 'rewrite', 'journal' or 'group'")
+        self.__snapshot_every_fills = int(config.position_manage.get(
+            'mock_trading_snapshot_every_fills', MockTradingWrapper.DEFAULT_SNAPSHOT_EVERY_FILLS))
+        if self.__snapshot_every_fills < 1:
+            raise ValueError('mock_trading_snapshot_every_fills must be at least 1')
+
+        # 成交可能來自多個送單執行緒
+        self.__lock = threading.Lock()
+        self.__journal_file = None
+        # 最後一筆 journal 紀錄的序號，快照會記錄它涵蓋到哪一筆
+        self.__journal_seq = 0
+        self.__fills_since_snapshot = 0
+
+        os.makedirs(self.__base_dir, mode=0o755, exist_ok=True)
         self.__read_file()
 
         if self.__cash_currency not in self.__positions:
@@ -38,6 +75,11 @@ class MockTradingWrapper:
             self.__positions[self.__cash_currency] = Decimal(init_fund_amount)
             _log.info(f'Funded {init_fund_amount} for mock trading cash')
 
+        # 注資要在套用 journal 之前，尚未寫過快照時 journal 的成交是以注資後的現金計算
+        if self.__replay_journal() > 0:
+            # 還原後立即寫快照，journal 從頭開始
+            self.snapshot()
+
     def get_equities_balance(
         self,
         watching_symbols: List[WatchingSymbol],
@@ -73,8 +115,24 @@ class MockTradingWrapper:
 
         return ret
 
-    def order_qty(self, side: str, quantity: str, symbol: str, order_type=ORDER_TYPE_MARKET):
-        """送出指定交易數量的訂單"""
+    async def get_equities_balance_async(
+        self,
+        watching_symbols: List[WatchingSymbol],
+        cash_asset: str
+    ) -> Dict[str, AssetBalance]:
+        """get_equities_balance 的 asyncio 版本，餘額都在 memory 內，直接回傳"""
+        return self.get_equities_balance(watching_symbols, cash_asset)
+
+    async def order_qty_async(
+            self, side: str, quantity: str, symbol: str, order_type=ORDER_TYPE_MARKET, client_order_id=None):
+        """order_qty 的 asyncio 版本，成交時需查詢報價、寫檔，因此於背景執行緒執行"""
+        return await asyncio.to_thread(self.order_qty, side, quantity, symbol, order_type, client_order_id)
+
+    def order_qty(self, side: str, quantity: str, symbol: str, order_type=ORDER_TYPE_MARKET, client_order_id=None):
+        """
+        送出指定交易數量的訂單
+        client_order_id: 回應的 clientOrderId，None 表示隨機產生
+        """
         if not symbol.endswith(self.__cash_currency):
             raise Exception(f"symbol not end with {self.__cash_currency}")
 
@@ -89,15 +147,13 @@ class MockTradingWrapper:
             # 市價單需使用幣安的即時報價來當作成交價。
             # 因為計算交易數量前，API caller 可能已經使用過幣安的 API 查過一次價格
             # 為了避免 API 呼叫次數過多，也為了加快處理速度，因此會優先使用快取的報價 (但距離查詢時間要在 3 秒內)
-            # TODO impl __binance_quote.get_latest_price_cache_first
-            # self.__binance_quote.get_latest_price_cache_first(symbol)
-            latest_price_api_call = self.__binance_quote.get_latest_price(symbol)
+            latest_price_api_call = self.__binance_quote.get_latest_price_cache_first(symbol)
             market_price = latest_price_api_call['price']
 
             _log.debug(f"[order_qty] mock exchanged received order, return as fulfilled")
 
             def current_milli_time():
-                return round(time.time() * 1000)
+                return round(self.__clock.time() * 1000)
 
             def random_str(length):
                 letters = string.ascii_lowercase
@@ -107,7 +163,7 @@ class MockTradingWrapper:
                 "symbol": symbol,
                 "orderId": uuid.uuid4().int & (1<<64)-1,
                 "orderListId": -1,
-                "clientOrderId": random_str(22),
+                "clientOrderId": client_order_id if client_order_id is not None else random_str(22),
                 "transactTime": current_milli_time(),
                 "price": "0.00000000",
                 "origQty": quantity,
@@ -142,7 +198,7 @@ class MockTradingWrapper:
 
 
     def __read_file(self):
-        record_path = MockTradingWrapper.__get_record_path()
+        record_path = MockTradingWrapper.__get_record_path(self.__base_dir)
 
         if not os.path.exists(record_path):
             self.__positions = {}
@@ -155,31 +211,122 @@ class MockTradingWrapper:
             _log.debug(
                 f"Mock exchange position file exists, loading ({record_path})")
             all = json.load(json_file)
-            self.__positions = all['positions']
+            self.__positions = {k: Decimal(v) for k, v in all['positions'].items()}
+            self.__journal_seq = int(all.get('journal_seq', 0))
+
+    def __replay_journal(self) -> int:
+        """套用快照之後的 journal 紀錄，回傳套用的筆數"""
+        journal_path = MockTradingWrapper.__get_journal_path(self.__base_dir)
+        if not os.path.exists(journal_path):
+            return 0
+
+        replayed = 0
+        with open(journal_path, "r") as journal_file:
+            for line in journal_file:
+                try:
+                    fill = json.loads(line)
+                except json.JSONDecodeError:
+                    # 寫到一半就中斷的最後一行
+                    _log.warning(f"Ignoring a truncated record at the end of {journal_path}")
+                    break
+
+                # 快照寫完、journal 還沒清空前就中斷時，已在快照內的紀錄要略過
+                if fill['seq'] <= self.__journal_seq:
+                    continue
+
+                self.__apply_fill(fill['side'], fill['asset'], Decimal(fill['price']), Decimal(fill['quantity']))
+                self.__journal_seq = fill['seq']
+                replayed += 1
+
+        if replayed > 0:
+            _log.info(f"Recovered {replayed} mock fills from {journal_path}")
+        return replayed
+
+    def __apply_fill(self, side: str, asset_symbol: str, price: Decimal, quantity: Decimal):
+        # side already checked, only SIDE_BUY and SIDE_SELL are allowed
+        if side == SIDE_SELL:
+            quantity = -quantity
+
+        self.__positions[self.__cash_currency] -= price * quantity
+        self.__positions[asset_symbol] = self.__positions.get(asset_symbol, Decimal('0')) + quantity
 
     def __on_order_fulfilled(self, side: str, asset_symbol: str, price: str, quantity: str):
-        record_path = MockTradingWrapper.__get_record_path()
-        _log.debug(f"__on_order_fulfilled, writing to {record_path}")
+        with self.__lock:
+            self.__apply_fill(side, asset_symbol, Decimal(price), Decimal(quantity))
+
+            if self.__persistence == 'rewrite':
+                self.__write_snapshot()
+                return
+
+            if self.__persistence == 'group':
+                self.__fills_since_snapshot += 1
+                return
+
+            self.__journal_seq += 1
+            self.__append_journal({
+                'seq': self.__journal_seq,
+                'side': side,
+                'asset': asset_symbol,
+                'price': price,
+                'quantity': quantity,
+            })
 
-        # side already checked, only SIDE_BUY and SIDE_SELL are allowed
-        quantity = Decimal(quantity)
-        if side == SIDE_SELL:
-            quantity *= Decimal('-1')
+            self.__fills_since_snapshot += 1
+            if self.__fills_since_snapshot >= self.__snapshot_every_fills:
+                self.__write_snapshot()
 
-        cash_delta = Decimal(price) * quantity * Decimal('-1')
-        self.__positions[self.__cash_currency] = str(Decimal(self.__positions[self.__cash_currency]) + cash_delta)
+    def __append_journal(self, fill: dict):
+        if self.__journal_file is None:
+            self.__journal_file = open(MockTradingWrapper.__get_journal_path(self.__base_dir), 'a')
 
-        if asset_symbol not in self.__positions:
-            self.__positions[asset_symbol] = str(quantity)
-        else:
-            self.__positions[asset_symbol] = str(Decimal(self.__positions[asset_symbol]) + quantity)
+        self.__journal_file.write(json.dumps(fill) + '\n')
+        # 只需撐過 process 結束，不需 fsync
+        self.__journal_file.flush()
 
-        with open(record_path, 'w') as outfile:
-            json.dump(self.to_dict(), outfile)
-        _log.debug(f"__on_order_fulfilled, writing to {record_path} successfully.")
+    def commit(self):
+        """group 模式下，將上次 commit() 之後的成交寫入 mock-record.json"""
+        with self.__lock:
+            if self.__persistence == 'group' and self.__fills_since_snapshot > 0:
+                self.__write_snapshot()
+
+    def snapshot(self):
+        """將目前的餘額寫入 mock-record.json 並清空 journal (e.g., 程式結束前)"""
+        with self.__lock:
+            self.__write_snapshot()
 
-    def __get_record_path():
-        return os.path.join(MockTradingWrapper.BASE_DIR, "mock-record.json")
+    def __write_snapshot(self):
+        record_path = MockTradingWrapper.__get_record_path(self.__base_dir)
+        _log.debug(f"Writing mock exchange snapshot to {record_path}")
+
+        # 先寫到暫存檔再取代，中斷時不會留下寫一半的快照
+        tmp_path = record_path + '.tmp'
+        with open(tmp_path, 'w') as outfile:
+            json.dump(self.to_dict(), outfile)
+            if self.__persistence == 'group':
+                # 每輪只寫一次，可以負擔 fsync，rename 之後快照一定是完整的
+                outfile.flush()
+                os.fsync(outfile.fileno())
+        os.replace(tmp_path, record_path)
+        if self.__persistence == 'group' and os.name != 'nt':
+            dir_fd = os.open(self.__base_dir, os.O_RDONLY)
+            try:
+                os.fsync(dir_fd)
+            finally:
+                os.close(dir_fd)
+
+        journal_path = MockTradingWrapper.__get_journal_path(self.__base_dir)
+        if self.__journal_file is not None:
+            self.__journal_file.close()
+            self.__journal_file = None
+        if os.path.exists(journal_path):
+            open(journal_path, 'w').close()
+        self.__fills_since_snapshot = 0
+
+    def __get_record_path(base_dir):
+        return os.path.join(base_dir, "mock-record.json")
+
+    def __get_journal_path(base_dir):
+        return os.path.join(base_dir, "mock-journal.jsonl")
 
 
     def to_dict(self):
@@ -189,5 +336,6 @@ class MockTradingWrapper:
             positions[k] = str(v)
 
         return {
-            'positions': positions
+            'positions': positions,
+            'journal_seq': self.__journal_seq,
         }
@@ -0,0 +1,235 @@
+import asyncio
+import logging.config
+import threading
+import time
+from typing import Dict
+from urllib.parse import parse_qs, urlsplit
+
+from requests.adapters import HTTPAdapter
+
+from metrics import REGISTRY
+
+_log = logging.getLogger(__name__)
+
+_request_seconds = REGISTRY.histogram(
+    'exchange_request_seconds', 'Latency of Binance REST requests, by endpoint')
+_requests = REGISTRY.counter(
+    'exchange_requests_total', 'Binance REST requests, by endpoint and HTTP status')
+_request_weight = REGISTRY.counter(
+    'exchange_request_weight_total', 'Request weight reserved for Binance REST requests')
+_weight_wait_seconds = REGISTRY.counter(
+    'exchange_request_weight_wait_seconds_total', 'Time spent waiting for request weight budget')
+
+# 幣安 REQUEST_WEIGHT 以每分鐘為單位計算 (分鐘開始時歸零)
+WEIGHT_WINDOW_SECONDS = 60
+
+# 回應 header 內，目前 IP 在這一分鐘已使用的權重
+USED_WEIGHT_HEADER = "x-mbx-used-weight-1m"
+
+
+def __klines_weight(params: Dict[str, str]) -> int:
+    limit = int(params.get('limit', 500))
+    if limit < 100:
+        return 1
+    elif limit < 500:
+        return 2
+    elif limit <= 1000:
+        return 5
+    return 10
+
+
+# (HTTP method, path) -> 權重，或依參數計算權重的函式
+ENDPOINT_WEIGHTS = {
+    ('GET', '/api/v3/ping'): 1,
+    ('GET', '/api/v3/time'): 1,
+    ('GET', '/api/v3/exchangeInfo'): 20,
+    ('GET', '/api/v3/klines'): __klines_weight,
+    ('GET', '/api/v3/ticker/price'): lambda params: 2 if 'symbol' in params else 4,
+    ('GET', '/api/v3/ticker/24hr'): lambda params: 2 if 'symbol' in params else 80,
+    ('GET', '/api/v3/account'): 20,
+    ('GET', '/api/v3/myTrades'): 20,
+    ('POST', '/api/v3/order'): 1,
+    ('POST', '/api/v3/userDataStream'): 2,
+    ('PUT', '/api/v3/userDataStream'): 2,
+    ('DELETE', '/api/v3/userDataStream'): 2,
+}
+
+
+def request_weight(method: str, path: str, query: str = "") -> int:
+    """依幣安文件計算一個請求的權重，未知的 endpoint 以 1 計算"""
+    weight = ENDPOINT_WEIGHTS.get((method.upper(), path), 1)
+    if callable(weight):
+        params = {k: v[-1] for k, v in parse_qs(query).items()}
+        weight = weight(params)
+
+    return weight
+
+
+class RequestWeightLimiter:
+    """
+    全部幣安 REST 請求共用的 request weight 限制器：
+    每個請求先預留權重，這一分鐘的額度用完時才等待到下一分鐘，而不是每個請求固定 sleep
+    回應 header 的 X-MBX-USED-WEIGHT-1M 為交易所端的實際用量 (包含同 IP 的其他程式)，以它校正本地計數
+    """
+
+    def __init__(self, limit_per_minute: int = 6000, safety_ratio: float = 0.9, clock=time.time, sleep=time.sleep):
+        """
+        limit_per_minute: 交易所的每分鐘權重上限
+        safety_ratio: 只使用上限的這個比例，保留餘裕給其他程式與估算誤差
+        clock, sleep: 測試時可替換的時間來源
+        """
+        if limit_per_minute <= 0 or not 0 < safety_ratio <= 1:
+            raise ValueError('Invalid request weight limit')
+
+        self.limit_per_minute = limit_per_minute
+        self.budget = int(limit_per_minute * safety_ratio)
+        self.__clock = clock
+        self.__sleep = sleep
+        self.__lock = threading.Lock()
+
+        self.__window_start = None
+        self.__used = 0
+        self.__blocked_until = 0
+
+        self.__round_requests = 0
+        self.__round_weight = 0
+        self.__round_waited = 0.0
+        self.__server_used = None
+
+    def try_acquire(self, weight: int) -> float:
+        """嘗試預留 weight，成功回傳 0，否則回傳需要等待的秒數"""
+        with self.__lock:
+            now = self.__clock()
+            self.__roll_window(now)
+
+            if now < self.__blocked_until:
+                return self.__blocked_until - now
+
+            # 權重大於整個額度的請求，在新的一分鐘開始時仍放行
+            if self.__used > 0 and self.__used + weight > self.budget:
+                return self.__window_start + WEIGHT_WINDOW_SECONDS - now
+
+            self.__used += weight
+            self.__round_requests += 1
+            self.__round_weight += weight
+            _request_weight.inc(weight)
+            return 0
+
+    def acquire(self, weight: int) -> None:
+        """預留 weight，額度不足時 block 到下一分鐘"""
+        while True:
+            wait = self.try_acquire(weight)
+            if wait <= 0:
+                return
+
+            self.__on_wait(wait)
+            self.__sleep(wait)
+
+    async def acquire_async(self, weight: int) -> None:
+        """acquire 的 asyncio 版本"""
+        while True:
+            wait = self.try_acquire(weight)
+            if wait <= 0:
+                return
+
+            self.__on_wait(wait)
+            await asyncio.sleep(wait)
+
+    def on_response(self, status: int, headers) -> None:
+        """以回應的 header 校正已使用的權重；429/418 時依 Retry-After 暫停全部請求"""
+        used = None
+        retry_after = None
+        for key, value in headers.items():
+            lower_key = key.lower()
+            if lower_key == USED_WEIGHT_HEADER:
+                used = int(value)
+            elif lower_key == 'retry-after':
+                retry_after = float(value)
+
+        with self.__lock:
+            now = self.__clock()
+            self.__roll_window(now)
+
+            if used is not None:
+                self.__server_used = used
+                self.__used = max(self.__used, used)
+
+            if status in (418, 429):
+                pause = retry_after if retry_after is not None else \
+                    self.__window_start + WEIGHT_WINDOW_SECONDS - now
+                self.__blocked_until = max(self.__blocked_until, now + pause)
+                _log.warning(
+                    f"Binance responded HTTP {status}, pausing all requests for {pause:0.1f} seconds")
+
+    def pop_round_stats(self) -> dict:
+        """取得並歸零上次呼叫後的請求數、權重、等待秒數，以及交易所回報的本分鐘用量"""
+        with self.__lock:
+            stats = {
+                'requests': self.__round_requests,
+                'weight': self.__round_weight,
+                'waited_seconds': self.__round_waited,
+                'server_used_weight': self.__server_used,
+                'budget': self.budget,
+            }
+            self.__round_requests = 0
+            self.__round_weight = 0
+            self.__round_waited = 0.0
+
+        return stats
+
+    def mount(self, session) -> None:
+        """讓 requests.Session (e.g., binance Client.session) 的全部請求經過此限制器"""
+        adapter = RateLimitedAdapter(self)
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+
+    def aiohttp_trace_config(self):
+        """回傳 aiohttp.TraceConfig，傳入 AsyncClient 的 session_params 讓 asyncio 請求也經過此限制器"""
+        import aiohttp
+
+        async def on_request_start(session, context, params):
+            await self.acquire_async(request_weight(
+                params.method, params.url.path, params.url.query_string))
+            context.started_at = time.perf_counter()
+
+        async def on_request_end(session, context, params):
+            path = params.url.path
+            _request_seconds.observe(time.perf_counter() - context.started_at, method=params.method, path=path)
+            _requests.inc(path=path, status=params.response.status)
+            self.on_response(params.response.status, params.response.headers)
+
+        trace_config = aiohttp.TraceConfig()
+        trace_config.on_request_start.append(on_request_start)
+        trace_config.on_request_end.append(on_request_end)
+        return trace_config
+
+    def __roll_window(self, now: float) -> None:
+        window_start = now - now % WEIGHT_WINDOW_SECONDS
+        if window_start != self.__window_start:
+            self.__window_start = window_start
+            self.__used = 0
+            self.__server_used = None
+
+    def __on_wait(self, wait: float) -> None:
+        _log.debug(f"Request weight budget used up, waiting {wait:0.2f} seconds")
+        _weight_wait_seconds.inc(wait)
+        with self.__lock:
+            self.__round_waited += wait
+
+
+class RateLimitedAdapter(HTTPAdapter):
+    """送出請求前向 RequestWeightLimiter 預留權重，收到回應後以 header 校正"""
+
+    def __init__(self, limiter: RequestWeightLimiter, **kwargs):
+        self.limiter = limiter
+        super().__init__(**kwargs)
+
+    def send(self, request, **kwargs):
+        url = urlsplit(request.url)
+        self.limiter.acquire(request_weight(request.method, url.path, url.query))
+
+        with _request_seconds.time(method=request.method, path=url.path):
+            response = super().send(request, **kwargs)
+        _requests.inc(path=url.path, status=response.status_code)
+        self.limiter.on_response(response.status_code, response.headers)
+        return response
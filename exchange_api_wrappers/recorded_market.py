@@ -0,0 +1,210 @@
+import bisect
+import json
+import logging.config
+import os
+import threading
+from typing import Dict, List
+
+from binance.helpers import interval_to_milliseconds
+
+_log = logging.getLogger(__name__)
+
+EXCHANGE_INFO_FILE = "exchange-info.json"
+KLINES_DIR = "klines"
+
+
+def _klines_file_name(symbol: str, interval: str) -> str:
+    return f"{symbol}_{interval}.json"
+
+
+def record_market(client, record_dir: str, symbols: List[str], intervals: List[str], start_ms: int, end_ms: int) -> None:
+    """
+    從幣安下載 [start_ms, end_ms) 的 K 線與 exchangeInfo，存成 RecordedMarketClient 可重播的檔案
+    client: binance Client
+    start_ms: 需包含分析所需的歷史 K 線 (e.g., 重播開始時間再往前 klines_limit 根)
+    """
+    os.makedirs(os.path.join(record_dir, KLINES_DIR), mode=0o755, exist_ok=True)
+
+    exchange_info = client.get_exchange_info()
+    wanted = set(symbols)
+    compact = {'symbols': [s for s in exchange_info['symbols'] if s['symbol'] in wanted]}
+    with open(os.path.join(record_dir, EXCHANGE_INFO_FILE), 'w') as outfile:
+        json.dump(compact, outfile)
+
+    for symbol in symbols:
+        for interval in intervals:
+            rows = client.get_historical_klines(symbol, interval, start_ms, end_ms - 1)
+            path = os.path.join(record_dir, KLINES_DIR, _klines_file_name(symbol, interval))
+            with open(path, 'w') as outfile:
+                json.dump(rows, outfile)
+            _log.info(f"Recorded {len(rows)} {interval} K lines of {symbol} ({path})")
+
+
+class _RecordedSeries:
+    """單一交易對、週期的 K 線紀錄"""
+
+    def __init__(self, path: str, interval: str):
+        with open(path, 'r') as json_file:
+            self.rows = json.load(json_file)
+
+        self.interval = interval
+        self.interval_ms = interval_to_milliseconds(interval)
+        self.open_times = [int(row[0]) for row in self.rows]
+
+    def closed_count(self, now_ms: int) -> int:
+        """now_ms 時已收盤的 K 線數量 (rows 的前幾根)"""
+        count = bisect.bisect_right(self.open_times, now_ms - self.interval_ms)
+        # 週、月 K 線的長度不固定，以 close_time 再確認一次
+        while count > 0 and int(self.rows[count - 1][6]) >= now_ms:
+            count -= 1
+
+        return count
+
+
+class RecordedMarketClient:
+    """
+    以 record_market() 錄下的檔案取代 binance Client 的行情 API (get_klines、get_symbol_ticker、get_exchange_info)
+    只回傳 clock 目前時間以前的資料：最後一根為尚未收盤的 K 線，由更小週期已收盤的 K 線組成，不會看到未來的價格
+    交給 BinanceKlineWrapper 使用，price_cache_ttl 應設為 0、不使用 incremental 模式 (兩者都以實際時間計算)
+    """
+
+    def __init__(self, record_dir: str, clock):
+        """
+        record_dir: record_market() 的輸出目錄
+        clock: 提供 time() (epoch 秒) 的時間來源，e.g., SimulatedClock
+        """
+        self.record_dir = record_dir
+        self.__clock = clock
+        self.__lock = threading.Lock()
+
+        # 交易對 -> {週期: 檔案路徑}
+        self.__files: Dict[str, Dict[str, str]] = dict()
+        klines_dir = os.path.join(record_dir, KLINES_DIR)
+        for name in sorted(os.listdir(klines_dir)):
+            if not name.endswith('.json'):
+                continue
+
+            symbol, interval = name[:-len('.json')].rsplit('_', 1)
+            self.__files.setdefault(symbol, dict())[interval] = os.path.join(klines_dir, name)
+
+        self.__series: Dict[tuple, _RecordedSeries] = dict()
+
+    def get_exchange_info(self):
+        with open(os.path.join(self.record_dir, EXCHANGE_INFO_FILE), 'r') as json_file:
+            exchange_info = json.load(json_file)
+
+        # 沒有錄到 K 線的交易對無法重播
+        exchange_info['symbols'] = [s for s in exchange_info['symbols'] if s['symbol'] in self.__files]
+        return exchange_info
+
+    def get_klines(self, symbol, interval, limit=500, startTime=None, endTime=None, **kwargs):
+        """與 Client.get_klines 相同格式，資料不足時回傳較少的 K 線"""
+        series = self.__get_series(symbol, interval)
+        if series is None:
+            return []
+
+        now_ms = self.__now_ms()
+        closed_count = series.closed_count(now_ms)
+        rows = series.rows[:closed_count]
+        if startTime is not None:
+            rows = rows[bisect.bisect_left(series.open_times, int(startTime), 0, closed_count):]
+
+        forming = self.__forming_kline(symbol, series, closed_count, now_ms)
+        if forming is not None:
+            rows = rows + [forming]
+
+        return rows[:limit] if startTime is not None else rows[-limit:]
+
+    def get_historical_klines(self, symbol, interval, start_str=None, end_str=None, **kwargs):
+        series = self.__get_series(symbol, interval)
+        if series is None:
+            return []
+
+        closed_count = series.closed_count(self.__now_ms())
+        return [row for row in series.rows[:closed_count]
+                if (start_str is None or row[0] >= int(start_str)) and (end_str is None or row[0] <= int(end_str))]
+
+    def get_symbol_ticker(self, symbol=None, **kwargs):
+        """與 Client.get_symbol_ticker 相同格式；沒有指定 symbol 時回傳全部交易對"""
+        if symbol is not None:
+            price = self.__latest_price(symbol)
+            if price is None:
+                raise ValueError(f"No recorded price of {symbol} at {self.__now_ms()}")
+            return {'symbol': symbol, 'price': price}
+
+        tickers = []
+        for s in self.__files.keys():
+            price = self.__latest_price(s)
+            if price is not None:
+                tickers.append({'symbol': s, 'price': price})
+
+        return tickers
+
+    def __now_ms(self) -> int:
+        return int(self.__clock.time() * 1000)
+
+    def __get_series(self, symbol: str, interval: str):
+        path = self.__files.get(symbol, {}).get(interval)
+        if path is None:
+            return None
+
+        key = (symbol, interval)
+        series = self.__series.get(key)
+        if series is None:
+            with self.__lock:
+                series = self.__series.get(key)
+                if series is None:
+                    series = _RecordedSeries(path, interval)
+                    self.__series[key] = series
+
+        return series
+
+    def __finest_series(self, symbol: str):
+        intervals = self.__files.get(symbol)
+        if not intervals:
+            return None
+
+        finest = min(intervals.keys(), key=lambda i: interval_to_milliseconds(i) or float('inf'))
+        return self.__get_series(symbol, finest)
+
+    def __latest_price(self, symbol: str):
+        """最小週期最後一根已收盤 K 線的收盤價；尚無已收盤的 K 線時，使用目前這根的開盤價"""
+        series = self.__finest_series(symbol)
+        if series is None:
+            return None
+
+        now_ms = self.__now_ms()
+        closed_count = series.closed_count(now_ms)
+        if closed_count > 0:
+            return series.rows[closed_count - 1][4]
+
+        if series.rows and int(series.rows[0][0]) <= now_ms:
+            return series.rows[0][1]
+
+        return None
+
+    def __forming_kline(self, symbol: str, series: _RecordedSeries, closed_count: int, now_ms: int):
+        """目前尚未收盤的 K 線：以更小週期、已收盤的 K 線組成"""
+        if closed_count >= len(series.rows) or int(series.rows[closed_count][0]) > now_ms:
+            return None
+
+        recorded = series.rows[closed_count]
+        open_time = int(recorded[0])
+        open_price = recorded[1]
+        high = low = close = float(open_price)
+        volume = quote_volume = 0.0
+        trades = 0
+
+        finest = self.__finest_series(symbol)
+        if finest is not series:
+            start = bisect.bisect_left(finest.open_times, open_time)
+            for row in finest.rows[start:finest.closed_count(now_ms)]:
+                high = max(high, float(row[2]))
+                low = min(low, float(row[3]))
+                close = float(row[4])
+                volume += float(row[5])
+                quote_volume += float(row[7])
+                trades += int(row[8])
+
+        return [open_time, open_price, f"{high:.8f}", f"{low:.8f}", f"{close:.8f}", f"{volume:.8f}",
+                int(recorded[6]), f"{quote_volume:.8f}", trades, "0", "0", "0"]
@@ -0,0 +1,206 @@
+import asyncio
+import logging.config
+import threading
+import time
+from typing import Dict
+
+from binance import AsyncClient, BinanceSocketManager
+
+from metrics import REGISTRY
+
+_log = logging.getLogger(__name__)
+
+_reconciles = REGISTRY.counter(
+    'balance_cache_reconciles_total', 'Account snapshots fetched by REST to (re)seed the balance cache, by reason')
+_stream_updates = REGISTRY.counter(
+    'balance_cache_stream_updates_total', 'outboundAccountPosition events applied to the balance cache')
+
+
+class BalanceCache:
+    """
+    以資產名稱索引的帳戶餘額，由 get_account 的快照建立，之後以 user data stream 的 outboundAccountPosition 更新
+    快照過期、串流重新連線或成交後遲遲沒有收到餘額更新時，需要以 REST 重新校正 (needs_reconcile)
+    """
+
+    def __init__(self, reconcile_seconds: float = 300, fill_grace_seconds: float = 5, clock=time.time):
+        """
+        reconcile_seconds: 距離上次 REST 快照超過此秒數就重新校正，0 表示只在必要時校正
+        fill_grace_seconds: 收到成交 (executionReport) 後，等待對應 outboundAccountPosition 的秒數
+        clock: 回傳目前 epoch 秒的函式
+        """
+        if reconcile_seconds < 0 or fill_grace_seconds < 0:
+            raise ValueError('reconcile_seconds and fill_grace_seconds must not be negative')
+
+        self.__reconcile_seconds = reconcile_seconds
+        self.__fill_grace_seconds = fill_grace_seconds
+        self.__clock = clock
+        self.__lock = threading.Lock()
+
+        # 資產 -> {'asset', 'free', 'locked'} (與 get_account 的 balances 相同格式)
+        self.__balances: Dict[str, dict] = dict()
+        # 資產 -> 最後更新時間 (ms)，用來丟棄比快照舊的串流事件
+        self.__updated_at: Dict[str, int] = dict()
+
+        self.__seeded_at = None
+        self.__invalid_reason = 'not_seeded'
+        # 尚未收到對應餘額更新的最早一筆成交時間 (epoch 秒)
+        self.__pending_fill_since = None
+
+    def seed(self, account: dict) -> None:
+        """以 get_account 的回應重建快取"""
+        update_ms = int(account.get('updateTime', 0))
+        with self.__lock:
+            balances = dict()
+            updated_at = dict()
+            for balance in account['balances']:
+                asset = balance['asset']
+                # 快照之後才到的串流事件比快照新，保留串流的值
+                if self.__updated_at.get(asset, -1) > update_ms:
+                    balances[asset] = self.__balances[asset]
+                    updated_at[asset] = self.__updated_at[asset]
+                else:
+                    balances[asset] = balance
+                    updated_at[asset] = update_ms
+
+            self.__balances = balances
+            self.__updated_at = updated_at
+            self.__seeded_at = self.__clock()
+            self.__invalid_reason = None
+            self.__pending_fill_since = None
+
+    def invalidate(self, reason: str) -> None:
+        """下次讀取前必須以 REST 重新校正 (e.g., 串流斷線期間可能漏掉事件)"""
+        with self.__lock:
+            self.__invalid_reason = reason
+
+    def needs_reconcile(self):
+        """需要以 REST 重新校正時回傳原因，否則回傳 None"""
+        now = self.__clock()
+        with self.__lock:
+            if self.__invalid_reason is not None:
+                return self.__invalid_reason
+
+            if self.__reconcile_seconds > 0 and now - self.__seeded_at >= self.__reconcile_seconds:
+                return 'periodic'
+
+            if self.__pending_fill_since is not None and now - self.__pending_fill_since >= self.__fill_grace_seconds:
+                return 'missing_account_update'
+
+        return None
+
+    def record_reconcile(self, reason: str) -> None:
+        _reconciles.inc(reason=reason)
+        _log.debug(f"Reconciled balance cache from REST ({reason})")
+
+    def on_user_data_message(self, msg: dict) -> None:
+        """處理一則 user data stream 訊息"""
+        event_type = msg.get('e')
+        if event_type == 'outboundAccountPosition':
+            update_ms = int(msg.get('u', msg.get('E', 0)))
+            with self.__lock:
+                for balance in msg['B']:
+                    asset = balance['a']
+                    if self.__updated_at.get(asset, -1) > update_ms:
+                        continue
+
+                    self.__balances[asset] = {'asset': asset, 'free': balance['f'], 'locked': balance['l']}
+                    self.__updated_at[asset] = update_ms
+
+                self.__pending_fill_since = None
+            _stream_updates.inc()
+        elif event_type == 'executionReport' and msg.get('x') == 'TRADE':
+            # 成交後幣安會再送出 outboundAccountPosition，在那之前快取的餘額是舊的
+            with self.__lock:
+                if self.__pending_fill_since is None:
+                    self.__pending_fill_since = self.__clock()
+        elif event_type == 'error':
+            self.invalidate('stream_error')
+
+    def balances_by_asset(self) -> Dict[str, dict]:
+        with self.__lock:
+            return dict(self.__balances)
+
+
+class UserDataStream:
+    """
+    於背景執行緒接收 user data stream (listenKey 由 BinanceSocketManager 維持)，交給 BalanceCache 更新餘額
+    每次 (重新) 連線後都會讓快取失效，下次讀取時以 REST 校正斷線期間漏掉的變化
+    """
+
+    # 斷線後重新連線前等待的秒數
+    RECONNECT_DELAY = 5
+
+    def __init__(self, api_key: str, api_secret: str, balance_cache: BalanceCache = None, on_execution_report=None):
+        """
+        balance_cache: 要更新的餘額快取，None 表示只轉交 executionReport
+        on_execution_report: 若有指定，每則 executionReport 訊息 (dict) 也會交給此 callback
+        """
+        self.__api_key = api_key
+        self.__api_secret = api_secret
+        self.__balance_cache = balance_cache
+        self.__on_execution_report = on_execution_report
+
+        self.__loop = None
+        self.__thread = None
+        self.__stopping = False
+
+    def start(self) -> None:
+        self.__stopping = False
+        self.__thread = threading.Thread(
+            target=self.__run_event_loop,
+            name="user-data-stream",
+            daemon=True)
+        self.__thread.start()
+
+    def stop(self) -> None:
+        self.__stopping = True
+        loop = self.__loop
+        if loop is not None:
+            for task in asyncio.all_tasks(loop):
+                loop.call_soon_threadsafe(task.cancel)
+
+        if self.__thread is not None:
+            self.__thread.join(timeout=10)
+            self.__thread = None
+
+    def __invalidate_balance_cache(self, reason: str) -> None:
+        if self.__balance_cache is not None:
+            self.__balance_cache.invalidate(reason)
+
+    def __run_event_loop(self) -> None:
+        try:
+            asyncio.run(self.__stream())
+        except Exception:
+            _log.exception("User data stream event loop exited unexpectedly")
+
+    async def __stream(self) -> None:
+        self.__loop = asyncio.get_running_loop()
+        client = await AsyncClient.create(self.__api_key, self.__api_secret)
+        try:
+            bm = BinanceSocketManager(client)
+            while not self.__stopping:
+                try:
+                    async with bm.user_socket() as socket:
+                        self.__invalidate_balance_cache('stream_connected')
+                        while not self.__stopping:
+                            msg = await socket.recv()
+                            if not isinstance(msg, dict):
+                                _log.warning(f"Unexpected message from user data stream: {msg}")
+                                continue
+
+                            if self.__balance_cache is not None:
+                                self.__balance_cache.on_user_data_message(msg)
+                            if msg.get('e') == 'executionReport' and self.__on_execution_report is not None:
+                                self.__on_execution_report(msg)
+                except asyncio.CancelledError:
+                    raise
+                except Exception:
+                    self.__invalidate_balance_cache('stream_disconnected')
+                    _log.exception(
+                        f"User data stream disconnected, reconnecting in {UserDataStream.RECONNECT_DELAY} seconds")
+                    await asyncio.sleep(UserDataStream.RECONNECT_DELAY)
+        except asyncio.CancelledError:
+            pass
+        finally:
+            await client.close_connection()
+            self.__loop = None
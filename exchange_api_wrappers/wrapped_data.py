@@ -1,5 +1,7 @@
 from decimal import Decimal
 
+import numpy
+
 """
 包裝、處理過的、來自交易所的資料
 """
@@ -34,6 +36,45 @@ class AssetBalance:
         )
 
 
+class SymbolFilters:
+    """交易對的下單限制，從 exchangeInfo 的 filters 解析一次後重複使用"""
+
+    __slots__ = ('min_notional', 'min_qty', 'max_qty', 'step_size')
+
+    def __init__(self, filters):
+        """
+        filters: [
+            {'filterType': 'LOT_SIZE', 'minQty': '0.00001000', 'maxQty': '9000.00000000', 'stepSize': '0.00001000'},
+            {'filterType': 'NOTIONAL', 'minNotional': '5.00000000', ...},
+            ...
+        ]
+        沒有 NOTIONAL / MIN_NOTIONAL 時 min_notional 為 0 (不限制)，其他不存在的限制為 None
+        """
+        self.min_notional = None
+        self.min_qty = None
+        self.max_qty = None
+        self.step_size = None
+
+        for f in filters:
+            filter_type = f['filterType']
+            if filter_type == 'LOT_SIZE':
+                self.min_qty = Decimal(f['minQty'])
+                self.max_qty = Decimal(f['maxQty'])
+                self.step_size = Decimal(f['stepSize'])
+            elif filter_type == 'NOTIONAL' or (filter_type == 'MIN_NOTIONAL' and self.min_notional is None):
+                # 舊版 API 使用 MIN_NOTIONAL，兩者皆有時以 NOTIONAL 為準
+                self.min_notional = Decimal(f['minNotional'])
+
+        if self.min_notional is None:
+            self.min_notional = Decimal('0')
+
+    def __repr__(self):
+        return (
+            f"{{min_notional: '{self.min_notional}', min_qty: '{self.min_qty}', "
+            f"max_qty: '{self.max_qty}', step_size: '{self.step_size}'}}"
+        )
+
+
 class WatchingSymbol:
     """監視中的交易對"""
 
@@ -48,6 +89,11 @@ class WatchingSymbol:
         self.base_asset = base_asset
         self.info = info
 
+        # 預先解析好的下單限制，info 內沒有 filters 時為 None
+        self.filters = None
+        if info is not None and 'filters' in info:
+            self.filters = SymbolFilters(info['filters'])
+
     def __str__(self):
         return f"{{symbol: '{self.symbol}', base_asset: '{self.base_asset}'}}"
 
@@ -87,3 +133,50 @@ class Kline:
         self.number_of_trades = int(dict[8])
         self.taker_buy_base_asset_volume = Decimal(dict[9])
         self.taker_buy_quote_asset_volume = Decimal(dict[10])
+
+
+class KlineBatch:
+    """
+    一段連續 K 線的欄式 (columnar) 表示：open_time、open、high、low、close、volume、close_time
+    各為一個連續的 numpy array，分析器可直接傳入 talib，不需要逐根轉換
+    需要精確數值 (e.g., 下單) 時才以 decimal_close() 或索引 (回傳 Kline) 從原始字串取得 Decimal
+    """
+
+    def __init__(self, rows):
+        """
+        rows: 交易所原始格式 (list of list) 的 K 線，格式見 Kline；K 線串流的緩衝區也使用相同格式
+        """
+        self.__rows = rows
+        count = len(rows)
+
+        times = numpy.array([(row[0], row[6]) for row in rows], dtype=numpy.int64).reshape(count, 2)
+        values = numpy.array([row[1:6] for row in rows], dtype=numpy.float64).reshape(count, 5)
+
+        # 轉置後每個欄位各自連續存放
+        times = numpy.ascontiguousarray(times.T)
+        values = numpy.ascontiguousarray(values.T)
+
+        self.open_time = times[0]
+        self.close_time = times[1]
+        self.open = values[0]
+        self.high = values[1]
+        self.low = values[2]
+        self.close = values[3]
+        self.volume = values[4]
+
+    def decimal_close(self, index: int = -1) -> Decimal:
+        """第 index 根 K 線的收盤價 (以原始字串轉換，沒有浮點誤差)"""
+        return Decimal(self.__rows[index][4])
+
+    def __len__(self):
+        return len(self.__rows)
+
+    def __getitem__(self, index):
+        """以索引取得單根 K 線 (Kline)，只在需要 Decimal 欄位時使用"""
+        if isinstance(index, slice):
+            return KlineBatch(self.__rows[index])
+
+        return Kline(self.__rows[index])
+
+    def __iter__(self):
+        return (Kline(row) for row in self.__rows)
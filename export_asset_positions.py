@@ -0,0 +1,38 @@
+import __init__
+import argparse
+import logging.config
+
+from asset_record_platforms.file_based_asset_positions import AssetPositions
+from bot_env_config.config import Config
+from exchange_api_wrappers.wrapped_data import WatchingSymbol
+
+_log = logging.getLogger(__name__)
+
+
+def export(config: Config):
+    """將 journal / sqlite 模式的倉位全部以 <ASSET>.json 格式寫出，供 dashboard 讀取"""
+    cash_currency = config.position_manage['cash_currency']
+    storage = config.position_manage.get('asset_positions_storage', 'json')
+    if storage == 'json':
+        raise ValueError('asset_positions_storage is json, positions are already stored as <ASSET>.json')
+
+    assets = AssetPositions.stored_assets(config.get_data_dir('asset_positions_dir'), storage)
+    watching_symbols = [
+        WatchingSymbol(f"{asset}{cash_currency}", asset, None) for asset in assets if asset != cash_currency]
+    record = AssetPositions.from_config(config, watching_symbols, cash_currency, read_only=True)
+    record.export_json(only_changed=False)
+
+    _log.info(f"Exported {len(record.positions)} positions from {storage} storage")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Export journal or sqlite asset positions as <ASSET>.json files read by the dashboard')
+    parser.add_argument('--config-dir', default=None, help='config directory, defaults to user-config')
+    args = parser.parse_args()
+
+    export(Config(args.config_dir))
+
+
+if __name__ == '__main__':
+    main()
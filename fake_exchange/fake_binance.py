@@ -0,0 +1,411 @@
+import argparse
+import json
+import logging.config
+import math
+import random
+import threading
+import time
+from decimal import Decimal
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List
+from urllib.parse import parse_qs, urlsplit
+
+from binance.helpers import interval_to_milliseconds
+
+from exchange_api_wrappers.rate_limiter import USED_WEIGHT_HEADER, WEIGHT_WINDOW_SECONDS, request_weight
+
+_log = logging.getLogger(__name__)
+
+# 前幾個交易對使用真實的貨幣名稱，其餘為 C0001、C0002...
+KNOWN_BASE_ASSETS = ['BTC', 'ETH', 'BNB', 'XRP', 'ADA', 'SOL', 'DOGE', 'DOT', 'LTC', 'LINK']
+
+# 市價單的手續費率 (以收到的資產支付)
+COMMISSION_RATE = Decimal('0.001')
+
+QTY_STEP = Decimal('0.00001')
+PRICE_STEP = Decimal('0.01')
+
+
+class FakeExchangeError(Exception):
+    """回傳給 client 的幣安格式錯誤"""
+
+    def __init__(self, status: int, code: int, msg: str):
+        super().__init__(msg)
+        self.status = status
+        self.code = code
+        self.msg = msg
+
+
+class FakeBinanceMarket:
+    """
+    合成的交易對與價格：價格只由 (交易對, 時間) 決定，同一段時間的 K 線無論何時、以何種參數下載都相同
+    帳戶餘額與訂單在記憶體內，所有方法都在 lock 內完成
+    """
+
+    def __init__(
+        self,
+        symbol_count: int = 50,
+        quote_asset: str = 'USDT',
+        initial_cash: Decimal = Decimal('10000'),
+        seed: int = 0,
+        clock=time.time,
+    ):
+        self.quote_asset = quote_asset
+        self.__clock = clock
+        self.__lock = threading.Lock()
+
+        rng = random.Random(seed)
+        self.__base_assets = [
+            KNOWN_BASE_ASSETS[i] if i < len(KNOWN_BASE_ASSETS) else f"C{i:04d}"
+            for i in range(symbol_count)]
+        # 交易對 -> (基準價, 週期相位, 雜訊種子)
+        self.__params = {
+            f"{base}{quote_asset}": (10 ** rng.uniform(-2, 4), rng.uniform(0, 2 * math.pi), rng.getrandbits(32))
+            for base in self.__base_assets}
+
+        self.__balances: Dict[str, Decimal] = {base: Decimal('0') for base in self.__base_assets}
+        self.__balances[quote_asset] = Decimal(initial_cash)
+        self.__next_order_id = 1
+        self.__next_trade_id = 1
+
+    @property
+    def symbols(self) -> List[str]:
+        return list(self.__params.keys())
+
+    def now_ms(self) -> int:
+        return int(self.__clock() * 1000)
+
+    def price_at(self, symbol: str, time_ms: int) -> float:
+        """交易對在 time_ms 的價格：以週為週期的波動加上每分鐘的雜訊"""
+        base, phase, noise_seed = self.__params[symbol]
+        minute = time_ms // 60000
+        noise = random.Random(noise_seed ^ minute).uniform(-0.005, 0.005)
+        return base * (1 + 0.15 * math.sin(2 * math.pi * time_ms / (7 * 86400000) + phase)) * (1 + noise)
+
+    def latest_price(self, symbol: str) -> Decimal:
+        return Decimal(f"{self.price_at(symbol, self.now_ms()):.8f}")
+
+    def exchange_info(self) -> dict:
+        return {
+            'timezone': 'UTC',
+            'serverTime': self.now_ms(),
+            'rateLimits': [],
+            'symbols': [{
+                'symbol': symbol,
+                'status': 'TRADING',
+                'baseAsset': base,
+                'quoteAsset': self.quote_asset,
+                'orderTypes': ['LIMIT', 'MARKET'],
+                'permissions': ['SPOT'],
+                'filters': [
+                    {'filterType': 'PRICE_FILTER', 'minPrice': '0.01000000',
+                     'maxPrice': '1000000.00000000', 'tickSize': '0.01000000'},
+                    {'filterType': 'LOT_SIZE', 'minQty': str(QTY_STEP),
+                     'maxQty': '9000000.00000000', 'stepSize': str(QTY_STEP)},
+                    {'filterType': 'NOTIONAL', 'minNotional': '5.00000000',
+                     'applyMinToMarket': True, 'maxNotional': '9000000.00000000'},
+                ],
+            } for base, symbol in zip(self.__base_assets, self.__params.keys())],
+        }
+
+    def klines(self, symbol: str, interval: str, limit: int = 500, start_time: int = None, end_time: int = None):
+        """與 GET /api/v3/klines 相同格式的 K 線，最後一根為目前尚未收盤的 K 線"""
+        self.__check_symbol(symbol)
+        interval_ms = interval_to_milliseconds(interval)
+        if interval_ms is None:
+            raise FakeExchangeError(400, -1120, 'Invalid interval.')
+
+        limit = max(1, min(int(limit), 1000))
+        now_ms = self.now_ms()
+        last_open = now_ms - now_ms % interval_ms
+        if end_time is not None:
+            last_open = min(last_open, end_time - end_time % interval_ms)
+
+        if start_time is not None:
+            first_open = start_time + (-start_time) % interval_ms
+            open_times = range(first_open, min(last_open, first_open + (limit - 1) * interval_ms) + 1, interval_ms)
+        else:
+            open_times = range(last_open - (limit - 1) * interval_ms, last_open + 1, interval_ms)
+
+        rows = []
+        for open_time in open_times:
+            close_time = open_time + interval_ms - 1
+            open_price = self.price_at(symbol, open_time - 1)
+            close_price = self.price_at(symbol, min(close_time, now_ms))
+            high = max(open_price, close_price) * 1.002
+            low = min(open_price, close_price) * 0.998
+            volume = 1000 + (open_time // interval_ms) % 97
+            rows.append([
+                open_time, f"{open_price:.8f}", f"{high:.8f}", f"{low:.8f}", f"{close_price:.8f}",
+                f"{volume:.8f}", close_time, f"{volume * close_price:.8f}", 100,
+                f"{volume / 2:.8f}", f"{volume * close_price / 2:.8f}", "0"])
+
+        return rows
+
+    def ticker_prices(self, symbol: str = None):
+        if symbol is not None:
+            self.__check_symbol(symbol)
+            return {'symbol': symbol, 'price': str(self.latest_price(symbol))}
+
+        return [{'symbol': s, 'price': str(self.latest_price(s))} for s in self.__params.keys()]
+
+    def account(self) -> dict:
+        with self.__lock:
+            balances = [{'asset': asset, 'free': f"{free:.8f}", 'locked': '0.00000000'}
+                        for asset, free in self.__balances.items()]
+
+        return {'makerCommission': 10, 'takerCommission': 10, 'canTrade': True,
+                'accountType': 'SPOT', 'balances': balances, 'permissions': ['SPOT']}
+
+    def order(self, params: Dict[str, str]) -> dict:
+        """以目前價格立即成交的市價單，回應格式同 newOrderRespType=FULL"""
+        symbol = params.get('symbol')
+        self.__check_symbol(symbol)
+        side = params.get('side')
+        if side not in ('BUY', 'SELL') or params.get('type') != 'MARKET':
+            raise FakeExchangeError(400, -1116, 'Invalid orderType.')
+
+        base = symbol[:-len(self.quote_asset)]
+        price = self.latest_price(symbol)
+        if 'quantity' in params:
+            qty = Decimal(params['quantity'])
+        elif 'quoteOrderQty' in params:
+            qty = Decimal(params['quoteOrderQty']) / price
+        else:
+            raise FakeExchangeError(400, -1102, "Mandatory parameter 'quantity' was not sent.")
+
+        qty = qty.quantize(QTY_STEP, rounding='ROUND_DOWN')
+        quote_qty = qty * price
+        if qty <= 0 or quote_qty < 5:
+            raise FakeExchangeError(400, -1013, 'Filter failure: NOTIONAL')
+
+        with self.__lock:
+            if side == 'BUY':
+                if self.__balances[self.quote_asset] < quote_qty:
+                    raise FakeExchangeError(400, -2010, 'Account has insufficient balance for requested action.')
+                commission, commission_asset = qty * COMMISSION_RATE, base
+                self.__balances[self.quote_asset] -= quote_qty
+                self.__balances[base] += qty - commission
+            else:
+                if self.__balances[base] < qty:
+                    raise FakeExchangeError(400, -2010, 'Account has insufficient balance for requested action.')
+                commission, commission_asset = quote_qty * COMMISSION_RATE, self.quote_asset
+                self.__balances[base] -= qty
+                self.__balances[self.quote_asset] += quote_qty - commission
+
+            order_id = self.__next_order_id
+            trade_id = self.__next_trade_id
+            self.__next_order_id += 1
+            self.__next_trade_id += 1
+
+        return {
+            'symbol': symbol, 'orderId': order_id, 'orderListId': -1,
+            'clientOrderId': params.get('newClientOrderId', f"fake{order_id}"),
+            'transactTime': self.now_ms(), 'price': '0.00000000',
+            'origQty': f"{qty:.8f}", 'executedQty': f"{qty:.8f}", 'cummulativeQuoteQty': f"{quote_qty:.8f}",
+            'status': 'FILLED', 'timeInForce': 'GTC', 'type': 'MARKET', 'side': side,
+            'fills': [{'price': f"{price:.8f}", 'qty': f"{qty:.8f}", 'commission': f"{commission:.8f}",
+                       'commissionAsset': commission_asset, 'tradeId': trade_id}],
+        }
+
+    def __check_symbol(self, symbol):
+        if symbol not in self.__params:
+            raise FakeExchangeError(400, -1121, 'Invalid symbol.')
+
+
+class FakeBinanceServer:
+    """
+    於背景執行緒提供幣安 REST API 的替身 (exchangeInfo、klines、ticker/price、account、order)
+    可加入延遲、隨機錯誤與 request weight header，用於壓力測試與整合測試，不需要網路
+    簽章不做驗證
+    """
+
+    def __init__(
+        self,
+        market: FakeBinanceMarket,
+        host: str = '127.0.0.1',
+        port: int = 0,
+        latency_seconds: float = 0,
+        latency_jitter_seconds: float = 0,
+        error_rate: float = 0,
+        weight_limit_per_minute: int = 6000,
+        seed: int = 0,
+    ):
+        """
+        latency_seconds, latency_jitter_seconds: 每個請求延遲 latency ± jitter 秒
+        error_rate: 以此機率回應 HTTP 503
+        weight_limit_per_minute: 每分鐘的權重超過此值時回應 HTTP 429 與 Retry-After
+        """
+        self.market = market
+        self.host = host
+        self.port = port
+        self.latency_seconds = latency_seconds
+        self.latency_jitter_seconds = latency_jitter_seconds
+        self.error_rate = error_rate
+        self.weight_limit_per_minute = weight_limit_per_minute
+
+        self.__rng = random.Random(seed)
+        self.__lock = threading.Lock()
+        self.__window_start = None
+        self.__used_weight = 0
+        self.request_counts: Dict[str, int] = dict()
+
+        self.__server = None
+        self.__thread = None
+
+    @property
+    def base_url(self) -> str:
+        return f"http://{self.host}:{self.port}"
+
+    def start(self) -> None:
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def do_GET(self):
+                fake._handle(self, 'GET')
+
+            def do_POST(self):
+                fake._handle(self, 'POST')
+
+            def log_message(self, format, *args):
+                _log.debug(format % args)
+
+        self.__server = ThreadingHTTPServer((self.host, self.port), Handler)
+        self.__server.daemon_threads = True
+        # port 指定 0 時由系統分配
+        self.port = self.__server.server_address[1]
+        self.__thread = threading.Thread(
+            target=self.__server.serve_forever, name="fake-binance", daemon=True)
+        self.__thread.start()
+        _log.info(f"Fake Binance REST API serving {len(self.market.symbols)} symbols on {self.base_url}")
+
+    def stop(self) -> None:
+        if self.__server is None:
+            return
+
+        self.__server.shutdown()
+        self.__server.server_close()
+        self.__thread.join(timeout=5)
+        self.__server = None
+        self.__thread = None
+
+    def _handle(self, handler: BaseHTTPRequestHandler, method: str) -> None:
+        url = urlsplit(handler.path)
+        query = url.query
+        length = int(handler.headers.get('Content-Length') or 0)
+        if length:
+            body = handler.rfile.read(length).decode('utf-8')
+            query = f"{query}&{body}" if query else body
+        params = {k: v[-1] for k, v in parse_qs(query).items()}
+
+        with self.__lock:
+            self.request_counts[url.path] = self.request_counts.get(url.path, 0) + 1
+            used_weight, over_limit = self.__add_weight(request_weight(method, url.path, url.query))
+            delay = self.latency_seconds + self.__rng.uniform(-1, 1) * self.latency_jitter_seconds
+            inject_error = self.__rng.random() < self.error_rate
+
+        if delay > 0:
+            time.sleep(delay)
+
+        headers = {USED_WEIGHT_HEADER: str(used_weight)}
+        if over_limit:
+            headers['Retry-After'] = str(WEIGHT_WINDOW_SECONDS - int(time.time()) % WEIGHT_WINDOW_SECONDS)
+            self.__reply(handler, 429, {'code': -1003, 'msg': 'Too many requests.'}, headers)
+            return
+
+        if inject_error:
+            self.__reply(handler, 503, {'code': -1001, 'msg': 'Internal error; unable to process your request.'},
+                         headers)
+            return
+
+        try:
+            status, payload = 200, self.__route(method, url.path, params)
+        except FakeExchangeError as e:
+            status, payload = e.status, {'code': e.code, 'msg': e.msg}
+        except Exception:
+            _log.exception(f"Fake Binance failed to handle {method} {handler.path}")
+            status, payload = 500, {'code': -1000, 'msg': 'An unknown error occurred.'}
+
+        self.__reply(handler, status, payload, headers)
+
+    def __route(self, method: str, path: str, params: Dict[str, str]):
+        market = self.market
+        if method == 'GET':
+            if path == '/api/v3/ping':
+                return {}
+            elif path == '/api/v3/time':
+                return {'serverTime': market.now_ms()}
+            elif path == '/api/v3/exchangeInfo':
+                return market.exchange_info()
+            elif path == '/api/v3/klines':
+                return market.klines(
+                    params.get('symbol'), params.get('interval'), int(params.get('limit', 500)),
+                    int(params['startTime']) if 'startTime' in params else None,
+                    int(params['endTime']) if 'endTime' in params else None)
+            elif path == '/api/v3/ticker/price':
+                return market.ticker_prices(params.get('symbol'))
+            elif path == '/api/v3/account':
+                return market.account()
+        elif method == 'POST' and path == '/api/v3/order':
+            return market.order(params)
+
+        raise FakeExchangeError(404, -1000, f"Unsupported endpoint {method} {path}")
+
+    def __add_weight(self, weight: int):
+        now = time.time()
+        window_start = now - now % WEIGHT_WINDOW_SECONDS
+        if window_start != self.__window_start:
+            self.__window_start = window_start
+            self.__used_weight = 0
+
+        self.__used_weight += weight
+        return (self.__used_weight, self.__used_weight > self.weight_limit_per_minute)
+
+    def __reply(self, handler: BaseHTTPRequestHandler, status: int, payload, headers: Dict[str, str]) -> None:
+        body = json.dumps(payload).encode('utf-8')
+        handler.send_response(status)
+        handler.send_header('Content-Type', 'application/json;charset=UTF-8')
+        handler.send_header('Content-Length', str(len(body)))
+        for key, value in headers.items():
+            handler.send_header(key, value)
+        handler.end_headers()
+        handler.wfile.write(body)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Offline stand-in for the Binance REST API, set binance_base_url to the printed URL')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8900)
+    parser.add_argument('--symbols', type=int, default=50, help='number of synthetic symbols')
+    parser.add_argument('--quote-asset', default='USDT')
+    parser.add_argument('--initial-cash', default='10000')
+    parser.add_argument('--latency-ms', type=float, default=0)
+    parser.add_argument('--latency-jitter-ms', type=float, default=0)
+    parser.add_argument('--error-rate', type=float, default=0, help='fraction of requests answered with 503')
+    parser.add_argument('--weight-limit', type=int, default=6000)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    market = FakeBinanceMarket(
+        symbol_count=args.symbols, quote_asset=args.quote_asset,
+        initial_cash=Decimal(args.initial_cash), seed=args.seed)
+    server = FakeBinanceServer(
+        market, host=args.host, port=args.port,
+        latency_seconds=args.latency_ms / 1000, latency_jitter_seconds=args.latency_jitter_ms / 1000,
+        error_rate=args.error_rate, weight_limit_per_minute=args.weight_limit, seed=args.seed)
+    server.start()
+    print(f"Fake Binance REST API on {server.base_url}, Ctrl+C to stop")
+
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.stop()
+
+
+if __name__ == '__main__':
+    main()
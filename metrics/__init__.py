@@ -0,0 +1,2 @@
+from .registry import *
+from .prometheus_exporter import *
@@ -0,0 +1,107 @@
+import logging.config
+import math
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from .registry import *
+
+_log = logging.getLogger(__name__)
+
+__all__ = ['to_prometheus_text', 'MetricsHTTPServer']
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+def _escape(value: str) -> str:
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(labels: dict) -> str:
+    if not labels:
+        return ''
+
+    return '{' + ','.join(f'{k}="{_escape(v)}"' for k, v in sorted(labels.items())) + '}'
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return '+Inf' if value > 0 else '-Inf'
+
+    return repr(float(value))
+
+
+def to_prometheus_text(registry: MetricsRegistry = REGISTRY) -> str:
+    """將 registry 內全部 metrics 轉為 Prometheus text exposition format"""
+    lines = []
+    for metric in registry.metrics():
+        metric_type = MetricsRegistry.metric_type(metric)
+        lines.append(f'# HELP {metric.name} {_escape(metric.help)}')
+        lines.append(f'# TYPE {metric.name} {metric_type}')
+
+        for labels, value in metric.samples():
+            if metric_type != 'histogram':
+                lines.append(f'{metric.name}{_format_labels(labels)} {_format_value(value)}')
+                continue
+
+            for upper, cumulative in value['buckets']:
+                bucket_labels = dict(labels, le=_format_value(upper))
+                lines.append(f'{metric.name}_bucket{_format_labels(bucket_labels)} {cumulative}')
+            lines.append(f'{metric.name}_sum{_format_labels(labels)} {_format_value(value["sum"])}')
+            lines.append(f'{metric.name}_count{_format_labels(labels)} {value["count"]}')
+
+    return '\n'.join(lines) + '\n'
+
+
+class MetricsHTTPServer:
+    """於背景執行緒提供 GET /metrics 的 HTTP server"""
+
+    def __init__(self, host: str = '127.0.0.1', port: int = 9108, registry: MetricsRegistry = REGISTRY):
+        self.host = host
+        self.port = port
+        self.__registry = registry
+        self.__server = None
+        self.__thread = None
+
+    def start(self) -> None:
+        registry = self.__registry
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split('?')[0] != '/metrics':
+                    self.send_error(404)
+                    return
+
+                try:
+                    body = to_prometheus_text(registry).encode('utf-8')
+                except Exception:
+                    _log.exception("Failed to render metrics")
+                    self.send_error(500)
+                    return
+
+                self.send_response(200)
+                self.send_header('Content-Type', CONTENT_TYPE)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                _log.debug(format % args)
+
+        self.__server = ThreadingHTTPServer((self.host, self.port), Handler)
+        self.__server.daemon_threads = True
+        # port 指定 0 時由系統分配
+        self.port = self.__server.server_address[1]
+        self.__thread = threading.Thread(
+            target=self.__server.serve_forever, name="metrics-http", daemon=True)
+        self.__thread.start()
+        _log.info(f"Serving metrics on http://{self.host}:{self.port}/metrics")
+
+    def stop(self) -> None:
+        if self.__server is None:
+            return
+
+        self.__server.shutdown()
+        self.__server.server_close()
+        self.__thread.join(timeout=5)
+        self.__server = None
+        self.__thread = None
@@ -0,0 +1,283 @@
+import bisect
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, List, Tuple
+
+__all__ = ['Counter', 'Gauge', 'Histogram', 'PhaseTimer', 'MetricsRegistry', 'REGISTRY', 'DEFAULT_LATENCY_BUCKETS']
+
+# 延遲 histogram 預設的 bucket 上界 (秒)
+DEFAULT_LATENCY_BUCKETS = (
+    0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+
+def _label_key(labels: Dict[str, str]) -> Tuple:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+class Counter:
+    """只會增加的計數器，可依 labels 分開計數"""
+
+    def __init__(self, name: str, help: str):
+        self.name = name
+        self.help = help
+        self.__values: Dict[Tuple, float] = dict()
+        self.__lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = _label_key(labels)
+        with self.__lock:
+            self.__values[key] = self.__values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        with self.__lock:
+            return self.__values.get(_label_key(labels), 0)
+
+    def samples(self) -> List[Tuple[Dict[str, str], float]]:
+        """回傳 [(labels, 值)]"""
+        with self.__lock:
+            return [(dict(k), v) for k, v in self.__values.items()]
+
+    def reset(self) -> None:
+        with self.__lock:
+            self.__values.clear()
+
+
+class Gauge:
+    """可增可減的數值，可直接設定，或指定 callback 在讀取時取值"""
+
+    def __init__(self, name: str, help: str):
+        self.name = name
+        self.help = help
+        self.__values: Dict[Tuple, float] = dict()
+        self.__functions: Dict[Tuple, object] = dict()
+        self.__lock = threading.Lock()
+
+    def set(self, value: float, **labels) -> None:
+        with self.__lock:
+            self.__values[_label_key(labels)] = float(value)
+
+    def set_function(self, function, **labels) -> None:
+        """讀取時呼叫 function() 取得 labels 目前的值，function 為 None 表示取消"""
+        key = _label_key(labels)
+        with self.__lock:
+            if function is None:
+                self.__functions.pop(key, None)
+            else:
+                self.__functions[key] = function
+
+    def value(self, **labels) -> float:
+        return dict((_label_key(l), v) for l, v in self.samples()).get(_label_key(labels), 0)
+
+    def samples(self) -> List[Tuple[Dict[str, str], float]]:
+        """回傳 [(labels, 值)]"""
+        with self.__lock:
+            values = dict(self.__values)
+            functions = dict(self.__functions)
+
+        for key, function in functions.items():
+            values[key] = float(function())
+
+        return [(dict(k), v) for k, v in values.items()]
+
+    def reset(self) -> None:
+        with self.__lock:
+            self.__values.clear()
+            self.__functions.clear()
+
+
+class Histogram:
+    """固定 bucket 的 histogram，記錄次數、總和與各 bucket 的數量，可依 labels 分開記錄"""
+
+    def __init__(self, name: str, help: str, buckets=DEFAULT_LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.buckets = tuple(sorted(buckets))
+        # labels -> [各 bucket 數量 (最後一個為 +Inf), 次數, 總和]
+        self.__values: Dict[Tuple, list] = dict()
+        self.__lock = threading.Lock()
+
+    def observe(self, value: float, **labels) -> None:
+        key = _label_key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self.__lock:
+            entry = self.__values.get(key)
+            if entry is None:
+                entry = [[0] * (len(self.buckets) + 1), 0, 0.0]
+                self.__values[key] = entry
+
+            entry[0][index] += 1
+            entry[1] += 1
+            entry[2] += value
+
+    @contextmanager
+    def time(self, **labels):
+        """以 with 量測區塊執行的秒數"""
+        tic = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - tic, **labels)
+
+    def count(self, **labels) -> int:
+        with self.__lock:
+            entry = self.__values.get(_label_key(labels))
+            return 0 if entry is None else entry[1]
+
+    def sum(self, **labels) -> float:
+        with self.__lock:
+            entry = self.__values.get(_label_key(labels))
+            return 0.0 if entry is None else entry[2]
+
+    def quantile(self, q: float, **labels) -> float:
+        """以 bucket 上界估計分位數，沒有資料時回傳 None"""
+        with self.__lock:
+            entry = self.__values.get(_label_key(labels))
+            if entry is None or entry[1] == 0:
+                return None
+            bucket_counts = list(entry[0])
+            total = entry[1]
+
+        target = q * total
+        cumulative = 0
+        for upper, n in zip(self.buckets + (float('inf'),), bucket_counts):
+            cumulative += n
+            if cumulative >= target:
+                return upper
+
+        return float('inf')
+
+    def samples(self) -> List[Tuple[Dict[str, str], Dict]]:
+        """回傳 [(labels, {'buckets': [(上界, 累計數量)], 'count', 'sum'})]"""
+        with self.__lock:
+            items = [(k, list(v[0]), v[1], v[2]) for k, v in self.__values.items()]
+
+        result = []
+        for key, bucket_counts, count, total in items:
+            cumulative = 0
+            buckets = []
+            for upper, n in zip(self.buckets + (float('inf'),), bucket_counts):
+                cumulative += n
+                buckets.append((upper, cumulative))
+            result.append((dict(key), {'buckets': buckets, 'count': count, 'sum': total}))
+
+        return result
+
+    def reset(self) -> None:
+        with self.__lock:
+            self.__values.clear()
+
+
+class MetricsRegistry:
+    """程式內共用的 metrics，以名稱取得 (不存在時建立) counter 與 histogram"""
+
+    def __init__(self):
+        self.__metrics = dict()
+        self.__lock = threading.Lock()
+
+    def counter(self, name: str, help: str = "") -> Counter:
+        return self.__get_or_create(name, Counter, help)
+
+    def gauge(self, name: str, help: str = "") -> Gauge:
+        return self.__get_or_create(name, Gauge, help)
+
+    def histogram(self, name: str, help: str = "", buckets=DEFAULT_LATENCY_BUCKETS) -> Histogram:
+        return self.__get_or_create(name, Histogram, help, buckets)
+
+    def get(self, name: str):
+        """取得已註冊的 metric，不存在時回傳 None"""
+        with self.__lock:
+            return self.__metrics.get(name)
+
+    def metrics(self) -> list:
+        with self.__lock:
+            return list(self.__metrics.values())
+
+    def snapshot(self) -> Dict[str, Dict]:
+        """全部 metrics 目前的值，可直接轉成 JSON 輸出"""
+        snapshot = dict()
+        for metric in self.metrics():
+            snapshot[metric.name] = {
+                'type': MetricsRegistry.metric_type(metric),
+                'help': metric.help,
+                'samples': [{'labels': labels, 'value': value} for labels, value in metric.samples()],
+            }
+
+        return snapshot
+
+    def metric_type(metric) -> str:
+        if isinstance(metric, Counter):
+            return 'counter'
+        elif isinstance(metric, Gauge):
+            return 'gauge'
+        return 'histogram'
+
+    def export_json(self, path: str) -> None:
+        """將 snapshot() 寫入 JSON 檔，先寫暫存檔再取代，讀取端不會讀到寫一半的檔案"""
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w') as outfile:
+            json.dump(self.snapshot(), outfile)
+        os.replace(tmp_path, path)
+
+    def reset(self) -> None:
+        """清空全部 metrics 的值 (測試用)"""
+        for metric in self.metrics():
+            metric.reset()
+
+    def __get_or_create(self, name, metric_class, *args):
+        with self.__lock:
+            metric = self.__metrics.get(name)
+            if metric is None:
+                metric = metric_class(name, *args)
+                self.__metrics[name] = metric
+            elif not isinstance(metric, metric_class):
+                raise ValueError(f"Metric {name} is already registered as {type(metric).__name__}")
+
+            return metric
+
+
+# 程式內預設共用的 registry
+REGISTRY = MetricsRegistry()
+
+
+class PhaseTimer:
+    """
+    累計一輪內各階段的耗時：每次量測都記入 symbol_histogram (有指定 symbol 時)，
+    finish() 時再把每個階段的總耗時記入 round_histogram
+    多個執行緒可同時使用
+    """
+
+    def __init__(self, round_histogram: Histogram, symbol_histogram: Histogram = None, labels: Dict[str, str] = None):
+        """labels: 每次記錄都附加的 label (e.g., account)"""
+        self.__round_histogram = round_histogram
+        self.__symbol_histogram = symbol_histogram
+        self.__labels = labels if labels is not None else dict()
+        self.__durations: Dict[str, float] = dict()
+        self.__lock = threading.Lock()
+
+    @contextmanager
+    def phase(self, name: str, symbol: str = None):
+        tic = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - tic, symbol)
+
+    def add(self, name: str, seconds: float, symbol: str = None) -> None:
+        if symbol is not None and self.__symbol_histogram is not None:
+            self.__symbol_histogram.observe(seconds, phase=name, symbol=symbol, **self.__labels)
+
+        with self.__lock:
+            self.__durations[name] = self.__durations.get(name, 0.0) + seconds
+
+    def finish(self) -> Dict[str, float]:
+        """記錄並回傳各階段在這一輪的總耗時"""
+        with self.__lock:
+            durations = dict(self.__durations)
+
+        for name, seconds in durations.items():
+            self.__round_histogram.observe(seconds, phase=name, **self.__labels)
+
+        return durations
@@ -0,0 +1,154 @@
+import __init__
+import argparse
+import logging.config
+import os
+import threading
+import time
+from typing import List
+
+from bot_env_config.config import Config
+from exchange_api_wrappers.crypto import Crypto, MarketData
+from metrics import MetricsHTTPServer, REGISTRY
+
+_log = logging.getLogger(__name__)
+
+# 共用行情資料層的 request weight 與 K 線下載統計，每隔此秒數取得一次，以 account="host" 回報
+STATS_REPORT_SECONDS = 60
+HOST_ACCOUNT_LABEL = 'host'
+
+_request_weight = REGISTRY.gauge(
+    'multi_account_host_request_weight', 'Binance request weight used by all accounts in the last report interval')
+_exchange_used_weight = REGISTRY.gauge(
+    'exchange_used_weight_1m', 'Request weight used this minute as reported by Binance')
+_kline_requests_shared = REGISTRY.counter(
+    'multi_account_host_kline_requests_shared_total', 'K line requests served by another account\'s download')
+
+# 各帳號的倉位紀錄、mock trading 餘額的預設目錄 (相對於該帳號的設定檔目錄)
+DEFAULT_DATA_DIRS = {
+    'asset_positions_dir': 'asset-positions',
+    'mock_trading_dir': 'mock-trading',
+}
+
+
+def load_account_configs(config_dirs: List[str]) -> List[Config]:
+    """
+    讀取每個帳號的設定檔目錄，帳號名稱為目錄名稱
+    未設定資料目錄的帳號使用設定檔目錄下的子目錄，不同帳號的資料目錄不可重複
+    """
+    configs = []
+    used_dirs = dict()
+    for config_dir in config_dirs:
+        config = Config(config_dir)
+        account_name = os.path.basename(config.config_dir)
+
+        if config.position_manage.get('trade_loop_engine', 'sync') != 'sync':
+            # asyncio 引擎的 AsyncClient 掛在共用的 K 線 wrapper 上，無法由多個帳號同時使用
+            raise ValueError(f"Account {account_name}: multi-account host requires trade_loop_engine sync")
+
+        for key, default_dir in DEFAULT_DATA_DIRS.items():
+            if not config.position_manage.get(key):
+                config.position_manage[key] = default_dir
+
+            data_dir = config.get_data_dir(key)
+            if data_dir in used_dirs:
+                raise ValueError(
+                    f"Account {account_name}: {key} {data_dir} is already used by account {used_dirs[data_dir]}")
+            used_dirs[data_dir] = account_name
+
+        configs.append(config)
+
+    names = [os.path.basename(c.config_dir) for c in configs]
+    if len(set(names)) != len(names):
+        raise ValueError(f"Account config directories must have distinct names: {names}")
+
+    return configs
+
+
+def report_market_data_stats(market_data: MarketData):
+    """取得並歸零共用行情資料層自上次回報後的 request weight 與 K 線下載統計 (各帳號的迴圈不會取得)"""
+    weight_stats = market_data.pop_request_weight_stats()
+    if weight_stats is not None:
+        _request_weight.set(weight_stats['weight'], account=HOST_ACCOUNT_LABEL)
+        if weight_stats['server_used_weight'] is not None:
+            _exchange_used_weight.set(weight_stats['server_used_weight'], account=HOST_ACCOUNT_LABEL)
+        _log.info(
+            f"Request weight of all accounts: {weight_stats['weight']} in {weight_stats['requests']} requests"
+            f", waited {weight_stats['waited_seconds']:0.2f} seconds for budget"
+            f", Binance reported {weight_stats['server_used_weight']}/{weight_stats['budget']} used this minute")
+
+    kline_stats = market_data.pop_kline_fetch_stats()
+    if kline_stats is not None:
+        _kline_requests_shared.inc(kline_stats['shared'], account=HOST_ACCOUNT_LABEL)
+        _log.info(
+            f"K lines downloaded: {kline_stats['fetched']}, saved by incremental fetch: {kline_stats['saved']}"
+            f", requests served by another account's download: {kline_stats['shared']}")
+
+
+def run_account(config: Config, market_data):
+    """帳號 thread 的進入點，結束時 (包括發生例外) 讓其他帳號一起停止"""
+    # 延後 import，trade_loop 在 import 時會註冊 signal handler
+    import trade_loop
+
+    account_name = os.path.basename(config.config_dir)
+    try:
+        runner = trade_loop.TradeLoopRunner(
+            config, market_data=market_data, account_name=account_name, serve_metrics=False)
+        runner.start_loop()
+    except:
+        _log.exception(f"Account {account_name} stopped with an exception")
+    finally:
+        trade_loop.request_stop_all()
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Run several accounts in one process, sharing klines, prices and exchangeInfo')
+    parser.add_argument('config_dirs', nargs='+', help='config directory of each account')
+    parser.add_argument('--metrics-host', default='127.0.0.1')
+    parser.add_argument('--metrics-port', type=int, default=0,
+                        help='serve metrics of all accounts on this port, 0 disables the server')
+    args = parser.parse_args()
+
+    # 先 import，讓 signal handler 在 main thread 註冊
+    import trade_loop
+
+    configs = load_account_configs(args.config_dirs)
+
+    # 行情資料只需要公開 API，使用第一個帳號的設定建立
+    market_data = Crypto.create_market_data(configs[0], shared=True)
+
+    metrics_server = None
+    if args.metrics_port:
+        metrics_server = MetricsHTTPServer(host=args.metrics_host, port=args.metrics_port)
+        metrics_server.start()
+
+    try:
+        accounts = [
+            threading.Thread(
+                target=run_account,
+                args=(config, market_data),
+                name=os.path.basename(config.config_dir))
+            for config in configs
+        ]
+        for account in accounts:
+            account.start()
+
+        last_report = time.monotonic()
+        for account in accounts:
+            while account.is_alive():
+                account.join(timeout=1)
+                if time.monotonic() - last_report >= STATS_REPORT_SECONDS:
+                    report_market_data_stats(market_data)
+                    last_report = time.monotonic()
+    finally:
+        report_market_data_stats(market_data)
+        market_data.stop_kline_streams()
+        if metrics_server is not None:
+            metrics_server.stop()
+        trade_loop.request_stop_all()
+
+
+if __name__ == '__main__':
+    _log.info("Multi-account host started")
+    main()
+    _log.debug("Multi-account host exited")
@@ -0,0 +1,242 @@
+import copy
+import hashlib
+import logging.config
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+from typing import Dict, List
+
+from binance.enums import *
+
+import asset_record_platforms.position as position
+import send_order
+from send_order import OrderResult, OrderStatus, _orders
+from metrics import REGISTRY
+
+_log = logging.getLogger(__name__)
+
+_fills = REGISTRY.counter(
+    'order_manager_fills_total', 'Fills applied to positions, by source (order response or executionReport)')
+
+# 不會再有成交的訂單狀態
+FINAL_STATUSES = {'FILLED', 'CANCELED', 'EXPIRED', 'EXPIRED_IN_MATCH', 'REJECTED'}
+
+# 幣安 newClientOrderId 的長度上限
+MAX_CLIENT_ORDER_ID_LENGTH = 36
+
+
+def make_client_order_id(round_id: str, trade_symbol: str, side: str) -> str:
+    """
+    由這一輪的 round_id、交易對與買賣方向決定 newClientOrderId
+    同一輪同一交易對、同方向重送時編號相同，交易所會拒絕重複的訂單
+    """
+    client_order_id = f"cb{round_id}{side[0]}{trade_symbol}"
+    if len(client_order_id) > MAX_CLIENT_ORDER_ID_LENGTH:
+        digest = hashlib.sha1(client_order_id.encode()).hexdigest()
+        client_order_id = "cb" + digest[:MAX_CLIENT_ORDER_ID_LENGTH - 2]
+
+    return client_order_id
+
+
+class OrderHandle:
+    """OrderManager 送出的一張訂單，成交會逐筆記入 asset_position"""
+
+    def __init__(
+        self,
+        client_order_id: str,
+        side: str,
+        trade_symbol: str,
+        base_asset: str,
+        quantity: str,
+        asset_position: position.Position,
+        round_id: str,
+        estimated_cost: Decimal = None,
+    ):
+        self.client_order_id = client_order_id
+        self.side = side
+        self.trade_symbol = trade_symbol
+        self.base_asset = base_asset
+        self.quantity = quantity
+        self.asset_position = asset_position
+        self.round_id = round_id
+        # 買單送出時預估的成交額，送出到成交之間先從可用現金扣除
+        self.estimated_cost = estimated_cost if estimated_cost is not None else Decimal('0')
+
+        self.status = 'PENDING_NEW'
+        self.executed_qty = Decimal('0')
+        self.transactions: List[position.Transaction] = list()
+        self.raw_response = None
+        self.api_error = False
+
+        self.trade_ids = set()
+        self.commission_to_cash_prices = dict()
+        self.__done = threading.Event()
+
+    def done(self) -> bool:
+        return self.__done.is_set()
+
+    def wait(self, timeout: float = None) -> bool:
+        """等待訂單不會再有成交，逾時回傳 False"""
+        return self.__done.wait(timeout)
+
+    def mark_done(self) -> None:
+        self.__done.set()
+
+    def to_order_result(self) -> OrderResult:
+        """
+        目前為止的成交轉成 OrderResult
+        有任何成交即為 OK (部份成交時 transactions 只含實際成交的數量)，沒有成交且送單失敗為 API_ERROR
+        """
+        if self.transactions:
+            ret = OrderResult(self.side, OrderStatus.OK)
+        elif self.api_error or self.status in FINAL_STATUSES:
+            ret = OrderResult(self.side, OrderStatus.API_ERROR)
+        else:
+            ret = OrderResult(self.side, OrderStatus.PENDING)
+
+        ret.transactions = [copy.deepcopy(tx) for tx in self.transactions]
+        ret.raw_response = self.raw_response
+        ret.handle = self
+        return ret
+
+
+class OrderManager:
+    """
+    於背景執行緒送出市價單並立即回傳 OrderHandle，呼叫端不需等待交易所回應
+    成交由訂單回應的 fills 與 user data stream 的 executionReport 記入倉位，以 tradeId 去除重複
+    部份成交、取消、過期的訂單只會記入實際成交的數量
+    """
+
+    def __init__(self, api_client, cash_asset: str, position_lock=None, max_workers: int = 4):
+        """
+        api_client: 送單用的 Crypto
+        cash_asset: 現金的資產名稱，用於換算手續費
+        position_lock: 修改倉位時持有的 lock，與交易迴圈檢查倉位時使用同一個
+        max_workers: 同時送單的執行緒數量
+        """
+        if max_workers < 1:
+            raise ValueError('max_workers must be at least 1')
+
+        self.__api_client = api_client
+        self.__cash_asset = cash_asset
+        self.__position_lock = position_lock if position_lock is not None else threading.Lock()
+        self.__executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="order")
+
+        # clientOrderId -> 尚未結束的訂單
+        self.__handles: Dict[str, OrderHandle] = dict()
+        self.__lock = threading.Lock()
+
+    def submit(
+        self,
+        side: str,
+        trade_symbol: str,
+        base_asset: str,
+        quantity: str,
+        asset_position: position.Position,
+        round_id: str,
+        estimated_cost: Decimal = None,
+    ) -> OrderHandle:
+        """送出市價單，不等待成交；同一個 clientOrderId 尚未結束時回傳原本的 handle"""
+        client_order_id = make_client_order_id(round_id, trade_symbol, side)
+        with self.__lock:
+            handle = self.__handles.get(client_order_id)
+            if handle is not None:
+                _log.warning(f"[{trade_symbol}] Order {client_order_id} is already in flight")
+                return handle
+
+            handle = OrderHandle(
+                client_order_id, side, trade_symbol, base_asset, quantity, asset_position, round_id, estimated_cost)
+            # 先登記再送單，executionReport 可能比訂單回應先到
+            self.__handles[client_order_id] = handle
+
+        _log.debug(f"[{trade_symbol}] Submitting {side} qty '{quantity}' as {client_order_id}")
+        self.__executor.submit(self.__send, handle)
+        return handle
+
+    def in_flight(self) -> List[OrderHandle]:
+        with self.__lock:
+            return list(self.__handles.values())
+
+    def on_execution_report(self, msg: dict) -> None:
+        """user data stream 的 executionReport，不是此物件送出的訂單會被忽略"""
+        with self.__lock:
+            handle = self.__handles.get(msg.get('c')) or self.__handles.get(msg.get('C'))
+
+        if handle is None:
+            return
+
+        if msg.get('x') == 'TRADE':
+            fill = {
+                'price': msg['L'],
+                'qty': msg['l'],
+                'commission': msg['n'] if msg.get('n') is not None else '0',
+                'commissionAsset': msg['N'] if msg.get('N') is not None else self.__cash_asset,
+                'tradeId': msg['t'],
+            }
+            self.__apply_fill(handle, fill, int(msg['i']), int(msg['T']), 'execution_report')
+
+        self.__update_status(handle, msg['X'])
+
+    def shutdown(self) -> None:
+        """等待送出中的訂單取得交易所回應"""
+        self.__executor.shutdown(wait=True)
+
+    def __send(self, handle: OrderHandle) -> None:
+        try:
+            order_ok, order = self.__api_client.order_qty(
+                side=handle.side,
+                quantity=handle.quantity,
+                symbol=handle.trade_symbol,
+                client_order_id=handle.client_order_id,
+            )
+        except Exception:
+            _log.exception(f"[{handle.trade_symbol}] Exception while sending {handle.side} order")
+            order_ok, order = False, None
+
+        _orders.inc(side=handle.side, result='ok' if order_ok else 'api_error')
+        if not order_ok:
+            _log.error(f"[{handle.trade_symbol}] Error while sending {handle.side} order {handle.client_order_id}")
+            handle.api_error = True
+            self.__finish(handle)
+            return
+
+        handle.raw_response = order
+        for fill in order.get('fills', []):
+            self.__apply_fill(handle, fill, order['orderId'], int(order['transactTime']), 'order_response')
+
+        self.__update_status(handle, order['status'])
+
+    def __apply_fill(self, handle: OrderHandle, fill: dict, order_id, transact_time: int, source: str) -> None:
+        with self.__lock:
+            if fill['tradeId'] in handle.trade_ids:
+                return
+            handle.trade_ids.add(fill['tradeId'])
+
+        transaction = send_order.fill_to_transaction(
+            self.__api_client, handle.base_asset, self.__cash_asset, handle.trade_symbol, handle.side,
+            order_id, transact_time, fill, handle.round_id, handle.commission_to_cash_prices)
+
+        with self.__position_lock:
+            handle.asset_position.add_transaction(transaction)
+        with self.__lock:
+            handle.transactions.append(copy.deepcopy(transaction))
+            handle.executed_qty += transaction.quantity
+        _fills.inc(source=source)
+
+    def __update_status(self, handle: OrderHandle, status: str) -> None:
+        with self.__lock:
+            if handle.done():
+                return
+            handle.status = status
+
+        if status in FINAL_STATUSES:
+            if status != 'FILLED':
+                _log.warning(
+                    f"[{handle.trade_symbol}] {handle.side} order {handle.client_order_id} ended as {status}"
+                    f", executed qty {handle.executed_qty.normalize():f} of {handle.quantity}")
+            self.__finish(handle)
+
+    def __finish(self, handle: OrderHandle) -> None:
+        with self.__lock:
+            self.__handles.pop(handle.client_order_id, None)
+        handle.mark_done()
@@ -49,21 +49,17 @@ class PortfolioCalculator:
         """Load all asset positions from files"""
         _log.info("Loading asset positions from files...")
         
-        # Get all position files
-        positions_dir = os.path.join(os.path.dirname(__file__), "asset-positions")
-        if not os.path.exists(positions_dir):
-            _log.warning(f"Positions directory not found: {positions_dir}")
-            return None
-        
-        position_files = [f for f in os.listdir(positions_dir) if f.endswith('.json')]
-        if not position_files:
-            _log.warning("No position files found")
+        # Get all assets with a position record (json files, journal or sqlite depending on config)
+        stored_assets = AssetPositions.stored_assets(
+            self.config.get_data_dir('asset_positions_dir'),
+            self.config.position_manage.get('asset_positions_storage', 'json'))
+        if not stored_assets:
+            _log.warning("No position records found")
             return None
         
         # Create watching symbols for all assets with positions
         watching_symbols = []
-        for filename in position_files:
-            asset_symbol = filename.replace('.json', '')
+        for asset_symbol in stored_assets:
             if asset_symbol != self.cash_currency:  # Skip cash currency
                 symbol = f"{asset_symbol}{self.cash_currency}"
                 watching_symbols.append(WatchingSymbol(symbol, asset_symbol, None))
@@ -73,7 +69,8 @@ class PortfolioCalculator:
             return None
         
         # Load positions using existing system
-        asset_positions = AssetPositions(watching_symbols, self.cash_currency)
+        asset_positions = AssetPositions.from_config(
+            self.config, watching_symbols, self.cash_currency, read_only=True)
         _log.info(f"Loaded positions for {len(asset_positions.positions)} assets")
         
         return asset_positions
@@ -85,7 +82,7 @@ class PortfolioCalculator:
         
         for symbol in symbols:
             try:
-                price_data = self.crypto_api.get_latest_price(symbol)
+                price_data = self.crypto_api.get_latest_price_cache_first(symbol)
                 prices[symbol] = Decimal(price_data['price'])
                 _log.debug(f"{symbol}: {prices[symbol]}")
             except Exception as e:
@@ -0,0 +1,140 @@
+import __init__
+import argparse
+import logging.config
+import os
+from datetime import datetime, timezone
+from decimal import Decimal
+
+from binance.helpers import interval_to_milliseconds
+
+from bot_env_config.config import Config
+from exchange_api_wrappers.crypto import Crypto
+from exchange_api_wrappers.recorded_market import record_market
+from simulated_clock import SimulatedClock
+
+_log = logging.getLogger(__name__)
+
+# 重播時組成「尚未收盤的 K 線」與報價所使用的最小週期
+DEFAULT_FINEST_INTERVAL = '1m'
+
+
+def parse_time(text: str) -> float:
+    """ISO 8601 時間 (未指定時區視為 UTC) 轉為 epoch 秒"""
+    parsed = datetime.fromisoformat(text)
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+
+    return parsed.timestamp()
+
+
+def get_watching_symbols(config: Config, crypto_or_klines):
+    """依 include_currencies / exclude_currencies 找出交易對，都未設定時為全部交易對"""
+    include = config.position_manage.get('include_currencies')
+    exclude = config.position_manage.get('exclude_currencies')
+    if include is None and exclude is None:
+        exclude = []
+
+    return crypto_or_klines.get_tradable_symbols(config.position_manage['cash_currency'], include, exclude)
+
+
+def record(config: Config, record_dir: str, start: float, end: float, finest_interval: str):
+    """下載 [start, end) 重播所需的行情，並往前多下載 analyzer 需要的 K 線數量"""
+    analyzer = config.spawn_analyzer()
+    market_data = Crypto.create_market_data(config)
+    symbols = get_watching_symbols(config, market_data.klines)
+
+    intervals = sorted({analyzer.kline_interval, finest_interval}, key=interval_to_milliseconds)
+    lookback_ms = interval_to_milliseconds(analyzer.kline_interval) * (analyzer.klines_limit + 1)
+    start_ms = int(start * 1000)
+
+    _log.info(f"Recording {len(symbols)} symbols, intervals {intervals} into {record_dir}")
+    record_market(
+        market_data.client, record_dir, [s.symbol for s in symbols], intervals,
+        start_ms - lookback_ms, int(end * 1000))
+
+
+def run(config: Config, record_dir: str, output_dir: str, start: float, end: float, speed: float):
+    """以模擬時間重播 record_dir 的行情，模擬交易的紀錄寫到 output_dir"""
+    # 延後 import，trade_loop 在 import 時會註冊 signal handler
+    import trade_loop
+
+    if config.position_manage.get('trade_loop_engine', 'sync') != 'sync':
+        raise ValueError('Replay requires trade_loop_engine sync')
+
+    # 只允許模擬交易，倉位紀錄也不可寫到正式的目錄
+    config.position_manage['trading_mode'] = 'mock_trading'
+    config.position_manage['kline_source'] = 'rest'
+    config.position_manage['kline_fetch_mode'] = 'full'
+    config.position_manage['enable_google_sheets'] = False
+    config.position_manage['asset_positions_dir'] = os.path.abspath(os.path.join(output_dir, 'asset-positions'))
+    config.position_manage['mock_trading_dir'] = os.path.abspath(os.path.join(output_dir, 'mock-trading'))
+    config.position_manage.pop('metrics_http_port', None)
+    config.bot = {}
+
+    if os.path.exists(os.path.join(config.position_manage['mock_trading_dir'], 'mock-record.json')):
+        _log.warning(f"{output_dir} contains a previous replay, continue from its balances and positions")
+
+    clock = SimulatedClock(start, end, speed)
+    crypto = Crypto.get_mock_trade_and_replay_klines(config, record_dir, clock)
+    runner = trade_loop.TradeLoopRunner(config, crypto=crypto, clock=clock, serve_metrics=False)
+    runner.start_loop()
+
+    log_summary(config, crypto)
+
+
+def log_summary(config: Config, crypto: Crypto):
+    """以重播結束時的報價計算模擬帳戶的總值"""
+    cash_currency = config.position_manage['cash_currency']
+    symbols = get_watching_symbols(config, crypto)
+    balances = crypto.get_equities_balance(symbols, cash_currency)
+
+    total = balances[cash_currency].free
+    for symbol_info in symbols:
+        balance = balances.get(symbol_info.base_asset)
+        if balance is None or balance.free == 0:
+            continue
+
+        price = Decimal(crypto.get_latest_price(symbol_info.symbol)['price'])
+        total += balance.free * price
+        _log.info(f"Replay summary: {symbol_info.base_asset} {balance.free} @ {price}")
+
+    _log.info(f"Replay summary: {cash_currency} {balances[cash_currency].free}, total value {total} {cash_currency}")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Record Binance market data, or replay it through the trade loop on a simulated clock')
+    parser.add_argument('--config-dir', default=None, help='config directory, defaults to user-config')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    record_parser = subparsers.add_parser('record', help='download K lines and exchangeInfo for a replay')
+    record_parser.add_argument('record_dir')
+    record_parser.add_argument('--start', required=True, help='ISO 8601 time, UTC if no offset is given')
+    record_parser.add_argument('--end', required=True)
+    record_parser.add_argument('--finest-interval', default=DEFAULT_FINEST_INTERVAL,
+                               help='interval used to build forming candles and prices during the replay')
+
+    run_parser = subparsers.add_parser('run', help='replay a recording with mock trading')
+    run_parser.add_argument('record_dir')
+    run_parser.add_argument('output_dir', help='positions and mock balances of the replay are written here')
+    run_parser.add_argument('--start', required=True)
+    run_parser.add_argument('--end', required=True)
+    run_parser.add_argument('--speed', type=float, default=0,
+                            help='multiple of real time, 0 runs as fast as possible')
+
+    args = parser.parse_args()
+    config = Config(args.config_dir)
+    start, end = parse_time(args.start), parse_time(args.end)
+    if start >= end:
+        raise ValueError('--start must be earlier than --end')
+
+    if args.command == 'record':
+        record(config, args.record_dir, start, end, args.finest_interval)
+    else:
+        run(config, args.record_dir, args.output_dir, start, end, args.speed)
+
+
+if __name__ == '__main__':
+    _log.info("Replay started")
+    main()
+    _log.debug("Replay exited")
@@ -0,0 +1,165 @@
+import logging.config
+import threading
+import time
+from decimal import Decimal
+from multiprocessing.managers import BaseManager
+from typing import Dict
+
+_log = logging.getLogger(__name__)
+
+
+class BuyReservation:
+    """RiskCoordinator 核准的買入額度"""
+
+    def __init__(self, reservation_id: int, asset: str, amount: Decimal):
+        self.reservation_id = reservation_id
+        self.asset = asset
+        self.amount = amount
+
+
+class RiskCoordinator:
+    """
+    多個 shard process 共用的現金與風險限制：
+    剩餘現金、max_open_positions、max_total_open_cost 只由此物件管理，
+    shard 送出買單前必須先取得買入額度 (reserve_buy)，送單後再回報實際花費 (commit_buy) 或取消 (release)
+    透過 multiprocessing manager 在 coordinator process 內執行，每個方法都在 lock 內完成
+    """
+
+    def __init__(
+        self,
+        free_cash: Decimal,
+        open_costs: Dict[str, Decimal],
+        max_open_positions: int = None,
+        max_total_open_cost: Decimal = None,
+    ):
+        """
+        free_cash: 啟動時交易所的剩餘現金
+        open_costs: 資產名稱 -> 目前持倉成本，只需包含有持倉的資產
+        max_open_positions: 最多開倉的貨幣數量，None 表示不限制
+        max_total_open_cost: 最大投入成本，None 表示不限制
+        """
+        self.__lock = threading.Lock()
+        self.__free_cash = Decimal(free_cash)
+        self.__open_costs = {k: Decimal(v) for k, v in open_costs.items() if Decimal(v) > 0}
+        self.__max_open_positions = max_open_positions
+        self.__max_total_open_cost = max_total_open_cost
+
+        self.__reservations: Dict[int, BuyReservation] = dict()
+        self.__next_reservation_id = 1
+        # 最後一次現金變動 (成交) 的時間，早於此時間取得的交易所餘額不採用
+        self.__last_cash_change = 0.0
+        self.__stop_requested = False
+
+    def reserve_buy(self, asset: str, max_fund: Decimal, min_fund: Decimal = Decimal('0')):
+        """
+        申請買入 asset 的額度，最多 max_fund
+        回傳 (BuyReservation 或 None, 拒絕原因)，原因為 None 表示核准
+        拒絕原因: 'max_open_positions'、'max_total_open_cost'、'insufficient_fund'、'pending'
+        """
+        with self.__lock:
+            if any(r.asset == asset for r in self.__reservations.values()):
+                return (None, 'pending')
+
+            is_new_position = asset not in self.__open_costs
+            if self.__max_open_positions is not None and is_new_position:
+                open_count = len(self.__open_costs) + len(
+                    {r.asset for r in self.__reservations.values()} - self.__open_costs.keys())
+                if open_count >= self.__max_open_positions:
+                    return (None, 'max_open_positions')
+
+            if self.__max_total_open_cost is not None:
+                total_open_cost = sum(self.__open_costs.values(), Decimal('0')) + sum(
+                    (r.amount for r in self.__reservations.values()), Decimal('0'))
+                if total_open_cost >= self.__max_total_open_cost:
+                    return (None, 'max_total_open_cost')
+
+            amount = self.__free_cash.min(Decimal(max_fund))
+            if amount <= 0 or amount < min_fund:
+                return (None, 'insufficient_fund')
+
+            reservation = BuyReservation(self.__next_reservation_id, asset, amount)
+            self.__next_reservation_id += 1
+            self.__reservations[reservation.reservation_id] = reservation
+            self.__free_cash -= amount
+            return (reservation, None)
+
+    def commit_buy(self, reservation_id: int, cash_spent: Decimal, open_cost: Decimal) -> None:
+        """
+        回報買單結果：退回額度中沒有花掉的現金，並更新資產的持倉成本
+        cash_spent: 實際花費的現金 (含以現金支付的手續費)
+        open_cost: 成交後該資產的持倉成本
+        """
+        with self.__lock:
+            reservation = self.__reservations.pop(reservation_id, None)
+            if reservation is None:
+                _log.warning(f"Unknown buy reservation {reservation_id}")
+                return
+
+            self.__free_cash += reservation.amount - Decimal(cash_spent)
+            self.__set_open_cost(reservation.asset, Decimal(open_cost))
+            self.__last_cash_change = time.time()
+
+    def release(self, reservation_id: int) -> None:
+        """沒有成交，取消額度"""
+        with self.__lock:
+            reservation = self.__reservations.pop(reservation_id, None)
+            if reservation is not None:
+                self.__free_cash += reservation.amount
+
+    def record_sell(self, asset: str, cash_received: Decimal, open_cost: Decimal) -> None:
+        """
+        回報賣單結果
+        cash_received: 實際收到的現金 (已扣除以現金支付的手續費)
+        open_cost: 成交後該資產的持倉成本
+        """
+        with self.__lock:
+            self.__free_cash += Decimal(cash_received)
+            self.__set_open_cost(asset, Decimal(open_cost))
+            self.__last_cash_change = time.time()
+
+    def sync_free_cash(self, exchange_free_cash: Decimal, fetched_at: float) -> bool:
+        """
+        以交易所的餘額校正剩餘現金 (扣除尚未結算的額度)
+        fetched_at 早於最後一次成交時，餘額可能尚未反映該筆成交，不採用並回傳 False
+        """
+        with self.__lock:
+            if fetched_at < self.__last_cash_change:
+                return False
+
+            reserved = sum((r.amount for r in self.__reservations.values()), Decimal('0'))
+            self.__free_cash = Decimal(exchange_free_cash) - reserved
+            return True
+
+    def get_free_cash(self) -> Decimal:
+        with self.__lock:
+            return self.__free_cash
+
+    def request_stop(self) -> None:
+        """任一 shard 偵測到停止檔時呼叫，讓全部 shard 停止"""
+        self.__stop_requested = True
+
+    def is_stop_requested(self) -> bool:
+        return self.__stop_requested
+
+    def snapshot(self) -> dict:
+        with self.__lock:
+            return {
+                'free_cash': self.__free_cash,
+                'open_positions': len(self.__open_costs),
+                'total_open_cost': sum(self.__open_costs.values(), Decimal('0')),
+                'pending_reservations': len(self.__reservations),
+            }
+
+    def __set_open_cost(self, asset: str, open_cost: Decimal) -> None:
+        if open_cost > 0:
+            self.__open_costs[asset] = open_cost
+        else:
+            self.__open_costs.pop(asset, None)
+
+
+class RiskCoordinatorManager(BaseManager):
+    """在獨立 process 內執行 RiskCoordinator，回傳的 proxy 可傳給 shard process 使用"""
+    pass
+
+
+RiskCoordinatorManager.register('RiskCoordinator', RiskCoordinator)
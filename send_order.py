@@ -7,15 +7,23 @@ from binance.enums import *
 import exchange_api_wrappers.crypto as crypto
 from exchange_api_wrappers.wrapped_data import *
 import asset_record_platforms.position as position
+from metrics import REGISTRY
 
 _log = logging.getLogger(__name__)
 
+_order_phase_seconds = REGISTRY.histogram(
+    'send_order_phase_seconds', 'Time spent in each phase of sending an order')
+_orders = REGISTRY.counter(
+    'send_order_orders_total', 'Orders sent to the exchange, by side and result')
+
 class OrderStatus(Enum):
     OK = 0
     API_ERROR = 1
     ALREADY_OPEN = 2
     NO_POSITION = 3
     INSUFFICIENT_FUND = 4
+    # 已交給 OrderManager 送出，成交結果由 OrderResult.handle 取得
+    PENDING = 5
 
 
 class OrderResult:
@@ -28,6 +36,8 @@ class OrderResult:
         self.status = status
         self.transactions = list()
         self.raw_response = None
+        # status 為 PENDING 時的 order_manager.OrderHandle
+        self.handle = None
 
 
 def execute_buy_order(
@@ -39,7 +49,8 @@ def execute_buy_order(
     asset_position: position.Position,
     symbol_info: WatchingSymbol,
     round_id: str,
-    position_accumulation_strategy: str = "hold_until_sell"
+    position_accumulation_strategy: str = "hold_until_sell",
+    order_manager=None
 ) -> OrderResult:
     """
     執行買入訂單：限制單次最多買入金額，適用於DCA和傳統策略
@@ -51,6 +62,7 @@ def execute_buy_order(
     asset_position: 某一幣種目前倉位的結構
     symbol_info: 交易對在交易所內的交易情況、交易限制等資訊
     position_accumulation_strategy: 位置累積策略
+    order_manager: 若有指定，交給 order_manager.OrderManager 送單，不等待成交，回傳 PENDING
     """
 
     _log.debug(f"[{trade_symbol}] Entering buy process")
@@ -64,31 +76,26 @@ def execute_buy_order(
         _log.info(
             f"[{trade_symbol}] Adding to existing {base_asset} position (qty {open_quantity.normalize():f}) using accumulate strategy")
 
-    symbol_filters = symbol_info.info['filters']
-    filters_dict = dict()
-    for f in symbol_filters:
-        filters_dict[f['filterType']] = f
+    symbol_filters = symbol_info.filters
 
     # 先檢查資金是否滿足最小成交額需求
-    notional_dict = filters_dict['NOTIONAL']
-    # print(f"NOTIONAL dict: {notional_dict}")
-    min_notional = Decimal(notional_dict['minNotional'])
+    min_notional = symbol_filters.min_notional
     if (max_fund < min_notional):
         _log.debug(f"[{trade_symbol}] No cash to send a BUY order"
                    f" (minNotional = {min_notional.normalize():f}, our budget = {max_fund.normalize():f}")
         return OrderResult(SIDE_BUY, OrderStatus.INSUFFICIENT_FUND)
 
     # 建立 Decimal 如果能傳字串就盡量傳字串，傳數字進來會有精度問題
-    latest_price_api_call = api_client.get_latest_price(trade_symbol)
+    with _order_phase_seconds.time(side=SIDE_BUY, phase='price_lookup'):
+        latest_price_api_call = api_client.get_latest_price_cache_first(trade_symbol)
     latest_price = Decimal(latest_price_api_call['price'])
     # print(f'Latest price of {trade_symbol} = {latest_price}')
 
     # 計算買入的數量，用 order_quote_qty(..) 會買到小數點後面太多位，到時無法全部平倉
-    lot_filter = filters_dict['LOT_SIZE']
     max_buyable_quantity = max_fund / latest_price
-    min_qty = Decimal(lot_filter['minQty'])
-    max_qty = Decimal(lot_filter['maxQty'])
-    step_size = Decimal(lot_filter['stepSize'])
+    min_qty = symbol_filters.min_qty
+    max_qty = symbol_filters.max_qty
+    step_size = symbol_filters.step_size
 
     if max_buyable_quantity < min_qty:
         _log.warning(f"[{trade_symbol}] Cannot meet minimum BUY qty requirement"
@@ -111,11 +118,20 @@ def execute_buy_order(
         f", estimated cost = (qty * latest_quote) = '{(rounded_quantity * latest_price).normalize():f}'"
         f" (commission not included)"
     )
-    order_ok, order = api_client.order_qty(
-        side=SIDE_BUY,
-        quantity=f'{rounded_qty_str}',
-        symbol=trade_symbol,
-    )
+    if order_manager is not None:
+        ret = OrderResult(SIDE_BUY, OrderStatus.PENDING)
+        ret.handle = order_manager.submit(
+            SIDE_BUY, trade_symbol, base_asset, rounded_qty_str, asset_position, round_id,
+            estimated_cost=rounded_quantity * latest_price)
+        return ret
+
+    with _order_phase_seconds.time(side=SIDE_BUY, phase='exchange_order'):
+        order_ok, order = api_client.order_qty(
+            side=SIDE_BUY,
+            quantity=f'{rounded_qty_str}',
+            symbol=trade_symbol,
+        )
+    _orders.inc(side=SIDE_BUY, result='ok' if order_ok else 'api_error')
 
     if order_ok:
         if order['status'] != "FILLED":
@@ -127,8 +143,9 @@ def execute_buy_order(
         ret.raw_response = order
         _log.debug(
             f"[{trade_symbol}] BUY order sent, adding transaction to database")
-        add_transactions_to_position(
-            ret, api_client, base_asset, trade_symbol, cash_asset, asset_position, round_id, order)
+        with _order_phase_seconds.time(side=order['side'], phase='record_position'):
+            add_transactions_to_position(
+                ret, api_client, base_asset, trade_symbol, cash_asset, asset_position, round_id, order)
         return ret
     else:
         _log.error(f"[{trade_symbol}] Error while sending BUY order")
@@ -142,9 +159,13 @@ def close_all_position(
     cash_asset: str,
     asset_position: position.Position,
     symbol_info: dict,
-    round_id: str
+    round_id: str,
+    order_manager=None
 ) -> OrderResult:
-    """全部平倉某資產"""
+    """
+    全部平倉某資產
+    order_manager: 若有指定，交給 order_manager.OrderManager 送單，不等待成交，回傳 PENDING
+    """
 
     _log.debug(f"[{trade_symbol}] Entering sell process")
 
@@ -157,11 +178,19 @@ def close_all_position(
     open_qty_str = f"{open_quantity.normalize():f}"
     _log.debug(
         f"[{trade_symbol}] Sending SELL order to exchange, qty = '{open_qty_str}'")
-    order_ok, order = api_client.order_qty(
-        side=SIDE_SELL,
-        quantity=open_qty_str,
-        symbol=trade_symbol,
-    )
+    if order_manager is not None:
+        ret = OrderResult(SIDE_SELL, OrderStatus.PENDING)
+        ret.handle = order_manager.submit(
+            SIDE_SELL, trade_symbol, base_asset, open_qty_str, asset_position, round_id)
+        return ret
+
+    with _order_phase_seconds.time(side=SIDE_SELL, phase='exchange_order'):
+        order_ok, order = api_client.order_qty(
+            side=SIDE_SELL,
+            quantity=open_qty_str,
+            symbol=trade_symbol,
+        )
+    _orders.inc(side=SIDE_SELL, result='ok' if order_ok else 'api_error')
 
     if order_ok:
         # order filled:
@@ -179,8 +208,9 @@ def close_all_position(
         ret.raw_response = order
         _log.debug(
             f"[{trade_symbol}] SELL order sent, adding transaction to database")
-        add_transactions_to_position(
-            ret, api_client, base_asset, trade_symbol, cash_asset, asset_position, round_id, order)
+        with _order_phase_seconds.time(side=order['side'], phase='record_position'):
+            add_transactions_to_position(
+                ret, api_client, base_asset, trade_symbol, cash_asset, asset_position, round_id, order)
         return ret
     else:
         _log.error(f"[{trade_symbol}] Error while sending SELL order")
@@ -198,48 +228,63 @@ def add_transactions_to_position(
     order: dict
 ):
     # {'symbol': 'DOGEUSDT', 'orderId': 786775885, 'orderListId': -1, 'clientOrderId': 'gQp1YKqpjVBMwlkUIcCgWV', 'transactTime': , 'price': '0.00000000', 'origQty': '36.60000000', 'executedQty': '36.60000000', 'cummulativeQuoteQty': '13.96546200', 'status': 'FILLED', 'timeInForce': 'GTC', 'type': 'MARKET', 'side': 'BUY', 'fills': [{'price': '0.38157000', 'qty': '36.60000000', 'commission': '0.00001676', 'commissionAsset': 'BNB', 'tradeId': 142837993}]}
-    order_symbol = order['symbol']
-    order_side = order['side']
-    order_type = order['type']
-    order_id = order['orderId']
-    fills = order['fills']
     commision_to_cash_prices = dict()
 
-    for fill in fills:
-        fill_qty = fill['qty']
-        fill_price = fill['price']
-        fill_commission = Decimal(fill['commission'])
-        fill_commission_asset = fill['commissionAsset']
-
-        # 若手續費不是以 USDT 計價，轉換為 USDT
-        if fill_commission_asset != cash_asset:
-            commision_to_cash_price = commision_to_cash_prices.get(
-                fill_commission_asset, None)
-            if commision_to_cash_price is None:
-                trade_symbol_commission = f"{fill_commission_asset}{cash_asset}"
-                latest_commision_to_cash_price_api_call = api_client.get_latest_price(
-                    trade_symbol_commission)
-                commision_to_cash_price = Decimal(
-                    latest_commision_to_cash_price_api_call['price'])
-                commision_to_cash_prices[fill_commission_asset] = commision_to_cash_price
-
-            fill_commission_as_cash = fill_commission * commision_to_cash_price
-        else:
-            fill_commission_as_cash = fill_commission
-
-        transaction = position.Transaction(
-            time=int(order['transactTime']),
-            activity=order_side,
-            symbol=base_asset,
-            trade_symbol=order_symbol,
-            quantity=Decimal(fill_qty),
-            price=Decimal(fill_price),
-            commission=Decimal(fill_commission),
-            commission_asset=fill_commission_asset,
-            commission_as_usdt=fill_commission_as_cash,
-            round_id=round_id,
-            order_id=order_id,
-            trade_id=fill['tradeId'],
-            closed_trade_ids=[])
+    for fill in order['fills']:
+        transaction = fill_to_transaction(
+            api_client, base_asset, cash_asset, order['symbol'], order['side'], order['orderId'],
+            int(order['transactTime']), fill, round_id, commision_to_cash_prices)
         asset_position.add_transaction(transaction)
         order_result.transactions.append(copy.deepcopy(transaction))
+
+
+def fill_to_transaction(
+    api_client: crypto.Crypto,
+    base_asset: str,
+    cash_asset: str,
+    order_symbol: str,
+    order_side: str,
+    order_id,
+    transact_time: int,
+    fill: dict,
+    round_id: str,
+    commision_to_cash_prices: dict
+) -> position.Transaction:
+    """
+    將一筆成交 (order 回應的 fills 格式) 轉成 Transaction
+    fill: {'price', 'qty', 'commission', 'commissionAsset', 'tradeId'}
+    commision_to_cash_prices: 手續費資產 -> 現金報價的快取，同一張訂單的成交共用
+    """
+    fill_commission = Decimal(fill['commission'])
+    fill_commission_asset = fill['commissionAsset']
+
+    # 若手續費不是以 USDT 計價，轉換為 USDT
+    if fill_commission_asset != cash_asset:
+        commision_to_cash_price = commision_to_cash_prices.get(
+            fill_commission_asset, None)
+        if commision_to_cash_price is None:
+            trade_symbol_commission = f"{fill_commission_asset}{cash_asset}"
+            latest_commision_to_cash_price_api_call = api_client.get_latest_price_cache_first(
+                trade_symbol_commission)
+            commision_to_cash_price = Decimal(
+                latest_commision_to_cash_price_api_call['price'])
+            commision_to_cash_prices[fill_commission_asset] = commision_to_cash_price
+
+        fill_commission_as_cash = fill_commission * commision_to_cash_price
+    else:
+        fill_commission_as_cash = fill_commission
+
+    return position.Transaction(
+        time=transact_time,
+        activity=order_side,
+        symbol=base_asset,
+        trade_symbol=order_symbol,
+        quantity=Decimal(fill['qty']),
+        price=Decimal(fill['price']),
+        commission=fill_commission,
+        commission_asset=fill_commission_asset,
+        commission_as_usdt=fill_commission_as_cash,
+        round_id=round_id,
+        order_id=order_id,
+        trade_id=fill['tradeId'],
+        closed_trade_ids=[])
@@ -0,0 +1,109 @@
+import __init__
+import logging.config
+import multiprocessing
+import signal
+from decimal import Decimal
+
+import asset_record_platforms.file_based_asset_positions as file_based_asset_positions
+from bot_env_config.config import Config
+from exchange_api_wrappers.crypto import Crypto
+from risk_coordinator import RiskCoordinatorManager
+
+_log = logging.getLogger(__name__)
+
+
+def run_shard(shard_index: int, shard_count: int, risk_coordinator):
+    """shard process 的進入點：只分析分配到的交易對，買單額度向 risk_coordinator 申請"""
+    # 延後 import，trade_loop 在 import 時會註冊此 process 的 signal handler
+    from trade_loop import TradeLoopRunner
+
+    config = Config()
+    runner = TradeLoopRunner(
+        config, symbol_shard=(shard_index, shard_count), risk_coordinator=risk_coordinator)
+    if runner.engine == 'asyncio':
+        runner.start_loop_async()
+    else:
+        runner.start_loop()
+
+
+def _ignore_sigint():
+    # 由 shard 處理 SIGINT，coordinator 必須活到全部 shard 結束
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, signal.SIG_IGN)
+
+
+def create_risk_coordinator(config: Config, manager: RiskCoordinatorManager):
+    """以交易所目前的餘額與全部交易對的倉位紀錄，在 manager process 內建立 RiskCoordinator"""
+    position_manage = config.position_manage
+    cash_currency = position_manage['cash_currency']
+
+    include_currencies = position_manage.get('include_currencies')
+    exclude_currencies = position_manage.get('exclude_currencies')
+    if include_currencies is not None and exclude_currencies is not None:
+        raise ValueError('include_currencies and exclude_currencies cannot both exist.')
+
+    # mock_trading 的餘額存在單一檔案，多個 process 同時寫入會互相覆蓋
+    if position_manage.get('trading_mode', 'mock_trading') != 'binance_trading':
+        raise ValueError('Sharded trade loop requires trading_mode binance_trading')
+
+    crypto = Crypto.get_binance_trade_and_klines(config)
+
+    watching_symbols = crypto.get_tradable_symbols(
+        cash_currency, include_currencies, exclude_currencies)
+    equities_balance = crypto.get_equities_balance(watching_symbols, cash_currency)
+    record = file_based_asset_positions.AssetPositions.from_config(config, watching_symbols, cash_currency)
+
+    open_costs = {asset: pos.open_cost for asset, pos in record.positions.items()
+                  if asset != cash_currency and pos.open_quantity > 0}
+
+    max_open_positions = None
+    if 'max_open_positions' in position_manage:
+        max_open_positions = int(position_manage['max_open_positions'])
+
+    max_total_open_cost = None
+    if 'max_total_open_cost' in position_manage:
+        max_total_open_cost = Decimal(position_manage['max_total_open_cost'])
+
+    return manager.RiskCoordinator(
+        equities_balance[cash_currency].free, open_costs, max_open_positions, max_total_open_cost)
+
+
+def main():
+    config = Config()
+    shard_count = int(config.position_manage.get('shard_count', 1))
+    if shard_count < 1:
+        raise ValueError('shard_count must be at least 1.')
+
+    manager = RiskCoordinatorManager()
+    manager.start(initializer=_ignore_sigint)
+    try:
+        risk_coordinator = create_risk_coordinator(config, manager)
+        _log.info(f"Risk coordinator started: {risk_coordinator.snapshot()}")
+
+        shards = [
+            multiprocessing.Process(
+                target=run_shard,
+                args=(i, shard_count, risk_coordinator),
+                name=f"shard-{i}")
+            for i in range(shard_count)
+        ]
+        for shard in shards:
+            shard.start()
+
+        for shard in shards:
+            while shard.is_alive():
+                try:
+                    shard.join()
+                except KeyboardInterrupt:
+                    # shard 會自行收到 SIGINT 並結束這一輪
+                    pass
+
+        _log.info(f"All shards stopped: {risk_coordinator.snapshot()}")
+    finally:
+        manager.shutdown()
+
+
+if __name__ == '__main__':
+    _log.info("Sharded trade loop started")
+    main()
+    _log.debug("Sharded trade loop exited")
@@ -0,0 +1,63 @@
+import threading
+import time
+from threading import Event
+
+
+class RealClock:
+    """實際時間，TradeLoopRunner 預設使用"""
+
+    def time(self) -> float:
+        return time.time()
+
+    def wait(self, seconds: float, event: Event) -> None:
+        """等待 seconds 秒，event 被設定時提早結束"""
+        event.wait(seconds)
+
+    def is_finished(self) -> bool:
+        return False
+
+
+class SimulatedClock:
+    """
+    重播紀錄用的模擬時間：wait() 直接把時間往前推，不需要真的等待
+    speed > 0 時仍會等待 seconds / speed 的實際時間 (e.g., speed = 600 表示 1 秒跑 10 分鐘)
+    """
+
+    def __init__(self, start: float, end: float = None, speed: float = 0):
+        """
+        start: 模擬開始的時間 (epoch 秒)
+        end: 模擬結束的時間，到達後 is_finished() 回傳 True，None 表示不結束
+        speed: 相對實際時間的倍數，0 表示不等待
+        """
+        if speed < 0:
+            raise ValueError('speed must not be negative')
+
+        self.start = start
+        self.end = end
+        self.speed = speed
+        self.__now = start
+        self.__lock = threading.Lock()
+
+    def time(self) -> float:
+        with self.__lock:
+            return self.__now
+
+    def advance(self, seconds: float) -> None:
+        if seconds <= 0:
+            return
+
+        with self.__lock:
+            self.__now += seconds
+
+    def wait(self, seconds: float, event: Event) -> None:
+        """把時間往前推 seconds 秒，event 被設定時 (要求停止) 不再前進"""
+        if self.speed > 0:
+            if event.wait(seconds / self.speed):
+                return
+        elif event.is_set():
+            return
+
+        self.advance(seconds)
+
+    def is_finished(self) -> bool:
+        return self.end is not None and self.time() >= self.end
@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+"""
+Integration tests for analysis_workers of trade_loop.py
+
+This module contains tests for:
+- The same positions with one worker and with several workers
+- max_open_positions, max_total_open_cost and free cash under concurrent BUY decisions
+- A stop request ending the round before every symbol is analyzed
+- CandleCloseScheduler.mark_analyzed called from worker threads
+- Round time shrinking with more workers when K line downloads are slow
+"""
+
+import unittest
+import importlib.util
+import os
+import json
+import tempfile
+import shutil
+import threading
+import time
+from decimal import Decimal
+
+# Add the project root to the path
+import sys
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from bot_env_config.config import Config
+from fake_exchange import FakeBinanceMarket, FakeBinanceServer
+from simulated_clock import SimulatedClock
+
+NOW = 1_700_000_000.0
+HOUR = 3600
+
+
+# trade_loop imports the Google Sheets report, which needs pandas and pygsheets
+@unittest.skipUnless(
+    importlib.util.find_spec('pandas') and importlib.util.find_spec('pygsheets'),
+    'trade_loop requires pandas and pygsheets')
+class TestAnalysisWorkers(unittest.TestCase):
+    """Test cases for TradeLoopRunner with analysis_workers on the fake exchange"""
+
+    SYMBOL_COUNT = 12
+
+    def setUp(self):
+        self.work_dir = tempfile.mkdtemp()
+        self.market = FakeBinanceMarket(symbol_count=self.SYMBOL_COUNT, clock=lambda: NOW)
+        self.server = FakeBinanceServer(self.market)
+        self.server.start()
+        self.addCleanup(self.server.stop)
+
+    def tearDown(self):
+        shutil.rmtree(self.work_dir)
+
+    def make_config(self, name, mock_cash=None, **position_manage):
+        """Config of a mock trading account that buys every symbol once per hour"""
+        config_dir = os.path.join(self.work_dir, name)
+        os.makedirs(config_dir)
+        files = {
+            'auth.json': {'API_KEY': 'key', 'API_SECRET': 'secret'},
+            'bot.json': {},
+            'analyzer.json': {
+                'type': 'DCA_Buy', 'kline_interval': '1h', 'klines_limit': 3,
+                'DCA': {'min_interval_between_buy': HOUR},
+            },
+            'position-manage.json': dict({
+                'cash_currency': 'USDT',
+                'max_fund_per_order': '20',
+                'exclude_currencies': [],
+                'trading_mode': 'mock_trading',
+                'binance_base_url': self.server.base_url,
+                'http_max_retries': 0,
+                'price_cache_ttl_seconds': 600,
+                'round_interval_seconds': 600,
+                'asset_positions_dir': 'asset-positions',
+                'mock_trading_dir': 'mock-trading',
+            }, **position_manage),
+        }
+        for file_name, content in files.items():
+            with open(os.path.join(config_dir, file_name), 'w') as outfile:
+                json.dump(content, outfile)
+
+        if mock_cash is not None:
+            os.makedirs(os.path.join(config_dir, 'mock-trading'))
+            with open(os.path.join(config_dir, 'mock-trading', 'mock-record.json'), 'w') as outfile:
+                json.dump({'positions': {'USDT': mock_cash}}, outfile)
+
+        return Config(config_dir)
+
+    def run_loop(self, config, seconds=60):
+        """Run TradeLoopRunner on a SimulatedClock, return (runner clock, wall seconds)"""
+        import trade_loop
+
+        clock = SimulatedClock(NOW, NOW + seconds)
+        runner = trade_loop.TradeLoopRunner(config, serve_metrics=False, clock=clock)
+        tic = time.perf_counter()
+        runner.start_loop()
+        return clock, time.perf_counter() - tic
+
+    def mock_positions(self, config):
+        with open(os.path.join(config.get_data_dir('mock_trading_dir'), 'mock-record.json')) as json_file:
+            return {k: Decimal(v) for k, v in json.load(json_file)['positions'].items()}
+
+    def test_same_positions_with_workers(self):
+        serial = self.make_config('serial', analysis_workers=1)
+        parallel = self.make_config('parallel', analysis_workers=4)
+
+        self.run_loop(serial)
+        self.run_loop(parallel)
+
+        positions = self.mock_positions(serial)
+        self.assertEqual(len([v for k, v in positions.items() if k != 'USDT' and v > 0]), self.SYMBOL_COUNT)
+        self.assertEqual(positions, self.mock_positions(parallel))
+
+    def test_limits_under_concurrent_buys(self):
+        limited_positions = self.make_config('max-open', analysis_workers=8, max_open_positions=3)
+        limited_cost = self.make_config('max-cost', analysis_workers=8, max_total_open_cost='50')
+        limited_cash = self.make_config('cash', mock_cash='50', analysis_workers=8)
+
+        for config in (limited_positions, limited_cost, limited_cash):
+            self.run_loop(config)
+
+        bought = lambda config: [k for k, v in self.mock_positions(config).items() if k != 'USDT' and v > 0]
+        self.assertEqual(len(bought(limited_positions)), 3)
+        # the last BUY that starts below max_total_open_cost may go over it by one order
+        self.assertLessEqual(len(bought(limited_cost)), 3)
+        self.assertGreaterEqual(self.mock_positions(limited_cash)['USDT'], 0)
+        self.assertLess(len(bought(limited_cash)), self.SYMBOL_COUNT)
+
+    def test_stop_request_mid_round(self):
+        self.server.latency_seconds = 0.05
+        config = self.make_config('stop', analysis_workers=2)
+
+        original_dir = os.getcwd()
+        os.chdir(self.work_dir)
+        self.addCleanup(os.chdir, original_dir)
+
+        def request_stop():
+            # the stop file is checked after each analyzed symbol
+            while self.server.request_counts.get('/api/v3/klines', 0) < 2:
+                time.sleep(0.005)
+            open('stoppp', 'w').close()
+        threading.Thread(target=request_stop, daemon=True).start()
+
+        clock, _ = self.run_loop(config, seconds=HOUR)
+
+        self.assertFalse(clock.is_finished())
+        self.assertTrue(os.path.exists('_stoppp'))
+        self.assertLess(self.server.request_counts['/api/v3/klines'], self.SYMBOL_COUNT)
+
+    def test_mark_analyzed_from_workers(self):
+        # 20 simulated minutes inside one 1h candle, with an intra-candle check every minute
+        config = self.make_config(
+            'candle-close', analysis_workers=8, round_scheduler='candle_close', intra_candle_check_seconds=60)
+
+        self.run_loop(config, seconds=20 * 60)
+
+        # a symbol not marked as analyzed would be analyzed again with a new K line download
+        self.assertEqual(self.server.request_counts['/api/v3/klines'], self.SYMBOL_COUNT)
+
+    def test_round_time_scales_with_workers(self):
+        self.server.latency_seconds = 0.05
+        serial = self.make_config('serial', analysis_workers=1)
+        parallel = self.make_config('parallel', analysis_workers=4)
+
+        _, serial_seconds = self.run_loop(serial)
+        _, parallel_seconds = self.run_loop(parallel)
+
+        # 12 downloads of 50 ms each: about 0.6 s in one worker, 0.15 s in four
+        self.assertLess(parallel_seconds, serial_seconds / 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
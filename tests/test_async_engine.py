@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+"""
+Integration tests for trade_loop_engine asyncio of trade_loop.py
+
+This module contains tests for:
+- The same trades as the sync engine
+- K line requests in flight never exceeding async_max_in_flight
+- A stop request ending the round before every symbol is analyzed
+"""
+
+import unittest
+import importlib.util
+import os
+import json
+import tempfile
+import shutil
+import threading
+import time
+from decimal import Decimal
+
+# Add the project root to the path
+import sys
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from bot_env_config.config import Config
+from fake_exchange import FakeBinanceMarket, FakeBinanceServer
+from simulated_clock import SimulatedClock
+
+NOW = 1_700_000_000.0
+HOUR = 3600
+
+
+# trade_loop imports the Google Sheets report, which needs pandas and pygsheets
+@unittest.skipUnless(
+    importlib.util.find_spec('pandas') and importlib.util.find_spec('pygsheets'),
+    'trade_loop requires pandas and pygsheets')
+class TestAsyncEngine(unittest.TestCase):
+    """Test cases for TradeLoopRunner.start_loop_async on the fake exchange"""
+
+    SYMBOL_COUNT = 12
+
+    def setUp(self):
+        self.work_dir = tempfile.mkdtemp()
+        self.market = FakeBinanceMarket(symbol_count=self.SYMBOL_COUNT, clock=lambda: NOW)
+        self.server = FakeBinanceServer(self.market)
+        self.server.start()
+        self.addCleanup(self.server.stop)
+
+    def tearDown(self):
+        shutil.rmtree(self.work_dir)
+
+    def make_config(self, name, **position_manage):
+        """Config of a mock trading account that buys every symbol once per hour"""
+        config_dir = os.path.join(self.work_dir, name)
+        os.makedirs(config_dir)
+        files = {
+            'auth.json': {'API_KEY': 'key', 'API_SECRET': 'secret'},
+            'bot.json': {},
+            'analyzer.json': {
+                'type': 'DCA_Buy', 'kline_interval': '1h', 'klines_limit': 3,
+                'DCA': {'min_interval_between_buy': HOUR},
+            },
+            'position-manage.json': dict({
+                'cash_currency': 'USDT',
+                'max_fund_per_order': '20',
+                'exclude_currencies': [],
+                'trading_mode': 'mock_trading',
+                'trade_loop_engine': 'asyncio',
+                'binance_base_url': self.server.base_url,
+                'http_max_retries': 0,
+                'price_cache_ttl_seconds': 600,
+                'round_interval_seconds': 600,
+                'asset_positions_dir': 'asset-positions',
+                'mock_trading_dir': 'mock-trading',
+            }, **position_manage),
+        }
+        for file_name, content in files.items():
+            with open(os.path.join(config_dir, file_name), 'w') as outfile:
+                json.dump(content, outfile)
+
+        return Config(config_dir)
+
+    def run_loop(self, config, seconds=60):
+        """Run TradeLoopRunner with the configured engine on a SimulatedClock, return the clock"""
+        import trade_loop
+
+        clock = SimulatedClock(NOW, NOW + seconds)
+        runner = trade_loop.TradeLoopRunner(config, serve_metrics=False, clock=clock)
+        if runner.engine == 'asyncio':
+            runner.start_loop_async()
+        else:
+            runner.start_loop()
+        return clock
+
+    def mock_positions(self, config):
+        with open(os.path.join(config.get_data_dir('mock_trading_dir'), 'mock-record.json')) as json_file:
+            return {k: Decimal(v) for k, v in json.load(json_file)['positions'].items()}
+
+    def slow_klines(self, seconds):
+        """Make each K line request take seconds, return a dict holding the most requests in flight"""
+        klines = self.market.klines
+        lock = threading.Lock()
+        state = {'in_flight': 0, 'max_in_flight': 0}
+
+        def slow(*args, **kwargs):
+            with lock:
+                state['in_flight'] += 1
+                state['max_in_flight'] = max(state['max_in_flight'], state['in_flight'])
+            try:
+                time.sleep(seconds)
+                return klines(*args, **kwargs)
+            finally:
+                with lock:
+                    state['in_flight'] -= 1
+
+        self.market.klines = slow
+        return state
+
+    def test_same_trades_as_sync_engine(self):
+        sync = self.make_config('sync', trade_loop_engine='sync')
+        asyncio_engine = self.make_config('asyncio')
+
+        self.run_loop(sync)
+        self.run_loop(asyncio_engine)
+
+        positions = self.mock_positions(sync)
+        self.assertEqual(len([v for k, v in positions.items() if k != 'USDT' and v > 0]), self.SYMBOL_COUNT)
+        self.assertEqual(positions, self.mock_positions(asyncio_engine))
+
+    def test_in_flight_limit(self):
+        state = self.slow_klines(0.05)
+        config = self.make_config('in-flight', async_max_in_flight=3)
+
+        self.run_loop(config)
+
+        self.assertEqual(self.server.request_counts['/api/v3/klines'], self.SYMBOL_COUNT)
+        self.assertGreater(state['max_in_flight'], 1)
+        self.assertLessEqual(state['max_in_flight'], 3)
+
+    def test_stop_request_mid_round(self):
+        self.slow_klines(0.05)
+        config = self.make_config('stop', async_max_in_flight=2)
+
+        original_dir = os.getcwd()
+        os.chdir(self.work_dir)
+        self.addCleanup(os.chdir, original_dir)
+
+        def request_stop():
+            # the stop file is checked after each analyzed symbol
+            while self.server.request_counts.get('/api/v3/klines', 0) < 2:
+                time.sleep(0.005)
+            open('stoppp', 'w').close()
+        threading.Thread(target=request_stop, daemon=True).start()
+
+        clock = self.run_loop(config, seconds=HOUR)
+
+        self.assertFalse(clock.is_finished())
+        self.assertTrue(os.path.exists('_stoppp'))
+        # symbols still waiting for an in-flight slot are not downloaded
+        self.assertLess(self.server.request_counts['/api/v3/klines'], self.SYMBOL_COUNT)
+
+
+if __name__ == '__main__':
+    unittest.main()
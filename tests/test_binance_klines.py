@@ -0,0 +1,273 @@
+#!/usr/bin/env python3
+"""
+Unit tests for exchange_api_wrappers/binance_klines.py
+
+This module contains tests for:
+- Full K line download (default mode)
+- Incremental K line download with startTime and the in-memory ring buffer
+- Download statistics per round
+- Bulk ticker price cache behind get_latest_price_cache_first
+- exchangeInfo disk cache (in CACHE_DIR or a configured cache_dir) and pre-parsed symbol filters
+"""
+
+import unittest
+import os
+import shutil
+import tempfile
+import time
+from decimal import Decimal
+from unittest.mock import Mock
+
+# Add the project root to the path
+import sys
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from exchange_api_wrappers.binance_klines import BinanceKlineWrapper
+from exchange_api_wrappers.wrapped_data import SymbolFilters
+
+ONE_MINUTE_MS = 60 * 1000
+
+
+def make_raw_kline(open_time, close):
+    return [open_time, "1.0", "2.0", "0.5", close, "100.0",
+            open_time + ONE_MINUTE_MS - 1, "150.0", 10, "50.0", "75.0", "0"]
+
+
+class FakeKlineClient:
+    """Serves one-minute candles ending with the candle forming right now."""
+
+    def __init__(self):
+        self.calls = []
+
+    def get_klines(self, symbol, interval, limit, startTime=None):
+        self.calls.append({'symbol': symbol, 'interval': interval,
+                           'limit': limit, 'startTime': startTime})
+        now_ms = int(time.time() * 1000)
+        forming_open = now_ms - now_ms % ONE_MINUTE_MS
+        first_open = forming_open - (limit - 1) * ONE_MINUTE_MS
+        if startTime is not None:
+            first_open = max(first_open, startTime)
+
+        return [make_raw_kline(t, str(t // ONE_MINUTE_MS))
+                for t in range(first_open, forming_open + 1, ONE_MINUTE_MS)][:limit]
+
+
+class TestBinanceKlineWrapper(unittest.TestCase):
+    """Test cases for BinanceKlineWrapper class"""
+
+    def test_full_mode_always_downloads_window(self):
+        """Without incremental mode every call downloads the whole window."""
+        client = FakeKlineClient()
+        wrapper = BinanceKlineWrapper(client)
+
+        wrapper.get_klines("BTCUSDT", 20, "1m")
+        wrapper.get_klines("BTCUSDT", 20, "1m")
+
+        self.assertEqual([c['startTime'] for c in client.calls], [None, None])
+
+    def test_incremental_mode_uses_start_time(self):
+        """The second call only asks for candles after the last closed one."""
+        client = FakeKlineClient()
+        wrapper = BinanceKlineWrapper(client, incremental=True)
+
+        first = wrapper.get_klines("BTCUSDT", 20, "1m")
+        second = wrapper.get_klines("BTCUSDT", 20, "1m")
+
+        self.assertIsNone(client.calls[0]['startTime'])
+        self.assertIsNotNone(client.calls[1]['startTime'])
+        # The forming candle is re-downloaded (or the next one, if it closed in between)
+        self.assertIn(client.calls[1]['startTime'],
+                      (first[-1].open_time, first[-1].open_time + ONE_MINUTE_MS))
+
+        # Callers still get a full, ordered window
+        self.assertEqual(len(second), 20)
+        open_times = [k.open_time for k in second]
+        self.assertEqual(open_times, sorted(open_times))
+        self.assertEqual(len(set(open_times)), 20)
+        self.assertEqual(second[-1].close, Decimal(str(second[-1].open_time // ONE_MINUTE_MS)))
+
+    def test_incremental_stats(self):
+        """Saved candles are counted and reset after being popped."""
+        client = FakeKlineClient()
+        wrapper = BinanceKlineWrapper(client, incremental=True)
+
+        wrapper.get_klines("BTCUSDT", 20, "1m")
+        wrapper.get_klines("BTCUSDT", 20, "1m")
+        stats = wrapper.pop_kline_fetch_stats()
+
+        self.assertEqual(stats['fetched'], 20 + len(client.get_klines("BTCUSDT", "1m", 20, client.calls[1]['startTime'])))
+        self.assertGreater(stats['saved'], 0)
+        self.assertEqual(wrapper.pop_kline_fetch_stats(), {'fetched': 0, 'saved': 0})
+
+    def test_incremental_limit_change_refetches(self):
+        """Changing klines_limit drops the buffer and downloads a full window."""
+        client = FakeKlineClient()
+        wrapper = BinanceKlineWrapper(client, incremental=True)
+
+        wrapper.get_klines("BTCUSDT", 20, "1m")
+        klines = wrapper.get_klines("BTCUSDT", 30, "1m")
+
+        self.assertIsNone(client.calls[1]['startTime'])
+        self.assertEqual(len(klines), 30)
+
+
+class TestPriceCache(unittest.TestCase):
+    """Test cases for the BinanceKlineWrapper price cache"""
+
+    def setUp(self):
+        self.client = Mock()
+        self.client.get_symbol_ticker.side_effect = self.fake_ticker
+
+    @staticmethod
+    def fake_ticker(symbol=None):
+        prices = [{'symbol': 'BTCUSDT', 'price': '50000.00'},
+                  {'symbol': 'ETHUSDT', 'price': '3000.00'}]
+        if symbol is None:
+            return prices
+        return {'symbol': symbol, 'price': '1.00'}
+
+    def test_one_bulk_call_serves_many_lookups(self):
+        """Many lookups within the TTL cost a single all-symbols request."""
+        wrapper = BinanceKlineWrapper(self.client, price_cache_ttl=60)
+
+        for _ in range(100):
+            self.assertEqual(wrapper.get_latest_price_cache_first("BTCUSDT")['price'], '50000.00')
+            self.assertEqual(wrapper.get_latest_price_cache_first("ETHUSDT")['price'], '3000.00')
+
+        self.client.get_symbol_ticker.assert_called_once_with()
+
+    def test_expired_cache_is_refreshed(self):
+        """Prices older than the TTL trigger a new bulk request."""
+        wrapper = BinanceKlineWrapper(self.client, price_cache_ttl=60)
+        wrapper.update_prices([{'symbol': 'BTCUSDT', 'price': '1.00'}],
+                              updated_at=time.time() - 120)
+
+        self.assertEqual(wrapper.get_latest_price_cache_first("BTCUSDT")['price'], '50000.00')
+        self.assertEqual(self.client.get_symbol_ticker.call_count, 1)
+
+    def test_unknown_symbol_falls_back_to_single_lookup(self):
+        """A symbol missing from the bulk response is queried on its own."""
+        wrapper = BinanceKlineWrapper(self.client, price_cache_ttl=60)
+
+        self.assertEqual(wrapper.get_latest_price_cache_first("NEWUSDT")['price'], '1.00')
+        self.client.get_symbol_ticker.assert_called_with(symbol="NEWUSDT")
+
+    def test_mini_ticker_stream_fills_cache(self):
+        """!miniTicker@arr payloads keep the cache fresh without REST calls."""
+        wrapper = BinanceKlineWrapper(self.client, price_cache_ttl=60)
+        wrapper.update_prices_from_mini_tickers([
+            {'e': '24hrMiniTicker', 'E': int(time.time() * 1000), 's': 'BTCUSDT', 'c': '51000.00'}
+        ])
+
+        self.assertEqual(wrapper.get_latest_price_cache_first("BTCUSDT")['price'], '51000.00')
+        self.client.get_symbol_ticker.assert_not_called()
+
+
+def make_symbol_info(base_asset, quote_asset="USDT", status="TRADING"):
+    return {
+        "symbol": f"{base_asset}{quote_asset}",
+        "status": status,
+        "baseAsset": base_asset,
+        "quoteAsset": quote_asset,
+        "orderTypes": ["LIMIT", "MARKET"],
+        "permissions": ["SPOT"],
+        "filters": [
+            {"filterType": "PRICE_FILTER", "minPrice": "0.01", "maxPrice": "1000000.00", "tickSize": "0.01"},
+            {"filterType": "LOT_SIZE", "minQty": "0.00001000", "maxQty": "9000.00000000", "stepSize": "0.00001000"},
+            {"filterType": "NOTIONAL", "minNotional": "5.00000000", "applyMinToMarket": True},
+        ],
+    }
+
+
+class TestExchangeInfoCache(unittest.TestCase):
+    """Test cases for the exchangeInfo disk cache and SymbolFilters"""
+
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+        self.original_cache_dir = BinanceKlineWrapper.CACHE_DIR
+        BinanceKlineWrapper.CACHE_DIR = self.test_dir
+
+        self.client = Mock()
+        self.client.get_exchange_info.return_value = {
+            "rateLimits": [],
+            "symbols": [
+                make_symbol_info("BTC"),
+                make_symbol_info("ETH"),
+                make_symbol_info("LUNA", status="BREAK"),
+                make_symbol_info("BNB", quote_asset="BTC"),
+            ]
+        }
+
+    def tearDown(self):
+        BinanceKlineWrapper.CACHE_DIR = self.original_cache_dir
+        shutil.rmtree(self.test_dir, ignore_errors=True)
+
+    def test_symbol_filters_parsed_once(self):
+        """WatchingSymbol carries Decimal filters parsed from exchangeInfo."""
+        wrapper = BinanceKlineWrapper(self.client)
+        symbols = wrapper.get_tradable_symbols("USDT", None, [])
+
+        self.assertEqual([s.symbol for s in symbols], ["BTCUSDT", "ETHUSDT"])
+        filters = symbols[0].filters
+        self.assertIsInstance(filters, SymbolFilters)
+        self.assertEqual(filters.min_notional, Decimal("5"))
+        self.assertEqual(filters.min_qty, Decimal("0.00001"))
+        self.assertEqual(filters.max_qty, Decimal("9000"))
+        self.assertEqual(filters.step_size, Decimal("0.00001"))
+
+    def test_legacy_min_notional_filter(self):
+        """MIN_NOTIONAL is used when NOTIONAL is absent."""
+        filters = SymbolFilters([{"filterType": "MIN_NOTIONAL", "minNotional": "10.0"}])
+        self.assertEqual(filters.min_notional, Decimal("10.0"))
+        self.assertIsNone(filters.step_size)
+
+    def test_no_notional_filter(self):
+        """Symbols without NOTIONAL / MIN_NOTIONAL have no minimum notional."""
+        filters = SymbolFilters([
+            {"filterType": "LOT_SIZE", "minQty": "0.001", "maxQty": "100", "stepSize": "0.001"}])
+        self.assertEqual(filters.min_notional, Decimal("0"))
+
+    def test_include_assets(self):
+        """Only included assets are returned."""
+        wrapper = BinanceKlineWrapper(self.client)
+        symbols = wrapper.get_tradable_symbols("USDT", ["ETH"], None)
+        self.assertEqual([s.symbol for s in symbols], ["ETHUSDT"])
+
+    def test_cache_skips_download_within_ttl(self):
+        """A fresh disk cache is reused, even by a new wrapper instance."""
+        BinanceKlineWrapper(self.client, exchange_info_cache_ttl=3600).get_tradable_symbols("USDT", None, [])
+        symbols = BinanceKlineWrapper(self.client, exchange_info_cache_ttl=3600).get_tradable_symbols("USDT", None, [])
+
+        self.assertEqual(self.client.get_exchange_info.call_count, 1)
+        self.assertEqual(len(symbols), 2)
+
+    def test_cache_enabled_by_default(self):
+        """The default TTL reuses the cached exchangeInfo."""
+        wrapper = BinanceKlineWrapper(self.client)
+        wrapper.get_tradable_symbols("USDT", None, [])
+        wrapper.get_tradable_symbols("USDT", None, [])
+
+        self.assertEqual(self.client.get_exchange_info.call_count, 1)
+
+    def test_cache_dir(self):
+        """The cache is written to cache_dir instead of CACHE_DIR when given."""
+        cache_dir = os.path.join(self.test_dir, 'account', 'exchange-data-cache')
+        BinanceKlineWrapper(self.client, cache_dir=cache_dir).get_tradable_symbols("USDT", None, [])
+        BinanceKlineWrapper(self.client, cache_dir=cache_dir).get_tradable_symbols("USDT", None, [])
+
+        self.assertEqual(self.client.get_exchange_info.call_count, 1)
+        self.assertEqual(os.listdir(cache_dir), ['exchange-info.json'])
+        self.assertEqual(os.listdir(self.test_dir), ['account'])
+
+    def test_cache_disabled(self):
+        """With a TTL of 0 every call downloads exchangeInfo."""
+        wrapper = BinanceKlineWrapper(self.client, exchange_info_cache_ttl=0)
+        wrapper.get_tradable_symbols("USDT", None, [])
+        wrapper.get_tradable_symbols("USDT", None, [])
+
+        self.assertEqual(self.client.get_exchange_info.call_count, 2)
+        self.assertFalse(os.listdir(self.test_dir))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+Integration tests for fake_exchange/fake_binance.py
+
+This module contains tests for:
+- Deterministic synthetic K lines (full and startTime windows)
+- Crypto talking to the local stand-in through binance_base_url
+- A market BUY order going through send_order and updating the position
+- Injected errors and request weight headers
+"""
+
+import unittest
+import os
+import tempfile
+import shutil
+from decimal import Decimal
+from unittest.mock import Mock
+
+# Add the project root to the path
+import sys
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import send_order
+from asset_record_platforms.position import Position
+from exchange_api_wrappers.binance_klines import BinanceKlineWrapper
+from exchange_api_wrappers.crypto import Crypto
+from fake_exchange import FakeBinanceMarket, FakeBinanceServer
+
+NOW = 1_700_000_000.0
+
+
+class TestFakeBinanceMarket(unittest.TestCase):
+    """Test cases for FakeBinanceMarket"""
+
+    def setUp(self):
+        self.market = FakeBinanceMarket(symbol_count=20, clock=lambda: NOW)
+
+    def test_symbols(self):
+        info = self.market.exchange_info()
+        self.assertEqual(len(info['symbols']), 20)
+        self.assertEqual(info['symbols'][0]['symbol'], 'BTCUSDT')
+        self.assertEqual(info['symbols'][15]['baseAsset'], 'C0015')
+
+    def test_klines_are_deterministic(self):
+        full = self.market.klines('BTCUSDT', '1m', limit=30)
+        self.assertEqual(len(full), 30)
+        self.assertTrue(full[-1][0] <= NOW * 1000 < full[-1][6])
+
+        # A startTime window returns the same candles as the full download
+        tail = self.market.klines('BTCUSDT', '1m', limit=30, start_time=full[-5][0])
+        self.assertEqual(tail, full[-5:])
+
+
+class TestFakeBinanceServer(unittest.TestCase):
+    """Test cases for Crypto connected to FakeBinanceServer"""
+
+    def setUp(self):
+        self.market = FakeBinanceMarket(symbol_count=10, initial_cash=Decimal('1000'))
+        self.server = FakeBinanceServer(self.market)
+        self.server.start()
+        self.addCleanup(self.server.stop)
+
+        self.cache_dir = tempfile.mkdtemp()
+        self.original_cache_dir = BinanceKlineWrapper.CACHE_DIR
+        BinanceKlineWrapper.CACHE_DIR = self.cache_dir
+
+        self.config = Mock()
+        self.config.auth = {'API_KEY': 'key', 'API_SECRET': 'secret'}
+        self.config.position_manage = {
+            'cash_currency': 'USDT',
+            'binance_base_url': self.server.base_url,
+            'http_max_retries': 0,
+        }
+
+    def tearDown(self):
+        BinanceKlineWrapper.CACHE_DIR = self.original_cache_dir
+        shutil.rmtree(self.cache_dir)
+
+    def test_market_data_through_base_url(self):
+        crypto = Crypto.get_binance_trade_and_klines(self.config)
+
+        symbols = crypto.get_tradable_symbols('USDT', None, ['DOGE'])
+        self.assertEqual(len(symbols), 9)
+
+        klines = crypto.get_klines('ETHUSDT', 20, '1h')
+        self.assertEqual(len(klines), 20)
+        self.assertGreater(klines.decimal_close(), 0)
+
+        balances = crypto.get_equities_balance(symbols, 'USDT')
+        self.assertEqual(balances['USDT'].free, Decimal('1000'))
+        self.assertEqual(self.server.request_counts['/api/v3/klines'], 1)
+
+    def test_buy_order_end_to_end(self):
+        crypto = Crypto.get_binance_trade_and_klines(self.config)
+        symbol_info = crypto.get_tradable_symbols('USDT', ['ETH'], None)[0]
+        pos = Position('ETH', Mock(), None)
+
+        result = send_order.execute_buy_order(
+            crypto, 'ETH', 'ETHUSDT', 'USDT', Decimal('20'), pos, symbol_info, 'round-1')
+
+        self.assertEqual(result.status, send_order.OrderStatus.OK)
+        self.assertGreater(pos.open_quantity, 0)
+        balances = crypto.get_equities_balance([symbol_info], 'USDT')
+        self.assertLess(balances['USDT'].free, Decimal('1000'))
+        self.assertGreater(balances['ETH'].free, 0)
+
+    def test_errors_and_weight_headers(self):
+        self.server.error_rate = 1.0
+        crypto = Crypto.get_binance_trade_and_klines(self.config)
+
+        with self.assertRaises(Exception):
+            crypto.get_klines('BTCUSDT', 20, '1m')
+
+        stats = crypto.pop_request_weight_stats()
+        self.assertEqual(stats['server_used_weight'], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -7,6 +7,7 @@ This module contains comprehensive tests covering:
 - Portfolio P&L calculations with various market conditions
 - P&L message formatting and edge cases
 - Error handling and boundary conditions
+- Incrementally maintained portfolio totals matching a full recompute
 """
 
 import unittest
@@ -14,14 +15,19 @@ import tempfile
 import shutil
 import json
 import os
+import random
+import decimal
 from decimal import Decimal
 from unittest.mock import patch
 
+from binance.enums import SIDE_BUY, SIDE_SELL
+
 # Add the project root to the path
 import sys
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
 
-from asset_record_platforms.file_based_asset_positions import AssetPositions
+from asset_record_platforms.file_based_asset_positions import STORAGE_TYPES, AssetPositions
+from asset_record_platforms.position import Transaction
 from exchange_api_wrappers.wrapped_data import WatchingSymbol
 
 
@@ -626,6 +632,100 @@ class TestAssetPositionsIntegration(unittest.TestCase):
         self.assertIn("DOGE |", message)
 
 
+class TestAssetPositionsTotals(unittest.TestCase):
+    """Test cases for the portfolio totals maintained by AssetPositions"""
+
+    ASSETS = ['BTC', 'ETH', 'DOGE', 'SOL']
+
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+        self.watching_symbols = [WatchingSymbol(f"{asset}USDT", asset, {}) for asset in self.ASSETS]
+
+    def tearDown(self):
+        shutil.rmtree(self.test_dir, ignore_errors=True)
+
+    def create_record(self, storage):
+        return AssetPositions(self.watching_symbols, "USDT", base_dir=os.path.join(self.test_dir, storage), storage=storage)
+
+    def recompute(self, record):
+        """Totals from scanning every position, without rounding"""
+        with decimal.localcontext(decimal.Context(prec=decimal.MAX_PREC)):
+            positions = list(record.positions.values())
+            return (
+                sum(1 for p in positions if p.open_quantity > 0),
+                sum((p.open_cost for p in positions if p.open_cost > 0), Decimal('0')),
+                sum((p.total_commission_as_usdt for p in positions), Decimal('0')),
+                sum(p.get_transactions_count() for p in positions),
+            )
+
+    def totals(self, record):
+        return (
+            record.cal_total_open_position_count(),
+            record.cal_total_open_cost(),
+            record.get_total_commision_as_usdt(),
+            record.get_transactions_count(),
+        )
+
+    def trade(self, record, rng, n):
+        asset = rng.choice(self.ASSETS)
+        position = record.positions[asset]
+        quantity = Decimal(rng.randint(1, 500)) / Decimal(1000)
+        activity = SIDE_BUY
+        if position.open_quantity > 0 and rng.random() < 0.4:
+            # sell part or all of the position
+            activity = SIDE_SELL
+            quantity = position.open_quantity if rng.random() < 0.5 else position.open_quantity / 3
+
+        position.add_transaction(Transaction(
+            time=1700000000000 + n,
+            activity=activity,
+            symbol=asset,
+            trade_symbol=f"{asset}USDT",
+            quantity=quantity,
+            price=Decimal(rng.randint(100, 70000)) / Decimal(7),
+            commission=Decimal('0.01'),
+            commission_asset='USDT',
+            commission_as_usdt=Decimal(rng.randint(1, 99)) / Decimal(1000),
+            round_id=str(n),
+            order_id=str(n),
+            trade_id=str(n),
+            closed_trade_ids=[]))
+
+    def test_totals_match_full_recompute(self):
+        for storage in STORAGE_TYPES:
+            with self.subTest(storage=storage):
+                rng = random.Random(storage)
+                record = self.create_record(storage)
+                self.assertEqual(self.totals(record), (0, Decimal('0'), Decimal('0'), 0))
+
+                for n in range(300):
+                    self.trade(record, rng, n)
+                    self.assertEqual(self.totals(record), self.recompute(record))
+
+                # totals are rebuilt from the stored aggregates on startup
+                reloaded = self.create_record(storage)
+                self.assertEqual(self.totals(reloaded), self.recompute(reloaded))
+                self.assertEqual(self.totals(reloaded), self.totals(record))
+
+    def test_closed_position_leaves_open_totals(self):
+        record = self.create_record('json')
+        rng = random.Random(1)
+        self.trade(record, rng, 0)
+        asset = next(asset for asset in self.ASSETS if record.positions[asset].open_quantity > 0)
+        self.assertEqual(record.cal_total_open_position_count(), 1)
+
+        position = record.positions[asset]
+        position.add_transaction(Transaction(
+            time=1700000000001, activity=SIDE_SELL, symbol=asset, trade_symbol=f"{asset}USDT",
+            quantity=position.open_quantity, price=Decimal('100'), commission=Decimal('0'),
+            commission_asset='USDT', commission_as_usdt=Decimal('0'), round_id='1', order_id='1',
+            trade_id='1', closed_trade_ids=[]))
+
+        self.assertEqual(record.cal_total_open_position_count(), 0)
+        self.assertEqual(record.cal_total_open_cost(), Decimal('0'))
+        self.assertEqual(record.get_transactions_count(), 2)
+
+
 if __name__ == '__main__':
     # Configure test runner
     unittest.main(verbosity=2)
\ No newline at end of file
@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+"""
+Unit tests for group commit in asset_record_platforms/file_based_asset_positions.py
+
+This module contains tests for:
+- Buffering position updates until commit() for every storage type
+- Writing <ASSET>.json through temp files and an intent file, and completing an interrupted commit on startup
+- One intent file per writer (writer_id) when several shards share the directory
+- Writing a round of journal / sqlite updates in one batch
+"""
+
+import unittest
+import tempfile
+import shutil
+import json
+import os
+from decimal import Decimal
+
+from binance.enums import SIDE_BUY, SIDE_SELL
+
+# Add the project root to the path
+import sys
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from asset_record_platforms.durable_file import write_json_synced
+from asset_record_platforms.file_based_asset_positions import STORAGE_TYPES, AssetPositions
+from asset_record_platforms.position import Transaction
+from exchange_api_wrappers.wrapped_data import WatchingSymbol
+
+WATCHING_SYMBOLS = [
+    WatchingSymbol(symbol="BTCUSDT", base_asset="BTC", info={}),
+    WatchingSymbol(symbol="ETHUSDT", base_asset="ETH", info={}),
+]
+
+
+def make_transaction(asset, n, activity=SIDE_BUY, price='40000'):
+    return Transaction(
+        time=1700000000000 + n,
+        activity=activity,
+        symbol=asset,
+        trade_symbol=f'{asset}USDT',
+        quantity=Decimal('0.001'),
+        price=Decimal(price),
+        commission=Decimal('0.04'),
+        commission_asset='USDT',
+        commission_as_usdt=Decimal('0.04'),
+        round_id=f'round-{n}',
+        order_id=str(n),
+        trade_id=f'{asset}-{n}',
+        closed_trade_ids=[])
+
+
+class TestGroupCommit(unittest.TestCase):
+    """Test cases for AssetPositions(group_commit=True)"""
+
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.test_dir, ignore_errors=True)
+
+    def create_record(self, storage='json', group_commit=True):
+        return AssetPositions(
+            WATCHING_SYMBOLS, 'USDT', base_dir=self.test_dir, storage=storage, compact_every=2,
+            group_commit=group_commit)
+
+    def add_round(self, record, start):
+        for n in range(start, start + 3):
+            activity = SIDE_SELL if n % 3 == 2 else SIDE_BUY
+            record.positions['BTC'].add_transaction(make_transaction('BTC', n, activity, str(40000 + n * 100)))
+        record.positions['ETH'].add_transaction(make_transaction('ETH', start, price='2000'))
+
+    def test_updates_written_on_commit(self):
+        for storage in STORAGE_TYPES:
+            with self.subTest(storage=storage):
+                record = self.create_record(storage)
+                self.add_round(record, 0)
+                self.assertEqual(self.create_record(storage).get_transactions_count(), 0)
+
+                self.assertEqual(record.commit(), 4)
+                self.assertEqual(record.commit(), 0)
+                self.add_round(record, 3)
+                record.commit()
+
+                reloaded = self.create_record(storage)
+                for asset in ('BTC', 'ETH'):
+                    self.assertEqual(reloaded.positions[asset].to_dict(), record.positions[asset].to_dict())
+
+                shutil.rmtree(self.test_dir)
+                os.makedirs(self.test_dir)
+
+    def test_matches_per_fill_writes(self):
+        for storage in STORAGE_TYPES:
+            with self.subTest(storage=storage):
+                grouped = self.create_record(storage)
+                self.add_round(grouped, 0)
+                grouped.commit()
+                expected = {asset: self.create_record(storage).positions[asset].to_dict() for asset in ('BTC', 'ETH')}
+
+                shutil.rmtree(self.test_dir)
+                os.makedirs(self.test_dir)
+                per_fill = self.create_record(storage, group_commit=False)
+                self.add_round(per_fill, 0)
+                reloaded = self.create_record(storage, group_commit=False)
+                for asset in ('BTC', 'ETH'):
+                    self.assertEqual(reloaded.positions[asset].to_dict(), expected[asset])
+
+                shutil.rmtree(self.test_dir)
+                os.makedirs(self.test_dir)
+
+    def test_complete_interrupted_json_commit(self):
+        record = self.create_record()
+        self.add_round(record, 0)
+        record.commit()
+        self.add_round(record, 3)
+        expected = {asset: record.positions[asset].to_dict() for asset in ('BTC', 'ETH')}
+
+        # crashed after the intent file was written and BTC.json was replaced, before ETH.json was
+        write_json_synced(os.path.join(self.test_dir, 'ETH.json.tmp'), expected['ETH'])
+        write_json_synced(os.path.join(self.test_dir, 'BTC.json'), expected['BTC'])
+        write_json_synced(os.path.join(self.test_dir, AssetPositions.COMMIT_INTENT_FILE), {'assets': ['BTC', 'ETH']})
+
+        recovered = self.create_record()
+        for asset in ('BTC', 'ETH'):
+            self.assertEqual(recovered.positions[asset].to_dict(), expected[asset])
+        self.assertFalse(os.path.exists(os.path.join(self.test_dir, AssetPositions.COMMIT_INTENT_FILE)))
+        self.assertFalse(os.path.exists(os.path.join(self.test_dir, 'ETH.json.tmp')))
+
+    def test_discard_json_commit_without_intent(self):
+        record = self.create_record()
+        self.add_round(record, 0)
+        record.commit()
+        expected = record.positions['BTC'].to_dict()
+
+        # crashed while writing the temp files, before the intent file
+        with open(os.path.join(self.test_dir, 'BTC.json.tmp'), 'w') as f:
+            f.write('{"open_quantity": "0.00')
+
+        recovered = self.create_record()
+        self.assertEqual(recovered.positions['BTC'].to_dict(), expected)
+
+        # the next commit overwrites the leftover temp file
+        recovered.positions['BTC'].add_transaction(make_transaction('BTC', 9))
+        recovered.commit()
+        self.assertEqual(self.create_record().positions['BTC'].get_transactions_count(), 4)
+
+    def test_intent_file_per_writer(self):
+        btc_writer = AssetPositions(WATCHING_SYMBOLS[:1], 'USDT', base_dir=self.test_dir, group_commit=True,
+                                    writer_id='shard-0')
+        btc_writer.positions['BTC'].add_transaction(make_transaction('BTC', 0))
+        btc_writer.commit()
+        btc_writer.positions['BTC'].add_transaction(make_transaction('BTC', 1))
+        expected = btc_writer.positions['BTC'].to_dict()
+
+        # shard-0 crashed after its intent file was written, before BTC.json was replaced
+        intent_path = os.path.join(self.test_dir, AssetPositions.COMMIT_INTENT_FILE + '.shard-0')
+        write_json_synced(os.path.join(self.test_dir, 'BTC.json.tmp'), expected)
+        write_json_synced(intent_path, {'assets': ['BTC']})
+
+        # another shard starting or committing leaves the intent file of shard-0 alone
+        eth_writer = AssetPositions(WATCHING_SYMBOLS[1:], 'USDT', base_dir=self.test_dir, group_commit=True,
+                                    writer_id='shard-1')
+        eth_writer.positions['ETH'].add_transaction(make_transaction('ETH', 0, price='2000'))
+        eth_writer.commit()
+        self.assertTrue(os.path.exists(intent_path))
+        self.assertTrue(os.path.exists(os.path.join(self.test_dir, 'BTC.json.tmp')))
+        self.assertFalse(os.path.exists(os.path.join(self.test_dir, AssetPositions.COMMIT_INTENT_FILE + '.shard-1')))
+
+        recovered = AssetPositions(WATCHING_SYMBOLS[:1], 'USDT', base_dir=self.test_dir, group_commit=True,
+                                   writer_id='shard-0')
+        self.assertEqual(recovered.positions['BTC'].to_dict(), expected)
+        self.assertFalse(os.path.exists(intent_path))
+
+    def test_journal_commit_appends_once(self):
+        record = self.create_record('journal')
+        self.add_round(record, 0)
+        record.commit()
+
+        with open(os.path.join(self.test_dir, 'journal', 'BTC.jsonl')) as f:
+            self.assertEqual(len(f.readlines()), 3)
+        with open(os.path.join(self.test_dir, 'journal', 'BTC.header.json')) as f:
+            header = json.load(f)
+        self.assertEqual(header['transaction_count'], 3)
+        self.assertEqual(header['journal_size'], os.path.getsize(os.path.join(self.test_dir, 'journal', 'BTC.jsonl')))
+
+
+if __name__ == '__main__':
+    unittest.main()
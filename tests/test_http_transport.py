@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+"""
+Unit tests for exchange_api_wrappers/http_transport.py
+
+This module contains tests for:
+- Jittered exponential backoff
+- Retrying GET requests on 5xx and timeouts, never retrying POST (orders)
+- Connection pool sizing and per-endpoint latency statistics
+"""
+
+import unittest
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+
+# Add the project root to the path
+import sys
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from exchange_api_wrappers.http_transport import HttpTransport
+from exchange_api_wrappers.rate_limiter import RequestWeightLimiter
+
+
+class FlakyHandler(BaseHTTPRequestHandler):
+    """Fails the first `failures` requests with 503 (or by stalling), then answers 200."""
+
+    failures = 0
+    stall_seconds = 0
+    requests_seen = 0
+
+    def __answer(self):
+        FlakyHandler.requests_seen += 1
+        if FlakyHandler.requests_seen <= FlakyHandler.failures:
+            if FlakyHandler.stall_seconds:
+                time.sleep(FlakyHandler.stall_seconds)
+            else:
+                self.send_response(503)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", "2")
+        self.end_headers()
+        self.wfile.write(b"{}")
+
+    def do_GET(self):
+        self.__answer()
+
+    def do_POST(self):
+        self.__answer()
+
+    def log_message(self, format, *args):
+        pass
+
+
+class TestBackoff(unittest.TestCase):
+    """Test cases for HttpTransport.backoff()"""
+
+    def test_backoff_is_capped_and_jittered(self):
+        transport = HttpTransport(
+            RequestWeightLimiter(), backoff_seconds=0.5, max_backoff_seconds=2.0, rand=lambda: 1.0)
+        self.assertEqual([transport.backoff(n) for n in range(4)], [0.5, 1.0, 2.0, 2.0])
+
+        transport = HttpTransport(RequestWeightLimiter(), backoff_seconds=0.5, rand=lambda: 0.25)
+        self.assertEqual(transport.backoff(1), 0.25)
+
+    def test_invalid_parameters(self):
+        with self.assertRaises(ValueError):
+            HttpTransport(RequestWeightLimiter(), pool_size=0)
+
+
+class TestTransportSession(unittest.TestCase):
+    """Test cases for HttpTransport mounted on a requests.Session"""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.server = ThreadingHTTPServer(("127.0.0.1", 0), FlakyHandler)
+        cls.base_url = f"http://127.0.0.1:{cls.server.server_port}"
+        cls.thread = threading.Thread(target=cls.server.serve_forever, daemon=True)
+        cls.thread.start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def setUp(self):
+        FlakyHandler.failures = 0
+        FlakyHandler.stall_seconds = 0
+        FlakyHandler.requests_seen = 0
+        self.waits = []
+        self.transport = HttpTransport(
+            RequestWeightLimiter(), pool_size=4, timeout_seconds=0.5, max_retries=2, sleep=self.waits.append)
+        self.session = requests.Session()
+        self.transport.mount(self.session)
+
+    def tearDown(self):
+        self.session.close()
+
+    def test_get_is_retried_on_5xx(self):
+        FlakyHandler.failures = 2
+        response = self.session.get(f"{self.base_url}/api/v3/ticker/price")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(FlakyHandler.requests_seen, 3)
+        self.assertEqual(len(self.waits), 2)
+        # every attempt reserves its own request weight
+        self.assertEqual(self.transport.request_limiter.pop_round_stats()['requests'], 3)
+
+    def test_gives_up_after_max_retries(self):
+        FlakyHandler.failures = 5
+        response = self.session.get(f"{self.base_url}/api/v3/ticker/price")
+
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(FlakyHandler.requests_seen, 3)
+
+    def test_post_is_not_retried(self):
+        FlakyHandler.failures = 1
+        response = self.session.post(f"{self.base_url}/api/v3/order")
+
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(FlakyHandler.requests_seen, 1)
+        self.assertEqual(self.waits, [])
+
+    def test_timeout_is_retried(self):
+        FlakyHandler.failures = 1
+        FlakyHandler.stall_seconds = 1.0
+        response = self.session.get(f"{self.base_url}/api/v3/klines", params={"symbol": "BTCUSDT"})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(self.waits), 1)
+
+    def test_pool_size_and_latency_stats(self):
+        adapter = self.session.get_adapter(self.base_url)
+        self.assertEqual(adapter._pool_maxsize, 4)
+
+        self.session.get(f"{self.base_url}/api/v3/exchangeInfo")
+        stats = self.transport.latency_stats()
+
+        self.assertIn("GET /api/v3/exchangeInfo", stats)
+        self.assertGreaterEqual(stats["GET /api/v3/exchangeInfo"]['count'], 1)
+        self.assertIsNotNone(stats["GET /api/v3/exchangeInfo"]['p99'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+"""
+Unit tests for asset_record_platforms/journal_position_store.py
+
+This module contains tests for:
+- Appending transactions without rewriting <ASSET>.json, compacting the header every N transactions
+- Recovering aggregates from the header plus the journal tail, or from the whole journal
+- Loading transactions lazily, only when they are first read
+- Converting legacy <ASSET>.json files and exporting them again for the dashboard
+- Read-only loading that never truncates the journal or rewrites the header
+"""
+
+import unittest
+import tempfile
+import shutil
+import json
+import os
+from decimal import Decimal
+
+from binance.enums import SIDE_BUY, SIDE_SELL
+
+# Add the project root to the path
+import sys
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from asset_record_platforms.file_based_asset_positions import AssetPositions
+from asset_record_platforms.position import Transaction
+from exchange_api_wrappers.wrapped_data import WatchingSymbol
+
+WATCHING_SYMBOLS = [WatchingSymbol(symbol="BTCUSDT", base_asset="BTC", info={})]
+
+
+def make_transaction(n, activity=SIDE_BUY, quantity='0.001', price='40000'):
+    return Transaction(
+        time=1700000000000 + n,
+        activity=activity,
+        symbol='BTC',
+        trade_symbol='BTCUSDT',
+        quantity=Decimal(quantity),
+        price=Decimal(price),
+        commission=Decimal('0.04'),
+        commission_asset='USDT',
+        commission_as_usdt=Decimal('0.04'),
+        round_id=f'round-{n}',
+        order_id=str(n),
+        trade_id=str(n),
+        closed_trade_ids=[])
+
+
+class TestJournalPositionStore(unittest.TestCase):
+    """Test cases for AssetPositions with storage='journal'"""
+
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+        self.journal_path = os.path.join(self.test_dir, 'journal', 'BTC.jsonl')
+        self.header_path = os.path.join(self.test_dir, 'journal', 'BTC.header.json')
+
+    def tearDown(self):
+        shutil.rmtree(self.test_dir, ignore_errors=True)
+
+    def create_record(self):
+        return AssetPositions(WATCHING_SYMBOLS, 'USDT', base_dir=self.test_dir, storage='journal', compact_every=3)
+
+    def add_transactions(self, record, count):
+        for n in range(count):
+            activity = SIDE_SELL if n % 3 == 2 else SIDE_BUY
+            record.positions['BTC'].add_transaction(make_transaction(n, activity, price=str(40000 + n * 100)))
+
+    def test_append_and_compact(self):
+        record = self.create_record()
+        self.add_transactions(record, 4)
+
+        self.assertFalse(os.path.exists(os.path.join(self.test_dir, 'BTC.json')))
+        with open(self.journal_path) as f:
+            self.assertEqual(len(f.readlines()), 4)
+        with open(self.header_path) as f:
+            header = json.load(f)
+        self.assertEqual(header['transaction_count'], 3)
+
+    def test_recover_aggregates(self):
+        record = self.create_record()
+        self.add_transactions(record, 5)
+        expected = record.positions['BTC'].to_dict()
+
+        reloaded = self.create_record().positions['BTC'].to_dict()
+        self.assertEqual(reloaded, expected)
+
+        # without the header the whole journal is replayed
+        os.remove(self.header_path)
+        self.assertEqual(self.create_record().positions['BTC'].to_dict(), expected)
+
+    def test_lazy_transactions(self):
+        record = self.create_record()
+        self.add_transactions(record, 4)
+        expected = record.positions['BTC'].to_dict()
+
+        position = self.create_record().positions['BTC']
+        self.assertFalse(position.transactions_loaded())
+        self.assertEqual(position.get_transactions_count(), 4)
+        self.assertEqual(position.open_quantity, record.positions['BTC'].open_quantity)
+
+        # a transaction added before loading is read back from the journal only once
+        position.add_transaction(make_transaction(7))
+        self.assertFalse(position.transactions_loaded())
+        self.assertEqual(position.get_transactions_count(), 5)
+        self.assertEqual(
+            [t.trade_id for t in position.transactions], [t['trade_id'] for t in expected['transactions']] + ['7'])
+        self.assertTrue(position.transactions_loaded())
+
+    def test_header_without_journal_size(self):
+        record = self.create_record()
+        self.add_transactions(record, 4)
+        expected = record.positions['BTC'].to_dict()
+
+        # headers written before journal_size existed fall back to replaying the whole journal
+        with open(self.header_path) as f:
+            header = json.load(f)
+        del header['journal_size']
+        with open(self.header_path, 'w') as f:
+            json.dump(header, f)
+
+        self.assertEqual(self.create_record().positions['BTC'].to_dict(), expected)
+        self.assertFalse(self.create_record().positions['BTC'].transactions_loaded())
+
+    def test_truncated_last_line(self):
+        record = self.create_record()
+        self.add_transactions(record, 2)
+        with open(self.journal_path, 'a') as f:
+            f.write('{"time": "17000')
+
+        record = self.create_record()
+        self.assertEqual(record.positions['BTC'].get_transactions_count(), 2)
+
+        # the torn record was cut off, the next transaction starts on its own line
+        record.positions['BTC'].add_transaction(make_transaction(9))
+        self.assertEqual(self.create_record().positions['BTC'].get_transactions_count(), 3)
+
+    def test_legacy_conversion_and_export(self):
+        legacy = AssetPositions(WATCHING_SYMBOLS, 'USDT', base_dir=self.test_dir)
+        self.add_transactions(legacy, 2)
+        expected = legacy.positions['BTC'].to_dict()
+
+        record = self.create_record()
+        self.assertEqual(record.positions['BTC'].to_dict(), expected)
+        self.assertTrue(os.path.exists(self.journal_path))
+
+        record.positions['BTC'].add_transaction(make_transaction(5))
+        record.export_json()
+        exported = AssetPositions(WATCHING_SYMBOLS, 'USDT', base_dir=self.test_dir)
+        self.assertEqual(exported.positions['BTC'].to_dict(), record.positions['BTC'].to_dict())
+
+    def test_read_only_has_no_side_effects(self):
+        record = self.create_record()
+        self.add_transactions(record, 4)
+        with open(self.journal_path, 'a') as f:
+            f.write('{"time": "17000')
+        os.remove(self.header_path)
+        with open(self.journal_path, 'rb') as f:
+            journal = f.read()
+
+        reader = AssetPositions(
+            WATCHING_SYMBOLS, 'USDT', base_dir=self.test_dir, storage='journal', compact_every=3, read_only=True)
+        self.assertEqual(reader.positions['BTC'].get_transactions_count(), 4)
+
+        # the record being appended by the writer is left alone, and the header is not rebuilt
+        with open(self.journal_path, 'rb') as f:
+            self.assertEqual(f.read(), journal)
+        self.assertFalse(os.path.exists(self.header_path))
+
+    def test_read_only_legacy_not_converted(self):
+        legacy = AssetPositions(WATCHING_SYMBOLS, 'USDT', base_dir=self.test_dir)
+        self.add_transactions(legacy, 2)
+
+        reader = AssetPositions(WATCHING_SYMBOLS, 'USDT', base_dir=self.test_dir, storage='journal', read_only=True)
+        self.assertEqual(reader.positions['BTC'].to_dict(), legacy.positions['BTC'].to_dict())
+        self.assertFalse(os.path.exists(os.path.join(self.test_dir, 'journal')))
+        self.assertEqual(AssetPositions.stored_assets(self.test_dir, 'journal'), [])
+
+    def test_invalid_storage(self):
+        with self.assertRaises(ValueError):
+            AssetPositions(WATCHING_SYMBOLS, 'USDT', base_dir=self.test_dir, storage='csv')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+Unit tests for KlineBatch in exchange_api_wrappers/wrapped_data.py
+
+This module contains tests for:
+- Building contiguous numpy columns from raw REST / stream rows
+- Exact Decimal access to single candles
+- RSI / WILLR analyzers reading the columns without conversion
+"""
+
+import unittest
+import os
+from decimal import Decimal
+
+import numpy
+import talib
+
+# Add the project root to the path
+import sys
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from analyzer import Trade, RSI_Analyzer, WILLR_Analyzer
+from exchange_api_wrappers.wrapped_data import Kline, KlineBatch
+
+ONE_MINUTE_MS = 60 * 1000
+
+
+def make_raw_kline(index, close):
+    open_time = index * ONE_MINUTE_MS
+    return [open_time, close, str(Decimal(close) + 1), str(Decimal(close) - 1), close, "100.0",
+            open_time + ONE_MINUTE_MS - 1, "150.0", 10, "50.0", "75.0", "0"]
+
+
+class TestKlineBatch(unittest.TestCase):
+    """Test cases for KlineBatch class"""
+
+    def setUp(self):
+        self.rows = [make_raw_kline(i, f"{100 + i}.10000001") for i in range(30)]
+        self.batch = KlineBatch(self.rows)
+
+    def test_columns_are_contiguous_arrays(self):
+        for column in (self.batch.open, self.batch.high, self.batch.low, self.batch.close, self.batch.volume):
+            self.assertEqual(column.dtype, numpy.float64)
+            self.assertTrue(column.flags['C_CONTIGUOUS'])
+            self.assertEqual(len(column), 30)
+
+        self.assertEqual(self.batch.open_time.dtype, numpy.int64)
+        self.assertEqual(self.batch.close_time[-1], 30 * ONE_MINUTE_MS - 1)
+        self.assertAlmostEqual(self.batch.high[0], 101.10000001)
+
+    def test_decimal_view_is_exact(self):
+        self.assertEqual(self.batch.decimal_close(), Decimal("129.10000001"))
+        self.assertEqual(self.batch.decimal_close(0), Decimal("100.10000001"))
+
+    def test_sequence_access_returns_kline(self):
+        self.assertEqual(len(self.batch), 30)
+        self.assertIsInstance(self.batch[-1], Kline)
+        self.assertEqual(self.batch[-1].close, Decimal("129.10000001"))
+        self.assertEqual([k.open_time for k in self.batch][:2], [0, ONE_MINUTE_MS])
+        self.assertEqual(len(self.batch[-5:]), 5)
+
+    def test_empty_batch(self):
+        batch = KlineBatch([])
+        self.assertEqual(len(batch), 0)
+        self.assertEqual(len(batch.close), 0)
+
+
+class TestAnalyzersOnKlineBatch(unittest.TestCase):
+    """The analyzers get the same indicator values as from per-candle floats"""
+
+    def setUp(self):
+        # Steady decline: oversold on both indicators
+        self.batch = KlineBatch([make_raw_kline(i, f"{200 - i * 3}.5") for i in range(30)])
+        self.position = type('Position', (), {'open_quantity': Decimal('0')})()
+
+    def test_rsi(self):
+        analyzer = RSI_Analyzer({'RSI': {'period': 14, 'oversell': 70, 'underbuy': 30}})
+        closes = numpy.array([float(k.close) for k in self.batch])
+        self.assertEqual(talib.RSI(closes, 14)[-1], talib.RSI(self.batch.close, 14)[-1])
+        self.assertEqual(analyzer.analyze(self.batch, self.position), Trade.BUY)
+
+    def test_willr(self):
+        analyzer = WILLR_Analyzer({'WILLR': {'period': 14, 'oversell': -20, 'underbuy': -80}})
+        self.assertEqual(analyzer.analyze(self.batch, self.position), Trade.BUY)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+"""
+Unit tests for exchange_api_wrappers/kline_stream.py
+
+This module contains tests for:
+- Initial REST backfill of the per-symbol K line buffer
+- Merging WebSocket K line messages (same candle update, next candle, gaps)
+- Reading K lines back in the same shape as the REST API
+- Not serving a buffer with a gap until the REST repair finishes, dropping it when the repair fails
+- Not serving a buffer that has not been updated for over one interval
+- Stopping the background event loop from another thread
+"""
+
+import asyncio
+import threading
+import time
+import unittest
+import os
+from decimal import Decimal
+from unittest.mock import AsyncMock, MagicMock, Mock, patch
+
+# Add the project root to the path
+import sys
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from exchange_api_wrappers.kline_stream import KlineStreamCache, stream_kline_to_raw
+
+ONE_MINUTE_MS = 60 * 1000
+
+
+def make_raw_kline(open_time, close):
+    return [open_time, "1.0", "2.0", "0.5", close, "100.0",
+            open_time + ONE_MINUTE_MS - 1, "150.0", 10, "50.0", "75.0", "0"]
+
+
+def make_stream_kline(open_time, close):
+    return {
+        "t": open_time, "T": open_time + ONE_MINUTE_MS - 1, "s": "BTCUSDT", "i": "1m",
+        "o": "1.0", "c": close, "h": "2.0", "l": "0.5", "v": "100.0", "n": 10,
+        "x": False, "q": "150.0", "V": "50.0", "Q": "75.0", "B": "0"
+    }
+
+
+class TestKlineStreamCache(unittest.TestCase):
+    """Test cases for KlineStreamCache class"""
+
+    def setUp(self):
+        """Set up a cache backfilled with 3 one-minute candles for BTCUSDT."""
+        self.rest_klines = Mock()
+        self.rest_klines.get_raw_klines.return_value = [
+            make_raw_kline(0, "10.0"),
+            make_raw_kline(ONE_MINUTE_MS, "11.0"),
+            make_raw_kline(2 * ONE_MINUTE_MS, "12.0"),
+        ]
+        self.cache = KlineStreamCache(self.rest_klines, "1m", buffer_size=3)
+        # Backfill only, without starting the WebSocket thread
+        self.cache._KlineStreamCache__backfill("BTCUSDT")
+
+    def test_stream_kline_to_raw_matches_rest_layout(self):
+        """Stream payloads are converted to the REST list layout."""
+        self.assertEqual(stream_kline_to_raw(make_stream_kline(0, "10.0")),
+                         make_raw_kline(0, "10.0"))
+
+    def test_covers(self):
+        """Only backfilled symbols on the subscribed interval are covered."""
+        self.assertTrue(self.cache.covers("BTCUSDT", "1m"))
+        self.assertFalse(self.cache.covers("BTCUSDT", "1d"))
+        self.assertFalse(self.cache.covers("ETHUSDT", "1m"))
+
+    def test_update_of_forming_candle(self):
+        """A message for the last candle replaces it in place."""
+        self.assertTrue(self.cache.on_kline_message(
+            "BTCUSDT", make_stream_kline(2 * ONE_MINUTE_MS, "12.5")))
+
+        klines = self.cache.get_klines("BTCUSDT", 3)
+        self.assertEqual(len(klines), 3)
+        self.assertEqual(klines[-1].close, Decimal("12.5"))
+
+    def test_next_candle_rolls_buffer(self):
+        """A message for the next candle is appended and the oldest is dropped."""
+        self.assertTrue(self.cache.on_kline_message(
+            "BTCUSDT", make_stream_kline(3 * ONE_MINUTE_MS, "13.0")))
+
+        klines = self.cache.get_klines("BTCUSDT", 3)
+        self.assertEqual([k.close for k in klines],
+                         [Decimal("11.0"), Decimal("12.0"), Decimal("13.0")])
+
+    def test_gap_requests_repair(self):
+        """Skipping a candle reports a gap so REST can repair the buffer."""
+        self.assertFalse(self.cache.on_kline_message(
+            "BTCUSDT", make_stream_kline(5 * ONE_MINUTE_MS, "15.0")))
+
+    def test_reads_during_repair(self):
+        """A buffer with a gap is not served until the REST repair replaces it."""
+        self.assertFalse(self.cache.on_kline_message(
+            "BTCUSDT", make_stream_kline(5 * ONE_MINUTE_MS, "15.0")))
+        self.assertIsNone(self.cache.get_klines("BTCUSDT", 3))
+
+        # messages arriving while the repair is pending do not schedule another one
+        self.assertTrue(self.cache.on_kline_message(
+            "BTCUSDT", make_stream_kline(6 * ONE_MINUTE_MS, "16.0")))
+        self.assertIsNone(self.cache.get_klines("BTCUSDT", 3))
+
+        self.rest_klines.get_raw_klines.return_value = [
+            make_raw_kline(n * ONE_MINUTE_MS, f"{10 + n}.0") for n in range(4, 7)]
+        self.cache._KlineStreamCache__repair("BTCUSDT")
+
+        klines = self.cache.get_klines("BTCUSDT", 3)
+        self.assertEqual([k.close for k in klines], [Decimal("14.0"), Decimal("15.0"), Decimal("16.0")])
+
+    def test_failed_repair_drops_buffer(self):
+        """A buffer whose REST repair fails is dropped, so the symbol is downloaded from REST."""
+        self.assertFalse(self.cache.on_kline_message(
+            "BTCUSDT", make_stream_kline(5 * ONE_MINUTE_MS, "15.0")))
+
+        self.rest_klines.get_raw_klines.side_effect = ConnectionError("REST API unavailable")
+        self.cache._KlineStreamCache__repair("BTCUSDT")
+
+        self.assertFalse(self.cache.covers("BTCUSDT", "1m"))
+        self.assertIsNone(self.cache.get_klines("BTCUSDT", 3))
+        # later messages for the dropped symbol are ignored
+        self.assertTrue(self.cache.on_kline_message(
+            "BTCUSDT", make_stream_kline(6 * ONE_MINUTE_MS, "16.0")))
+        self.assertIsNone(self.cache.get_klines("BTCUSDT", 3))
+
+    def test_stale_buffer_not_served(self):
+        """A buffer without messages for over one interval is not served."""
+        now = [1000.0]
+        cache = KlineStreamCache(self.rest_klines, "1m", buffer_size=3, clock=lambda: now[0])
+        cache._KlineStreamCache__backfill("BTCUSDT")
+
+        now[0] += 59
+        self.assertIsNotNone(cache.get_klines("BTCUSDT", 3))
+        self.assertTrue(cache.on_kline_message("BTCUSDT", make_stream_kline(2 * ONE_MINUTE_MS, "12.5")))
+
+        now[0] += 60
+        self.assertIsNotNone(cache.get_klines("BTCUSDT", 3))
+        now[0] += 1
+        self.assertIsNone(cache.get_klines("BTCUSDT", 3))
+
+        # the stream catching up serves the buffer again
+        self.assertTrue(cache.on_kline_message("BTCUSDT", make_stream_kline(3 * ONE_MINUTE_MS, "13.0")))
+        self.assertEqual(cache.get_klines("BTCUSDT", 3)[-1].close, Decimal("13.0"))
+
+    def test_stop_cancels_event_loop(self):
+        """stop() cancels the streams from inside the event loop and joins the thread."""
+        class Socket:
+            async def __aenter__(self):
+                return self
+
+            async def __aexit__(self, *args):
+                return False
+
+            async def recv(self):
+                # a quiet stream, only cancellation ends it
+                await asyncio.Event().wait()
+
+        client = Mock()
+        client.close_connection = AsyncMock()
+        socket_manager = MagicMock()
+        socket_manager.multiplex_socket.side_effect = lambda streams: Socket()
+
+        with patch('exchange_api_wrappers.kline_stream.AsyncClient.create', AsyncMock(return_value=client)), \
+                patch('exchange_api_wrappers.kline_stream.BinanceSocketManager', return_value=socket_manager):
+            self.cache.start(["BTCUSDT"])
+            for _ in range(100):
+                if socket_manager.multiplex_socket.called:
+                    break
+                time.sleep(0.01)
+
+            self.cache.stop()
+
+        self.assertFalse(any(t.name == "kline-stream" for t in threading.enumerate()))
+        client.close_connection.assert_awaited_once()
+
+    def test_get_klines_not_enough_data(self):
+        """Asking for more candles than buffered returns None."""
+        self.assertIsNone(self.cache.get_klines("BTCUSDT", 4))
+        self.assertIsNone(self.cache.get_klines("ETHUSDT", 1))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+"""
+Integration tests for recorded-market replay
+
+This module contains tests for:
+- SimulatedClock advancing instead of sleeping
+- RecordedMarketClient never returning candles or prices from the future
+- TradeLoopRunner replaying a recording with mock trading on the simulated clock
+"""
+
+import unittest
+import importlib.util
+import os
+import json
+import tempfile
+import shutil
+from threading import Event
+
+# Add the project root to the path
+import sys
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from bot_env_config.config import Config
+from exchange_api_wrappers.crypto import Crypto
+from exchange_api_wrappers.recorded_market import RecordedMarketClient, record_market
+from fake_exchange import FakeBinanceMarket
+from simulated_clock import SimulatedClock
+
+# 2023-11-14 22:00:00 UTC, on an hour boundary
+START = 1_699_999_200.0
+HOUR = 3600
+
+
+class FakeMarketClient:
+    """Exposes FakeBinanceMarket through the two Client methods record_market() uses."""
+
+    def __init__(self, market):
+        self.market = market
+
+    def get_exchange_info(self):
+        return self.market.exchange_info()
+
+    def get_historical_klines(self, symbol, interval, start_ms, end_ms):
+        return self.market.klines(symbol, interval, limit=1000, start_time=start_ms, end_time=end_ms)
+
+
+def make_recording(record_dir, end):
+    market = FakeBinanceMarket(symbol_count=3, clock=lambda: end)
+    record_market(
+        FakeMarketClient(market), record_dir, market.symbols, ['1m', '1h'],
+        int((START - 5 * HOUR) * 1000), int(end * 1000))
+    return market
+
+
+class TestSimulatedClock(unittest.TestCase):
+    """Test cases for SimulatedClock"""
+
+    def test_wait_advances_time(self):
+        clock = SimulatedClock(START, START + 90)
+        clock.wait(60, Event())
+        self.assertEqual(clock.time(), START + 60)
+        self.assertFalse(clock.is_finished())
+
+        clock.wait(60, Event())
+        self.assertTrue(clock.is_finished())
+
+    def test_stop_request_freezes_time(self):
+        clock = SimulatedClock(START)
+        stop = Event()
+        stop.set()
+        clock.wait(60, stop)
+        self.assertEqual(clock.time(), START)
+
+    def test_negative_speed(self):
+        with self.assertRaises(ValueError):
+            SimulatedClock(START, speed=-1)
+
+
+class TestRecordedMarketClient(unittest.TestCase):
+    """Test cases for RecordedMarketClient"""
+
+    def setUp(self):
+        self.record_dir = tempfile.mkdtemp()
+        self.market = make_recording(self.record_dir, START + 3 * HOUR)
+        self.clock = SimulatedClock(START + HOUR + 30 * 60 + 5)
+        self.client = RecordedMarketClient(self.record_dir, self.clock)
+
+    def tearDown(self):
+        shutil.rmtree(self.record_dir)
+
+    def test_no_look_ahead(self):
+        now_ms = self.clock.time() * 1000
+        rows = self.client.get_klines(symbol='BTCUSDT', interval='1h', limit=3)
+
+        self.assertEqual(len(rows), 3)
+        self.assertTrue(all(row[0] <= now_ms for row in rows))
+        # the last candle is still forming, the others are closed
+        self.assertTrue(all(row[6] < now_ms for row in rows[:-1]))
+        self.assertEqual(rows[-1][0], (START + HOUR) * 1000)
+
+        # the forming candle closes at the last closed 1m candle, which is also the ticker price
+        minutes = self.client.get_klines(symbol='BTCUSDT', interval='1m', limit=2)
+        self.assertEqual(float(rows[-1][4]), float(minutes[-2][4]))
+        self.assertEqual(self.client.get_symbol_ticker(symbol='BTCUSDT')['price'], minutes[-2][4])
+
+    def test_time_moves_forward(self):
+        before = self.client.get_symbol_ticker(symbol='ETHUSDT')['price']
+        self.clock.advance(HOUR)
+        after = self.client.get_symbol_ticker(symbol='ETHUSDT')['price']
+
+        self.assertNotEqual(before, after)
+        self.assertEqual(len(self.client.get_symbol_ticker()), 3)
+
+    def test_tradable_symbols_from_recording(self):
+        crypto = Crypto.get_mock_trade_and_replay_klines(self.__config(), self.record_dir, self.clock)
+        symbols = crypto.get_tradable_symbols('USDT', None, [])
+        self.assertEqual(sorted(s.symbol for s in symbols), sorted(self.market.symbols))
+
+    def __config(self):
+        config = Config.__new__(Config)
+        config.config_dir = self.record_dir
+        config.position_manage = {'cash_currency': 'USDT', 'mock_trading_dir': 'mock-trading'}
+        return config
+
+
+# trade_loop imports the Google Sheets report, which needs pandas and pygsheets
+@unittest.skipUnless(
+    importlib.util.find_spec('pandas') and importlib.util.find_spec('pygsheets'),
+    'trade_loop requires pandas and pygsheets')
+class TestReplayTradeLoop(unittest.TestCase):
+    """Test cases for TradeLoopRunner on a SimulatedClock"""
+
+    def setUp(self):
+        self.work_dir = tempfile.mkdtemp()
+        self.record_dir = os.path.join(self.work_dir, 'record')
+        make_recording(self.record_dir, START + 3 * HOUR)
+
+        self.config_dir = os.path.join(self.work_dir, 'config')
+        os.makedirs(self.config_dir)
+        files = {
+            'auth.json': {'API_KEY': '', 'API_SECRET': ''},
+            'bot.json': {},
+            'analyzer.json': {
+                'type': 'DCA_Buy', 'kline_interval': '1h', 'klines_limit': 3,
+                'DCA': {'min_interval_between_buy': HOUR},
+            },
+            'position-manage.json': {
+                'cash_currency': 'USDT',
+                'max_fund_per_order': '20',
+                'include_currencies': ['BTC'],
+                'position_accumulation_strategy': 'accumulate',
+                'round_interval_seconds': 600,
+                'asset_positions_dir': 'asset-positions',
+                'mock_trading_dir': 'mock-trading',
+            },
+        }
+        for name, content in files.items():
+            with open(os.path.join(self.config_dir, name), 'w') as outfile:
+                json.dump(content, outfile)
+
+    def tearDown(self):
+        shutil.rmtree(self.work_dir)
+
+    def test_replay_buys_on_simulated_schedule(self):
+        import trade_loop
+
+        config = Config(self.config_dir)
+        clock = SimulatedClock(START, START + 3 * HOUR)
+        crypto = Crypto.get_mock_trade_and_replay_klines(config, self.record_dir, clock)
+        runner = trade_loop.TradeLoopRunner(config, crypto=crypto, clock=clock, serve_metrics=False)
+
+        runner.start_loop()
+
+        self.assertTrue(clock.is_finished())
+        with open(os.path.join(self.config_dir, 'mock-trading', 'mock-record.json')) as json_file:
+            positions = json.load(json_file)['positions']
+        # one DCA buy per simulated hour
+        self.assertGreater(float(positions['BTC']), 0)
+        with open(os.path.join(self.config_dir, 'asset-positions', 'BTC.json')) as json_file:
+            transactions = json.load(json_file)['transactions']
+        self.assertEqual([int(tx['time']) for tx in transactions],
+                         [int((START + n * HOUR) * 1000) for n in range(3)])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+"""
+Unit tests for metrics/registry.py
+
+This module contains tests for:
+- Counters and histograms with labels
+- Quantile estimates from histogram buckets
+- PhaseTimer per-symbol and per-round accounting
+- JSON snapshot export
+- Prometheus text format and the /metrics HTTP endpoint
+"""
+
+import unittest
+import os
+import json
+import shutil
+import tempfile
+import urllib.error
+import urllib.request
+
+# Add the project root to the path
+import sys
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from metrics import MetricsRegistry, PhaseTimer, MetricsHTTPServer, to_prometheus_text
+
+
+class TestMetricsRegistry(unittest.TestCase):
+    """Test cases for MetricsRegistry, Counter and Histogram"""
+
+    def setUp(self):
+        self.registry = MetricsRegistry()
+
+    def test_counter_labels(self):
+        counter = self.registry.counter('orders_total', 'Orders')
+        counter.inc(side='BUY')
+        counter.inc(2, side='BUY')
+        counter.inc(side='SELL')
+
+        self.assertEqual(counter.value(side='BUY'), 3)
+        self.assertEqual(counter.value(side='SELL'), 1)
+        self.assertEqual(counter.value(side='OTHER'), 0)
+
+    def test_same_name_returns_same_metric(self):
+        self.assertIs(self.registry.counter('a'), self.registry.counter('a'))
+        with self.assertRaises(ValueError):
+            self.registry.histogram('a')
+
+    def test_histogram_count_sum_quantile(self):
+        histogram = self.registry.histogram('latency', buckets=(0.1, 1, 10))
+        for value in (0.05, 0.05, 0.5, 5):
+            histogram.observe(value, phase='analyze')
+
+        self.assertEqual(histogram.count(phase='analyze'), 4)
+        self.assertAlmostEqual(histogram.sum(phase='analyze'), 5.6)
+        self.assertEqual(histogram.quantile(0.5, phase='analyze'), 0.1)
+        self.assertEqual(histogram.quantile(0.99, phase='analyze'), 10)
+        self.assertIsNone(histogram.quantile(0.5, phase='missing'))
+
+    def test_histogram_samples_are_cumulative(self):
+        histogram = self.registry.histogram('latency', buckets=(1, 2))
+        histogram.observe(0.5)
+        histogram.observe(3)
+
+        (labels, value), = histogram.samples()
+        self.assertEqual(labels, {})
+        self.assertEqual(value['buckets'], [(1, 1), (2, 1), (float('inf'), 2)])
+
+    def test_export_json(self):
+        self.registry.counter('rounds_total', 'Rounds').inc()
+        self.registry.histogram('round_seconds').observe(1.5)
+
+        test_dir = tempfile.mkdtemp()
+        try:
+            path = os.path.join(test_dir, 'metrics.json')
+            self.registry.export_json(path)
+            with open(path) as f:
+                data = json.load(f)
+        finally:
+            shutil.rmtree(test_dir, ignore_errors=True)
+
+        self.assertEqual(data['rounds_total']['type'], 'counter')
+        self.assertEqual(data['rounds_total']['samples'][0]['value'], 1)
+        self.assertEqual(data['round_seconds']['samples'][0]['value']['count'], 1)
+
+
+class TestPhaseTimer(unittest.TestCase):
+    """Test cases for PhaseTimer"""
+
+    def test_round_totals_and_symbol_samples(self):
+        registry = MetricsRegistry()
+        round_histogram = registry.histogram('round_phase_seconds')
+        symbol_histogram = registry.histogram('symbol_phase_seconds')
+        timer = PhaseTimer(round_histogram, symbol_histogram)
+
+        timer.add('kline_download', 0.2, 'BTCUSDT')
+        timer.add('kline_download', 0.3, 'ETHUSDT')
+        with timer.phase('gsheet_sync'):
+            pass
+
+        durations = timer.finish()
+        self.assertAlmostEqual(durations['kline_download'], 0.5)
+        self.assertIn('gsheet_sync', durations)
+        self.assertEqual(round_histogram.count(phase='kline_download'), 1)
+        self.assertEqual(symbol_histogram.count(phase='kline_download', symbol='BTCUSDT'), 1)
+        self.assertEqual(symbol_histogram.count(phase='gsheet_sync'), 0)
+
+    def test_account_labels(self):
+        registry = MetricsRegistry()
+        round_histogram = registry.histogram('round_phase_seconds')
+        symbol_histogram = registry.histogram('symbol_phase_seconds')
+        alice = PhaseTimer(round_histogram, symbol_histogram, {'account': 'alice'})
+        bob = PhaseTimer(round_histogram, symbol_histogram, {'account': 'bob'})
+
+        alice.add('analyze', 0.2, 'BTCUSDT')
+        bob.add('analyze', 0.4, 'BTCUSDT')
+        alice.finish()
+        bob.finish()
+
+        self.assertAlmostEqual(round_histogram.sum(phase='analyze', account='alice'), 0.2)
+        self.assertAlmostEqual(round_histogram.sum(phase='analyze', account='bob'), 0.4)
+        self.assertEqual(symbol_histogram.count(phase='analyze', symbol='BTCUSDT', account='bob'), 1)
+
+
+class TestPrometheusExporter(unittest.TestCase):
+    """Test cases for the Prometheus text format exporter"""
+
+    def setUp(self):
+        self.registry = MetricsRegistry()
+        self.registry.counter('orders_total', 'Orders sent').inc(side='BUY', result='ok')
+        self.registry.gauge('free_cash', 'Free cash').set_function(lambda: 123.5)
+        self.registry.histogram('round_seconds', 'Round duration', buckets=(1, 10)).observe(2)
+
+    def test_text_format(self):
+        text = to_prometheus_text(self.registry)
+
+        self.assertIn('# TYPE orders_total counter', text)
+        self.assertIn('orders_total{result="ok",side="BUY"} 1.0', text)
+        self.assertIn('free_cash 123.5', text)
+        self.assertIn('round_seconds_bucket{le="1.0"} 0', text)
+        self.assertIn('round_seconds_bucket{le="10.0"} 1', text)
+        self.assertIn('round_seconds_bucket{le="+Inf"} 1', text)
+        self.assertIn('round_seconds_count 1', text)
+        self.assertTrue(text.endswith('\n'))
+
+    def test_label_escaping(self):
+        self.registry.counter('escaped').inc(path='a"b\\c')
+        self.assertIn('escaped{path="a\\"b\\\\c"} 1.0', to_prometheus_text(self.registry))
+
+    def test_http_endpoint(self):
+        server = MetricsHTTPServer(port=0, registry=self.registry)
+        server.start()
+        try:
+            with urllib.request.urlopen(f"http://127.0.0.1:{server.port}/metrics") as response:
+                body = response.read().decode('utf-8')
+                self.assertTrue(response.headers['Content-Type'].startswith('text/plain'))
+
+            with self.assertRaises(urllib.error.HTTPError):
+                urllib.request.urlopen(f"http://127.0.0.1:{server.port}/other")
+        finally:
+            server.stop()
+
+        self.assertIn('free_cash 123.5', body)
+
+
+if __name__ == '__main__':
+    unittest.main()
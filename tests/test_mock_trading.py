@@ -8,9 +8,12 @@ This module contains tests for:
 - Balance management and position tracking
 - Data persistence and file operations
 - Integration with Binance price feeds
+- Journal persistence: appending fills, periodic snapshots and recovery
+- Group persistence: fills written once per commit()
 """
 
 import unittest
+import asyncio
 import tempfile
 import shutil
 import json
@@ -44,7 +47,7 @@ class TestMockTradingWrapper(unittest.TestCase):
         
         # Mock Binance quote wrapper
         self.mock_binance_quote = Mock()
-        self.mock_binance_quote.get_latest_price.return_value = {'price': '50000.00'}
+        self.mock_binance_quote.get_latest_price_cache_first.return_value = {'price': '50000.00'}
         
         # Sample watching symbols
         self.watching_symbols = [
@@ -185,6 +188,16 @@ class TestMockTradingWrapper(unittest.TestCase):
         self.assertEqual(fill["price"], "50000.00")  # From mock
         self.assertEqual(fill["qty"], "0.001")
 
+    def test_order_qty_async_client_order_id(self):
+        """The asyncio version returns the given clientOrderId."""
+        wrapper = MockTradingWrapper(self.mock_config, self.mock_binance_quote)
+
+        success, order = asyncio.run(wrapper.order_qty_async(
+            SIDE_BUY, "0.001", "BTCUSDT", ORDER_TYPE_MARKET, client_order_id="cb1BBTCUSDT"))
+
+        self.assertTrue(success)
+        self.assertEqual(order["clientOrderId"], "cb1BBTCUSDT")
+
     def test_order_qty_sell_order_basic(self):
         """Test basic sell order execution."""
         # Set up wrapper with existing BTC position
@@ -259,7 +272,7 @@ class TestMockTradingWrapper(unittest.TestCase):
         wrapper = MockTradingWrapper(self.mock_config, self.mock_binance_quote)
         
         # Mock Binance API to raise exception
-        self.mock_binance_quote.get_latest_price.side_effect = Exception("API Error")
+        self.mock_binance_quote.get_latest_price_cache_first.side_effect = Exception("API Error")
         
         success, order = wrapper.order_qty(
             side=SIDE_BUY,
@@ -448,7 +461,7 @@ class TestMockTradingWrapper(unittest.TestCase):
         def mock_get_price(symbol):
             return price_responses.get(symbol, {"price": "1.00"})
         
-        self.mock_binance_quote.get_latest_price.side_effect = mock_get_price
+        self.mock_binance_quote.get_latest_price_cache_first.side_effect = mock_get_price
         
         # Trade different assets
         trades = [
@@ -556,6 +569,96 @@ class TestMockTradingWrapper(unittest.TestCase):
         self.assertEqual(balances["BTC"].free, Decimal('0.001'))
 
 
+class TestMockTradingJournal(unittest.TestCase):
+    """Test cases for mock_trading_persistence: journal"""
+
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+        self.mock_config = Mock()
+        self.mock_config.position_manage = {
+            'cash_currency': 'USDT',
+            'mock_trading_persistence': 'journal',
+            'mock_trading_snapshot_every_fills': 3,
+        }
+        self.mock_binance_quote = Mock()
+        self.mock_binance_quote.get_latest_price_cache_first.return_value = {'price': '50000.00'}
+        self.watching_symbols = [WatchingSymbol(symbol="BTCUSDT", base_asset="BTC", info={})]
+        self.record_path = os.path.join(self.test_dir, "mock-record.json")
+        self.journal_path = os.path.join(self.test_dir, "mock-journal.jsonl")
+
+    def tearDown(self):
+        shutil.rmtree(self.test_dir, ignore_errors=True)
+
+    def create_wrapper(self):
+        return MockTradingWrapper(self.mock_config, self.mock_binance_quote, base_dir=self.test_dir)
+
+    def buy(self, wrapper, count):
+        for _ in range(count):
+            success, order = wrapper.order_qty(SIDE_BUY, "0.001", "BTCUSDT", ORDER_TYPE_MARKET)
+            self.assertTrue(success)
+
+    def test_fills_appended_until_snapshot(self):
+        wrapper = self.create_wrapper()
+        self.buy(wrapper, 2)
+
+        self.assertFalse(os.path.exists(self.record_path))
+        with open(self.journal_path) as f:
+            self.assertEqual(len(f.readlines()), 2)
+
+        # the third fill reaches mock_trading_snapshot_every_fills
+        self.buy(wrapper, 1)
+        with open(self.record_path) as f:
+            self.assertEqual(Decimal(json.load(f)['positions']['BTC']), Decimal('0.003'))
+        self.assertEqual(os.path.getsize(self.journal_path), 0)
+
+    def test_recover_from_snapshot_and_journal(self):
+        wrapper = self.create_wrapper()
+        self.buy(wrapper, 5)
+        expected = wrapper.get_equities_balance(self.watching_symbols, "USDT")
+
+        # no snapshot() on shutdown, as after a crash
+        recovered = self.create_wrapper().get_equities_balance(self.watching_symbols, "USDT")
+        self.assertEqual(recovered["BTC"].free, Decimal('0.005'))
+        self.assertEqual(recovered["USDT"].free, expected["USDT"].free)
+
+    def test_snapshot_already_covering_journal(self):
+        wrapper = self.create_wrapper()
+        self.buy(wrapper, 2)
+        with open(self.journal_path) as f:
+            journal = f.read()
+
+        # crashed after the snapshot replaced the record, before the journal was cleared
+        wrapper.snapshot()
+        with open(self.journal_path, 'w') as f:
+            f.write(journal + '{"seq": 3, "side": "BUY", "asse')
+
+        balances = self.create_wrapper().get_equities_balance(self.watching_symbols, "USDT")
+        self.assertEqual(balances["BTC"].free, Decimal('0.002'))
+        self.assertEqual(balances["USDT"].free, Decimal('10000000000') - Decimal('100.00'))
+
+    def test_group_commit(self):
+        self.mock_config.position_manage['mock_trading_persistence'] = 'group'
+        wrapper = self.create_wrapper()
+        self.buy(wrapper, 2)
+        self.assertFalse(os.path.exists(self.record_path))
+        self.assertFalse(os.path.exists(self.journal_path))
+
+        wrapper.commit()
+        with open(self.record_path) as f:
+            self.assertEqual(Decimal(json.load(f)['positions']['BTC']), Decimal('0.002'))
+
+        # fills after the last commit are lost on a crash, the committed balances stay consistent
+        self.buy(wrapper, 1)
+        balances = self.create_wrapper().get_equities_balance(self.watching_symbols, "USDT")
+        self.assertEqual(balances["BTC"].free, Decimal('0.002'))
+        self.assertEqual(balances["USDT"].free, Decimal('10000000000') - Decimal('100.00'))
+
+    def test_invalid_persistence(self):
+        self.mock_config.position_manage['mock_trading_persistence'] = 'sqlite'
+        with self.assertRaises(ValueError):
+            self.create_wrapper()
+
+
 class TestMockTradingWrapperIntegration(unittest.TestCase):
     """Integration tests for MockTradingWrapper"""
     
@@ -586,7 +689,7 @@ class TestMockTradingWrapperIntegration(unittest.TestCase):
             {"price": "47000.00"},  # Recovery
         ]
         
-        mock_binance.get_latest_price.side_effect = price_sequence
+        mock_binance.get_latest_price_cache_first.side_effect = price_sequence
         
         wrapper = MockTradingWrapper(mock_config, mock_binance)
         
@@ -0,0 +1,411 @@
+#!/usr/bin/env python3
+"""
+Unit tests for running several accounts in one process (multi_account_host.py)
+
+This module contains tests for:
+- Loading an account's Config from its own directory, with data dirs relative to it
+- Per-account data directories and their validation
+- MarketData reusing one K line stream for every account on the same interval
+- MarketData downloading exchangeInfo once and sharing REST K lines between accounts (sync and asyncio)
+- Total request weight of N accounts on the fake exchange not growing with N
+- AssetPositions and MockTradingWrapper keeping records under the given base_dir
+"""
+
+import unittest
+import asyncio
+import importlib.util
+import tempfile
+import shutil
+import json
+import os
+import threading
+import time
+from decimal import Decimal
+from unittest.mock import AsyncMock, Mock, patch
+
+# Add the project root to the path
+import sys
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import send_order
+from asset_record_platforms.file_based_asset_positions import AssetPositions
+from bot_env_config.config import Config
+from exchange_api_wrappers.crypto import Crypto, MarketData
+from exchange_api_wrappers.mock_trading import MockTradingWrapper
+from fake_exchange import FakeBinanceMarket, FakeBinanceServer
+from multi_account_host import load_account_configs, report_market_data_stats
+from simulated_clock import SimulatedClock
+
+NOW = 1_700_000_000.0
+HOUR = 3600
+
+
+def write_account_config(config_dir, **position_manage):
+    os.makedirs(config_dir)
+    files = {
+        'auth.json': {'API_KEY': 'key', 'API_SECRET': 'secret'},
+        'analyzer.json': {'type': 'DCA'},
+        'position-manage.json': dict({'cash_currency': 'USDT', 'max_fund_per_order': '20'}, **position_manage),
+        'bot.json': {},
+    }
+    for name, content in files.items():
+        with open(os.path.join(config_dir, name), 'w') as f:
+            json.dump(content, f)
+
+
+class TestAccountConfig(unittest.TestCase):
+    """Test cases for Config(config_dir) and load_account_configs()"""
+
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.test_dir)
+
+    def test_data_dir_is_relative_to_config_dir(self):
+        config_dir = os.path.join(self.test_dir, 'alice')
+        write_account_config(config_dir, asset_positions_dir='positions')
+
+        config = Config(config_dir)
+        self.assertEqual(config.config_dir, config_dir)
+        self.assertEqual(config.get_data_dir('asset_positions_dir'), os.path.join(config_dir, 'positions'))
+        self.assertIsNone(config.get_data_dir('mock_trading_dir'))
+
+    def test_default_data_dirs_per_account(self):
+        for name in ('alice', 'bob'):
+            write_account_config(os.path.join(self.test_dir, name))
+
+        alice, bob = load_account_configs(
+            [os.path.join(self.test_dir, 'alice'), os.path.join(self.test_dir, 'bob')])
+
+        self.assertEqual(alice.get_data_dir('asset_positions_dir'),
+                         os.path.join(self.test_dir, 'alice', 'asset-positions'))
+        self.assertNotEqual(alice.get_data_dir('mock_trading_dir'), bob.get_data_dir('mock_trading_dir'))
+
+    def test_shared_data_dir_is_rejected(self):
+        shared = os.path.join(self.test_dir, 'shared-positions')
+        for name in ('alice', 'bob'):
+            write_account_config(os.path.join(self.test_dir, name), asset_positions_dir=shared)
+
+        with self.assertRaises(ValueError):
+            load_account_configs([os.path.join(self.test_dir, 'alice'), os.path.join(self.test_dir, 'bob')])
+
+    def test_asyncio_engine_is_rejected(self):
+        config_dir = os.path.join(self.test_dir, 'alice')
+        write_account_config(config_dir, trade_loop_engine='asyncio')
+
+        with self.assertRaises(ValueError):
+            load_account_configs([config_dir])
+
+
+class TestMarketData(unittest.TestCase):
+    """Test cases for MarketData K line stream sharing"""
+
+    def setUp(self):
+        patcher = patch('exchange_api_wrappers.kline_stream.KlineStreamCache')
+        self.stream_class = patcher.start()
+        self.addCleanup(patcher.stop)
+        self.market_data = MarketData(client=Mock(), klines=Mock())
+
+    def test_covered_request_reuses_stream(self):
+        self.market_data.start_kline_stream(['BTCUSDT', 'ETHUSDT'], '1d', 20, with_mini_tickers=True)
+        self.market_data.start_kline_stream(['BTCUSDT'], '1d', 20, with_mini_tickers=True)
+
+        self.assertEqual(self.stream_class.call_count, 1)
+        self.stream_class.return_value.stop.assert_not_called()
+
+    def test_wider_request_restarts_with_union(self):
+        self.market_data.start_kline_stream(['BTCUSDT'], '1d', 20)
+        self.market_data.start_kline_stream(['ETHUSDT'], '1d', 30)
+
+        self.assertEqual(self.stream_class.call_count, 2)
+        self.assertEqual(self.stream_class.call_args.args[2], 30)
+        self.stream_class.return_value.start.assert_called_with(['BTCUSDT', 'ETHUSDT'])
+        self.stream_class.return_value.stop.assert_called_once()
+
+    def test_intervals_have_separate_streams(self):
+        self.market_data.start_kline_stream(['BTCUSDT'], '1d', 20)
+        self.market_data.start_kline_stream(['BTCUSDT'], '1h', 20)
+
+        self.assertEqual(self.stream_class.call_count, 2)
+        self.assertIsNotNone(self.market_data.get_kline_stream('1h'))
+
+        self.market_data.stop_kline_streams()
+        self.assertIsNone(self.market_data.get_kline_stream('1d'))
+
+
+class TestSharedDownloads(unittest.TestCase):
+    """Test cases for MarketData sharing exchangeInfo and REST K lines"""
+
+    def setUp(self):
+        self.klines = Mock()
+        self.klines.pop_kline_fetch_stats.return_value = {'fetched': 0, 'saved': 0}
+
+    def test_klines_are_downloaded_once_within_ttl(self):
+        market_data = MarketData(client=Mock(), klines=self.klines, kline_share_ttl=30)
+
+        first = market_data.get_klines('BTCUSDT', 20, '1h')
+        second = market_data.get_klines('BTCUSDT', 20, '1h')
+        market_data.get_klines('BTCUSDT', 30, '1h')
+
+        self.assertIs(first, second)
+        self.assertEqual(self.klines.get_klines.call_count, 2)
+        self.assertEqual(market_data.pop_kline_fetch_stats()['shared'], 1)
+        self.assertEqual(market_data.pop_kline_fetch_stats()['shared'], 0)
+
+    def test_no_sharing_by_default(self):
+        market_data = MarketData(client=Mock(), klines=self.klines)
+
+        market_data.get_klines('BTCUSDT', 20, '1h')
+        market_data.get_klines('BTCUSDT', 20, '1h')
+
+        self.assertEqual(self.klines.get_klines.call_count, 2)
+
+    def test_concurrent_requests_wait_for_one_download(self):
+        market_data = MarketData(client=Mock(), klines=self.klines, kline_share_ttl=30)
+        started = threading.Event()
+        release = threading.Event()
+
+        def slow_download(*args):
+            started.set()
+            release.wait(5)
+            return 'klines'
+        self.klines.get_klines.side_effect = slow_download
+
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(market_data.get_klines('BTCUSDT', 20, '1h')))
+                   for _ in range(3)]
+        threads[0].start()
+        started.wait(5)
+        for thread in threads[1:]:
+            thread.start()
+        shared = 0
+        for _ in range(500):
+            # wait until the other two threads are waiting for the same download
+            shared += market_data.pop_kline_fetch_stats()['shared']
+            if shared == 2:
+                break
+            time.sleep(0.01)
+        release.set()
+        for thread in threads:
+            thread.join(5)
+
+        self.assertEqual(shared, 2)
+        self.assertEqual(results, ['klines'] * 3)
+        self.assertEqual(self.klines.get_klines.call_count, 1)
+
+    def test_failed_download_is_retried(self):
+        market_data = MarketData(client=Mock(), klines=self.klines, kline_share_ttl=30)
+        self.klines.get_klines.side_effect = [ConnectionError(), 'klines']
+
+        with self.assertRaises(ConnectionError):
+            market_data.get_klines('BTCUSDT', 20, '1h')
+        self.assertEqual(market_data.get_klines('BTCUSDT', 20, '1h'), 'klines')
+
+    def test_async_requests_share_one_download(self):
+        market_data = MarketData(client=Mock(), klines=self.klines, kline_share_ttl=30)
+
+        async def slow_download(*args):
+            await asyncio.sleep(0.05)
+            return 'klines'
+        self.klines.get_klines_async = AsyncMock(side_effect=slow_download)
+
+        async def request_all():
+            return await asyncio.gather(*[market_data.get_klines_async('BTCUSDT', 20, '1h') for _ in range(3)])
+
+        self.assertEqual(asyncio.run(request_all()), ['klines'] * 3)
+        # the sync path reuses the result of the asyncio download
+        self.assertEqual(market_data.get_klines('BTCUSDT', 20, '1h'), 'klines')
+        self.assertEqual(self.klines.get_klines_async.await_count, 1)
+        self.klines.get_klines.assert_not_called()
+        self.assertEqual(market_data.pop_kline_fetch_stats()['shared'], 3)
+
+    def test_cancelled_async_download_releases_waiters(self):
+        market_data = MarketData(client=Mock(), klines=self.klines, kline_share_ttl=30)
+
+        async def endless_download(*args):
+            await asyncio.Event().wait()
+        self.klines.get_klines_async = AsyncMock(side_effect=endless_download)
+
+        async def cancel_download():
+            download = asyncio.ensure_future(market_data.get_klines_async('BTCUSDT', 20, '1h'))
+            waiter = asyncio.ensure_future(market_data.get_klines_async('BTCUSDT', 20, '1h'))
+            await asyncio.sleep(0.01)
+            download.cancel()
+            with self.assertRaises(asyncio.CancelledError):
+                await asyncio.wait_for(waiter, 5)
+
+        asyncio.run(cancel_download())
+        # the next request downloads again
+        self.klines.get_klines_async = AsyncMock(return_value='klines')
+        self.assertEqual(asyncio.run(market_data.get_klines_async('BTCUSDT', 20, '1h')), 'klines')
+
+    def test_exchange_info_is_downloaded_once(self):
+        market_data = MarketData(client=Mock(), klines=self.klines)
+
+        market_data.get_tradable_symbols('USDT', ['BTC'], None)
+        market_data.get_tradable_symbols('USDT', None, ['DOGE'])
+
+        self.klines.get_exchange_info.assert_called_once()
+        self.assertIs(self.klines.get_tradable_symbols.call_args.kwargs['exchange_info'],
+                      self.klines.get_exchange_info.return_value)
+
+
+class FakeExchangeAccounts(unittest.TestCase):
+    """Accounts with their own config directories, trading on one FakeBinanceServer"""
+
+    SYMBOL_COUNT = 5
+
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+        self.market = FakeBinanceMarket(symbol_count=self.SYMBOL_COUNT, clock=lambda: NOW)
+        self.server = FakeBinanceServer(self.market)
+        self.server.start()
+        self.addCleanup(self.server.stop)
+
+    def tearDown(self):
+        shutil.rmtree(self.test_dir)
+
+    def make_accounts(self, names, **position_manage):
+        """Return the Config of each account and the MarketData they share, created from the first one"""
+        for name in names:
+            write_account_config(
+                os.path.join(self.test_dir, name),
+                binance_base_url=self.server.base_url,
+                http_max_retries=0,
+                # prices and K lines stay fresh for the whole test, so request counts do not depend on timing
+                price_cache_ttl_seconds=600,
+                kline_share_ttl_seconds=600,
+                **position_manage)
+
+        configs = load_account_configs([os.path.join(self.test_dir, name) for name in names])
+        return configs, Crypto.create_market_data(configs[0], shared=True)
+
+
+class TestSharedRequestWeight(FakeExchangeAccounts):
+    """Test cases for the request weight of several accounts sharing MarketData"""
+
+    def run_accounts(self, count):
+        """Run one round on N accounts at once: list symbols, download K lines of each, buy the first one"""
+        names = [f"account-{n}-of-{count}" for n in range(count)]
+        configs, market_data = self.make_accounts(names)
+
+        def run_round(config):
+            crypto = Crypto.get_trade_with_shared_market_data(config, market_data)
+            symbols = crypto.get_tradable_symbols('USDT', None, [])
+            for symbol_info in symbols:
+                crypto.get_klines(symbol_info.symbol, 20, '1h')
+
+            position = AssetPositions.from_config(config, symbols, 'USDT').positions[symbols[0].base_asset]
+            send_order.execute_buy_order(
+                crypto, symbols[0].base_asset, symbols[0].symbol, 'USDT', Decimal('20'), position,
+                symbols[0], 'round-1')
+
+            # stats of the shared MarketData are taken by the host, not by each account
+            self.assertIsNone(crypto.pop_request_weight_stats())
+            self.assertIsNone(crypto.pop_kline_fetch_stats())
+
+        accounts = [threading.Thread(target=run_round, args=(config,)) for config in configs]
+        for account in accounts:
+            account.start()
+        for account in accounts:
+            account.join(30)
+
+        return market_data
+
+    def test_weight_does_not_grow_with_accounts(self):
+        weights = [self.run_accounts(count).pop_request_weight_stats()['weight'] for count in (1, 3)]
+
+        self.assertGreater(weights[0], 0)
+        self.assertEqual(weights[0], weights[1])
+        self.assertEqual(self.server.request_counts['/api/v3/exchangeInfo'], 2)
+        self.assertEqual(self.server.request_counts['/api/v3/klines'], 2 * self.SYMBOL_COUNT)
+
+    def test_host_reports_stats_once(self):
+        market_data = self.run_accounts(3)
+
+        report_market_data_stats(market_data)
+
+        self.assertEqual(market_data.pop_request_weight_stats()['weight'], 0)
+        self.assertEqual(market_data.pop_kline_fetch_stats()['shared'], 0)
+
+
+# trade_loop imports the Google Sheets report, which needs pandas and pygsheets
+@unittest.skipUnless(
+    importlib.util.find_spec('pandas') and importlib.util.find_spec('pygsheets'),
+    'trade_loop requires pandas and pygsheets')
+class TestHostTradeLoop(FakeExchangeAccounts):
+    """Test cases for several TradeLoopRunner sharing MarketData on the fake exchange"""
+
+    def run_accounts(self, count):
+        import trade_loop
+
+        names = [f"account-{n}-of-{count}" for n in range(count)]
+        configs, market_data = self.make_accounts(
+            names,
+            include_currencies=['BTC', 'ETH'],
+            position_accumulation_strategy='accumulate',
+            round_interval_seconds=600)
+        for config in configs:
+            config.analyzer = {
+                'type': 'DCA_Buy', 'kline_interval': '1h', 'klines_limit': 3,
+                'DCA': {'min_interval_between_buy': HOUR},
+            }
+
+        runners = [
+            trade_loop.TradeLoopRunner(
+                config, market_data=market_data, account_name=os.path.basename(config.config_dir),
+                serve_metrics=False, clock=SimulatedClock(NOW, NOW + HOUR))
+            for config in configs]
+        accounts = [threading.Thread(target=runner.start_loop) for runner in runners]
+        for account in accounts:
+            account.start()
+        for account in accounts:
+            account.join(60)
+
+        return configs, market_data.pop_request_weight_stats()['weight']
+
+    def test_weight_does_not_grow_with_accounts(self):
+        _, single_weight = self.run_accounts(1)
+        configs, weight = self.run_accounts(3)
+
+        self.assertEqual(single_weight, weight)
+        for config in configs:
+            with open(os.path.join(config.get_data_dir('asset_positions_dir'), 'BTC.json')) as json_file:
+                self.assertGreater(len(json.load(json_file)['transactions']), 0)
+
+
+class TestPerAccountRecords(FakeExchangeAccounts):
+    """Test cases for base_dir of AssetPositions and MockTradingWrapper"""
+
+    def test_asset_positions_base_dir(self):
+        (alice_config, bob_config), market_data = self.make_accounts(['alice', 'bob'])
+        alice = Crypto.get_trade_with_shared_market_data(alice_config, market_data)
+        symbols = alice.get_tradable_symbols('USDT', ['BTC'], None)
+        alice_record = AssetPositions.from_config(alice_config, symbols, 'USDT')
+        bob_record = AssetPositions.from_config(bob_config, symbols, 'USDT')
+
+        buy = send_order.execute_buy_order(
+            alice, 'BTC', 'BTCUSDT', 'USDT', Decimal('20'), alice_record.positions['BTC'], symbols[0], 'round-1')
+        sell = send_order.close_all_position(
+            alice, 'BTC', 'BTCUSDT', 'USDT', alice_record.positions['BTC'], symbols[0], 'round-2')
+
+        self.assertEqual(buy.status, send_order.OrderStatus.OK)
+        self.assertEqual(sell.status, send_order.OrderStatus.OK)
+        with open(os.path.join(alice_config.get_data_dir('asset_positions_dir'), 'BTC.json')) as json_file:
+            self.assertEqual(len(json.load(json_file)['transactions']), 2)
+        self.assertEqual(bob_record.positions['BTC'].get_transactions_count(), 0)
+        self.assertFalse(os.path.exists(os.path.join(bob_config.get_data_dir('asset_positions_dir'), 'BTC.json')))
+
+    def test_mock_trading_base_dir(self):
+        config = Mock()
+        config.position_manage = {'cash_currency': 'USDT'}
+
+        MockTradingWrapper(config, Mock(), base_dir=os.path.join(self.test_dir, 'alice'))
+
+        self.assertTrue(os.path.isdir(os.path.join(self.test_dir, 'alice')))
+        self.assertNotEqual(MockTradingWrapper.BASE_DIR, os.path.join(self.test_dir, 'alice'))
+
+
+if __name__ == '__main__':
+    unittest.main()
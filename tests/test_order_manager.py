@@ -0,0 +1,212 @@
+#!/usr/bin/env python3
+"""
+Unit tests for order_manager.py
+
+This module contains tests for:
+- Deterministic newClientOrderId per round, symbol and side
+- Fills from the order response and from executionReport applied to the position once
+- Partially filled orders that expire only recording the executed quantity
+- send_order handing orders to the OrderManager and returning PENDING
+"""
+
+import unittest
+import os
+import threading
+from decimal import Decimal
+from unittest.mock import Mock
+
+from binance.enums import SIDE_BUY, SIDE_SELL
+
+# Add the project root to the path
+import sys
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import send_order
+from asset_record_platforms.position import Position
+from exchange_api_wrappers.wrapped_data import SymbolFilters
+from order_manager import MAX_CLIENT_ORDER_ID_LENGTH, OrderManager, make_client_order_id
+from send_order import OrderStatus
+
+
+def make_order(client_order_id, status, fills):
+    return {
+        'symbol': 'ETHUSDT',
+        'orderId': 42,
+        'clientOrderId': client_order_id,
+        'transactTime': 1700000000000,
+        'status': status,
+        'side': SIDE_BUY,
+        'type': 'MARKET',
+        'fills': fills,
+    }
+
+
+def make_fill(trade_id, qty, price='2000'):
+    return {'price': price, 'qty': qty, 'commission': '0.02', 'commissionAsset': 'USDT', 'tradeId': trade_id}
+
+
+def execution_report(client_order_id, trade_id, qty, status, price='2000'):
+    return {
+        'e': 'executionReport',
+        'c': client_order_id,
+        'C': '',
+        'x': 'TRADE',
+        'X': status,
+        'i': 42,
+        'T': 1700000000001,
+        'L': price,
+        'l': qty,
+        'n': '0.02',
+        'N': 'USDT',
+        't': trade_id,
+    }
+
+
+class TestClientOrderId(unittest.TestCase):
+    """Test cases for make_client_order_id()"""
+
+    def test_deterministic(self):
+        first = make_client_order_id('1700000000000000000', 'ETHUSDT', SIDE_BUY)
+        self.assertEqual(first, make_client_order_id('1700000000000000000', 'ETHUSDT', SIDE_BUY))
+        self.assertNotEqual(first, make_client_order_id('1700000000000000000', 'ETHUSDT', SIDE_SELL))
+        self.assertNotEqual(first, make_client_order_id('1700000000000000001', 'ETHUSDT', SIDE_BUY))
+
+    def test_length_limit(self):
+        client_order_id = make_client_order_id('1700000000000000000', '1000SATSFDUSD', SIDE_BUY)
+        self.assertLessEqual(len(client_order_id), MAX_CLIENT_ORDER_ID_LENGTH)
+        self.assertNotEqual(client_order_id, make_client_order_id('1700000000000000000', '1000SATSFDUSD', SIDE_SELL))
+
+
+class TestOrderManager(unittest.TestCase):
+    """Test cases for OrderManager"""
+
+    def setUp(self):
+        self.api_client = Mock()
+        self.position = Position('ETH', Mock(), None)
+        self.manager = OrderManager(self.api_client, 'USDT', max_workers=1)
+
+    def tearDown(self):
+        self.manager.shutdown()
+
+    def submit(self, quantity='0.01'):
+        return self.manager.submit(SIDE_BUY, 'ETHUSDT', 'ETH', quantity, self.position, 'round-1')
+
+    def test_fills_from_order_response(self):
+        self.api_client.order_qty.side_effect = lambda **kwargs: (True, make_order(
+            kwargs['client_order_id'], 'FILLED', [make_fill(1, '0.004'), make_fill(2, '0.006')]))
+
+        handle = self.submit()
+        self.assertTrue(handle.wait(5))
+
+        result = handle.to_order_result()
+        self.assertEqual(result.status, OrderStatus.OK)
+        self.assertEqual(len(result.transactions), 2)
+        self.assertEqual(self.position.open_quantity, Decimal('0.010'))
+        self.assertEqual(self.api_client.order_qty.call_args.kwargs['client_order_id'], handle.client_order_id)
+        self.assertEqual(self.manager.in_flight(), [])
+
+    def test_execution_report_deduplicated(self):
+        # the executionReport arrives before the order response, both carry trade 1
+        def order_qty(**kwargs):
+            self.manager.on_execution_report(execution_report(kwargs['client_order_id'], 1, '0.01', 'FILLED'))
+            return True, make_order(kwargs['client_order_id'], 'FILLED', [make_fill(1, '0.01')])
+
+        self.api_client.order_qty.side_effect = order_qty
+
+        handle = self.submit()
+        self.assertTrue(handle.wait(5))
+        self.manager.shutdown()
+
+        self.assertEqual(len(self.position.transactions), 1)
+        self.assertEqual(self.position.open_quantity, Decimal('0.01'))
+
+    def test_partial_fill_then_expired(self):
+        sent = threading.Event()
+
+        def order_qty(**kwargs):
+            sent.set()
+            return True, make_order(kwargs['client_order_id'], 'PARTIALLY_FILLED', [make_fill(1, '0.004')])
+
+        self.api_client.order_qty.side_effect = order_qty
+
+        handle = self.submit()
+        self.assertTrue(sent.wait(5))
+        self.assertFalse(handle.wait(0.5))
+        self.assertEqual(handle.to_order_result().status, OrderStatus.OK)
+
+        self.manager.on_execution_report(dict(
+            execution_report(handle.client_order_id, None, '0', 'EXPIRED'), x='EXPIRED'))
+        self.assertTrue(handle.done())
+
+        result = handle.to_order_result()
+        self.assertEqual(sum(tx.quantity for tx in result.transactions), Decimal('0.004'))
+        self.assertEqual(self.position.open_quantity, Decimal('0.004'))
+
+    def test_api_error(self):
+        self.api_client.order_qty.return_value = (False, None)
+
+        handle = self.submit()
+        self.assertTrue(handle.wait(5))
+        self.assertEqual(handle.to_order_result().status, OrderStatus.API_ERROR)
+        self.assertEqual(self.position.transactions, [])
+
+    def test_resubmit_returns_same_handle(self):
+        sent = threading.Event()
+        release = threading.Event()
+
+        def order_qty(**kwargs):
+            sent.set()
+            release.wait(5)
+            return True, make_order(kwargs['client_order_id'], 'FILLED', [make_fill(1, '0.01')])
+
+        self.api_client.order_qty.side_effect = order_qty
+
+        handle = self.submit()
+        self.assertTrue(sent.wait(5))
+        self.assertIs(self.submit(), handle)
+        release.set()
+
+        self.assertTrue(handle.wait(5))
+        self.assertEqual(self.api_client.order_qty.call_count, 1)
+
+
+class TestSendOrderWithOrderManager(unittest.TestCase):
+    """Test cases for send_order.execute_buy_order() with an OrderManager"""
+
+    def test_buy_returns_pending(self):
+        api_client = Mock()
+        api_client.get_latest_price_cache_first.return_value = {'price': '2000'}
+        symbol_info = Mock()
+        symbol_info.filters.min_notional = Decimal('5')
+        symbol_info.filters.min_qty = Decimal('0.0001')
+        symbol_info.filters.max_qty = Decimal('1000')
+        symbol_info.filters.step_size = Decimal('0.0001')
+        order_manager = Mock()
+
+        result = send_order.execute_buy_order(
+            api_client, 'ETH', 'ETHUSDT', 'USDT', Decimal('20'), Position('ETH', Mock(), None),
+            symbol_info, 'round-1', order_manager=order_manager)
+
+        self.assertEqual(result.status, OrderStatus.PENDING)
+        self.assertIs(result.handle, order_manager.submit.return_value)
+        self.assertEqual(order_manager.submit.call_args.kwargs['estimated_cost'], Decimal('20'))
+        api_client.order_qty.assert_not_called()
+
+    def test_buy_without_notional_filter(self):
+        api_client = Mock()
+        api_client.get_latest_price_cache_first.return_value = {'price': '2000'}
+        symbol_info = Mock()
+        symbol_info.filters = SymbolFilters([
+            {'filterType': 'LOT_SIZE', 'minQty': '0.0001', 'maxQty': '1000', 'stepSize': '0.0001'}])
+        order_manager = Mock()
+
+        result = send_order.execute_buy_order(
+            api_client, 'ETH', 'ETHUSDT', 'USDT', Decimal('20'), Position('ETH', Mock(), None),
+            symbol_info, 'round-1', order_manager=order_manager)
+
+        self.assertEqual(result.status, OrderStatus.PENDING)
+        self.assertEqual(order_manager.submit.call_args.args[3], '0.01')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+"""
+Integration tests for order_pipeline async of trade_loop.py
+
+This module contains tests for:
+- max_open_positions counting BUY orders that are still in flight
+- Orders still pending at order_fill_timeout_seconds being settled in a later round
+"""
+
+import unittest
+import importlib.util
+import os
+import json
+import tempfile
+import shutil
+import threading
+from decimal import Decimal
+from unittest import mock
+
+# Add the project root to the path
+import sys
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from bot_env_config.config import Config
+from exchange_api_wrappers.mock_trading import MockTradingWrapper
+from fake_exchange import FakeBinanceMarket, FakeBinanceServer
+from simulated_clock import SimulatedClock
+
+NOW = 1_700_000_000.0
+HOUR = 3600
+
+
+# trade_loop imports the Google Sheets report, which needs pandas and pygsheets
+@unittest.skipUnless(
+    importlib.util.find_spec('pandas') and importlib.util.find_spec('pygsheets'),
+    'trade_loop requires pandas and pygsheets')
+class TestOrderPipeline(unittest.TestCase):
+    """Test cases for TradeLoopRunner with order_pipeline async on the fake exchange"""
+
+    SYMBOL_COUNT = 6
+
+    def setUp(self):
+        self.work_dir = tempfile.mkdtemp()
+        self.market = FakeBinanceMarket(symbol_count=self.SYMBOL_COUNT, clock=lambda: NOW)
+        self.server = FakeBinanceServer(self.market)
+        self.server.start()
+        self.addCleanup(self.server.stop)
+
+    def tearDown(self):
+        shutil.rmtree(self.work_dir)
+
+    def make_config(self, name, **position_manage):
+        """Config of a mock trading account that buys every symbol once per hour"""
+        config_dir = os.path.join(self.work_dir, name)
+        os.makedirs(config_dir)
+        files = {
+            'auth.json': {'API_KEY': 'key', 'API_SECRET': 'secret'},
+            'bot.json': {},
+            'analyzer.json': {
+                'type': 'DCA_Buy', 'kline_interval': '1h', 'klines_limit': 3,
+                'DCA': {'min_interval_between_buy': HOUR},
+            },
+            'position-manage.json': dict({
+                'cash_currency': 'USDT',
+                'max_fund_per_order': '20',
+                'exclude_currencies': [],
+                'trading_mode': 'mock_trading',
+                'order_pipeline': 'async',
+                'order_fill_timeout_seconds': 0.2,
+                'binance_base_url': self.server.base_url,
+                'http_max_retries': 0,
+                'price_cache_ttl_seconds': 600,
+                'round_interval_seconds': 600,
+                'asset_positions_dir': 'asset-positions',
+                'mock_trading_dir': 'mock-trading',
+            }, **position_manage),
+        }
+        for file_name, content in files.items():
+            with open(os.path.join(config_dir, file_name), 'w') as outfile:
+                json.dump(content, outfile)
+
+        return Config(config_dir)
+
+    def run_loop(self, config, seconds=HOUR):
+        import trade_loop
+
+        clock = SimulatedClock(NOW, NOW + seconds)
+        runner = trade_loop.TradeLoopRunner(config, serve_metrics=False, clock=clock)
+        runner.start_loop()
+
+    def run_loop_with_orders_held(self, config):
+        """Run the loop with every order held until the second round downloads K lines"""
+        release = threading.Event()
+        order_qty = MockTradingWrapper.order_qty
+
+        def held_order_qty(*args, **kwargs):
+            release.wait(10)
+            return order_qty(*args, **kwargs)
+
+        first_round_end = self.server.request_counts.get('/api/v3/klines', 0) + self.SYMBOL_COUNT
+
+        def release_in_second_round():
+            while self.server.request_counts.get('/api/v3/klines', 0) <= first_round_end:
+                if release.wait(0.005):
+                    return
+            release.set()
+        releaser = threading.Thread(target=release_in_second_round, daemon=True)
+        releaser.start()
+        self.addCleanup(release.set)
+
+        with mock.patch.object(MockTradingWrapper, 'order_qty', held_order_qty):
+            self.run_loop(config)
+
+    def mock_positions(self, config):
+        with open(os.path.join(config.get_data_dir('mock_trading_dir'), 'mock-record.json')) as json_file:
+            return {k: Decimal(v) for k, v in json.load(json_file)['positions'].items()}
+
+    def bought(self, config):
+        return [k for k, v in self.mock_positions(config).items() if k != 'USDT' and v > 0]
+
+    def test_in_flight_buys_count_toward_limits(self):
+        limited_positions = self.make_config('max-open', max_open_positions=3)
+        limited_cost = self.make_config('max-cost', max_total_open_cost='50')
+
+        for config in (limited_positions, limited_cost):
+            self.run_loop_with_orders_held(config)
+
+        self.assertEqual(len(self.bought(limited_positions)), 3)
+        # the last BUY that starts below max_total_open_cost may go over it by one order
+        self.assertLessEqual(len(self.bought(limited_cost)), 3)
+
+    def test_late_fills_settled_in_next_round(self):
+        sync = self.make_config('sync', order_pipeline='sync')
+        held = self.make_config('held')
+
+        self.run_loop(sync)
+        self.run_loop_with_orders_held(held)
+
+        # a late fill that was dropped would not be recorded by DCA, and the symbol would be bought again
+        self.assertEqual(len(self.bought(sync)), self.SYMBOL_COUNT)
+        self.assertEqual(self.mock_positions(held), self.mock_positions(sync))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+"""
+Unit tests for exchange_api_wrappers/rate_limiter.py
+
+This module contains tests for:
+- Endpoint weight table (including limit-dependent K line weight)
+- Budget accounting, waiting for the next minute and 429 back-off
+- X-MBX-USED-WEIGHT-1M header handling through a local HTTP stand-in
+"""
+
+import unittest
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+import requests
+
+# Add the project root to the path
+import sys
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from exchange_api_wrappers.rate_limiter import RequestWeightLimiter, request_weight
+
+
+class FakeClock:
+    def __init__(self, now=1000.0):
+        self.now = now
+        self.slept = []
+
+    def time(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.slept.append(seconds)
+        self.now += seconds
+
+
+class WeightHeaderHandler(BaseHTTPRequestHandler):
+    """Answers every GET with the used weight the server pretends to have counted."""
+
+    used_weight = 0
+    status = 200
+
+    def do_GET(self):
+        WeightHeaderHandler.used_weight += 1
+        self.send_response(WeightHeaderHandler.status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("X-MBX-USED-WEIGHT-1M", str(WeightHeaderHandler.used_weight))
+        if WeightHeaderHandler.status == 429:
+            self.send_header("Retry-After", "7")
+        self.end_headers()
+        self.wfile.write(b"{}")
+
+    def log_message(self, format, *args):
+        pass
+
+
+class TestRequestWeight(unittest.TestCase):
+    """Test cases for request_weight()"""
+
+    def test_known_endpoints(self):
+        self.assertEqual(request_weight("GET", "/api/v3/exchangeInfo"), 20)
+        self.assertEqual(request_weight("GET", "/api/v3/ticker/price", "symbol=BTCUSDT"), 2)
+        self.assertEqual(request_weight("GET", "/api/v3/ticker/price"), 4)
+        self.assertEqual(request_weight("get", "/api/v3/unknown"), 1)
+
+    def test_klines_weight_depends_on_limit(self):
+        self.assertEqual(request_weight("GET", "/api/v3/klines", "symbol=BTCUSDT&limit=20"), 1)
+        self.assertEqual(request_weight("GET", "/api/v3/klines", "symbol=BTCUSDT&limit=500"), 5)
+        self.assertEqual(request_weight("GET", "/api/v3/klines", "symbol=BTCUSDT"), 5)
+
+
+class TestRequestWeightLimiter(unittest.TestCase):
+    """Test cases for RequestWeightLimiter"""
+
+    def setUp(self):
+        self.clock = FakeClock(now=1000.0)  # 1000 s = 16 min 40 s, 20 s left in this minute
+        self.limiter = RequestWeightLimiter(
+            limit_per_minute=100, safety_ratio=0.5, clock=self.clock.time, sleep=self.clock.sleep)
+
+    def test_no_wait_within_budget(self):
+        for _ in range(50):
+            self.limiter.acquire(1)
+
+        self.assertEqual(self.clock.slept, [])
+        stats = self.limiter.pop_round_stats()
+        self.assertEqual(stats['requests'], 50)
+        self.assertEqual(stats['weight'], 50)
+        self.assertEqual(self.limiter.pop_round_stats()['weight'], 0)
+
+    def test_waits_for_next_minute(self):
+        """Once the budget is used up, the next call waits only until the minute rolls over."""
+        self.limiter.acquire(50)
+        self.limiter.acquire(1)
+
+        self.assertEqual(self.clock.slept, [20.0])
+        self.assertEqual(self.limiter.pop_round_stats()['waited_seconds'], 20.0)
+
+    def test_server_header_raises_local_count(self):
+        """Weight used by other processes on the same IP is taken into account."""
+        self.limiter.on_response(200, {"X-MBX-USED-WEIGHT-1M": "49"})
+        self.limiter.acquire(1)
+        self.assertEqual(self.clock.slept, [])
+
+        self.limiter.acquire(1)
+        self.assertEqual(self.clock.slept, [20.0])
+
+    def test_retry_after_pauses_requests(self):
+        self.limiter.on_response(429, {"Retry-After": "7"})
+        self.limiter.acquire(1)
+        self.assertEqual(self.clock.slept, [7.0])
+
+
+class TestRateLimitedSession(unittest.TestCase):
+    """Test cases for RequestWeightLimiter mounted on a requests.Session"""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.server = HTTPServer(("127.0.0.1", 0), WeightHeaderHandler)
+        cls.base_url = f"http://127.0.0.1:{cls.server.server_port}"
+        cls.thread = threading.Thread(target=cls.server.serve_forever, daemon=True)
+        cls.thread.start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def setUp(self):
+        WeightHeaderHandler.used_weight = 0
+        WeightHeaderHandler.status = 200
+        self.limiter = RequestWeightLimiter(limit_per_minute=6000)
+        self.session = requests.Session()
+        self.limiter.mount(self.session)
+
+    def tearDown(self):
+        self.session.close()
+
+    def test_weights_and_headers_are_tracked(self):
+        self.session.get(f"{self.base_url}/api/v3/klines", params={"symbol": "BTCUSDT", "limit": 20})
+        self.session.get(f"{self.base_url}/api/v3/exchangeInfo")
+
+        stats = self.limiter.pop_round_stats()
+        self.assertEqual(stats['requests'], 2)
+        self.assertEqual(stats['weight'], 21)
+        self.assertEqual(stats['server_used_weight'], 2)
+
+    def test_429_blocks_following_requests(self):
+        WeightHeaderHandler.status = 429
+        self.session.get(f"{self.base_url}/api/v3/ping")
+
+        self.assertGreater(self.limiter.try_acquire(1), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
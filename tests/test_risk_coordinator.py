@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""
+Unit tests for risk_coordinator.py
+
+This module contains tests for:
+- Atomic buy reservations against free cash
+- max_open_positions / max_total_open_cost enforcement including pending reservations
+- Commit, release and sell accounting
+- Ignoring exchange balances fetched before the last fill
+- Sharing one coordinator between processes through RiskCoordinatorManager
+"""
+
+import unittest
+import os
+import multiprocessing
+from decimal import Decimal
+
+# Add the project root to the path
+import sys
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from risk_coordinator import RiskCoordinator, RiskCoordinatorManager
+
+
+def reserve_many(coordinator, assets, results):
+    for asset in assets:
+        reservation, _ = coordinator.reserve_buy(asset, Decimal('10'))
+        if reservation is not None:
+            results.put(str(reservation.amount))
+
+
+class TestRiskCoordinator(unittest.TestCase):
+    """Test cases for RiskCoordinator"""
+
+    def test_reservation_deducts_free_cash(self):
+        coordinator = RiskCoordinator(Decimal('25'), {})
+
+        first, _ = coordinator.reserve_buy('BTC', Decimal('20'))
+        second, _ = coordinator.reserve_buy('ETH', Decimal('20'))
+        third, reason = coordinator.reserve_buy('DOGE', Decimal('20'))
+
+        self.assertEqual(first.amount, Decimal('20'))
+        self.assertEqual(second.amount, Decimal('5'))
+        self.assertIsNone(third)
+        self.assertEqual(reason, 'insufficient_fund')
+
+    def test_one_pending_reservation_per_asset(self):
+        coordinator = RiskCoordinator(Decimal('100'), {})
+        coordinator.reserve_buy('BTC', Decimal('20'))
+        self.assertEqual(coordinator.reserve_buy('BTC', Decimal('20')), (None, 'pending'))
+
+    def test_max_open_positions_counts_pending(self):
+        coordinator = RiskCoordinator(Decimal('100'), {'BTC': Decimal('10')}, max_open_positions=2)
+
+        reservation, _ = coordinator.reserve_buy('ETH', Decimal('10'))
+        self.assertIsNotNone(reservation)
+        self.assertEqual(coordinator.reserve_buy('DOGE', Decimal('10')), (None, 'max_open_positions'))
+
+        # Adding to an existing position does not open a new one
+        self.assertIsNotNone(coordinator.reserve_buy('BTC', Decimal('10'))[0])
+
+        # A cancelled reservation frees the slot
+        coordinator.release(reservation.reservation_id)
+        self.assertIsNotNone(coordinator.reserve_buy('DOGE', Decimal('10'))[0])
+
+    def test_max_total_open_cost(self):
+        coordinator = RiskCoordinator(Decimal('100'), {'BTC': Decimal('20')}, max_total_open_cost=Decimal('30'))
+        self.assertIsNotNone(coordinator.reserve_buy('ETH', Decimal('10'))[0])
+        self.assertEqual(coordinator.reserve_buy('DOGE', Decimal('10')), (None, 'max_total_open_cost'))
+
+    def test_commit_refunds_unspent_cash(self):
+        coordinator = RiskCoordinator(Decimal('100'), {})
+        reservation, _ = coordinator.reserve_buy('BTC', Decimal('20'))
+
+        coordinator.commit_buy(reservation.reservation_id, Decimal('19.5'), Decimal('19.5'))
+
+        snapshot = coordinator.snapshot()
+        self.assertEqual(snapshot['free_cash'], Decimal('80.5'))
+        self.assertEqual(snapshot['open_positions'], 1)
+        self.assertEqual(snapshot['pending_reservations'], 0)
+
+    def test_sell_closes_position(self):
+        coordinator = RiskCoordinator(Decimal('0'), {'BTC': Decimal('20')})
+        coordinator.record_sell('BTC', Decimal('25'), Decimal('0'))
+
+        snapshot = coordinator.snapshot()
+        self.assertEqual(snapshot['free_cash'], Decimal('25'))
+        self.assertEqual(snapshot['open_positions'], 0)
+
+    def test_stale_balance_is_ignored(self):
+        coordinator = RiskCoordinator(Decimal('100'), {})
+        reservation, _ = coordinator.reserve_buy('BTC', Decimal('20'))
+
+        self.assertTrue(coordinator.sync_free_cash(Decimal('90'), fetched_at=0))
+        self.assertEqual(coordinator.get_free_cash(), Decimal('70'))
+
+        coordinator.commit_buy(reservation.reservation_id, Decimal('20'), Decimal('20'))
+        self.assertFalse(coordinator.sync_free_cash(Decimal('90'), fetched_at=0))
+        self.assertEqual(coordinator.get_free_cash(), Decimal('70'))
+
+
+class TestRiskCoordinatorManager(unittest.TestCase):
+    """Test cases for sharing RiskCoordinator between processes"""
+
+    def test_reservations_from_several_processes(self):
+        """Concurrent shards never get more cash than the coordinator holds."""
+        manager = RiskCoordinatorManager()
+        manager.start()
+        try:
+            coordinator = manager.RiskCoordinator(Decimal('55'), {})
+            results = multiprocessing.Queue()
+            shards = [
+                multiprocessing.Process(
+                    target=reserve_many,
+                    args=(coordinator, [f"A{shard}{i}" for i in range(5)], results))
+                for shard in range(3)
+            ]
+            for shard in shards:
+                shard.start()
+            for shard in shards:
+                shard.join()
+
+            granted = Decimal('0')
+            while not results.empty():
+                granted += Decimal(results.get())
+            self.assertEqual(granted, Decimal('55'))
+            self.assertEqual(coordinator.get_free_cash(), Decimal('0'))
+        finally:
+            manager.shutdown()
+
+
+if __name__ == '__main__':
+    unittest.main()
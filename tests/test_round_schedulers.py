@@ -0,0 +1,208 @@
+#!/usr/bin/env python3
+"""
+Unit tests for trade_schedulers
+
+This module contains tests for:
+- FixedIntervalScheduler (every symbol, every round)
+- CandleCloseScheduler boundary alignment, settle delay and intra-candle checks
+- PriorityScheduler cadences for open positions and watch-only symbols
+- Round plan statistics exported to the metrics registry
+- Analyzer intra-candle hook detection
+"""
+
+import unittest
+import os
+from types import SimpleNamespace
+
+# Add the project root to the path
+import sys
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from metrics import REGISTRY
+from trade_schedulers import FixedIntervalScheduler, CandleCloseScheduler, PriorityScheduler
+from analyzer.analyzer import Analyzer, Trade
+
+HOUR = 60 * 60
+DAY = 24 * HOUR
+
+
+def make_symbols(*names):
+    return [SimpleNamespace(symbol=name, base_asset=name[:-4]) for name in names]
+
+
+def make_positions(open_assets):
+    return {asset: SimpleNamespace(open_quantity=1) for asset in open_assets}
+
+
+class TestFixedIntervalScheduler(unittest.TestCase):
+    """Test cases for FixedIntervalScheduler"""
+
+    def test_all_symbols_every_round(self):
+        scheduler = FixedIntervalScheduler(round_seconds=60)
+        symbols = make_symbols("BTCUSDT", "ETHUSDT")
+
+        plan = scheduler.plan_round(symbols, {}, 1000.0)
+
+        self.assertEqual(plan.full_analysis, symbols)
+        self.assertEqual(plan.intra_candle, [])
+        self.assertAlmostEqual(scheduler.seconds_until_next_round(1010.0), 50.0)
+
+
+class TestCandleCloseScheduler(unittest.TestCase):
+    """Test cases for CandleCloseScheduler"""
+
+    def setUp(self):
+        self.symbols = make_symbols("BTCUSDT", "ETHUSDT")
+        self.scheduler = CandleCloseScheduler(
+            "1h", settle_seconds=2, intra_candle_seconds=30)
+
+    def test_boundary_alignment(self):
+        """Candle boundaries are aligned to the epoch, weekly ones to Monday."""
+        self.assertEqual(self.scheduler.last_close_ms(10 * HOUR + 123), 10 * HOUR * 1000)
+
+        weekly = CandleCloseScheduler("1w")
+        # 1970-01-05 was the first Monday
+        self.assertEqual(weekly.last_close_ms(4 * DAY + 5), 4 * DAY * 1000)
+        self.assertEqual(weekly.last_close_ms(4 * DAY - 5), -3 * DAY * 1000)
+
+    def test_monthly_not_supported(self):
+        with self.assertRaises(ValueError):
+            CandleCloseScheduler("1M")
+
+    def test_analyze_once_per_candle(self):
+        """After a symbol is analyzed, it only gets intra-candle checks until the next close."""
+        now = 10 * HOUR + 5
+        plan = self.scheduler.plan_round(self.symbols, {}, now)
+        self.assertEqual(plan.full_analysis, self.symbols)
+
+        for s in plan.full_analysis:
+            self.scheduler.mark_analyzed(s)
+
+        plan = self.scheduler.plan_round(self.symbols, {}, now + 60)
+        self.assertEqual(plan.full_analysis, [])
+        self.assertEqual(plan.intra_candle, self.symbols)
+
+        plan = self.scheduler.plan_round(self.symbols, {}, 11 * HOUR + 5)
+        self.assertEqual(plan.full_analysis, self.symbols)
+
+    def test_failed_symbol_is_retried(self):
+        """A symbol not marked as analyzed stays due within the same candle."""
+        now = 10 * HOUR + 5
+        self.scheduler.plan_round(self.symbols, {}, now)
+        self.scheduler.mark_analyzed(self.symbols[0])
+
+        plan = self.scheduler.plan_round(self.symbols, {}, now + 30)
+        self.assertEqual(plan.full_analysis, [self.symbols[1]])
+        self.assertLessEqual(self.scheduler.seconds_until_next_round(now + 30), 30)
+
+    def test_waits_for_settle_delay(self):
+        """Right after a close, analysis waits settle_seconds for the candle to be final."""
+        plan = self.scheduler.plan_round(self.symbols, {}, 10 * HOUR + 1)
+        self.assertEqual(plan.full_analysis, [])
+
+    def test_sleeps_until_next_close(self):
+        """Without intra-candle checks the next round starts at the next close plus the settle delay."""
+        scheduler = CandleCloseScheduler("1h", settle_seconds=2, intra_candle_seconds=30)
+        now = 10 * HOUR + 5
+        for s in scheduler.plan_round(self.symbols, {}, now).full_analysis:
+            scheduler.mark_analyzed(s)
+
+        self.assertAlmostEqual(scheduler.seconds_until_next_round(now), HOUR - 5 + 2)
+
+
+class TestPriorityScheduler(unittest.TestCase):
+    """Test cases for PriorityScheduler"""
+
+    def setUp(self):
+        self.symbols = make_symbols("BTCUSDT", "ETHUSDT", "DOGEUSDT", "XRPUSDT")
+        self.positions = make_positions(["BTC"])
+        self.scheduler = PriorityScheduler(
+            open_position_seconds=60, watch_only_seconds=600, min_round_seconds=5)
+
+    def names(self, plan):
+        return sorted(s.symbol for s in plan.full_analysis)
+
+    def test_first_round_analyzes_everything(self):
+        plan = self.scheduler.plan_round(self.symbols, self.positions, 1000.0)
+        self.assertEqual(len(plan.full_analysis), 4)
+        self.assertEqual(plan.stats['open_position_due'], 1)
+        self.assertEqual(plan.stats['watch_only_due'], 3)
+
+    def test_separate_cadences(self):
+        """Open positions come back after 60 seconds, watch-only symbols after 600."""
+        self.scheduler.plan_round(self.symbols, self.positions, 1000.0)
+        self.assertAlmostEqual(self.scheduler.seconds_until_next_round(1001.0), 59.0)
+
+        self.assertEqual(self.names(self.scheduler.plan_round(self.symbols, self.positions, 1060.0)), ["BTCUSDT"])
+        self.assertEqual(self.names(self.scheduler.plan_round(self.symbols, self.positions, 1300.0)), ["BTCUSDT"])
+        self.assertEqual(len(self.scheduler.plan_round(self.symbols, self.positions, 1600.0).full_analysis), 4)
+
+    def test_new_position_moves_to_tight_cadence(self):
+        """A symbol that was just bought is re-evaluated on the open-position cadence."""
+        self.scheduler.plan_round(self.symbols, self.positions, 1000.0)
+        positions = make_positions(["BTC", "ETH"])
+
+        plan = self.scheduler.plan_round(self.symbols, positions, 1060.0)
+        self.assertEqual(self.names(plan), ["BTCUSDT", "ETHUSDT"])
+
+    def test_watch_only_rotation_limit(self):
+        """watch_only_max_per_round rotates watch-only symbols oldest-first."""
+        scheduler = PriorityScheduler(watch_only_max_per_round=2, min_round_seconds=5)
+        first = scheduler.plan_round(self.symbols, self.positions, 1000.0)
+        self.assertEqual(len(first.full_analysis), 3)
+        self.assertEqual(first.stats['watch_only_deferred'], 1)
+        self.assertAlmostEqual(scheduler.seconds_until_next_round(1000.0), 5.0)
+
+        second = scheduler.plan_round(self.symbols, self.positions, 1005.0)
+        self.assertEqual(len(second.full_analysis), 1)
+        self.assertNotIn(second.full_analysis[0].symbol,
+                         [s.symbol for s in first.full_analysis])
+
+    def test_plan_metrics(self):
+        """Deferral and cadence stats are exported under the account label."""
+        scheduler = PriorityScheduler(watch_only_max_per_round=2, min_round_seconds=5)
+        plan = scheduler.plan_round(self.symbols, self.positions, 1000.0)
+        plan.record_metrics(account='scheduler-test')
+
+        symbols = REGISTRY.gauge('trade_loop_round_plan_symbols')
+        self.assertEqual(symbols.value(category='full_analysis', account='scheduler-test'), 3)
+        self.assertEqual(symbols.value(category='open_position_due', account='scheduler-test'), 1)
+        self.assertEqual(symbols.value(category='watch_only_due', account='scheduler-test'), 2)
+        self.assertEqual(symbols.value(category='open_positions', account='scheduler-test'), 1)
+        intervals = REGISTRY.gauge('trade_loop_scheduler_interval_seconds')
+        self.assertEqual(intervals.value(cadence='watch_only', account='scheduler-test'), 600)
+
+        deferred = REGISTRY.counter('trade_loop_watch_only_deferred_total')
+        self.assertEqual(deferred.value(account='scheduler-test'), 1)
+        scheduler.plan_round(self.symbols, self.positions, 1005.0).record_metrics(account='scheduler-test')
+        self.assertEqual(deferred.value(account='scheduler-test'), 1)
+
+    def test_removed_symbols_are_dropped(self):
+        self.scheduler.plan_round(self.symbols, self.positions, 1000.0)
+        plan = self.scheduler.plan_round(self.symbols[1:], self.positions, 2000.0)
+        self.assertEqual(plan.stats['watching'], 3)
+        self.assertNotIn("BTCUSDT", self.names(plan))
+
+    def test_invalid_interval(self):
+        with self.assertRaises(ValueError):
+            PriorityScheduler(open_position_seconds=0)
+
+
+class TestAnalyzerIntraCandleHook(unittest.TestCase):
+    """Test cases for Analyzer.has_intra_candle_logic()"""
+
+    def test_detects_override(self):
+        class CloseOnly(Analyzer):
+            def analyze(self, klines, position):
+                return Trade.PASS
+
+        class WithStopLoss(CloseOnly):
+            def analyze_intra_candle(self, latest_price, position):
+                return Trade.SELL
+
+        self.assertFalse(CloseOnly().has_intra_candle_logic())
+        self.assertTrue(WithStopLoss().has_intra_candle_logic())
+
+
+if __name__ == '__main__':
+    unittest.main()
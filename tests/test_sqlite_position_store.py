@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+"""
+Unit tests for asset_record_platforms/sqlite_position_store.py
+
+This module contains tests for:
+- AssetPositions with storage='sqlite' keeping the positions dict interface
+- Indexed lookups by asset, time range, round_id and trade_id
+- Importing legacy <ASSET>.json files and reading from another connection while writing
+- Loading transactions lazily, only when they are first read
+- Read-only AssetPositions that never imports legacy files or creates the database
+"""
+
+import unittest
+import tempfile
+import shutil
+import os
+import sqlite3
+from decimal import Decimal
+
+from binance.enums import SIDE_BUY, SIDE_SELL
+
+# Add the project root to the path
+import sys
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from asset_record_platforms.file_based_asset_positions import AssetPositions
+from asset_record_platforms.position import Transaction
+from asset_record_platforms.sqlite_position_store import SqlitePositionStore
+from exchange_api_wrappers.wrapped_data import WatchingSymbol
+
+WATCHING_SYMBOLS = [
+    WatchingSymbol(symbol="BTCUSDT", base_asset="BTC", info={}),
+    WatchingSymbol(symbol="ETHUSDT", base_asset="ETH", info={}),
+]
+
+
+def make_transaction(asset, n, activity=SIDE_BUY, price='40000'):
+    return Transaction(
+        time=1700000000000 + n * 1000,
+        activity=activity,
+        symbol=asset,
+        trade_symbol=f'{asset}USDT',
+        quantity=Decimal('0.001'),
+        price=Decimal(price),
+        commission=Decimal('0.04'),
+        commission_asset='USDT',
+        commission_as_usdt=Decimal('0.04'),
+        round_id=f'round-{n}',
+        order_id=str(n),
+        trade_id=f'{asset}-{n}',
+        closed_trade_ids=[f'{asset}-0'] if activity == SIDE_SELL else [])
+
+
+class TestSqlitePositionStore(unittest.TestCase):
+    """Test cases for AssetPositions with storage='sqlite'"""
+
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+        self.record = self.create_record()
+        for n in range(3):
+            self.record.positions['BTC'].add_transaction(
+                make_transaction('BTC', n, SIDE_SELL if n == 2 else SIDE_BUY, str(40000 + n * 500)))
+        self.record.positions['ETH'].add_transaction(make_transaction('ETH', 1, price='2000'))
+
+    def tearDown(self):
+        shutil.rmtree(self.test_dir, ignore_errors=True)
+
+    def create_record(self):
+        return AssetPositions(WATCHING_SYMBOLS, 'USDT', base_dir=self.test_dir, storage='sqlite')
+
+    def test_reload_positions(self):
+        reloaded = self.create_record()
+        for asset in ('BTC', 'ETH'):
+            self.assertEqual(reloaded.positions[asset].to_dict(), self.record.positions[asset].to_dict())
+        self.assertEqual(reloaded.positions['USDT'].get_transactions_count(), 0)
+        self.assertEqual(AssetPositions.stored_assets(self.test_dir, 'sqlite'), ['BTC', 'ETH'])
+
+    def test_lazy_transactions(self):
+        position = self.create_record().positions['BTC']
+        self.assertFalse(position.transactions_loaded())
+        self.assertEqual(position.get_transactions_count(), 3)
+        self.assertEqual(position.open_quantity, self.record.positions['BTC'].open_quantity)
+
+        position.add_transaction(make_transaction('BTC', 5))
+        self.assertFalse(position.transactions_loaded())
+        self.assertEqual([t.trade_id for t in position.transactions], ['BTC-0', 'BTC-1', 'BTC-2', 'BTC-5'])
+        self.assertEqual(self.create_record().positions['BTC'].get_transactions_count(), 4)
+
+    def test_indexed_lookups(self):
+        store = SqlitePositionStore(self.test_dir, read_only=True)
+
+        self.assertEqual([t['trade_id'] for t in store.transactions(asset='BTC')], ['BTC-0', 'BTC-1', 'BTC-2'])
+        in_range = store.transactions(start_ms=1700000001000, end_ms=1700000002000)
+        self.assertEqual(sorted(t['trade_id'] for t in in_range), ['BTC-1', 'ETH-1'])
+        self.assertEqual(len(store.transactions_by_round('round-1')), 2)
+
+        transact = store.transactions_by_trade_id('BTC-2')[0]
+        self.assertEqual(transact['activity'], SIDE_SELL)
+        self.assertEqual(transact['closed_trade_ids'], ['BTC-0'])
+
+        summary = store.positions_summary()
+        self.assertEqual(Decimal(summary['BTC']['open_quantity']), self.record.positions['BTC'].open_quantity)
+        self.assertEqual(summary['BTC']['transaction_count'], 3)
+
+    def test_queries_use_indexes(self):
+        conn = sqlite3.connect(os.path.join(self.test_dir, SqlitePositionStore.DB_FILE))
+        self.assertEqual(conn.execute("PRAGMA journal_mode").fetchone()[0], 'wal')
+
+        for where in ("asset = 'BTC'", "time >= 0 AND time < 1", "round_id = 'round-1'", "trade_id = 'BTC-1'"):
+            plan = ' '.join(row[-1] for row in conn.execute(f"EXPLAIN QUERY PLAN SELECT * FROM transactions WHERE {where}"))
+            self.assertIn('USING INDEX', plan, where)
+        conn.close()
+
+    def test_reader_sees_committed_transactions(self):
+        reader = SqlitePositionStore(self.test_dir, read_only=True)
+        self.assertEqual(len(reader.transactions(asset='ETH')), 1)
+
+        self.record.positions['ETH'].add_transaction(make_transaction('ETH', 5, price='2100'))
+        self.assertEqual(len(reader.transactions(asset='ETH')), 2)
+        reader.close()
+
+    def test_import_legacy_json(self):
+        legacy_dir = tempfile.mkdtemp()
+        try:
+            legacy = AssetPositions(WATCHING_SYMBOLS, 'USDT', base_dir=legacy_dir)
+            legacy.positions['BTC'].add_transaction(make_transaction('BTC', 0))
+
+            imported = AssetPositions(WATCHING_SYMBOLS, 'USDT', base_dir=legacy_dir, storage='sqlite')
+            self.assertEqual(imported.positions['BTC'].to_dict(), legacy.positions['BTC'].to_dict())
+            self.assertEqual(len(SqlitePositionStore(legacy_dir).transactions(asset='BTC')), 1)
+        finally:
+            shutil.rmtree(legacy_dir, ignore_errors=True)
+
+
+    def test_read_only_positions(self):
+        reader = AssetPositions(WATCHING_SYMBOLS, 'USDT', base_dir=self.test_dir, storage='sqlite', read_only=True)
+        self.assertEqual(reader.positions['BTC'].to_dict(), self.record.positions['BTC'].to_dict())
+
+        # legacy <ASSET>.json files are read but not imported, and a missing database is not created
+        legacy_dir = tempfile.mkdtemp()
+        try:
+            legacy = AssetPositions(WATCHING_SYMBOLS, 'USDT', base_dir=legacy_dir)
+            legacy.positions['BTC'].add_transaction(make_transaction('BTC', 0))
+
+            reader = AssetPositions(WATCHING_SYMBOLS, 'USDT', base_dir=legacy_dir, storage='sqlite', read_only=True)
+            self.assertEqual(reader.positions['BTC'].to_dict(), legacy.positions['BTC'].to_dict())
+            self.assertEqual(AssetPositions.stored_assets(legacy_dir, 'sqlite'), [])
+            self.assertFalse(os.path.exists(os.path.join(legacy_dir, SqlitePositionStore.DB_FILE)))
+        finally:
+            shutil.rmtree(legacy_dir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+"""
+Unit tests for exchange_api_wrappers/user_data_stream.py
+
+This module contains tests for:
+- Seeding the balance cache from get_account and applying outboundAccountPosition events
+- Reconciling after a fill without an account update, periodically, and after reconnects
+- BinanceTradingWrapper reading balances from the cache instead of get_account every round
+"""
+
+import unittest
+import os
+from decimal import Decimal
+from unittest.mock import Mock
+
+# Add the project root to the path
+import sys
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from exchange_api_wrappers.binance_trading import BinanceTradingWrapper
+from exchange_api_wrappers.crypto import Crypto
+from exchange_api_wrappers.user_data_stream import BalanceCache
+from exchange_api_wrappers.wrapped_data import WatchingSymbol
+
+
+def make_account(update_time, **balances):
+    return {
+        'updateTime': update_time,
+        'balances': [{'asset': a, 'free': f, 'locked': '0.00000000'} for a, f in balances.items()],
+    }
+
+
+def account_position(update_time, **balances):
+    return {
+        'e': 'outboundAccountPosition',
+        'E': update_time + 1,
+        'u': update_time,
+        'B': [{'a': a, 'f': f, 'l': '0.00000000'} for a, f in balances.items()],
+    }
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestBalanceCache(unittest.TestCase):
+    """Test cases for BalanceCache"""
+
+    def setUp(self):
+        self.clock = FakeClock()
+        self.cache = BalanceCache(reconcile_seconds=300, fill_grace_seconds=5, clock=self.clock)
+
+    def test_needs_seed(self):
+        self.assertEqual(self.cache.needs_reconcile(), 'not_seeded')
+        self.cache.seed(make_account(100, USDT='50', BTC='0'))
+        self.assertIsNone(self.cache.needs_reconcile())
+
+    def test_stream_updates_and_ordering(self):
+        self.cache.seed(make_account(100, USDT='50', BTC='0'))
+        self.cache.on_user_data_message(account_position(200, USDT='30', BTC='0.001'))
+        # an event older than what we already have is ignored
+        self.cache.on_user_data_message(account_position(150, USDT='40'))
+
+        balances = self.cache.balances_by_asset()
+        self.assertEqual(balances['USDT']['free'], '30')
+        self.assertEqual(balances['BTC']['free'], '0.001')
+
+        # a REST snapshot taken before the event does not roll it back
+        self.cache.seed(make_account(180, USDT='45', BTC='0'))
+        self.assertEqual(self.cache.balances_by_asset()['USDT']['free'], '30')
+
+    def test_fill_without_account_update(self):
+        self.cache.seed(make_account(100, USDT='50'))
+        self.cache.on_user_data_message({'e': 'executionReport', 'x': 'TRADE'})
+        self.assertIsNone(self.cache.needs_reconcile())
+
+        self.clock.now += 5
+        self.assertEqual(self.cache.needs_reconcile(), 'missing_account_update')
+
+        self.cache.on_user_data_message(account_position(200, USDT='30'))
+        self.assertIsNone(self.cache.needs_reconcile())
+
+    def test_periodic_and_invalidated(self):
+        self.cache.seed(make_account(100, USDT='50'))
+        self.clock.now += 300
+        self.assertEqual(self.cache.needs_reconcile(), 'periodic')
+
+        self.cache.seed(make_account(200, USDT='50'))
+        self.cache.invalidate('stream_disconnected')
+        self.assertEqual(self.cache.needs_reconcile(), 'stream_disconnected')
+
+
+class TestBinanceTradingWrapperBalances(unittest.TestCase):
+    """Test cases for BinanceTradingWrapper.get_equities_balance()"""
+
+    def setUp(self):
+        self.client = Mock()
+        self.client.get_account.return_value = make_account(100, USDT='50', BTC='0.5', ETH='2')
+        self.symbols = [
+            WatchingSymbol('BTCUSDT', 'BTC', {}),
+            WatchingSymbol('ETHUSDT', 'ETH', {}),
+            WatchingSymbol('DOGEUSDT', 'DOGE', {}),
+        ]
+
+    def test_rest_only(self):
+        wrapper = BinanceTradingWrapper(self.client)
+        balances = wrapper.get_equities_balance(self.symbols, 'USDT')
+
+        self.assertEqual(balances['USDT'].free, Decimal('50'))
+        self.assertEqual(balances['ETH'].free, Decimal('2'))
+        self.assertNotIn('DOGE', balances)
+
+        wrapper.get_equities_balance(self.symbols, 'USDT')
+        self.assertEqual(self.client.get_account.call_count, 2)
+
+    def test_cache_avoids_get_account(self):
+        cache = BalanceCache(reconcile_seconds=0)
+        wrapper = BinanceTradingWrapper(self.client, balance_cache=cache)
+
+        wrapper.get_equities_balance(self.symbols, 'USDT')
+        cache.on_user_data_message(account_position(200, USDT='30', BTC='0.6'))
+        balances = wrapper.get_equities_balance(self.symbols, 'USDT')
+
+        self.assertEqual(self.client.get_account.call_count, 1)
+        self.assertEqual(balances['USDT'].free, Decimal('30'))
+        self.assertEqual(balances['BTC'].free, Decimal('0.6'))
+        self.assertEqual(balances['ETH'].free, Decimal('2'))
+
+    def test_missing_cash_asset(self):
+        wrapper = BinanceTradingWrapper(self.client)
+        with self.assertRaises(Exception):
+            wrapper.get_equities_balance(self.symbols, 'FDUSD')
+
+
+class TestBalanceSourceConfig(unittest.TestCase):
+    """Test cases for the balance_source option"""
+
+    def setUp(self):
+        self.config = Mock()
+        self.config.auth = {'API_KEY': 'key', 'API_SECRET': 'secret'}
+
+    def test_invalid_balance_source(self):
+        self.config.position_manage = {'balance_source': 'websocket', 'binance_base_url': 'http://127.0.0.1:1'}
+        with self.assertRaises(ValueError):
+            Crypto.get_binance_trade_and_klines(self.config)
+
+    def test_user_stream_needs_real_binance(self):
+        self.config.position_manage = {'balance_source': 'user_stream', 'binance_base_url': 'http://127.0.0.1:1'}
+        with self.assertRaises(ValueError):
+            Crypto.get_binance_trade_and_klines(self.config)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,13 +1,17 @@
 import __init__
+import asyncio
 import logging.config
 import queue
 import time
 import signal
+import threading
 import send_order
+from order_manager import OrderManager
 import asset_record_platforms.file_based_asset_positions as file_based_asset_positions
 import asset_record_platforms.position as position
 import os
 from decimal import Decimal
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from typing import List
 from threading import Event
 from binance.enums import *
@@ -19,7 +23,9 @@ from bot_env_config.config import Config
 from exchange_api_wrappers.crypto import *
 from exchange_api_wrappers.wrapped_data import *
 from crypto_report import CryptoReport
+from metrics import REGISTRY, PhaseTimer, MetricsHTTPServer
 from notification_platforms.queue_task import *
+from simulated_clock import RealClock
 
 
 class GracefulKiller:
@@ -38,12 +44,58 @@ class GracefulKiller:
 sleep_event = Event()
 _log = logging.getLogger(__name__)
 _killer = GracefulKiller(sleep_event)
-write_to_gsheet = False  # Will be set dynamically based on configuration
+
+_round_seconds = REGISTRY.histogram(
+    'trade_loop_round_seconds', 'Duration of a trade loop round, cooldown excluded')
+_round_phase_seconds = REGISTRY.histogram(
+    'trade_loop_round_phase_seconds', 'Total time spent in each phase of a trade loop round')
+_symbol_phase_seconds = REGISTRY.histogram(
+    'trade_loop_symbol_phase_seconds', 'Time spent in each phase for a single symbol')
+_symbols_analyzed = REGISTRY.counter(
+    'trade_loop_symbols_analyzed_total', 'Symbols analyzed, by analysis result')
+_rounds = REGISTRY.counter(
+    'trade_loop_rounds_total', 'Trade loop rounds completed')
+_round_symbols_analyzed = REGISTRY.gauge(
+    'trade_loop_round_symbols_analyzed', 'Symbols fully analyzed in the last round')
+_round_request_weight = REGISTRY.gauge(
+    'trade_loop_round_request_weight', 'Binance request weight used in the last round')
+_exchange_used_weight = REGISTRY.gauge(
+    'exchange_used_weight_1m', 'Request weight used this minute as reported by Binance')
+_free_cash = REGISTRY.gauge(
+    'trade_loop_free_cash', 'Free balance of the cash currency')
+_open_positions = REGISTRY.gauge(
+    'trade_loop_open_positions', 'Number of open positions')
+_notification_queue_depth = REGISTRY.gauge(
+    'trade_loop_notification_queue_depth', 'Tasks waiting in the notification queue')
 
 
 class TradeLoopRunner:
-    def __init__(self, config: Config):
+    def __init__(
+        self,
+        config: Config,
+        symbol_shard=None,
+        risk_coordinator=None,
+        market_data: MarketData = None,
+        account_name: str = None,
+        serve_metrics: bool = True,
+        crypto: Crypto = None,
+        clock=None,
+    ):
+        """
+        symbol_shard: (shard 編號, shard 總數)，只分析分配到此 shard 的交易對，None 表示分析全部
+        risk_coordinator: 多個 shard 共用的 RiskCoordinator (proxy)，買單的現金與倉位限制改由它核准
+        market_data: 多個帳號共用的行情資料層，None 表示自行建立
+        account_name: 同一個 process 內執行多個帳號時的帳號名稱，會加在 gauge 的 account label
+        serve_metrics: 是否依 metrics_http_port 啟動 metrics HTTP server，多帳號時由 host 統一提供
+        crypto: 已建立好的 Crypto (e.g., 重播紀錄用的 get_mock_trade_and_replay_klines)，None 表示依 trading_mode 建立
+        clock: 迴圈使用的時間來源 (time、wait、is_finished)，None 表示實際時間 RealClock
+        """
         self.__config = config
+        self.__symbol_shard = symbol_shard
+        self.__risk_coordinator = risk_coordinator
+        self.__account_name = account_name
+        self.__metric_labels = {'account': account_name} if account_name else {}
+        self.__clock = clock if clock is not None else RealClock()
 
         # 交易用的貨幣，等同於買股票用的現金
         self.__cash_currency = config.position_manage['cash_currency']
@@ -105,15 +157,53 @@ class TradeLoopRunner:
             self.__include_currencies = ics[:l]
             _log.info(f"Included currencies: {self.__include_currencies}")
 
-        self.client = Client(
-            api_key=config.auth["API_KEY"],
-            api_secret=config.auth["API_SECRET"],
-            testnet=False
-        )
+        # 同時下載 K 線、分析交易對的 worker 數量，1 表示逐一分析
+        self.__analysis_workers = int(
+            config.position_manage.get('analysis_workers', 1))
+        if self.__analysis_workers < 1:
+            raise ValueError('analysis_workers must be at least 1.')
+        _log.info(f"Analysis workers: {self.__analysis_workers}")
+
+        # 多個 worker 同時分析時，送單、現金與倉位限制的檢查必須逐一進行
+        self.__order_lock = threading.Lock()
+
+        # K 線資料來源：rest (每輪下載) 或 websocket (串流維護的緩衝區)
+        self.__kline_source = config.position_manage.get('kline_source', 'rest')
+        if self.__kline_source not in ('rest', 'websocket'):
+            raise ValueError(f"Invalid kline_source: {self.__kline_source}. Use 'rest' or 'websocket'")
+        _log.info(f"K line source: {self.__kline_source}")
+
+        # 迴圈引擎：sync (執行緒) 或 asyncio
+        self.engine = config.position_manage.get('trade_loop_engine', 'sync')
+        if self.engine not in ('sync', 'asyncio'):
+            raise ValueError(f"Invalid trade_loop_engine: {self.engine}. Use 'sync' or 'asyncio'")
+        _log.info(f"Trade loop engine: {self.engine}")
+
+        # 每輪結束時將 metrics 寫入此 JSON 檔，未設定則不輸出
+        self.__metrics_snapshot_file = config.position_manage.get('metrics_snapshot_file')
+
+        # 以 Prometheus text format 提供 metrics 的 HTTP port，未設定則不啟動
+        self.__metrics_server = None
+        if serve_metrics and config.position_manage.get('metrics_http_port'):
+            # 多個 shard 時，各 shard 使用 metrics_http_port + shard 編號
+            shard_index = symbol_shard[0] if symbol_shard is not None else 0
+            self.__metrics_server = MetricsHTTPServer(
+                host=config.position_manage.get('metrics_http_host', '127.0.0.1'),
+                port=int(config.position_manage['metrics_http_port']) + shard_index)
+
+        # asyncio 引擎下，同時進行中的交易對分析數量上限
+        self.__async_max_in_flight = int(
+            config.position_manage.get('async_max_in_flight', 50))
 
         # Configure trading mode based on configuration
         trading_mode = config.position_manage.get('trading_mode', 'mock_trading')
-        if trading_mode == 'mock_trading':
+        if crypto is not None:
+            self.__crypto = crypto
+            _log.info(f"Using {trading_mode} mode with the given exchange API")
+        elif market_data is not None:
+            self.__crypto = Crypto.get_trade_with_shared_market_data(config, market_data)
+            _log.info(f"Using {trading_mode} mode with shared market data")
+        elif trading_mode == 'mock_trading':
             self.__crypto = Crypto.get_mock_trade_and_binance_klines(config)
             _log.info("Using mock trading mode")
         elif trading_mode == 'binance_trading':
@@ -122,10 +212,31 @@ class TradeLoopRunner:
         else:
             raise ValueError(f"Invalid trading_mode: {trading_mode}. Use 'mock_trading' or 'binance_trading'")
         
+        # 送單方式：sync (等待交易所回應) 或 async (交給 OrderManager，這一輪分析完才等待成交)
+        self.__order_pipeline = config.position_manage.get('order_pipeline', 'sync')
+        if self.__order_pipeline not in ('sync', 'async'):
+            raise ValueError(f"Invalid order_pipeline: {self.__order_pipeline}. Use 'sync' or 'async'")
+        self.__order_manager = None
+        self.__pending_orders = []
+        if self.__order_pipeline == 'async':
+            if self.engine != 'sync' or risk_coordinator is not None:
+                raise ValueError('order_pipeline async requires trade_loop_engine sync and a single shard')
+
+            # 等待這一輪訂單成交的秒數上限，之後才到的成交仍會記入倉位
+            self.__order_fill_timeout = float(config.position_manage.get('order_fill_timeout_seconds', 30))
+            self.__order_manager = OrderManager(
+                self.__crypto, self.__cash_currency, position_lock=self.__order_lock,
+                max_workers=int(config.position_manage.get('order_workers', 4)))
+            if not self.__crypto.set_execution_report_callback(self.__order_manager.on_execution_report):
+                _log.info("Exchange API has no user data stream, fills are taken from order responses only")
+        _log.info(f"Order pipeline: {self.__order_pipeline}")
+
+        # journal / sqlite 模式的倉位紀錄，每輪結束時是否寫出 dashboard 讀取的 <ASSET>.json
+        self.__export_positions_json = config.position_manage.get('asset_positions_export_json', False)
+
         # Configure Google Sheets recording
-        global write_to_gsheet
-        write_to_gsheet = config.position_manage.get('enable_google_sheets', False)
-        _log.info(f"Google Sheets recording: {'enabled' if write_to_gsheet else 'disabled'}")
+        self.__write_to_gsheet = config.position_manage.get('enable_google_sheets', False)
+        _log.info(f"Google Sheets recording: {'enabled' if self.__write_to_gsheet else 'disabled'}")
         self.__notif = config.spawn_nofification_platform()
         self.__tx_q = queue.Queue()
         self.__rx_q = queue.Queue()
@@ -136,159 +247,460 @@ class TradeLoopRunner:
         # Analyzer
         _log.info(f"Analyzer: {config.analyzer['type']}")
         self.__analyzer = config.spawn_analyzer()
+        self.__analyzer.clock = self.__clock
+
+        # 分析使用的 K 線週期與數量
+        self.__kline_interval = self.__analyzer.kline_interval
+        self.__klines_limit = self.__analyzer.klines_limit
+        _log.info(f"K line interval: {self.__kline_interval}, limit: {self.__klines_limit}")
+
+        # 決定每一輪分析哪些交易對、下一輪何時開始
+        self.__scheduler = config.spawn_round_scheduler(self.__kline_interval)
+        _log.info(f"Round scheduler: {self.__scheduler.__class__.__name__}")
 
         # 需要使用交易所 API，延後於 start_loop() 內取得
         self.__watching_symbols = None
         self.__record = None
         self.__free_cash = None
 
+        # 這一輪各階段的耗時
+        self.__round_phases = PhaseTimer(_round_phase_seconds, _symbol_phase_seconds, self.__metric_labels)
+
     def start_loop(self):
         """啟動分析全部交易對的迴圈"""
-        self.__watching_symbols = self.__crypto.get_tradable_symbols(
-            self.__cash_currency, self.__include_currencies, self.__exclude_currencies)
-        _log.debug(f"Watching trading symbols: {self.__watching_symbols}")
-
-        equities_balance = self.__crypto.get_equities_balance(
-            self.__watching_symbols, self.__cash_currency)
-        self.__record = file_based_asset_positions.AssetPositions(
-            self.__watching_symbols, self.__cash_currency)
-
-        # Google Sheet 報表 client
-        report = None
-        if write_to_gsheet:
-            report = CryptoReport(config=self.__config)
-
-        # 印出持倉
-        for k, v in self.__record.positions.items():
-            if v.open_quantity > 0:
-                _log.info(f"Position: {str(v)}")
-
-        # 當交易量達到一定數值後，向外發出目前剩餘的現金和 P&L 快照
-        acc_transaction_count_before_notify_pnl = 0
-
-        self.__free_cash = equities_balance[self.__cash_currency].free
+        equities_balance, report = self.__prepare_loop()
         keep_loop_running = True
 
-        while keep_loop_running and not _killer.kill_now:
+        executor = None
+        if self.__analysis_workers > 1:
+            executor = ThreadPoolExecutor(
+                max_workers=self.__analysis_workers,
+                thread_name_prefix="analyze")
+
+        while keep_loop_running and not _killer.kill_now and not self.__clock.is_finished():
             tic = time.perf_counter()
 
             # 給這一輪的 transaction 一個 group ID
             round_id = str(time.time_ns())
             _log.debug(f"Starting new round, round_id = {round_id}")
+            self.__round_phases = PhaseTimer(_round_phase_seconds, _symbol_phase_seconds, self.__metric_labels)
 
             _log.debug(f'Available {self.__cash_currency}: {self.__free_cash}')
             market_price_dict = {}
             transactions_made = []
             insufficient_fund_trade_symbols = []
 
-            # 分析全部交易對、進行交易
-            for symbol_info in self.__watching_symbols:
-                trade_result = self.__analyze_a_currency(
-                    symbol_info=symbol_info,
+            plan = self.__scheduler.plan_round(
+                self.__watching_symbols, self.__record.positions, self.__clock.time())
+            self.__log_round_plan(plan)
+
+            # 分析這一輪排定的交易對、進行交易
+            keep_loop_running, analyzed_count = self.__analyze_symbols(
+                executor=executor,
+                symbols=plan.full_analysis,
+                equities_balance=equities_balance,
+                report=report,
+                round_id=round_id,
+                market_price_dict=market_price_dict,
+                transactions_made=transactions_made,
+                insufficient_fund_trade_symbols=insufficient_fund_trade_symbols,
+            )
+            analysis_elapsed = time.perf_counter() - tic
+            self.__round_phases.add('analysis', analysis_elapsed)
+            self.__log_analysis_elapsed(
+                analyzed_count, analysis_elapsed, f"{self.__analysis_workers} worker(s)")
+
+            if keep_loop_running:
+                keep_loop_running = self.__check_intra_candle(
+                    symbols=plan.intra_candle,
                     equities_balance=equities_balance,
                     report=report,
                     round_id=round_id,
                     market_price_dict=market_price_dict,
                     transactions_made=transactions_made,
+                    insufficient_fund_trade_symbols=insufficient_fund_trade_symbols,
                 )
 
-                if trade_result is not None and trade_result.status == OrderStatus.INSUFFICIENT_FUND:
-                    insufficient_fund_trade_symbols.append(symbol_info.symbol)
-
-                if os.path.exists("stoppp"):
-                    _log.warning(
-                        "Stop file detected, stop trading symbol loop")
-                    keep_loop_running = False
-                    os.rename("stoppp", "_stoppp")
-                    break
-                elif _killer.kill_now:
-                    _log.warning(
-                        "SIGINT or SIGTERM detected, stop trading symbol loop")
-                    keep_loop_running = False
-                    break
+            # 其他交易對分析完後，才等待這一輪送出的訂單成交
+            self.__settle_pending_orders(report, transactions_made)
 
-            # 通知進行的交易
-            self.__try_notify_transactions(transactions_made)
-
-            # 更新 Google Sheet
-            if write_to_gsheet:
-                try:
-                    report.update_market_price(
-                        market_price_dict, self.__record.positions)
-                except:
-                    _log.exception(
-                        f"Catched an exception while updating report on Google Sheet")
-
-            if len(insufficient_fund_trade_symbols) > 0:
-                _log.warning(
-                    f"Cannot send BUY order for the following due to insufficient funds: {insufficient_fund_trade_symbols}")
+            self.__after_analysis(
+                report, market_price_dict, transactions_made, insufficient_fund_trade_symbols)
 
             if not keep_loop_running or _killer.kill_now:
-                _log.warning(
-                    "Stop the outer loop after updating report on Google Sheet")
-                toc = time.perf_counter()
-                time_elapsed = toc - tic
-                _log.debug(
-                    f"Round stopped early, took {time_elapsed:0.4f} seconds")
+                self.__log_stopped_early(
+                    "Stop the outer loop after updating report on Google Sheet", tic)
                 break
 
             try:
                 # 從 API 更新餘額，取得最新剩餘現金
                 _log.debug(
                     f"Fetching latest {self.__cash_currency} balance from exchange")
-                equities_balance = self.__crypto.get_equities_balance(
-                    self.__watching_symbols, self.__cash_currency)
-                self.__free_cash = equities_balance[self.__cash_currency].free
-
-                if len(transactions_made) > 0:
-                    _log.info(
-                        f"Cash balance = {self.__free_cash} after transactions are made")
-
-                # 累計交易數量夠多時，向外通知目前剩餘的現金和 P&L 快照
-                acc_transaction_count_before_notify_pnl += len(transactions_made)
-                notify_threshold = self.__config.position_manage.get('acc_transaction_count_before_notify_pnl', 20)
-                
-                if acc_transaction_count_before_notify_pnl >= notify_threshold:
-                    if self.__notif is not None:
-                        # Send cash balance notification
-                        self.__tx_q.put(QueueTask(
-                            TaskType.NOTIFY_CASH_BALANCE, f"{self.__free_cash.normalize():f} {self.__cash_currency}"))
-                        
-                        # Calculate and send P&L snapshot
-                        try:
-                            pnl_data = self.__record.cal_portfolio_pnl(market_price_dict, self.__cash_currency)
-                            pnl_message = self.__record.format_pnl_snapshot_message(pnl_data, "Trading")
-                            self.__tx_q.put(QueueTask(TaskType.NOTIFY_PNL_SNAPSHOT, pnl_message))
-                            _log.info("P&L snapshot notification sent")
-                        except Exception as e:
-                            _log.exception("Failed to calculate or send P&L snapshot")
-                            
-                    acc_transaction_count_before_notify_pnl = 0
-
-                sleep_event.wait(1)
+                fetched_at = self.__clock.time()
+                with self.__round_phases.phase('balance_refresh'):
+                    equities_balance = self.__crypto.get_equities_balance(
+                        self.__watching_symbols, self.__cash_currency)
+                self.__after_balance_refresh(
+                    equities_balance, market_price_dict, transactions_made, fetched_at)
+
+                self.__clock.wait(1, sleep_event)
             except:
                 _log.exception(
                     f"Catched an exception while fetching latest {self.__cash_currency} balance from exchange")
 
-            toc = time.perf_counter()
-            time_elapsed = toc - tic
-            _log.debug(f"Round ended, took {time_elapsed:0.4f} seconds")
-
-            cool_down_time = 60 - time_elapsed
+            cool_down_time = self.__end_round(tic)
             if cool_down_time > 0:
-                _log.debug(f"Sleep {cool_down_time} seconds before next round")
-                sleep_event.wait(cool_down_time)
+                self.__clock.wait(cool_down_time, sleep_event)
 
             if not keep_loop_running or _killer.kill_now:
-                _log.warning("Stop the outer loop after cooldown")
-                toc = time.perf_counter()
-                time_elapsed = toc - tic
-                _log.debug(
-                    f"Round stopped early, took {time_elapsed:0.4f} seconds")
+                self.__log_stopped_early("Stop the outer loop after cooldown", tic)
                 break
 
-        self.__tx_q.put(QueueTask(TaskType.STOP_WORKER_THREAD, None))
-        self.__tx_q.join()
+        if executor is not None:
+            executor.shutdown(wait=True, cancel_futures=True)
+
+        if self.__order_manager is not None:
+            self.__order_manager.shutdown()
+            if self.__pending_orders:
+                _log.warning(
+                    f"{len(self.__pending_orders)} order(s) are still pending at exit, later fills only update the position")
+        self.__crypto.stop_kline_stream()
+        self.__crypto.stop_user_data_stream()
+        self.__record.commit()
+        self.__crypto.snapshot_trade_records()
+        self.__stop_metrics_server()
+        # 沒有通知平台時沒有 worker thread 處理 queue，join() 會永遠等待
+        if self.__notif is not None:
+            self.__tx_q.put(QueueTask(TaskType.STOP_WORKER_THREAD, None))
+            self.__tx_q.join()
+
+    def start_loop_async(self):
+        """以 asyncio 啟動分析全部交易對的迴圈，K 線下載與餘額查詢在同一個 event loop 上同時進行"""
+        asyncio.run(self.__async_loop())
+
+    async def __async_loop(self):
+        equities_balance, report = await asyncio.to_thread(self.__prepare_loop)
+        await self.__crypto.open_async_session(
+            self.__config.auth["API_KEY"], self.__config.auth["API_SECRET"])
+
+        # 同時進行中的交易對分析數量上限
+        in_flight = asyncio.Semaphore(self.__async_max_in_flight)
+        order_lock = asyncio.Lock()
+        keep_loop_running = True
+
+        try:
+            while keep_loop_running and not _killer.kill_now and not self.__clock.is_finished():
+                tic = time.perf_counter()
+
+                # 給這一輪的 transaction 一個 group ID
+                round_id = str(time.time_ns())
+                _log.debug(f"Starting new round, round_id = {round_id}")
+                self.__round_phases = PhaseTimer(_round_phase_seconds, _symbol_phase_seconds, self.__metric_labels)
+
+                _log.debug(f'Available {self.__cash_currency}: {self.__free_cash}')
+                market_price_dict = {}
+                transactions_made = []
+                insufficient_fund_trade_symbols = []
+                plan = self.__scheduler.plan_round(
+                    self.__watching_symbols, self.__record.positions, self.__clock.time())
+                self.__log_round_plan(plan)
+
+                # 每分析完一個交易對就檢查是否要停止，之後才取得 in_flight 的交易對不再分析
+                stop_requested = False
+                analyzed_count = 0
+
+                async def analyze(symbol_info):
+                    nonlocal stop_requested, analyzed_count
+                    async with in_flight:
+                        if stop_requested or _killer.kill_now:
+                            return None
+
+                        trade_result = await self.__analyze_a_currency_async(
+                            symbol_info=symbol_info,
+                            equities_balance=equities_balance,
+                            report=report,
+                            round_id=round_id,
+                            market_price_dict=market_price_dict,
+                            transactions_made=transactions_made,
+                            order_lock=order_lock,
+                        )
+                        analyzed_count += 1
+
+                    if not stop_requested and self.__stop_requested():
+                        stop_requested = True
+
+                    return trade_result
+
+                trade_results = await asyncio.gather(
+                    *[analyze(symbol_info) for symbol_info in plan.full_analysis])
+
+                for symbol_info, trade_result in zip(plan.full_analysis, trade_results):
+                    if trade_result is not None and trade_result.status == OrderStatus.INSUFFICIENT_FUND:
+                        insufficient_fund_trade_symbols.append(symbol_info.symbol)
+
+                keep_loop_running = not stop_requested and not self.__stop_requested()
+                analysis_elapsed = time.perf_counter() - tic
+                self.__round_phases.add('analysis', analysis_elapsed)
+                self.__log_analysis_elapsed(
+                    analyzed_count, analysis_elapsed,
+                    f"asyncio, {self.__async_max_in_flight} in flight")
+
+                if keep_loop_running:
+                    keep_loop_running = await asyncio.to_thread(
+                        self.__check_intra_candle,
+                        symbols=plan.intra_candle,
+                        equities_balance=equities_balance,
+                        report=report,
+                        round_id=round_id,
+                        market_price_dict=market_price_dict,
+                        transactions_made=transactions_made,
+                        insufficient_fund_trade_symbols=insufficient_fund_trade_symbols,
+                    )
+
+                await asyncio.to_thread(
+                    self.__after_analysis,
+                    report, market_price_dict, transactions_made, insufficient_fund_trade_symbols)
+
+                if not keep_loop_running or _killer.kill_now:
+                    self.__log_stopped_early(
+                        "Stop the outer loop after updating report on Google Sheet", tic)
+                    break
+
+                try:
+                    # 從 API 更新餘額，取得最新剩餘現金
+                    _log.debug(
+                        f"Fetching latest {self.__cash_currency} balance from exchange")
+                    fetched_at = self.__clock.time()
+                    with self.__round_phases.phase('balance_refresh'):
+                        equities_balance = await self.__crypto.get_equities_balance_async(
+                            self.__watching_symbols, self.__cash_currency)
+                    await asyncio.to_thread(
+                        self.__after_balance_refresh,
+                        equities_balance, market_price_dict, transactions_made, fetched_at)
+                except:
+                    _log.exception(
+                        f"Catched an exception while fetching latest {self.__cash_currency} balance from exchange")
+
+                cool_down_time = self.__end_round(tic)
+                if cool_down_time > 0:
+                    await asyncio.to_thread(self.__clock.wait, cool_down_time, sleep_event)
+
+                if not keep_loop_running or _killer.kill_now:
+                    self.__log_stopped_early("Stop the outer loop after cooldown", tic)
+                    break
+        finally:
+            await self.__crypto.close_async_session()
+            self.__crypto.stop_kline_stream()
+            self.__crypto.stop_user_data_stream()
+            self.__record.commit()
+            self.__crypto.snapshot_trade_records()
+            self.__stop_metrics_server()
+
+        if self.__notif is not None:
+            self.__tx_q.put(QueueTask(TaskType.STOP_WORKER_THREAD, None))
+            await asyncio.to_thread(self.__tx_q.join)
+
+    def __prepare_loop(self):
+        """取得監視的交易對、餘額與倉位紀錄，回傳 (equities_balance, report)"""
+        self.__watching_symbols = self.__crypto.get_tradable_symbols(
+            self.__cash_currency, self.__include_currencies, self.__exclude_currencies)
+        if self.__symbol_shard is not None:
+            self.__watching_symbols = TradeLoopRunner.select_shard_symbols(
+                self.__watching_symbols, *self.__symbol_shard)
+            _log.info(
+                f"Shard {self.__symbol_shard[0] + 1}/{self.__symbol_shard[1]}"
+                f" watching {len(self.__watching_symbols)} symbols")
+        _log.debug(f"Watching trading symbols: {self.__watching_symbols}")
+
+        # 先訂閱 user data stream 再查詢餘額，之後的餘額變化才不會漏掉
+        self.__crypto.start_user_data_stream()
+        equities_balance = self.__crypto.get_equities_balance(
+            self.__watching_symbols, self.__cash_currency)
+        # 多個 shard 寫入同一個目錄，group commit 的 intent 檔各自分開
+        self.__record = file_based_asset_positions.AssetPositions.from_config(
+            self.__config, self.__watching_symbols, self.__cash_currency,
+            writer_id=f"shard-{self.__symbol_shard[0]}" if self.__symbol_shard is not None else None)
+
+        if self.__kline_source == 'websocket':
+            self.__crypto.start_kline_stream(
+                [s.symbol for s in self.__watching_symbols],
+                self.__kline_interval,
+                self.__klines_limit,
+                with_mini_tickers=True)
+
+        # Google Sheet 報表 client
+        report = None
+        if self.__write_to_gsheet:
+            report = CryptoReport(config=self.__config)
+
+        # 印出持倉
+        for k, v in self.__record.positions.items():
+            if v.open_quantity > 0:
+                _log.info(f"Position: {str(v)}")
+
+        # 當交易量達到一定數值後，向外發出目前剩餘的現金和 P&L 快照
+        self.__acc_transaction_count_before_notify_pnl = 0
+
+        self.__free_cash = equities_balance[self.__cash_currency].free
+        if self.__risk_coordinator is not None:
+            self.__free_cash = self.__risk_coordinator.get_free_cash()
+        self.__start_metrics_server()
+        return (equities_balance, report)
+
+    def select_shard_symbols(symbols: List[WatchingSymbol], shard_index: int, shard_count: int) -> List[WatchingSymbol]:
+        """依交易對名稱排序後輪流分配，每個交易對只屬於一個 shard"""
+        return sorted(symbols, key=lambda s: s.symbol)[shard_index::shard_count]
+
+    def __start_metrics_server(self):
+        """註冊讀取目前狀態的 gauge，並啟動 metrics HTTP server"""
+        _free_cash.set_function(lambda: self.__free_cash or 0, **self.__metric_labels)
+        _open_positions.set_function(self.__record.cal_total_open_position_count, **self.__metric_labels)
+        _notification_queue_depth.set_function(self.__tx_q.qsize, **self.__metric_labels)
+
+        if self.__metrics_server is not None:
+            self.__metrics_server.start()
+
+    def __stop_metrics_server(self):
+        if self.__metrics_server is not None:
+            self.__metrics_server.stop()
+
+    def __after_analysis(
+        self,
+        report: CryptoReport,
+        market_price_dict,
+        transactions_made,
+        insufficient_fund_trade_symbols,
+    ):
+        """一輪分析結束後，送出交易通知並更新報表"""
+        # group commit 模式下，這一輪的成交在此一次寫檔
+        with self.__round_phases.phase('persistence_commit'):
+            self.__record.commit()
+            self.__crypto.commit_trade_records()
+
+        # 通知進行的交易
+        self.__try_notify_transactions(transactions_made)
+
+        if self.__export_positions_json:
+            with self.__round_phases.phase('positions_export'):
+                self.__record.export_json()
+
+        # 更新 Google Sheet
+        if self.__write_to_gsheet:
+            try:
+                with self.__round_phases.phase('gsheet_sync'):
+                    report.update_market_price(
+                        market_price_dict, self.__record.positions)
+            except:
+                _log.exception(
+                    f"Catched an exception while updating report on Google Sheet")
+
+        if len(insufficient_fund_trade_symbols) > 0:
+            _log.warning(
+                f"Cannot send BUY order for the following due to insufficient funds: {insufficient_fund_trade_symbols}")
+
+    def __after_balance_refresh(self, equities_balance, market_price_dict, transactions_made, fetched_at):
+        """從交易所取得最新餘額後，更新剩餘現金，必要時通知現金和 P&L 快照"""
+        if self.__risk_coordinator is not None:
+            # 現金由 coordinator 統一管理，交易所餘額只用來校正
+            self.__risk_coordinator.sync_free_cash(
+                equities_balance[self.__cash_currency].free, fetched_at)
+            self.__free_cash = self.__risk_coordinator.get_free_cash()
+        else:
+            # 尚未結束的買單保留的現金，到訂單結束才退回
+            self.__free_cash = equities_balance[self.__cash_currency].free - self.__pending_buy_reservations()[1]
+
+        if len(transactions_made) > 0:
+            _log.info(
+                f"Cash balance = {self.__free_cash} after transactions are made")
+
+        # 累計交易數量夠多時，向外通知目前剩餘的現金和 P&L 快照
+        self.__acc_transaction_count_before_notify_pnl += len(transactions_made)
+        notify_threshold = self.__config.position_manage.get('acc_transaction_count_before_notify_pnl', 20)
+
+        if self.__acc_transaction_count_before_notify_pnl >= notify_threshold:
+            if self.__notif is not None:
+                # Send cash balance notification
+                self.__tx_q.put(QueueTask(
+                    TaskType.NOTIFY_CASH_BALANCE, f"{self.__free_cash.normalize():f} {self.__cash_currency}"))
+
+                # Calculate and send P&L snapshot
+                try:
+                    pnl_data = self.__record.cal_portfolio_pnl(market_price_dict, self.__cash_currency)
+                    pnl_message = self.__record.format_pnl_snapshot_message(pnl_data, "Trading")
+                    self.__tx_q.put(QueueTask(TaskType.NOTIFY_PNL_SNAPSHOT, pnl_message))
+                    _log.info("P&L snapshot notification sent")
+                except Exception as e:
+                    _log.exception("Failed to calculate or send P&L snapshot")
+
+            self.__acc_transaction_count_before_notify_pnl = 0
+
+    def __end_round(self, tic) -> float:
+        """記錄此輪耗時，回傳下一輪開始前需要等待的秒數"""
+        toc = time.perf_counter()
+        time_elapsed = toc - tic
+        _log.debug(f"Round ended, took {time_elapsed:0.4f} seconds")
+        _round_seconds.observe(time_elapsed, **self.__metric_labels)
+        _rounds.inc(**self.__metric_labels)
+
+        phases = self.__round_phases.finish()
+        _log.info(
+            f"Round took {time_elapsed:0.3f} seconds: "
+            + ", ".join(f"{name} {seconds:0.3f}s" for name, seconds in phases.items()))
+
+        if self.__metrics_snapshot_file:
+            try:
+                REGISTRY.export_json(self.__metrics_snapshot_file)
+            except:
+                _log.exception(f"Catched an exception while writing metrics to {self.__metrics_snapshot_file}")
+
+        weight_stats = self.__crypto.pop_request_weight_stats()
+        if weight_stats is not None:
+            _round_request_weight.set(weight_stats['weight'], **self.__metric_labels)
+            if weight_stats['server_used_weight'] is not None:
+                _exchange_used_weight.set(weight_stats['server_used_weight'], **self.__metric_labels)
+            _log.info(
+                f"Request weight this round: {weight_stats['weight']} in {weight_stats['requests']} requests"
+                f", waited {weight_stats['waited_seconds']:0.2f} seconds for budget"
+                f", Binance reported {weight_stats['server_used_weight']}/{weight_stats['budget']} used this minute")
+
+        latency_stats = self.__crypto.get_request_latency_stats()
+        if latency_stats:
+            _log.debug(
+                "Request latency by endpoint: "
+                + ", ".join(f"{endpoint} n={s['count']} p50<={s['p50']}s p90<={s['p90']}s p99<={s['p99']}s"
+                            for endpoint, s in sorted(latency_stats.items())))
+
+        cool_down_time = self.__scheduler.seconds_until_next_round(self.__clock.time())
+        if cool_down_time > 0:
+            _log.debug(f"Sleep {cool_down_time} seconds before next round")
+
+        return cool_down_time
+
+    def __log_round_plan(self, plan):
+        plan.record_metrics(**self.__metric_labels)
+        if plan.stats:
+            _log.info(
+                f"Round plan: {len(plan.full_analysis)} to analyze, {len(plan.intra_candle)} intra-candle"
+                f", " + ", ".join(f"{k} = {v}" for k, v in plan.stats.items()))
+
+    def __log_analysis_elapsed(self, analyzed_count, analysis_elapsed, engine_desc):
+        _round_symbols_analyzed.set(analyzed_count, **self.__metric_labels)
+        _log.info(
+            f"Analyzed {analyzed_count} symbols in {analysis_elapsed:0.4f} seconds"
+            f" ({engine_desc}, {analyzed_count / max(analysis_elapsed, 1e-9):0.2f} symbols/s)")
+
+        kline_stats = self.__crypto.pop_kline_fetch_stats()
+        if kline_stats is not None and (kline_stats['fetched'] or kline_stats['saved']):
+            _log.info(
+                f"K lines downloaded this round: {kline_stats['fetched']}"
+                f", saved by incremental fetch: {kline_stats['saved']}")
+
+    def __log_stopped_early(self, message, tic):
+        _log.warning(message)
+        toc = time.perf_counter()
+        time_elapsed = toc - tic
+        _log.debug(
+            f"Round stopped early, took {time_elapsed:0.4f} seconds")
 
     def close_all_positions(self):
         """平倉記錄的所有部位"""
@@ -302,12 +714,12 @@ class TradeLoopRunner:
 
         equities_balance = self.__crypto.get_equities_balance(
             self.__watching_symbols, self.__cash_currency)
-        self.__record = file_based_asset_positions.AssetPositions(
-            self.__watching_symbols, self.__cash_currency)
+        self.__record = file_based_asset_positions.AssetPositions.from_config(
+            self.__config, self.__watching_symbols, self.__cash_currency)
 
         # Google Sheet 報表 client
         report = None
-        if write_to_gsheet:
+        if self.__write_to_gsheet:
             report = CryptoReport(config=self.__config)
 
         self.__free_cash = equities_balance[self.__cash_currency].free
@@ -346,15 +758,157 @@ class TradeLoopRunner:
                         "SIGINT or SIGTERM detected, stop trading symbol loop")
                     keep_loop_running = False
                     break
-
-                time.sleep(0.1)
         except:
             _log.exception(
                 f"[{trade_symbol}] Catched an exception while selling all {base_asset} for {self.__cash_currency}")
 
+        self.__settle_pending_orders(report, transactions_made)
+        if self.__order_manager is not None:
+            self.__order_manager.shutdown()
+        self.__record.commit()
+        self.__crypto.snapshot_trade_records()
+        if self.__export_positions_json:
+            self.__record.export_json()
         self.__try_notify_transactions(transactions_made)
         _log.info("----- Done closing all positions -----")
 
+    def __analyze_symbols(
+        self,
+        executor: ThreadPoolExecutor,
+        symbols: List[WatchingSymbol],
+        equities_balance,
+        report: CryptoReport,
+        round_id: str,
+        market_price_dict,
+        transactions_made,
+        insufficient_fund_trade_symbols,
+    ):
+        """
+        分析一輪交易對，executor 為 None 時逐一分析，否則交給 executor 同時分析
+        回傳 (是否繼續執行迴圈, 完成分析的交易對數量)
+        """
+        analyze_kwargs = dict(
+            equities_balance=equities_balance,
+            report=report,
+            round_id=round_id,
+            market_price_dict=market_price_dict,
+            transactions_made=transactions_made,
+        )
+
+        def on_analyzed(symbol_info, trade_result):
+            if trade_result is not None and trade_result.status == OrderStatus.INSUFFICIENT_FUND:
+                insufficient_fund_trade_symbols.append(symbol_info.symbol)
+
+        analyzed_count = 0
+
+        if executor is None:
+            for symbol_info in symbols:
+                on_analyzed(symbol_info, self.__analyze_a_currency(
+                    symbol_info=symbol_info, **analyze_kwargs))
+                analyzed_count += 1
+
+                if self.__stop_requested():
+                    return (False, analyzed_count)
+
+            return (True, analyzed_count)
+
+        futures = {
+            executor.submit(self.__analyze_a_currency,
+                            symbol_info=symbol_info, **analyze_kwargs): symbol_info
+            for symbol_info in symbols
+        }
+
+        keep_loop_running = True
+        for future in as_completed(futures):
+            if future.cancelled():
+                continue
+
+            on_analyzed(futures[future], future.result())
+            analyzed_count += 1
+
+            if keep_loop_running and self.__stop_requested():
+                keep_loop_running = False
+                for f in futures:
+                    f.cancel()
+
+        return (keep_loop_running, analyzed_count)
+
+    def __check_intra_candle(
+        self,
+        symbols: List[WatchingSymbol],
+        equities_balance,
+        report: CryptoReport,
+        round_id: str,
+        market_price_dict,
+        transactions_made,
+        insufficient_fund_trade_symbols,
+    ) -> bool:
+        """
+        K 線收盤之間，只以最新價 (批次 ticker 快取) 呼叫 analyzer.analyze_intra_candle()
+        analyzer 沒有實作 intra-candle 邏輯時不做任何事
+        回傳是否繼續執行迴圈
+        """
+        if not symbols or not self.__analyzer.has_intra_candle_logic():
+            return True
+
+        for symbol_info in symbols:
+            trade_symbol = symbol_info.symbol
+            base_asset = symbol_info.base_asset
+            if base_asset not in equities_balance:
+                continue
+
+            try:
+                with self.__round_phases.phase('intra_candle', trade_symbol):
+                    latest_quote = Decimal(
+                        self.__crypto.get_latest_price_cache_first(trade_symbol)['price'])
+                    analyzed_action = self.__analyzer.analyze_intra_candle(
+                        latest_quote, self.__record.positions[base_asset])
+                market_price_dict[symbol_info] = latest_quote
+
+                if analyzed_action != Trade.PASS:
+                    _log.info(f'[{trade_symbol}] Intra-candle analysis result: {analyzed_action.name}')
+                    with self.__order_lock, self.__round_phases.phase('order', trade_symbol):
+                        trade_result = self.__do_action_by_analysis_result(
+                            symbol_info=symbol_info,
+                            equities_balance=equities_balance,
+                            report=report,
+                            round_id=round_id,
+                            market_price_dict=market_price_dict,
+                            transactions_made=transactions_made,
+                            buy_sell_action=analyzed_action,
+                        )
+
+                    if trade_result is not None and trade_result.status == OrderStatus.INSUFFICIENT_FUND:
+                        insufficient_fund_trade_symbols.append(trade_symbol)
+            except:
+                _log.exception(
+                    f"[{trade_symbol}] Catched an exception in intra-candle check")
+
+            if self.__stop_requested():
+                return False
+
+        return True
+
+    def __stop_requested(self) -> bool:
+        """檢查是否收到停止檔或 SIGINT/SIGTERM"""
+        if os.path.exists("stoppp"):
+            _log.warning(
+                "Stop file detected, stop trading symbol loop")
+            os.rename("stoppp", "_stoppp")
+            if self.__risk_coordinator is not None:
+                self.__risk_coordinator.request_stop()
+            return True
+        elif _killer.kill_now:
+            _log.warning(
+                "SIGINT or SIGTERM detected, stop trading symbol loop")
+            return True
+        elif self.__risk_coordinator is not None and self.__risk_coordinator.is_stop_requested():
+            _log.warning(
+                "Another shard requested to stop, stop trading symbol loop")
+            return True
+
+        return False
+
     def __analyze_a_currency(
         self,
         symbol_info: WatchingSymbol,
@@ -376,40 +930,109 @@ class TradeLoopRunner:
 
         try:
             _log.info(f'[{trade_symbol}] Downloading K lines from Binance...')
-            klines = self.__crypto.get_klines(
-                trade_symbol, 20, Client.KLINE_INTERVAL_1DAY)
+            with self.__round_phases.phase('kline_download', trade_symbol):
+                klines = self.__crypto.get_klines(
+                    trade_symbol, self.__klines_limit, self.__kline_interval)
             if klines is None:
                 _log.warning(f'[{trade_symbol}] Failed to get K lines from Binance')
                 return None
 
-            latest_quote = klines[-1].close
+            latest_quote = klines.decimal_close()
             _log.info(f'[{trade_symbol}] ✓ Got Binance quote: {latest_quote} USDT (from {len(klines)} K-lines)')
             
             _log.info(f'[{trade_symbol}] Performing technical analysis using {self.__analyzer.__class__.__name__}...')
-            analyzed_action = self.__analyzer.analyze(
-                klines, self.__record.positions[base_asset])
+            with self.__round_phases.phase('analyze', trade_symbol):
+                analyzed_action = self.__analyzer.analyze(
+                    klines, self.__record.positions[base_asset])
+            _symbols_analyzed.inc(result=analyzed_action.name, **self.__metric_labels)
             _log.info(f'[{trade_symbol}] ✓ Technical analysis result: {analyzed_action.name}')
 
             _log.debug(
                 f"[{trade_symbol}] {self.__analyzer.tag} = {analyzed_action}")
 
-            trade_result = self.__do_action_by_analysis_result(
-                symbol_info=symbol_info,
-                equities_balance=equities_balance,
-                report=report,
-                round_id=round_id,
-                market_price_dict=market_price_dict,
-                transactions_made=transactions_made,
-                buy_sell_action=analyzed_action,
-            )
+            with self.__order_lock, self.__round_phases.phase('order', trade_symbol):
+                trade_result = self.__do_action_by_analysis_result(
+                    symbol_info=symbol_info,
+                    equities_balance=equities_balance,
+                    report=report,
+                    round_id=round_id,
+                    market_price_dict=market_price_dict,
+                    transactions_made=transactions_made,
+                    buy_sell_action=analyzed_action,
+                )
 
-            sleep_event.wait(0.1)
+            self.__scheduler.mark_analyzed(symbol_info)
+            market_price_dict[symbol_info] = latest_quote
+            return trade_result
+        except:
+            # 暫時性的網路錯誤已由傳輸層重送，仍失敗的交易對略過，不拖慢這一輪其他交易對
+            _log.exception(
+                f"[{trade_symbol}] Catched an exception in trading symbol loop")
+            return None
+
+    async def __analyze_a_currency_async(
+        self,
+        symbol_info: WatchingSymbol,
+        equities_balance,
+        report: CryptoReport,
+        round_id: str,
+        market_price_dict,
+        transactions_made,
+        order_lock: asyncio.Lock,
+    ) -> OrderResult:
+        """__analyze_a_currency 的 asyncio 版本，送單仍透過同步的 send_order 於背景執行緒逐一進行"""
+        trade_symbol = symbol_info.symbol
+        base_asset = symbol_info.base_asset
+
+        if base_asset not in equities_balance:
+            # 沒辦法看到該幣餘額，推斷帳號無法交易此幣，所以不計算策略
+            _log.warning(
+                f"Cannot get {base_asset} balance in your account, skip analyzing this currency")
+            return None
+
+        try:
+            _log.info(f'[{trade_symbol}] Downloading K lines from Binance...')
+            with self.__round_phases.phase('kline_download', trade_symbol):
+                klines = await self.__crypto.get_klines_async(
+                    trade_symbol, self.__klines_limit, self.__kline_interval)
+            if klines is None:
+                _log.warning(f'[{trade_symbol}] Failed to get K lines from Binance')
+                return None
+
+            latest_quote = klines.decimal_close()
+            _log.info(f'[{trade_symbol}] ✓ Got Binance quote: {latest_quote} USDT (from {len(klines)} K-lines)')
+
+            _log.info(f'[{trade_symbol}] Performing technical analysis using {self.__analyzer.__class__.__name__}...')
+            with self.__round_phases.phase('analyze', trade_symbol):
+                analyzed_action = self.__analyzer.analyze(
+                    klines, self.__record.positions[base_asset])
+            _symbols_analyzed.inc(result=analyzed_action.name, **self.__metric_labels)
+            _log.info(f'[{trade_symbol}] ✓ Technical analysis result: {analyzed_action.name}')
+
+            _log.debug(
+                f"[{trade_symbol}] {self.__analyzer.tag} = {analyzed_action}")
+
+            trade_result = None
+            if analyzed_action != Trade.PASS:
+                async with order_lock:
+                    with self.__round_phases.phase('order', trade_symbol):
+                        trade_result = await asyncio.to_thread(
+                            self.__do_action_by_analysis_result,
+                            symbol_info=symbol_info,
+                            equities_balance=equities_balance,
+                            report=report,
+                            round_id=round_id,
+                            market_price_dict=market_price_dict,
+                            transactions_made=transactions_made,
+                            buy_sell_action=analyzed_action,
+                        )
+
+            self.__scheduler.mark_analyzed(symbol_info)
             market_price_dict[symbol_info] = latest_quote
             return trade_result
         except:
             _log.exception(
                 f"[{trade_symbol}] Catched an exception in trading symbol loop")
-            sleep_event.wait(3)
             return None
 
     def __do_action_by_analysis_result(
@@ -426,9 +1049,13 @@ class TradeLoopRunner:
         base_asset = symbol_info.base_asset
         trade_result = None
 
-        if buy_sell_action == Trade.BUY:
+        if buy_sell_action == Trade.BUY and self.__risk_coordinator is not None:
+            trade_result = self.__buy_with_reservation(
+                symbol_info, report, round_id, transactions_made)
+        elif buy_sell_action == Trade.BUY:
             can_send_buy_order = self.__can_send_buy_order_permitted_by_config(
                 trade_symbol=trade_symbol,
+                base_asset=base_asset,
             )
 
             if can_send_buy_order:
@@ -445,7 +1072,8 @@ class TradeLoopRunner:
                     asset_position=self.__record.positions[base_asset],
                     symbol_info=symbol_info,
                     round_id=round_id,
-                    position_accumulation_strategy=self.__config.position_manage.get('position_accumulation_strategy', 'hold_until_sell')
+                    position_accumulation_strategy=self.__config.position_manage.get('position_accumulation_strategy', 'hold_until_sell'),
+                    order_manager=self.__order_manager
                 )
 
                 self.__process_order_result(
@@ -459,15 +1087,72 @@ class TradeLoopRunner:
                 asset_position=self.__record.positions[base_asset],
                 symbol_info=symbol_info,
                 round_id=round_id,
+                order_manager=self.__order_manager,
             )
 
             self.__process_order_result(
                 trade_result, trade_symbol, report, transactions_made)
+
+            if self.__risk_coordinator is not None and trade_result.status == OrderStatus.OK:
+                self.__risk_coordinator.record_sell(
+                    base_asset,
+                    self.__cash_delta(trade_result),
+                    self.__record.positions[base_asset].open_cost)
+                self.__free_cash = self.__risk_coordinator.get_free_cash()
         else:
             trade_result = None
 
         return trade_result
 
+    def __buy_with_reservation(
+        self,
+        symbol_info: WatchingSymbol,
+        report: CryptoReport,
+        round_id: str,
+        transactions_made,
+    ) -> OrderResult:
+        """向 RiskCoordinator 取得買入額度後才送出買單，送單後回報實際花費"""
+        trade_symbol = symbol_info.symbol
+        base_asset = symbol_info.base_asset
+
+        reservation, reject_reason = self.__risk_coordinator.reserve_buy(
+            base_asset, self.__max_fund_per_order)
+        if reservation is None:
+            if reject_reason == 'insufficient_fund':
+                return OrderResult(SIDE_BUY, OrderStatus.INSUFFICIENT_FUND)
+
+            _log.warning(f"[{trade_symbol}] BUY rejected by risk coordinator ({reject_reason})")
+            return None
+
+        trade_result = None
+        try:
+            trade_result = send_order.execute_buy_order(
+                api_client=self.__crypto,
+                base_asset=base_asset,
+                trade_symbol=trade_symbol,
+                cash_asset=self.__cash_currency,
+                max_fund=reservation.amount,
+                asset_position=self.__record.positions[base_asset],
+                symbol_info=symbol_info,
+                round_id=round_id,
+                position_accumulation_strategy=self.__config.position_manage.get('position_accumulation_strategy', 'hold_until_sell')
+            )
+
+            self.__process_order_result(
+                trade_result, trade_symbol, report, transactions_made)
+        finally:
+            if trade_result is not None and trade_result.status == OrderStatus.OK:
+                self.__risk_coordinator.commit_buy(
+                    reservation.reservation_id,
+                    -self.__cash_delta(trade_result),
+                    self.__record.positions[base_asset].open_cost)
+            else:
+                self.__risk_coordinator.release(reservation.reservation_id)
+
+            self.__free_cash = self.__risk_coordinator.get_free_cash()
+
+        return trade_result
+
     def __process_order_result(
         self,
         trade_result: send_order.OrderResult,
@@ -475,10 +1160,17 @@ class TradeLoopRunner:
         report: CryptoReport,
         tx_made: List[position.Transaction],
     ):
+        if trade_result.status == OrderStatus.PENDING:
+            self.__pending_orders.append(trade_result.handle)
+            if trade_result.side == SIDE_BUY:
+                # 成交前先扣除預估成本，這一輪其他買單才不會超用現金
+                self.__free_cash -= trade_result.handle.estimated_cost
+            return
+
         if trade_result.status != OrderStatus.OK:
             return
 
-        if write_to_gsheet:
+        if self.__write_to_gsheet:
             report.add_transaction(trade_result.transactions)
 
         for tx in trade_result.transactions:
@@ -495,10 +1187,53 @@ class TradeLoopRunner:
             self.__analyzer.record_successful_sell(base_asset)
             _log.info(f'Recorded successful sell for {base_asset}')
 
-        self.__cal_new_cash_balance(trade_result)
+        if self.__risk_coordinator is None:
+            self.__cal_new_cash_balance(trade_result)
         _log.debug(
             f'[{trade_symbol}] {self.__cash_currency} bal. after {trade_result.side}: {self.__free_cash}')
 
+    def __settle_pending_orders(self, report: CryptoReport, tx_made: List[position.Transaction]):
+        """等待這一輪交給 OrderManager 的訂單成交，並以實際成交的數量處理結果"""
+        if not self.__pending_orders:
+            return
+
+        unresolved = []
+        deadline = time.monotonic() + self.__order_fill_timeout
+        with self.__round_phases.phase('order_settle'):
+            for handle in self.__pending_orders:
+                if not handle.wait(max(0, deadline - time.monotonic())):
+                    # 尚未結束的訂單留到下一輪再處理，買單保留的現金、倉位與成本也繼續保留
+                    _log.warning(
+                        f"[{handle.trade_symbol}] {handle.side} order {handle.client_order_id} is still {handle.status}"
+                        f" after {self.__order_fill_timeout} seconds, settle it in the next round")
+                    unresolved.append(handle)
+                    continue
+
+                if handle.side == SIDE_BUY:
+                    self.__free_cash += handle.estimated_cost
+
+                with self.__order_lock:
+                    self.__process_order_result(handle.to_order_result(), handle.trade_symbol, report, tx_made)
+
+        self.__pending_orders = unresolved
+
+    def __pending_buy_reservations(self):
+        """
+        尚未結束的買單保留的 (買入中的資產, 成本)，與 RiskCoordinator.reserve_buy 相同計入限制
+        已成交的部份已記入倉位，只保留預估成本中尚未成交的部份
+        """
+        assets = set()
+        reserved_cost = Decimal('0')
+        for handle in self.__pending_orders:
+            if handle.side != SIDE_BUY:
+                continue
+
+            assets.add(handle.base_asset)
+            filled_cost = sum((tx.quantity * tx.price for tx in list(handle.transactions)), Decimal('0'))
+            reserved_cost += max(Decimal('0'), handle.estimated_cost - filled_cost)
+
+        return (assets, reserved_cost)
+
     def __cal_new_cash_balance(
         self,
         trade_result: OrderResult
@@ -508,35 +1243,44 @@ class TradeLoopRunner:
         if trade_result.status != OrderStatus.OK:
             return
 
+        # 在此輪結束前還是會向交易所取得最新的餘額，所以計算有些微誤差應可接受
+        self.__free_cash += self.__cash_delta(trade_result)
+
+    def __cash_delta(self, trade_result: OrderResult) -> Decimal:
+        """成交造成的現金變化 (買入為負、賣出為正)，以現金支付的手續費也計入"""
         total_cost_cash = Decimal('0')
         total_commission_cash = Decimal('0')
 
         for transact in trade_result.transactions:
-            # 在此輪結束前還是會向交易所取得最新的餘額，所以計算有些微誤差應可接受
-            total_cost_cash = transact.quantity * transact.price
+            total_cost_cash += transact.quantity * transact.price
 
             # 若手續費使用現金幣支付也要計入
             if transact.commission_asset == self.__cash_currency:
                 total_commission_cash += transact.commission
 
         if trade_result.side == SIDE_BUY:
-            self.__free_cash -= total_cost_cash
+            return -total_cost_cash - total_commission_cash
         elif trade_result.side == SIDE_SELL:
-            self.__free_cash += total_cost_cash
-        else:
-            _log.error(
-                f"Cannot calculate new cash balance due to unknown trade_result.side '{trade_result.side}'")
-            return
+            return total_cost_cash - total_commission_cash
 
-        self.__free_cash -= total_commission_cash
+        _log.error(
+            f"Cannot calculate new cash balance due to unknown trade_result.side '{trade_result.side}'")
+        return Decimal('0')
 
     def __can_send_buy_order_permitted_by_config(
         self,
         trade_symbol: str,
+        base_asset: str,
     ) -> bool:
-        """依照 config 限制，目前狀況是否還允許送出買單至交易所"""
+        """依照 config 限制，目前狀況是否還允許送出買單至交易所 (尚未結束的買單也計入)"""
+        pending_assets, pending_cost = self.__pending_buy_reservations()
+        if base_asset in pending_assets:
+            _log.warning(f"[{trade_symbol}] A BUY order of {base_asset} is still pending, skip the BUY")
+            return False
+
         if self.__max_open_positions is not None:
-            cur_open_count = self.__record.cal_total_open_position_count()
+            cur_open_count = self.__record.cal_total_open_position_count() + len(
+                [a for a in pending_assets if self.__record.positions[a].open_quantity <= 0])
             if cur_open_count >= self.__max_open_positions:
                 _log.warning(
                     f"[{trade_symbol}] Current opened position count exceeds limit, skip the BUY"
@@ -545,7 +1289,7 @@ class TradeLoopRunner:
                 return False
 
         if self.__max_total_open_cost is not None:
-            cur_total_open_cost = self.__record.cal_total_open_cost()
+            cur_total_open_cost = self.__record.cal_total_open_cost() + pending_cost
             if cur_total_open_cost >= self.__max_total_open_cost:
                 _log.warning(
                     f"[{trade_symbol}] Current total open cost exceeds limit, skip the BUY"
@@ -567,6 +1311,11 @@ class TradeLoopRunner:
                 f"Catched an exception while sending transactions notification")
 
 
+def request_stop_all():
+    """讓此 process 內全部的 TradeLoopRunner 結束迴圈 (與收到 SIGINT/SIGTERM 相同)"""
+    _killer.exit_gracefully()
+
+
 if __name__ == '__main__':
     _log.info("App started")
 
@@ -574,7 +1323,10 @@ if __name__ == '__main__':
     config = Config()
 
     trade_loop_runner = TradeLoopRunner(config)
-    trade_loop_runner.start_loop()
+    if trade_loop_runner.engine == 'asyncio':
+        trade_loop_runner.start_loop_async()
+    else:
+        trade_loop_runner.start_loop()
     # trade_loop_runner.close_all_positions()
 
     _log.debug("App exited")
@@ -0,0 +1,4 @@
+from .scheduler import *
+from .fixed_interval_scheduler import *
+from .candle_close_scheduler import *
+from .priority_scheduler import *
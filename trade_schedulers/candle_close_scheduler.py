@@ -0,0 +1,85 @@
+import logging.config
+from typing import Dict, List
+
+from binance.client import Client
+from binance.helpers import interval_to_milliseconds
+
+from .scheduler import *
+
+_log = logging.getLogger(__name__)
+
+# 1970-01-01 是星期四，幣安的週 K 線從星期一 00:00 UTC 開始
+_WEEK_OFFSET_MS = 4 * 24 * 60 * 60 * 1000
+
+
+class CandleCloseScheduler(RoundScheduler):
+    """
+    配合 K 線收盤時間的排程：
+    只有在交易對最後一根 K 線收盤後 (且尚未分析過) 才完整分析，
+    K 線收盤之間只以最新價做輕量檢查 (analyzer.analyze_intra_candle)
+    """
+
+    def __init__(self, kline_interval: str, settle_seconds: float = 2, intra_candle_seconds: float = 60):
+        """
+        kline_interval: 分析使用的 K 線週期 (e.g., Client.KLINE_INTERVAL_1DAY)
+        settle_seconds: K 線收盤後多等幾秒再分析，讓交易所的 K 線資料就緒
+        intra_candle_seconds: K 線收盤之間，輕量檢查的間隔秒數
+        """
+        if kline_interval == Client.KLINE_INTERVAL_1MONTH:
+            raise ValueError('CandleCloseScheduler does not support monthly K lines')
+
+        self.kline_interval = kline_interval
+        self.__interval_ms = interval_to_milliseconds(kline_interval)
+        self.__offset_ms = _WEEK_OFFSET_MS if kline_interval == Client.KLINE_INTERVAL_1WEEK else 0
+        self.settle_seconds = settle_seconds
+        self.intra_candle_seconds = intra_candle_seconds
+
+        # 交易對 -> 已完整分析過的最後一根收盤 K 線的收盤時間 (ms)
+        self.__last_analyzed_close: Dict[str, int] = dict()
+        self.__current_close_ms = None
+        self.__pending = set()
+        self.__last_intra_candle = None
+
+    def last_close_ms(self, now: float) -> int:
+        """now 之前最後一個 K 線收盤 (= 目前 K 線開盤) 的時間 (ms)"""
+        now_ms = int(now * 1000)
+        return now_ms - (now_ms - self.__offset_ms) % self.__interval_ms
+
+    def plan_round(self, watching_symbols: List, positions: Dict, now: float) -> RoundPlan:
+        close_ms = self.last_close_ms(now)
+        settled = (now * 1000 - close_ms) >= self.settle_seconds * 1000
+        self.__current_close_ms = close_ms
+
+        full_analysis = []
+        intra_candle = []
+        for symbol_info in watching_symbols:
+            if settled and self.__last_analyzed_close.get(symbol_info.symbol, -1) < close_ms:
+                full_analysis.append(symbol_info)
+            else:
+                intra_candle.append(symbol_info)
+
+        self.__pending = {s.symbol for s in full_analysis}
+
+        if self.__last_intra_candle is not None and now - self.__last_intra_candle < self.intra_candle_seconds:
+            intra_candle = []
+        elif intra_candle:
+            self.__last_intra_candle = now
+
+        _log.debug(
+            f"K line closed at {close_ms}, {len(full_analysis)} symbols to analyze"
+            f", {len(intra_candle)} symbols for intra-candle check")
+        return RoundPlan(full_analysis, intra_candle)
+
+    def mark_analyzed(self, symbol_info) -> None:
+        self.__last_analyzed_close[symbol_info.symbol] = self.__current_close_ms
+        self.__pending.discard(symbol_info.symbol)
+
+    def seconds_until_next_round(self, now: float) -> float:
+        next_close = (self.last_close_ms(now) + self.__interval_ms) / 1000
+        wait = next_close + self.settle_seconds - now
+
+        # 還有交易對這次沒分析成功，或 K 線收盤之間的輕量檢查時間到了
+        if self.__pending or self.__last_intra_candle is not None:
+            wait = min(wait, self.intra_candle_seconds)
+
+        return wait
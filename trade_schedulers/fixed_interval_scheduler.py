@@ -0,0 +1,24 @@
+import logging.config
+from typing import Dict, List
+
+from .scheduler import *
+
+_log = logging.getLogger(__name__)
+
+
+class FixedIntervalScheduler(RoundScheduler):
+    """每隔固定秒數完整分析全部交易對"""
+
+    def __init__(self, round_seconds: float = 60):
+        self.round_seconds = round_seconds
+        self.__round_started = None
+
+    def plan_round(self, watching_symbols: List, positions: Dict, now: float) -> RoundPlan:
+        self.__round_started = now
+        return RoundPlan(list(watching_symbols), [])
+
+    def seconds_until_next_round(self, now: float) -> float:
+        if self.__round_started is None:
+            return 0
+
+        return self.round_seconds - (now - self.__round_started)
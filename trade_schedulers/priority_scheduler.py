@@ -0,0 +1,126 @@
+import heapq
+import logging.config
+from typing import Dict, List
+
+from .scheduler import *
+
+_log = logging.getLogger(__name__)
+
+
+class PriorityScheduler(RoundScheduler):
+    """
+    以 heap 記錄每個交易對下一次到期的時間：
+    有持倉的交易對 (影響出場) 以較短的間隔重新分析，
+    只觀察的交易對以較長的間隔輪流分析，且每輪數量可設上限
+    """
+
+    def __init__(
+        self,
+        open_position_seconds: float = 60,
+        watch_only_seconds: float = 600,
+        watch_only_max_per_round: int = 0,
+        min_round_seconds: float = 5,
+    ):
+        """
+        open_position_seconds: 有持倉的交易對的分析間隔
+        watch_only_seconds: 沒有持倉的交易對的分析間隔
+        watch_only_max_per_round: 每輪最多分析幾個沒有持倉的交易對，0 表示不限制
+        min_round_seconds: 兩輪之間最少間隔的秒數，避免積壓時連續發出 API 請求
+        """
+        if open_position_seconds <= 0 or watch_only_seconds <= 0:
+            raise ValueError('PriorityScheduler intervals must be positive')
+        if watch_only_max_per_round < 0:
+            raise ValueError('watch_only_max_per_round must not be negative')
+
+        self.open_position_seconds = open_position_seconds
+        self.watch_only_seconds = watch_only_seconds
+        self.watch_only_max_per_round = watch_only_max_per_round
+        self.min_round_seconds = min_round_seconds
+
+        # (到期時間, 交易對) 的 min-heap，過期的項目在 pop 時略過
+        self.__heap = []
+        # 交易對 -> 目前有效的到期時間
+        self.__next_due: Dict[str, float] = dict()
+        # 交易對 -> 上次排入分析的時間
+        self.__last_planned: Dict[str, float] = dict()
+        # 交易對 -> 上次排程時是否有持倉
+        self.__is_open: Dict[str, bool] = dict()
+        self.__round_started = None
+
+    def plan_round(self, watching_symbols: List, positions: Dict, now: float) -> RoundPlan:
+        self.__round_started = now
+        symbols_by_name = {s.symbol: s for s in watching_symbols}
+
+        # 同步監視清單，並處理持倉狀態的變化 (e.g., 剛買進的交易對改用較短的間隔)
+        for name in list(self.__next_due.keys()):
+            if name not in symbols_by_name:
+                del self.__next_due[name]
+                self.__last_planned.pop(name, None)
+                self.__is_open.pop(name, None)
+
+        for name, symbol_info in symbols_by_name.items():
+            is_open = PriorityScheduler.__has_open_position(symbol_info, positions)
+            if name not in self.__next_due:
+                self.__schedule(name, now)
+            elif is_open and not self.__is_open.get(name, False):
+                self.__schedule(name, min(
+                    self.__next_due[name], self.__last_planned.get(name, now) + self.open_position_seconds))
+            self.__is_open[name] = is_open
+
+        open_due = []
+        watch_due = []
+        deferred = []
+        while self.__heap and self.__heap[0][0] <= now:
+            due, name = heapq.heappop(self.__heap)
+            if self.__next_due.get(name) != due:
+                continue
+
+            if self.__is_open[name]:
+                open_due.append(name)
+            elif self.watch_only_max_per_round and len(watch_due) >= self.watch_only_max_per_round:
+                deferred.append((due, name))
+                continue
+            else:
+                watch_due.append(name)
+
+            self.__last_planned[name] = now
+            self.__schedule(name, now + (
+                self.open_position_seconds if self.__is_open[name] else self.watch_only_seconds))
+
+        # 超過每輪上限的交易對保留原本的到期時間，下一輪優先處理
+        for entry in deferred:
+            heapq.heappush(self.__heap, entry)
+
+        stats = {
+            'open_position_due': len(open_due),
+            'watch_only_due': len(watch_due),
+            'watch_only_deferred': len(deferred),
+            'open_positions': sum(1 for v in self.__is_open.values() if v),
+            'watching': len(self.__next_due),
+            'open_position_seconds': self.open_position_seconds,
+            'watch_only_seconds': self.watch_only_seconds,
+        }
+
+        return RoundPlan(
+            [symbols_by_name[name] for name in open_due + watch_due], [], stats)
+
+    def seconds_until_next_round(self, now: float) -> float:
+        while self.__heap and self.__next_due.get(self.__heap[0][1]) != self.__heap[0][0]:
+            heapq.heappop(self.__heap)
+
+        if not self.__heap:
+            return self.open_position_seconds
+
+        wait = self.__heap[0][0] - now
+        if self.__round_started is not None:
+            wait = max(wait, self.min_round_seconds - (now - self.__round_started))
+
+        return wait
+
+    def __schedule(self, name: str, due: float) -> None:
+        self.__next_due[name] = due
+        heapq.heappush(self.__heap, (due, name))
+
+    def __has_open_position(symbol_info, positions: Dict) -> bool:
+        position = positions.get(symbol_info.base_asset)
+        return position is not None and position.open_quantity > 0
@@ -0,0 +1,67 @@
+import abc
+import logging.config
+from typing import Dict, List
+
+from metrics import REGISTRY
+
+_log = logging.getLogger(__name__)
+
+_round_plan_symbols = REGISTRY.gauge(
+    'trade_loop_round_plan_symbols', 'Symbols in the last round plan, by scheduler category')
+_scheduler_interval_seconds = REGISTRY.gauge(
+    'trade_loop_scheduler_interval_seconds', 'Re-analysis interval of each scheduler cadence')
+_watch_only_deferred = REGISTRY.counter(
+    'trade_loop_watch_only_deferred_total', 'Watch-only symbols deferred by watch_only_max_per_round')
+
+
+class RoundPlan:
+    """一輪要處理的交易對"""
+
+    def __init__(self, full_analysis: List, intra_candle: List, stats: Dict = None):
+        """
+        full_analysis: 需要下載 K 線、完整分析的交易對 (WatchingSymbol)
+        intra_candle: 只需要以最新價做輕量檢查的交易對 (WatchingSymbol)
+        stats: 排程器提供的本輪統計 (e.g., 各類交易對數量、排程間隔)，供 log 與 metrics 使用
+        """
+        self.full_analysis = full_analysis
+        self.intra_candle = intra_candle
+        self.stats = stats if stats is not None else dict()
+
+    def record_metrics(self, **labels) -> None:
+        """
+        將本輪排程的統計記入 metrics
+        stats 中以 _seconds 結尾的是排程間隔，其他是交易對數量
+        """
+        _round_plan_symbols.set(len(self.full_analysis), category='full_analysis', **labels)
+        _round_plan_symbols.set(len(self.intra_candle), category='intra_candle', **labels)
+        for name, value in self.stats.items():
+            if name.endswith('_seconds'):
+                _scheduler_interval_seconds.set(value, cadence=name[:-len('_seconds')], **labels)
+            else:
+                _round_plan_symbols.set(value, category=name, **labels)
+
+        if 'watch_only_deferred' in self.stats:
+            _watch_only_deferred.inc(self.stats['watch_only_deferred'], **labels)
+
+
+class RoundScheduler(metaclass=abc.ABCMeta):
+    """決定每一輪分析哪些交易對，以及下一輪什麼時候開始"""
+
+    @abc.abstractmethod
+    def plan_round(self, watching_symbols: List, positions: Dict, now: float) -> RoundPlan:
+        """
+        規劃這一輪
+        watching_symbols: 全部監視中的交易對
+        positions: 資產名稱 -> Position
+        now: 目前時間 (epoch 秒)
+        """
+        return NotImplemented
+
+    def mark_analyzed(self, symbol_info) -> None:
+        """交易對完整分析成功後呼叫"""
+        pass
+
+    @abc.abstractmethod
+    def seconds_until_next_round(self, now: float) -> float:
+        """距離下一輪開始的秒數，小於等於 0 表示立即開始"""
+        return NotImplemented